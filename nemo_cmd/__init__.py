@@ -16,6 +16,6 @@
 # SPDX-License-Identifier: Apache-2.0
 
 
-# Make fspath.fspath() and fspath.resolved_path() available in the nemo_cmd
-# namespace
-from nemo_cmd.fspath import fspath, expanded_path, resolved_path
+# Make fspath.fspath(), fspath.resolved_path(), and fspath.PathCache available
+# in the nemo_cmd namespace
+from nemo_cmd.fspath import fspath, expanded_path, resolved_path, PathCache
@@ -36,7 +36,9 @@ import yaml
 from nemo_cmd import combine as combine_plugin
 from nemo_cmd import deflate as deflate_plugin
 from nemo_cmd import gather as gather_plugin
+from nemo_cmd import postprocess as postprocess_plugin
 from nemo_cmd import prepare as prepare_plugin
+from nemo_cmd.fspath import fspath
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -47,7 +49,15 @@ handler.setFormatter(formatter)
 log.addHandler(handler)
 
 
-def combine(run_desc_file):
+def combine(
+    run_desc_file,
+    max_concurrent_jobs=None,
+    n_threads=None,
+    output_dir=None,
+    include_vars=None,
+    exclude_vars=None,
+    work_dir=None,
+):
     """Run the NEMO :program:`rebuild_nemo` tool for each set of
     per-processor results files.
 
@@ -56,11 +66,50 @@ def combine(run_desc_file):
 
     :param run_desc_file: File path/name of the run description YAML file.
     :type results_dir: :py:class:`pathlib.Path`
+
+    :param int max_concurrent_jobs: Maximum number of concurrent
+                                    :program:`rebuild_nemo` processes allowed;
+                                    calculated from the number of cores and
+                                    the per-processor file sets by default.
+
+    :param int n_threads: Number of OpenMP threads to use in each
+                          :program:`rebuild_nemo` process;
+                          calculated from the number of cores and the number
+                          of concurrent processes by default.
+
+    :param output_dir: Directory in which to write the combined files;
+                       defaults to the present working directory.
+    :type output_dir: :py:class:`pathlib.Path`
+
+    :param dict include_vars: Lists of the only variables to include in the
+                              combined files, keyed by file name-root
+                              patterns;
+                              overrides the :kbd:`combine: variables:` section
+                              of the run description.
+
+    :param dict exclude_vars: Lists of variables to exclude from the combined
+                              files, keyed by file name-root patterns;
+                              overrides the :kbd:`combine: variables:` section
+                              of the run description.
+
+    :param work_dir: Directory that contains the per-processor files,
+                     and that relative run_desc_file and output_dir paths
+                     are relative to;
+                     defaults to the present working directory.
+    :type work_dir: :py:class:`pathlib.Path`
     """
-    return combine_plugin.combine(run_desc_file)
+    return combine_plugin.combine(
+        run_desc_file,
+        max_concurrent_jobs,
+        n_threads,
+        output_dir,
+        include_vars,
+        exclude_vars,
+        work_dir,
+    )
 
 
-def deflate(filepaths, max_concurrent_jobs):
+def deflate(filepaths, max_concurrent_jobs, output_dir=None, work_dir=None):
     """Deflate variables in each of the netCDF files in filepaths using
     Lempel-Ziv compression.
 
@@ -71,12 +120,25 @@ def deflate(filepaths, max_concurrent_jobs):
 
     :param int max_concurrent_jobs: Maximum number of concurrent deflation
                                     processes allowed.
+
+    :param output_dir: Directory in which to write the deflated files;
+                       the default is to replace the original files.
+    :type output_dir: :py:class:`pathlib.Path`
+
+    :param work_dir: Directory that relative filepaths and output_dir are
+                     relative to;
+                     defaults to the present working directory.
+    :type work_dir: :py:class:`pathlib.Path`
     """
     try:
-        return deflate_plugin.deflate(filepaths, max_concurrent_jobs)
+        return deflate_plugin.deflate(
+            filepaths, max_concurrent_jobs, output_dir, work_dir
+        )
     except AttributeError:
         # filepaths is sequence of path strings not Path objects
-        return deflate_plugin.deflate(map(Path, filepaths), max_concurrent_jobs)
+        return deflate_plugin.deflate(
+            map(Path, filepaths), max_concurrent_jobs, output_dir, work_dir
+        )
 
 
 def find_rebuild_nemo_script(run_desc):
@@ -96,22 +158,159 @@ def find_rebuild_nemo_script(run_desc):
     return combine_plugin.find_rebuild_nemo_script(run_desc)
 
 
-def gather(results_dir):
-    """Move all of the files and directories from the present working directory
+def gather(
+    results_dir,
+    max_concurrent_jobs=None,
+    manifest=False,
+    hash_name="blake2b",
+    bundle_threshold=None,
+    keep_source=False,
+    add_mode=None,
+    group=None,
+    layout=None,
+    run_id=None,
+    work_dir=None,
+):
+    """Move all of the files and directories from the run directory
     into results_dir.
 
     If results_dir doesn't exist, create it.
 
-    Delete any symbolic links so that the present working directory is empty.
+    Delete any symbolic links so that the run directory is empty.
+
+    :param results_dir: Path of the directory into which to store the run
+                        results.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :param int max_concurrent_jobs: Maximum number of concurrent file copies
+                                    when results_dir is on a different file
+                                    system than the run directory;
+                                    defaults to
+                                    :py:data:`nemo_cmd.transfer.DEFAULT_MAX_WORKERS`.
+
+    :param boolean manifest: Write a :file:`MANIFEST` file containing the size,
+                             modification time, and hash of each file in
+                             results_dir.
+
+    :param str hash_name: Name of the :py:mod:`hashlib` algorithm to use for
+                          the :file:`MANIFEST` file.
+
+    :param int bundle_threshold: Size in bytes below which files,
+                                 other than netCDF files,
+                                 are bundled into an indexed
+                                 :file:`small_files.tar` archive in
+                                 results_dir;
+                                 :py:obj:`None` means don't bundle files.
+
+    :param boolean keep_source: Leave the files and symbolic links in the
+                                run directory in place;
+                                files are cloned,
+                                hard-linked,
+                                or copied into results_dir.
+
+    :param int add_mode: Permission bits to add to results_dir and the files
+                         and directories gathered into it;
+                         :py:obj:`None` means leave their modes unchanged.
+
+    :param str group: Name or id of the group to change the group ownership
+                      of results_dir and the files and directories gathered
+                      into it to;
+                      :py:obj:`None` means leave their groups unchanged.
+
+    :param str layout: Template of the sub-directory of results_dir to put
+                       each results file whose name contains NEMO output
+                       dates into
+                       (e.g. :kbd:`{run_id}/{yyyy}/{mm}/`);
+                       :py:obj:`None` means put all files in results_dir.
+
+    :param str run_id: Run id to use for the :kbd:`{run_id}` field of the
+                       layout template.
+
+    :param work_dir: Run directory to gather the results from;
+                     a relative results_dir is relative to it.
+                     Defaults to the present working directory.
+    :type work_dir: :py:class:`pathlib.Path`
+    """
+    return gather_plugin.gather(
+        results_dir,
+        max_concurrent_jobs,
+        manifest,
+        hash_name,
+        bundle_threshold,
+        keep_source,
+        add_mode,
+        group,
+        layout,
+        run_id,
+        work_dir,
+    )
+
+
+def postprocess(
+    run_desc_file,
+    results_dir,
+    max_combine_jobs=None,
+    n_threads=None,
+    max_deflate_jobs=None,
+    max_transfer_jobs=None,
+    no_deflate=False,
+    add_mode=None,
+    group=None,
+    work_dir=None,
+):
+    """Combine, deflate, and gather the results of the NEMO run in work_dir
+    into results_dir in a single pipeline.
+
+    :param run_desc_file: File path/name of the run description YAML file.
+    :type run_desc_file: :py:class:`pathlib.Path`
 
     :param results_dir: Path of the directory into which to store the run
                         results.
     :type results_dir: :py:class:`pathlib.Path`
+
+    :param int max_combine_jobs: Maximum number of concurrent
+                                 :program:`rebuild_nemo` processes allowed.
+
+    :param int n_threads: Number of OpenMP threads to use in each
+                          :program:`rebuild_nemo` process.
+
+    :param int max_deflate_jobs: Maximum number of concurrent deflation
+                                 processes allowed.
+
+    :param int max_transfer_jobs: Maximum number of concurrent file copies
+                                  when results_dir is on a different file
+                                  system than work_dir.
+
+    :param boolean no_deflate: Don't deflate the combined results files.
+
+    :param int add_mode: Permission bits to add to results_dir and the files
+                         and directories placed in it.
+
+    :param str group: Name or id of the group to change the group ownership
+                      of results_dir and the files and directories placed in
+                      it to.
+
+    :param work_dir: Run directory that contains the results files;
+                     relative run_desc_file and results_dir paths are
+                     relative to it.
+                     Defaults to the present working directory.
+    :type work_dir: :py:class:`pathlib.Path`
     """
-    return gather_plugin.gather(results_dir)
+    return postprocess_plugin.postprocess(
+        run_desc_file,
+        results_dir,
+        max_combine_jobs,
+        n_threads,
+        max_deflate_jobs,
+        max_transfer_jobs,
+        no_deflate,
+        add_mode,
+        group,
+        work_dir,
+    )
 
 
-def prepare(run_desc_file, nocheck_init=False):
+def prepare(run_desc_file, nocheck_init=False, work_dir=None, run_desc=None):
     """Prepare a NEMO run.
 
     A temporary run directory is created, and symbolic links
@@ -128,10 +327,24 @@ def prepare(run_desc_file, nocheck_init=False):
                        default is to check
     :type nocheck_init: boolean
 
+    :param work_dir: Directory that a relative run_desc_file path is relative
+                     to;
+                     defaults to the present working directory.
+                     Relative paths in the run description are still
+                     relative to the present working directory.
+    :type work_dir: :py:class:`pathlib.Path`
+
+    :param dict run_desc: Run description dictionary that has already been
+                          loaded from run_desc_file,
+                          so that it is not parsed again;
+                          run_desc_file is loaded if it is :py:obj:`None`.
+
     :returns: Path of the temporary run directory
     :rtype: :py:class:`pathlib.Path`
     """
-    return prepare_plugin.prepare(run_desc_file, nocheck_init)
+    if work_dir is not None:
+        run_desc_file = Path(work_dir, run_desc_file)
+    return prepare_plugin.prepare(run_desc_file, nocheck_init, run_desc=run_desc)
 
 
 def run_description(
@@ -265,7 +478,7 @@ def run_description(
     return run_description
 
 
-def run_in_subprocess(run_id, run_desc, results_dir):
+def run_in_subprocess(run_id, run_desc, results_dir, work_dir=None):
     """Execute `nemo run` in a subprocess.
 
     :arg str run_id: Job identifier that appears in the :command:`qstat`
@@ -278,15 +491,24 @@ def run_in_subprocess(run_id, run_desc, results_dir):
 
     :arg results_dir: Directory to store results into.
     :type results_dir: str
+
+    :arg work_dir: Directory to write the temporary YAML file in,
+                   and to run the sub-process in;
+                   defaults to the present working directory.
+    :type work_dir: :py:class:`pathlib.Path`
     """
+    work_dir = Path.cwd() if work_dir is None else Path(work_dir)
     yaml_file = f"{run_id}_subprocess_run.yaml"
-    with open(yaml_file, "wt") as f:
+    with (work_dir / yaml_file).open("wt") as f:
         yaml.dump(run_desc, f, default_flow_style=False)
     cmd = ["salishsea", "run"]
     cmd.extend([yaml_file, results_dir])
     try:
         output = subprocess.check_output(
-            cmd, stderr=subprocess.STDOUT, universal_newlines=True
+            cmd,
+            stderr=subprocess.STDOUT,
+            cwd=fspath(work_dir),
+            universal_newlines=True,
         )
         for line in output.splitlines():
             if line:
@@ -296,7 +518,7 @@ def run_in_subprocess(run_id, run_desc, results_dir):
         for line in e.output.splitlines():
             if line:
                 log.error(line)
-    os.unlink(yaml_file)
+    (work_dir / yaml_file).unlink()
 
 
 def _run_subcommand(app, app_args, argv):
@@ -0,0 +1,201 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""Bundles of small files in indexed tar archives.
+
+A run produces dozens of small files
+(namelists, XML file definitions, revision records, :file:`ocean.output`,
+:file:`time.step`, :file:`layout.dat`, etc.)
+that use an inode each in the results directory.
+Bundling them into a single uncompressed tar archive reduces the pressure
+on inode quotas,
+and speeds up directory listings and backups on parallel file systems.
+
+Each bundle has an index sidecar file that contains the offset,
+size,
+modification time,
+and permissions of each member,
+so that members can be read with a single seek and read without unpacking,
+or even scanning,
+the archive.
+Because the archive is uncompressed it can also be read,
+or unpacked,
+with :command:`tar`.
+"""
+
+import math
+import os
+import shutil
+import stat
+import tarfile
+from pathlib import Path
+
+import yaml
+
+from nemo_cmd.fspath import fspath
+
+#: Suffix of bundle index sidecar file names.
+INDEX_SUFFIX = ".index.yaml"
+
+
+def index_path(bundle_path):
+    """Return the path of the index sidecar file of a bundle.
+
+    :param bundle_path: Path of bundle archive.
+    :type bundle_path: :py:class:`pathlib.Path`
+
+    :rtype: :py:class:`pathlib.Path`
+    """
+    bundle_path = Path(bundle_path)
+    return bundle_path.with_name(f"{bundle_path.name}{INDEX_SUFFIX}")
+
+
+def write_bundle(file_paths, bundle_path):
+    """Add files to a bundle archive and update its index.
+
+    If the bundle already exists the files are appended to it,
+    and members with the same names as files that were already in the bundle
+    replace them in the index.
+
+    The files are appended to a temporary copy of the archive that replaces
+    it when it is complete,
+    so an interrupted write leaves the archive as it was,
+    and writing the bundle again resumes it.
+    The archive and its index are flushed to disk before this function
+    returns,
+    so the source files can safely be deleted.
+
+    :param file_paths: Paths of files to add to the bundle.
+                       They are stored under their names,
+                       without their directories.
+    :type file_paths: sequence of :py:class:`pathlib.Path`
+
+    :param bundle_path: Path of bundle archive.
+    :type bundle_path: :py:class:`pathlib.Path`
+
+    :returns: Index of the bundle members keyed by member name.
+    :rtype: dict
+    """
+    bundle_path = Path(bundle_path)
+    tmp_path = bundle_path.with_name(f".{bundle_path.name}.tmp")
+    index = {}
+    mode = "w"
+    if bundle_path.exists():
+        index = read_index(bundle_path)
+        shutil.copyfile(fspath(bundle_path), fspath(tmp_path))
+        mode = "a"
+    with tarfile.open(fspath(tmp_path), mode, format=tarfile.PAX_FORMAT) as tar:
+        for file_path in file_paths:
+            file_path = Path(file_path)
+            tarinfo = tar.gettarinfo(fspath(file_path), arcname=file_path.name)
+            with file_path.open("rb") as f:
+                tar.addfile(tarinfo, f)
+            # The member's data is the last thing written,
+            # padded to a whole number of blocks
+            data_blocks = math.ceil(tarinfo.size / tarfile.BLOCKSIZE)
+            index[tarinfo.name] = {
+                "offset": tar.offset - data_blocks * tarfile.BLOCKSIZE,
+                "size": tarinfo.size,
+                "mtime": tarinfo.mtime,
+                "mode": stat.S_IMODE(tarinfo.mode),
+            }
+    fd = os.open(fspath(tmp_path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(fspath(tmp_path), fspath(bundle_path))
+    _write_index(index, bundle_path)
+    return index
+
+
+def _write_index(index, bundle_path):
+    path = index_path(bundle_path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with tmp_path.open("wt") as f:
+        yaml.safe_dump(index, f, default_flow_style=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(fspath(tmp_path), fspath(path))
+
+
+def read_index(bundle_path):
+    """Read the index of a bundle archive.
+
+    If the index sidecar file is missing,
+    because writing the bundle was interrupted before the index was written,
+    the index is rebuilt by scanning the archive.
+
+    :param bundle_path: Path of bundle archive.
+    :type bundle_path: :py:class:`pathlib.Path`
+
+    :returns: Offset, size, modification time, and permissions of each member
+              of the bundle keyed by member name.
+    :rtype: dict
+    """
+    try:
+        with index_path(bundle_path).open("rt") as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return _scan_index(bundle_path)
+
+
+def _scan_index(bundle_path):
+    index = {}
+    with tarfile.open(fspath(bundle_path), "r") as tar:
+        # Later members replace earlier ones with the same name,
+        # as they do when the archive is unpacked
+        for tarinfo in tar:
+            index[tarinfo.name] = {
+                "offset": tarinfo.offset_data,
+                "size": tarinfo.size,
+                "mtime": tarinfo.mtime,
+                "mode": stat.S_IMODE(tarinfo.mode),
+            }
+    return index
+
+
+def list_members(bundle_path):
+    """Return the names of the members of a bundle archive.
+
+    :param bundle_path: Path of bundle archive.
+    :type bundle_path: :py:class:`pathlib.Path`
+
+    :rtype: list
+    """
+    return sorted(read_index(bundle_path))
+
+
+def read_member(bundle_path, name):
+    """Read the contents of a member of a bundle archive without unpacking
+    the archive.
+
+    :param bundle_path: Path of bundle archive.
+    :type bundle_path: :py:class:`pathlib.Path`
+
+    :param str name: Name of member to read.
+
+    :returns: Contents of the member.
+    :rtype: bytes
+
+    :raises: :py:exc:`KeyError` if there is no member with that name in the
+             bundle.
+    """
+    member = read_index(bundle_path)[name]
+    with open(fspath(bundle_path), "rb") as f:
+        return os.pread(f.fileno(), member["size"], member["offset"])
@@ -0,0 +1,94 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""Per-user cache of information that NEMO-Cmd sub-commands reuse from
+one invocation to the next.
+
+The cache is a directory of YAML files.
+Nothing in it is essential;
+failures to read or write cache files are logged and otherwise ignored,
+so deleting the cache directory is always safe.
+"""
+
+import logging
+import os
+from pathlib import Path
+
+import yaml
+
+from nemo_cmd.fspath import fspath
+
+logger = logging.getLogger(__name__)
+
+
+def cache_dir():
+    """Return the path of the NEMO-Cmd per-user cache directory.
+
+    The directory is :file:`nemo_cmd/` in the directory given by the
+    :envvar:`XDG_CACHE_HOME` environment variable,
+    or in :file:`~/.cache/` if that is not set.
+
+    :return: Cache directory path.
+    :rtype: :py:class:`pathlib.Path`
+    """
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+    base_dir = Path(xdg_cache_home) if xdg_cache_home else Path.home() / ".cache"
+    return base_dir / "nemo_cmd"
+
+
+def read_yaml(name, default=None):
+    """Read the contents of a YAML file in the cache directory.
+
+    :param str name: File name in the cache directory.
+
+    :param default: Value to return if the file does not exist or can't be
+                    read.
+
+    :return: Contents of the file.
+    """
+    path = cache_dir() / name
+    try:
+        with path.open("rt") as f:
+            contents = yaml.safe_load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, yaml.YAMLError) as e:
+        logger.debug(f"unable to read cache file {path}: {e}")
+        return default
+    return default if contents is None else contents
+
+
+def write_yaml(name, contents):
+    """Write contents to a YAML file in the cache directory.
+
+    The file is written under a temporary name and renamed so that
+    concurrent readers never see a partially written file.
+
+    :param str name: File name in the cache directory.
+
+    :param contents: Object to write to the file.
+    """
+    path = cache_dir() / name
+    tmp_path = path.with_name(f".{name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tmp_path.open("wt") as f:
+            yaml.safe_dump(contents, f, default_flow_style=False)
+        os.replace(fspath(tmp_path), fspath(path))
+    except OSError as e:
+        logger.debug(f"unable to write cache file {path}: {e}")
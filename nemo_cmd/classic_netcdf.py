@@ -0,0 +1,545 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""Memory-mapped combining of netCDF classic format per-processor files.
+
+NEMO per-processor restart files are often written in the netCDF classic or
+64-bit offset formats in which the data for each variable is stored at a
+fixed offset given in the file header.
+That allows the per-processor files to be combined by copying the bytes of
+each row of each tile from a memory map of the tile directly into a memory
+map of the combined file,
+through memory views of the maps so that the rows are not copied into
+intermediate bytes objects,
+and without using the netCDF library.
+
+The file format is described in
+https://docs.unidata.ucar.edu/netcdf-c/current/file_format_specifications.html
+"""
+
+import math
+import mmap
+import os
+import struct
+from pathlib import Path
+
+import attr
+
+from nemo_cmd.fspath import fspath
+
+CLASSIC_MAGIC = b"CDF\x01"
+OFFSET_64BIT_MAGIC = b"CDF\x02"
+STREAMING = 0xFFFFFFFF
+NC_DIMENSION = 0x0A
+NC_VARIABLE = 0x0B
+NC_ATTRIBUTE = 0x0C
+#: Sizes in bytes of the netCDF classic data types, keyed by type code.
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 4, 6: 8}
+#: :py:mod:`struct` format characters of the numeric netCDF classic data types.
+TYPE_FORMATS = {1: "b", 3: "h", 4: "i", 5: "f", 6: "d"}
+
+
+@attr.s
+class Variable(object):
+    """netCDF classic format variable header information."""
+
+    #: Variable name.
+    name = attr.ib()
+    #: Ids of the variable's dimensions.
+    dimids = attr.ib()
+    #: Variable attributes as a list of (name, nc_type, nelems, raw value bytes)
+    #: tuples.
+    attrs = attr.ib()
+    #: netCDF data type code of the variable.
+    nc_type = attr.ib()
+    #: Byte offset of the start of the variable's data.
+    begin = attr.ib(default=0)
+
+
+@attr.s
+class Header(object):
+    """netCDF classic format file header."""
+
+    #: Format version number; 1 for classic, 2 for 64-bit offset.
+    version = attr.ib()
+    #: Number of records.
+    numrecs = attr.ib()
+    #: Dimensions as a list of (name, length) tuples;
+    #: the record dimension has length 0.
+    dims = attr.ib()
+    #: Global attributes as a list of (name, nc_type, nelems, raw value bytes)
+    #: tuples.
+    gatts = attr.ib()
+    #: List of :py:class:`~nemo_cmd.classic_netcdf.Variable` objects.
+    variables = attr.ib()
+
+    def is_record_var(self, var):
+        """Return a boolean indicating whether var is a record variable."""
+        return bool(var.dimids) and self.dims[var.dimids[0]][1] == 0
+
+    def slab_shape(self, var):
+        """Return the shape of one record of var,
+        or of all of var if it is not a record variable.
+        """
+        dimids = var.dimids[1:] if self.is_record_var(var) else var.dimids
+        return [self.dims[dimid][1] for dimid in dimids]
+
+    def slab_size(self, var):
+        """Return the unpadded size in bytes of one record of var,
+        or of all of var if it is not a record variable.
+        """
+        return math.prod(self.slab_shape(var)) * TYPE_SIZES[var.nc_type]
+
+    @property
+    def record_size(self):
+        """Size in bytes of each record."""
+        record_vars = [var for var in self.variables if self.is_record_var(var)]
+        if len(record_vars) == 1:
+            # Record data for a lone record variable is not padded
+            return self.slab_size(record_vars[0])
+        return sum(_padded(self.slab_size(var)) for var in record_vars)
+
+    def global_attr(self, name):
+        """Return the decoded value of the global attribute called name,
+        or :py:obj:`None` if there is no such attribute.
+        """
+        for att_name, nc_type, nelems, value in self.gatts:
+            if att_name == name:
+                if nc_type == 2:
+                    return value.decode()
+                return list(struct.unpack(f">{nelems}{TYPE_FORMATS[nc_type]}", value))
+        return None
+
+
+def is_classic_format(path):
+    """Return a boolean indicating whether the file at path is in the netCDF
+    classic or 64-bit offset format.
+
+    :param path: Path of file to check.
+    :type path: :py:class:`pathlib.Path`
+
+    :rtype: boolean
+    """
+    try:
+        with open(fspath(path), "rb") as f:
+            magic = f.read(4)
+    except OSError:
+        return False
+    return magic in {CLASSIC_MAGIC, OFFSET_64BIT_MAGIC}
+
+
+def read_header(buf):
+    """Parse the header of a netCDF classic or 64-bit offset format file.
+
+    :param buf: Buffer holding the file contents;
+                typically a memory map of the file.
+
+    :returns: File header.
+    :rtype: :py:class:`nemo_cmd.classic_netcdf.Header`
+
+    :raises: :py:exc:`ValueError` if buf does not hold a classic or 64-bit
+             offset format file
+    """
+    magic = bytes(buf[:4])
+    if magic not in {CLASSIC_MAGIC, OFFSET_64BIT_MAGIC}:
+        raise ValueError("not a netCDF classic or 64-bit offset format file")
+    version = magic[3]
+    reader = _HeaderReader(buf, 4)
+    numrecs = reader.uint()
+    dims = [(reader.name(), reader.uint()) for _ in range(reader.list_length())]
+    gatts = reader.attrs()
+    variables = []
+    for _ in range(reader.list_length()):
+        name = reader.name()
+        dimids = [reader.uint() for _ in range(reader.uint())]
+        attrs = reader.attrs()
+        nc_type = reader.uint()
+        reader.uint()  # vsize is recalculated when it is needed
+        begin = reader.offset(version)
+        variables.append(Variable(name, dimids, attrs, nc_type, begin))
+    header = Header(version, numrecs, dims, gatts, variables)
+    if numrecs == STREAMING:
+        record_vars = [var for var in variables if header.is_record_var(var)]
+        header.numrecs = (
+            (len(buf) - record_vars[0].begin) // header.record_size
+            if record_vars
+            else 0
+        )
+    return header
+
+
+def write_header(header):
+    """Serialize a netCDF file header in the 64-bit offset format,
+    calculating the data offsets of the variables.
+
+    The :py:attr:`begin` attributes of the variables in header are updated.
+
+    :param header: File header to serialize.
+    :type header: :py:class:`nemo_cmd.classic_netcdf.Header`
+
+    :returns: Serialized header, and the total size of the file.
+    :rtype: 2-tuple of (bytes, int)
+    """
+    header.version = 2
+    fixed_part = _serialize_header(header)
+    offset = len(fixed_part)
+    for var in header.variables:
+        if not header.is_record_var(var):
+            var.begin = offset
+            offset += _padded(header.slab_size(var))
+    for var in header.variables:
+        if header.is_record_var(var):
+            var.begin = offset
+            offset += _padded(header.slab_size(var))
+    record_vars = [var for var in header.variables if header.is_record_var(var)]
+    file_size = offset
+    if record_vars:
+        file_size = record_vars[0].begin + header.numrecs * header.record_size
+    return _serialize_header(header), file_size
+
+
+def combine_tiles(tile_paths, combined_path, include=None, exclude=()):
+    """Combine a set of per-processor classic or 64-bit offset format files
+    into a single 64-bit offset format file.
+
+    The tiles are memory-mapped and the rows of each of their variables are
+    copied directly into a memory map of the combined file.
+    Halo regions are excluded using the NEMO :kbd:`DOMAIN_*` global attributes.
+    Variables that are not decomposed over the processors are copied from the
+    first tile.
+    Regions of the domain that are not covered by any tile
+    (land processors that were eliminated from the run)
+    are filled with the :kbd:`_FillValue` of the variable,
+    or zero if it has none.
+
+    The combined file is written under a temporary name and renamed to
+    combined_path when it is complete.
+
+    When include is given only those variables,
+    and the coordinate variables that they use,
+    are copied,
+    so the data for the other variables is never read.
+
+    :param tile_paths: Paths of per-processor files to combine.
+    :type tile_paths: sequence of :py:class:`pathlib.Path`
+
+    :param combined_path: Path of combined file to write.
+    :type combined_path: :py:class:`pathlib.Path`
+
+    :param include: Names of the only variables to include in the combined
+                    file;
+                    :py:obj:`None` means include all variables.
+    :type include: sequence or :py:obj:`None`
+
+    :param exclude: Names of variables to exclude from the combined file.
+    :type exclude: sequence
+
+    :raises: :py:exc:`ValueError` if the tiles can't be combined by copying
+             their rows
+    """
+    tiles = []
+    try:
+        for tile_path in tile_paths:
+            with open(fspath(tile_path), "rb") as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            tiles.append((buf, read_header(buf)))
+        out_header, x_dimid, y_dimid = _combined_header(
+            [header for _, header in tiles], include, exclude
+        )
+        _write_combined(tiles, out_header, x_dimid, y_dimid, Path(combined_path))
+    finally:
+        for buf, _ in tiles:
+            buf.close()
+
+
+def combined_file_size(tile_paths, include=None, exclude=()):
+    """Calculate the size of the file that :py:func:`combine_tiles` would
+    write for a set of per-processor files.
+
+    Only the headers of the per-processor files are read.
+
+    :param tile_paths: Paths of per-processor files to combine.
+    :type tile_paths: sequence of :py:class:`pathlib.Path`
+
+    :param include: Names of the only variables to include in the combined
+                    file;
+                    :py:obj:`None` means include all variables.
+    :type include: sequence or :py:obj:`None`
+
+    :param exclude: Names of variables to exclude from the combined file.
+    :type exclude: sequence
+
+    :returns: Size in bytes of the combined file.
+    :rtype: int
+
+    :raises: :py:exc:`ValueError` if the tiles can't be combined by copying
+             their rows
+    """
+    headers = []
+    for tile_path in tile_paths:
+        with open(fspath(tile_path), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                headers.append(read_header(buf))
+    out_header, _, _ = _combined_header(headers, include, exclude)
+    _, file_size = write_header(out_header)
+    return file_size
+
+
+def _combined_header(headers, include, exclude):
+    first = headers[0]
+    n_domains = first.global_attr("DOMAIN_number_total")
+    if n_domains is None or n_domains[0] != len(headers):
+        raise ValueError(
+            f"expected {n_domains} per-processor files, found {len(headers)}"
+        )
+    x_dimid, y_dimid = (
+        dimid - 1 for dimid in _domain_attr(first, "DOMAIN_dimensions_ids")
+    )
+    var_names = [var.name for var in first.variables]
+    for header in headers[1:]:
+        if [var.name for var in header.variables] != var_names:
+            raise ValueError("per-processor files contain different variables")
+        if header.numrecs != first.numrecs:
+            raise ValueError("per-processor files contain different numbers of records")
+    global_size = _domain_attr(first, "DOMAIN_size_global")
+    dims = list(first.dims)
+    dims[x_dimid] = (dims[x_dimid][0], global_size[0])
+    dims[y_dimid] = (dims[y_dimid][0], global_size[1])
+    selected = _select_vars(first, include, exclude)
+    out_vars = []
+    for var in first.variables:
+        if var.name not in selected:
+            continue
+        if (x_dimid in var.dimids or y_dimid in var.dimids) and var.dimids[-2:] != [
+            y_dimid,
+            x_dimid,
+        ]:
+            raise ValueError(f"{var.name} does not have y and x as its last dimensions")
+        out_vars.append(Variable(var.name, var.dimids, var.attrs, var.nc_type))
+    gatts = [att for att in first.gatts if not att[0].startswith("DOMAIN_")]
+    return Header(2, first.numrecs, dims, gatts, out_vars), x_dimid, y_dimid
+
+
+def _select_vars(header, include, exclude):
+    """Return the set of names of the variables to include in the combined file.
+
+    Coordinate variables,
+    and variables named in the :kbd:`coordinates` attributes of the included
+    variables,
+    are included along with the variables in include.
+    """
+    if include is None:
+        return {var.name for var in header.variables} - set(exclude)
+    selected = set(include)
+    dim_names = {name for name, _ in header.dims}
+    for var in header.variables:
+        if var.name in dim_names:
+            selected.add(var.name)
+        if var.name in include:
+            for att_name, nc_type, _, value in var.attrs:
+                if att_name == "coordinates" and nc_type == 2:
+                    selected.update(value.decode().split())
+    return selected - set(exclude)
+
+
+def _write_combined(tiles, out_header, x_dimid, y_dimid, combined_path):
+    header_bytes, file_size = write_header(out_header)
+    tmp_path = combined_path.with_name(f".{combined_path.name}.tmp")
+    try:
+        with open(fspath(tmp_path), "w+b") as f:
+            f.truncate(file_size)
+            f.write(header_bytes)
+            f.flush()
+            if file_size > len(header_bytes):
+                with mmap.mmap(f.fileno(), file_size) as out:
+                    for out_var in out_header.variables:
+                        _copy_variable(
+                            tiles, out, out_header, out_var, x_dimid, y_dimid
+                        )
+                    out.flush()
+    except BaseException:
+        # Don't leave a partial file behind for rebuild_nemo to trip over
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(fspath(tmp_path), fspath(combined_path))
+
+
+def _copy_variable(tiles, out, out_header, out_var, x_dimid, y_dimid):
+    n_records = out_header.numrecs if out_header.is_record_var(out_var) else 1
+    out_record_size = out_header.record_size
+    out_slab_size = out_header.slab_size(out_var)
+    decomposed = out_var.dimids[-2:] == [y_dimid, x_dimid]
+    if not decomposed:
+        buf, header = tiles[0]
+        var = _find_var(header, out_var.name)
+        with memoryview(out) as out_view, memoryview(buf) as src_view:
+            for record in range(n_records):
+                src = var.begin + record * header.record_size
+                dst = out_var.begin + record * out_record_size
+                out_view[dst : dst + out_slab_size] = src_view[
+                    src : src + out_slab_size
+                ]
+        return
+    elsize = TYPE_SIZES[out_var.nc_type]
+    *_, out_ny, out_nx = out_header.slab_shape(out_var)
+    for att_name, nc_type, nelems, value in out_var.attrs:
+        if att_name == "_FillValue" and nc_type == out_var.nc_type and nelems == 1:
+            fill = value * (out_slab_size // elsize)
+            for record in range(n_records):
+                dst = out_var.begin + record * out_record_size
+                out[dst : dst + out_slab_size] = fill
+    for buf, header in tiles:
+        var = _find_var(header, out_var.name)
+        *outer_shape, ny, nx = header.slab_shape(var)
+        first_x, first_y = _domain_attr(header, "DOMAIN_position_first")
+        halo_start_x, halo_start_y = header.global_attr("DOMAIN_halo_size_start") or (
+            0,
+            0,
+        )
+        halo_end_x, halo_end_y = header.global_attr("DOMAIN_halo_size_end") or (0, 0)
+        row_bytes = (nx - halo_start_x - halo_end_x) * elsize
+        with memoryview(out) as out_view, memoryview(buf) as src_view:
+            for record in range(n_records):
+                src_record = var.begin + record * header.record_size
+                dst_record = out_var.begin + record * out_record_size
+                for outer in range(math.prod(outer_shape)):
+                    for j in range(halo_start_y, ny - halo_end_y):
+                        src = (
+                            src_record + ((outer * ny + j) * nx + halo_start_x) * elsize
+                        )
+                        dst = (
+                            dst_record
+                            + (
+                                (outer * out_ny + first_y - 1 + j) * out_nx
+                                + first_x
+                                - 1
+                                + halo_start_x
+                            )
+                            * elsize
+                        )
+                        out_view[dst : dst + row_bytes] = src_view[
+                            src : src + row_bytes
+                        ]
+
+
+def _domain_attr(header, name):
+    """Return the value of the NEMO :kbd:`DOMAIN_*` global attribute called
+    name.
+
+    :raises: :py:exc:`ValueError` if the attribute is missing,
+             so that the file set is combined by :program:`rebuild_nemo`
+             instead.
+    """
+    value = header.global_attr(name)
+    if value is None:
+        raise ValueError(f"{name} global attribute not found")
+    return value
+
+
+def _find_var(header, name):
+    for var in header.variables:
+        if var.name == name:
+            return var
+    raise ValueError(f"{name} variable not found")
+
+
+def _padded(n):
+    return n + (-n % 4)
+
+
+class _HeaderReader:
+    """Sequential reader for the big-endian fields of a netCDF header."""
+
+    def __init__(self, buf, pos):
+        self.buf = buf
+        self.pos = pos
+
+    def uint(self):
+        (value,) = struct.unpack_from(">I", self.buf, self.pos)
+        self.pos += 4
+        return value
+
+    def offset(self, version):
+        fmt, size = (">Q", 8) if version == 2 else (">I", 4)
+        (value,) = struct.unpack_from(fmt, self.buf, self.pos)
+        self.pos += size
+        return value
+
+    def name(self):
+        nelems = self.uint()
+        name = bytes(self.buf[self.pos : self.pos + nelems]).decode()
+        self.pos += _padded(nelems)
+        return name
+
+    def list_length(self):
+        tag, nelems = self.uint(), self.uint()
+        if tag not in {0, NC_DIMENSION, NC_VARIABLE, NC_ATTRIBUTE}:
+            raise ValueError(f"unexpected netCDF header tag: {tag:#x}")
+        return nelems
+
+    def attrs(self):
+        attrs = []
+        for _ in range(self.list_length()):
+            name = self.name()
+            nc_type = self.uint()
+            nelems = self.uint()
+            size = nelems * TYPE_SIZES[nc_type]
+            attrs.append(
+                (name, nc_type, nelems, bytes(self.buf[self.pos : self.pos + size]))
+            )
+            self.pos += _padded(size)
+        return attrs
+
+
+def _serialize_header(header):
+    parts = [OFFSET_64BIT_MAGIC, struct.pack(">I", header.numrecs)]
+    parts.append(_serialize_list_tag(NC_DIMENSION, header.dims))
+    for name, length in header.dims:
+        parts.extend((_serialize_name(name), struct.pack(">I", length)))
+    parts.append(_serialize_attrs(header.gatts))
+    parts.append(_serialize_list_tag(NC_VARIABLE, header.variables))
+    for var in header.variables:
+        parts.append(_serialize_name(var.name))
+        parts.append(struct.pack(f">I{len(var.dimids)}I", len(var.dimids), *var.dimids))
+        parts.append(_serialize_attrs(var.attrs))
+        vsize = _padded(header.slab_size(var))
+        parts.append(struct.pack(">IIQ", var.nc_type, min(vsize, STREAMING), var.begin))
+    return b"".join(parts)
+
+
+def _serialize_list_tag(tag, items):
+    return struct.pack(">II", tag if items else 0, len(items))
+
+
+def _serialize_name(name):
+    encoded = name.encode()
+    return struct.pack(">I", len(encoded)) + encoded + b"\x00" * (-len(encoded) % 4)
+
+
+def _serialize_attrs(attrs):
+    parts = [_serialize_list_tag(NC_ATTRIBUTE, attrs)]
+    for name, nc_type, nelems, value in attrs:
+        parts.extend(
+            (
+                _serialize_name(name),
+                struct.pack(">II", nc_type, nelems),
+                value,
+                b"\x00" * (-len(value) % 4),
+            )
+        )
+    return b"".join(parts)
@@ -22,20 +22,38 @@ Combine per-processor files from an MPI Salish Sea NEMO run into single
 files with the same name-root.
 """
 
+import argparse
+import fnmatch
+import heapq
 import logging
+import math
+import multiprocessing
 import os
 import shlex
 from pathlib import Path
 import shutil
+import statistics
 import subprocess
+import time
 
+import attr
 import cliff.command
-import yaml
 
-from nemo_cmd.fspath import fspath
+from nemo_cmd import cache, classic_netcdf
+from nemo_cmd.fspath import fspath, PathCache
+from nemo_cmd.run_description import RunDescription
 
 logger = logging.getLogger(__name__)
 
+#: Name of the cache file in which the throughputs of earlier combine runs
+#: are stored for :py:func:`plan`.
+THROUGHPUT_HISTORY = "combine_throughput.yaml"
+#: Number of throughput samples to keep for each combining method.
+THROUGHPUT_HISTORY_LENGTH = 50
+#: Name of the file in each rebuild job directory that the output of
+#: :program:`rebuild_nemo` is written to.
+REBUILD_LOG = "rebuild_nemo.log"
+
 
 class Combine(cliff.command.Command):
     """Combine per-processor files from an MPI NEMO run into single files"""
@@ -54,6 +72,78 @@ class Combine(cliff.command.Command):
             metavar="RUN_DESC_FILE",
             help="file path/name of run description YAML file",
         )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=positive_int,
+            default=None,
+            help=(
+                "Maximum number of concurrent rebuild_nemo processes allowed. "
+                "Defaults to a value calculated from the number of cores detected "
+                "and the number and sizes of the per-processor file sets."
+            ),
+        )
+        parser.add_argument(
+            "-t",
+            "--threads",
+            type=positive_int,
+            default=None,
+            help=(
+                "Number of OpenMP threads to use in each rebuild_nemo process. "
+                "Defaults to the number of cores detected divided by the number "
+                "of concurrent rebuild_nemo processes."
+            ),
+        )
+        parser.add_argument(
+            "--output-dir",
+            dest="output_dir",
+            type=Path,
+            default=None,
+            metavar="OUTPUT_DIR",
+            help=(
+                "Directory in which to write the combined files. "
+                "Defaults to the present working directory."
+            ),
+        )
+        parser.add_argument(
+            "--include-vars",
+            dest="include_vars",
+            type=_name_root_vars,
+            action="append",
+            default=[],
+            metavar="NAME_ROOT=VAR[,VAR...]",
+            help=(
+                "Only include the listed variables in the combined files whose "
+                "name-roots match the NAME_ROOT pattern; "
+                "e.g. '*_grid_T=votemper,vosaline'. "
+                "May be used more than once. "
+                "Overrides the combine: variables: section of the run description."
+            ),
+        )
+        parser.add_argument(
+            "--exclude-vars",
+            dest="exclude_vars",
+            type=_name_root_vars,
+            action="append",
+            default=[],
+            metavar="NAME_ROOT=VAR[,VAR...]",
+            help=(
+                "Exclude the listed variables from the combined files whose "
+                "name-roots match the NAME_ROOT pattern. "
+                "May be used more than once. "
+                "Overrides the combine: variables: section of the run description."
+            ),
+        )
+        parser.add_argument(
+            "--plan",
+            action="store_true",
+            help=(
+                "Don't combine anything; "
+                "report the number of per-processor files, their total size, "
+                "the expected combined file size, and the estimated time to "
+                "combine each file set, based on the throughput of earlier runs."
+            ),
+        )
         return parser
 
     def take_action(self, parsed_args):
@@ -65,29 +155,497 @@ class Combine(cliff.command.Command):
         The output of `rebuild_nemo` for each file set is logged
         at the INFO level.
         """
-        combine(parsed_args.run_desc_file)
+        if parsed_args.plan:
+            plan(
+                parsed_args.run_desc_file,
+                max_concurrent_jobs=parsed_args.jobs,
+                n_threads=parsed_args.threads,
+                include_vars=dict(parsed_args.include_vars),
+                exclude_vars=dict(parsed_args.exclude_vars),
+            )
+            return
+        combine(
+            parsed_args.run_desc_file,
+            max_concurrent_jobs=parsed_args.jobs,
+            n_threads=parsed_args.threads,
+            output_dir=parsed_args.output_dir,
+            include_vars=dict(parsed_args.include_vars),
+            exclude_vars=dict(parsed_args.exclude_vars),
+        )
+
 
+def positive_int(value):
+    """Parse a command-line option value that must be a positive integer,
+    like a number of concurrent jobs or threads.
+    """
+    try:
+        n = int(value)
+    except ValueError:
+        n = 0
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    return n
 
-def combine(run_desc_file):
+
+def _name_root_vars(value):
+    """Parse a NAME_ROOT=VAR[,VAR...] command-line option value."""
+    name_root, sep, var_names = value.partition("=")
+    var_names = [var_name for var_name in var_names.split(",") if var_name]
+    if not sep or not name_root or not var_names:
+        raise argparse.ArgumentTypeError(
+            f"expected NAME_ROOT=VAR[,VAR...], got {value!r}"
+        )
+    return name_root, var_names
+
+
+@attr.s
+class RebuildJob(object):
+    """:program:`rebuild_nemo` job to combine a set of per-processor files."""
+
+    #: Name-root of the per-processor files to combine.
+    name_root = attr.ib()
+    #: Number of per-processor files in the set.
+    nfiles = attr.ib()
+    #: Path of the :program:`rebuild_nemo` script to run.
+    rebuild_nemo_script = attr.ib()
+    #: Number of OpenMP threads for :program:`rebuild_nemo` to use.
+    n_threads = attr.ib(default=1)
+    #: Directory in which to write the combined file.
+    output_dir = attr.ib(default=None)
+    #: Variables to include in the combined file as a
+    #: (include variable names or :py:obj:`None`, exclude variable names)
+    #: 2-tuple;
+    #: :py:obj:`None` means include all variables.
+    var_selection = attr.ib(default=None)
+    #: Directory in which :program:`rebuild_nemo` is run.
+    job_dir = attr.ib(default=None)
+    #: Rebuild job subprocess object.
+    process = attr.ib(default=None)
+    #: Rebuild job process PID.
+    pid = attr.ib(default=None)
+    #: Rebuild job process return code.
+    returncode = attr.ib(default=None)
+    #: Time at which the rebuild job was started.
+    start_time = attr.ib(default=None)
+    #: Number of seconds that the rebuild job took.
+    elapsed = attr.ib(default=None)
+    #: Directory that contains the per-processor files;
+    #: :py:obj:`None` means the present working directory.
+    work_dir = attr.ib(default=None)
+    #: Output of the rebuild job,
+    #: available when it is done.
+    output = attr.ib(default=None)
+
+    def start(self):
+        """Start the rebuild job in a subprocess.
+
+        :program:`rebuild_nemo` writes its :file:`nam_rebuild` namelist file
+        in its working directory,
+        so each job runs in its own directory that contains symlinks to the
+        per-processor files.
+        That allows several jobs to run concurrently.
+        The job directory is created in the output directory so that the
+        combined file is written directly on to the file system where it will
+        be stored,
+        and only appears under its final name when it is complete.
+
+        The output of :program:`rebuild_nemo` is written to a log file in the
+        job directory rather than a pipe,
+        so that verbose output can't fill the pipe buffer and block the job
+        while it is only polled.
+
+        Cache the subprocess object and its process id as job attributes.
+        """
+        work_dir = Path.cwd() if self.work_dir is None else self.work_dir
+        output_dir = work_dir if self.output_dir is None else self.output_dir
+        self.job_dir = output_dir / f".{self.name_root}.rebuild"
+        self.job_dir.mkdir(exist_ok=True)
+        for fp in work_dir.glob(f"{self.name_root}_[0-9][0-9][0-9][0-9].nc"):
+            link = self.job_dir / fp.name
+            if not link.is_symlink():
+                link.symlink_to(fp)
+        cmd = (
+            f"{self.rebuild_nemo_script} -t {self.n_threads} "
+            f"{self.name_root} {self.nfiles}"
+        )
+        logger.info(cmd)
+        self.start_time = time.time()
+        with (self.job_dir / REBUILD_LOG).open("wt") as log:
+            self.process = subprocess.Popen(
+                shlex.split(cmd),
+                cwd=fspath(self.job_dir),
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                universal_newlines=True,
+            )
+        self.pid = self.process.pid
+        logger.debug(f"combining {self.name_root} in process {self.pid}")
+
+    @property
+    def done(self):
+        """Return a boolean indicating whether the job has finished.
+
+        Cache the subprocess return code and output as job attributes.
+        A job whose :program:`rebuild_nemo` process exits successfully
+        without producing the combined file has failed.
+        """
+        finished = False
+        self.returncode = self.process.poll()
+        if self.returncode is not None:
+            try:
+                self.output = (self.job_dir / REBUILD_LOG).read_text()
+            except FileNotFoundError:
+                self.output = ""
+            combined_path = self.job_dir / f"{self.name_root}.nc"
+            if self.returncode == 0 and not combined_path.exists():
+                self.returncode = 1
+                self.output = (
+                    f"{self.output}{self.name_root}: rebuild_nemo did not produce "
+                    f"{combined_path.name}; per-processor files kept"
+                )
+            if self.returncode == 0:
+                if self.var_selection is not None:
+                    selected_path = self.job_dir / f"{self.name_root}.vars.nc"
+                    self.returncode = _extract_vars(
+                        combined_path, selected_path, self.var_selection
+                    )
+                    combined_path = selected_path
+                if self.returncode == 0:
+                    combined_path.rename(self.job_dir.parent / f"{self.name_root}.nc")
+                    if self.start_time is not None:
+                        self.elapsed = time.time() - self.start_time
+            finished = True
+            logger.debug(
+                f"combining {self.name_root} finished with return code {self.returncode}"
+            )
+        return finished
+
+
+def combine(
+    run_desc_file,
+    max_concurrent_jobs=None,
+    n_threads=None,
+    output_dir=None,
+    include_vars=None,
+    exclude_vars=None,
+    work_dir=None,
+):
     """Run the NEMO :program:`rebuild_nemo` tool for each set of
     per-processor results files.
 
+    The number of concurrent :program:`rebuild_nemo` processes and the number
+    of OpenMP threads that each uses are balanced against the number of cores
+    available,
+    and the number and sizes of the per-processor file sets.
+
     The output of :program:`rebuild_nemo` for each file set is logged
     at the INFO level.
 
+    The combined files are written directly into output_dir under temporary
+    names,
+    and renamed when they are complete.
+
     :param run_desc_file: File path/name of the run description YAML file.
     :type run_desc_file: :py:class:`pathlib.Path`
+
+    :param int max_concurrent_jobs: Maximum number of concurrent
+                                    :program:`rebuild_nemo` processes allowed.
+
+    :param int n_threads: Number of OpenMP threads to use in each
+                          :program:`rebuild_nemo` process.
+
+    :param output_dir: Directory in which to write the combined files;
+                       defaults to the present working directory.
+                       It will be created if it does not exist.
+    :type output_dir: :py:class:`pathlib.Path`
+
+    :param dict include_vars: Lists of the only variables to include in the
+                              combined files,
+                              keyed by name-root patterns.
+                              Combined with,
+                              and takes precedence over the
+                              :kbd:`combine: variables:` section of the run
+                              description.
+
+    :param dict exclude_vars: Lists of variables to exclude from the combined
+                              files,
+                              keyed by name-root patterns.
+
+    :param work_dir: Directory that contains the per-processor files;
+                     defaults to the present working directory.
+                     Relative run_desc_file and output_dir paths are relative
+                     to it.
+    :type work_dir: :py:class:`pathlib.Path`
+
+    :raises: :py:exc:`SystemExit` if any of the file sets could not be combined.
     """
-    with run_desc_file.open("rt") as f:
-        run_desc = yaml.safe_load(f)
-    name_roots = _get_results_files()
+    work_dir = _work_dir(work_dir)
+    run_desc = RunDescription.load(work_dir / run_desc_file)
+    name_roots = _get_results_files(work_dir)
     if name_roots:
         rebuild_nemo_script = find_rebuild_nemo_script(run_desc)
-        _combine_results_files(rebuild_nemo_script, name_roots)
-        _delete_results_files(name_roots)
+        if output_dir is not None:
+            output_dir = (work_dir / output_dir).resolve()
+            output_dir.mkdir(parents=True, exist_ok=True)
+        var_selections = _get_var_selections(
+            run_desc, name_roots, include_vars or {}, exclude_vars or {}
+        )
+        combined = _combine_results_files(
+            rebuild_nemo_script,
+            name_roots,
+            max_concurrent_jobs,
+            n_threads,
+            output_dir,
+            var_selections,
+            work_dir,
+        )
+        _delete_results_files(combined, work_dir)
+        failed = [name_root for name_root in name_roots if name_root not in combined]
+        if failed:
+            logger.error(
+                f"unable to combine per-processor files for: {', '.join(failed)}"
+            )
+            raise SystemExit(2)
+
+
+@attr.s
+class FileSetPlan(object):
+    """Estimated cost of combining a set of per-processor files."""
+
+    #: Name-root of the per-processor files.
+    name_root = attr.ib()
+    #: Number of per-processor files in the set.
+    nfiles = attr.ib()
+    #: Total size in bytes of the per-processor files.
+    nbytes = attr.ib()
+    #: How the file set would be combined:
+    #: :kbd:`rename`, :kbd:`ncks`, :kbd:`mmap`, or :kbd:`rebuild_nemo`.
+    method = attr.ib()
+    #: Expected size in bytes of the combined file.
+    #: It is exact for the :kbd:`rename` and :kbd:`mmap` methods,
+    #: and the total size of the per-processor files,
+    #: including their halos,
+    #: for the others.
+    output_bytes = attr.ib()
+    #: Estimated number of seconds to combine the file set;
+    #: :py:obj:`None` if there is no throughput history for the method.
+    seconds = attr.ib(default=None)
+
+
+def plan(
+    run_desc_file,
+    max_concurrent_jobs=None,
+    n_threads=None,
+    include_vars=None,
+    exclude_vars=None,
+    work_dir=None,
+):
+    """Report how much work combining the per-processor files would be,
+    without combining anything.
+
+    For each set of per-processor files the number of files,
+    their total size,
+    the expected size of the combined file,
+    and the estimated time to combine them are logged at the INFO level,
+    along with the concurrent process layout and the estimated total
+    wall time.
+
+    The time estimates are based on the median throughputs of earlier
+    :program:`nemo combine` runs that are stored in the NEMO-Cmd cache
+    directory.
+
+    :param run_desc_file: File path/name of the run description YAML file.
+    :type run_desc_file: :py:class:`pathlib.Path`
 
+    :param int max_concurrent_jobs: Maximum number of concurrent
+                                    :program:`rebuild_nemo` processes allowed.
 
-def find_rebuild_nemo_script(run_desc):
+    :param int n_threads: Number of OpenMP threads to use in each
+                          :program:`rebuild_nemo` process.
+
+    :param dict include_vars: Lists of the only variables to include in the
+                              combined files,
+                              keyed by name-root patterns.
+
+    :param dict exclude_vars: Lists of variables to exclude from the combined
+                              files,
+                              keyed by name-root patterns.
+
+    :param work_dir: Directory that contains the per-processor files;
+                     defaults to the present working directory.
+    :type work_dir: :py:class:`pathlib.Path`
+
+    :returns: Estimated cost of combining each file set,
+              and estimated total wall time in seconds,
+              or :py:obj:`None` if it can't be estimated.
+    :rtype: 2-tuple of (list of :py:class:`FileSetPlan`, float)
+    """
+    work_dir = _work_dir(work_dir)
+    run_desc = RunDescription.load(work_dir / run_desc_file)
+    name_roots = _get_results_files(work_dir)
+    if not name_roots:
+        return [], None
+    var_selections = _get_var_selections(
+        run_desc, name_roots, include_vars or {}, exclude_vars or {}
+    )
+    file_sets = _get_file_set_sizes(name_roots, work_dir)
+    rebuild_sets = {
+        fn: (nfiles, nbytes)
+        for fn, (nfiles, nbytes) in file_sets.items()
+        if nfiles > 1 and not _is_classic_file_set(fn, work_dir)
+    }
+    max_concurrent_jobs, n_threads = _calc_layout(
+        rebuild_sets or file_sets,
+        max_concurrent_jobs,
+        n_threads,
+        multiprocessing.cpu_count(),
+    )
+    throughputs = _median_throughputs()
+    plans = [
+        _plan_file_set(
+            fn,
+            nfiles,
+            nbytes,
+            fn in rebuild_sets,
+            var_selections.get(fn),
+            throughputs,
+            n_threads,
+            work_dir,
+        )
+        for fn, (nfiles, nbytes) in sorted(file_sets.items())
+    ]
+    wall_time = _estimate_wall_time(plans, max_concurrent_jobs)
+    _log_plan(plans, max_concurrent_jobs, n_threads, wall_time)
+    return plans, wall_time
+
+
+def _plan_file_set(
+    name_root,
+    nfiles,
+    nbytes,
+    use_rebuild_nemo,
+    var_selection,
+    throughputs,
+    n_threads,
+    work_dir=None,
+):
+    include, exclude = (None, []) if var_selection is None else var_selection
+    if nfiles == 1:
+        method = "rename" if var_selection is None else "ncks"
+        seconds = 0.0 if var_selection is None else None
+        return FileSetPlan(name_root, nfiles, nbytes, method, nbytes, seconds)
+    if not use_rebuild_nemo:
+        tile_paths = sorted(
+            _work_dir(work_dir).glob(f"{name_root}_[0-9][0-9][0-9][0-9].nc")
+        )
+        try:
+            output_bytes = classic_netcdf.combined_file_size(
+                tile_paths, include, exclude
+            )
+        except (ValueError, OSError):
+            # combine falls back to rebuild_nemo for file sets like this
+            pass
+        else:
+            throughput = throughputs.get("mmap")
+            seconds = None if throughput is None else nbytes / throughput
+            return FileSetPlan(name_root, nfiles, nbytes, "mmap", output_bytes, seconds)
+    throughput = throughputs.get("rebuild_nemo")
+    seconds = None if throughput is None else nbytes / (throughput * n_threads)
+    return FileSetPlan(name_root, nfiles, nbytes, "rebuild_nemo", nbytes, seconds)
+
+
+def _estimate_wall_time(plans, max_concurrent_jobs):
+    """Estimate the wall time to combine all of the file sets.
+
+    :program:`rebuild_nemo` jobs are scheduled largest-first on
+    max_concurrent_jobs process slots,
+    as :py:func:`_combine_results_files` does,
+    while the memory-mapped file sets are combined one after the other.
+
+    :returns: Estimated wall time in seconds,
+              or :py:obj:`None` if any file set has no time estimate.
+    :rtype: float
+    """
+    if any(file_set.seconds is None for file_set in plans):
+        return None
+    slots = [0.0] * max_concurrent_jobs
+    rebuild_plans = sorted(
+        (file_set for file_set in plans if file_set.method == "rebuild_nemo"),
+        key=lambda file_set: file_set.nbytes,
+        reverse=True,
+    )
+    for file_set in rebuild_plans:
+        heapq.heapreplace(slots, slots[0] + file_set.seconds)
+    serial_seconds = sum(
+        file_set.seconds for file_set in plans if file_set.method != "rebuild_nemo"
+    )
+    return max(max(slots), serial_seconds)
+
+
+def _log_plan(plans, max_concurrent_jobs, n_threads, wall_time):
+    logger.info(
+        f"{'name-root':<40} {'files':>6} {'input MiB':>11} {'output MiB':>11} "
+        f"{'method':<12} {'est. time':>10}"
+    )
+    for file_set in plans:
+        seconds = "unknown" if file_set.seconds is None else f"{file_set.seconds:.0f} s"
+        logger.info(
+            f"{file_set.name_root:<40} {file_set.nfiles:>6} "
+            f"{file_set.nbytes / 2**20:>11.1f} {file_set.output_bytes / 2**20:>11.1f} "
+            f"{file_set.method:<12} {seconds:>10}"
+        )
+    total_bytes = sum(file_set.nbytes for file_set in plans)
+    output_bytes = sum(file_set.output_bytes for file_set in plans)
+    logger.info(
+        f"{len(plans)} file sets: {total_bytes / 2**20:.1f} MiB of per-processor "
+        f"files to combine into {output_bytes / 2**20:.1f} MiB"
+    )
+    logger.info(
+        f"up to {max_concurrent_jobs} concurrent rebuild_nemo processes with "
+        f"{n_threads} OpenMP threads each"
+    )
+    if wall_time is None:
+        logger.info(
+            "estimated wall time: unknown - there is no throughput history for "
+            "some of the combining methods; it will be recorded by nemo combine"
+        )
+    else:
+        logger.info(f"estimated wall time: {wall_time:.0f} s")
+
+
+def _median_throughputs():
+    """Calculate the median throughput of each combining method from the
+    history of earlier runs.
+
+    The :kbd:`rebuild_nemo` throughput is per OpenMP thread.
+
+    :returns: Throughputs in bytes per second keyed by combining method.
+    :rtype: dict
+    """
+    history = cache.read_yaml(THROUGHPUT_HISTORY, default={})
+    return {
+        method: statistics.median(samples)
+        for method, samples in history.items()
+        if samples
+    }
+
+
+def _update_throughput_history(samples):
+    """Append throughput samples to the history of earlier runs.
+
+    :param dict samples: Lists of throughputs in bytes per second keyed by
+                         combining method.
+    """
+    if not any(samples.values()):
+        return
+    history = cache.read_yaml(THROUGHPUT_HISTORY, default={})
+    for method, throughputs in samples.items():
+        method_history = history.get(method, []) + [float(t) for t in throughputs]
+        history[method] = method_history[-THROUGHPUT_HISTORY_LENGTH:]
+    cache.write_yaml(THROUGHPUT_HISTORY, history)
+
+
+def find_rebuild_nemo_script(run_desc, path_cache=None):
     """Calculate absolute path of the rebuild_nemo script.
 
     Confirm that the rebuild_nemo executable exists, raising a SystemExit
@@ -95,17 +653,18 @@ def find_rebuild_nemo_script(run_desc):
 
     :param dict run_desc: Run description dictionary.
 
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
     :return: Resolved path of :file:`rebuild_nemo` script.
     :rtype: :py:class:`pathlib.Path`
 
     :raises: :py:exc:`SystemExit` if the :file:`rebuild_nemo` script does not
              exist.
     """
-    nemo_code_config = (
-        Path(os.path.expandvars(run_desc["paths"]["NEMO code config"]))
-        .expanduser()
-        .resolve()
-    )
+    if path_cache is None:
+        path_cache = PathCache()
+    nemo_code_config = path_cache.resolved_path(run_desc["paths"]["NEMO code config"])
     rebuild_nemo_exec = (
         nemo_code_config / ".." / "TOOLS" / "REBUILD_NEMO" / "rebuild_nemo.exe"
     )
@@ -116,36 +675,347 @@ def find_rebuild_nemo_script(run_desc):
     return rebuild_nemo_script
 
 
-def _get_results_files():
+def _work_dir(work_dir):
+    """Return the absolute path of work_dir,
+    or of the present working directory if it is :py:obj:`None`.
+    """
+    return Path.cwd() if work_dir is None else Path(work_dir).resolve()
+
+
+def _get_results_files(work_dir=None):
     result_pattern = "*_0000.nc"
-    name_roots = [fspath(fn.stem)[:-5] for fn in Path.cwd().glob(result_pattern)]
+    name_roots = [
+        fspath(fn.stem)[:-5] for fn in _work_dir(work_dir).glob(result_pattern)
+    ]
     if not name_roots:
         logger.info(f"no files found that match the {result_pattern} pattern")
     return name_roots
 
 
-def _combine_results_files(rebuild_nemo_script, name_roots):
+def _get_var_selections(run_desc, name_roots, include_vars, exclude_vars):
+    """Calculate the variables to include in the combined file for each
+    name-root.
+
+    The include and exclude variable lists from the command-line override
+    those from the :kbd:`combine: variables:` section of the run description
+    separately,
+    so a command-line include list is combined with a run description
+    exclude list for the same name-root,
+    and vice versa.
+    For each list,
+    the first matching name-root pattern from the command-line is used,
+    or the first matching one from the run description if there is none.
+
+    :raises: :py:exc:`SystemExit` if a selection excludes all of the
+             variables that it includes,
+             so that it is reported before any combining jobs are started.
+
+    :returns: (include variable names or :py:obj:`None`,
+              exclude variable names) 2-tuples keyed by name-root for the
+              name-roots that have variable selections.
+    :rtype: dict
+    """
+    try:
+        patterns = dict(run_desc["combine"]["variables"])
+    except (KeyError, TypeError):
+        patterns = {}
+    run_desc_include_vars = {
+        pattern: selection.get("include")
+        for pattern, selection in patterns.items()
+        if selection is not None
+    }
+    run_desc_exclude_vars = {
+        pattern: selection.get("exclude")
+        for pattern, selection in patterns.items()
+        if selection is not None
+    }
+    var_selections = {}
+    for name_root in name_roots:
+        include = _first_match(name_root, include_vars)
+        if include is None:
+            include = _first_match(name_root, run_desc_include_vars)
+        exclude = _first_match(name_root, exclude_vars)
+        if exclude is None:
+            exclude = _first_match(name_root, run_desc_exclude_vars)
+        exclude = exclude or []
+        if include is not None or exclude:
+            var_selections[name_root] = (include, exclude)
+    empty = {
+        name_root: (include, exclude)
+        for name_root, (include, exclude) in var_selections.items()
+        if include is not None and not set(include) - set(exclude)
+    }
+    if empty:
+        for name_root, (include, exclude) in empty.items():
+            logger.error(
+                f"no variables selected for {name_root}: "
+                f"include {', '.join(include) or 'nothing'}, "
+                f"exclude {', '.join(exclude) or 'nothing'}; "
+                f"please check your --include-vars and --exclude-vars options "
+                f"and the combine: variables: section of your run description"
+            )
+        raise SystemExit(2)
+    return var_selections
+
+
+def _first_match(name_root, var_lists):
+    """Return the variable list of the first name-root pattern in var_lists
+    that matches name_root and has a list,
+    or :py:obj:`None` if there is none.
+    """
+    for pattern, var_list in var_lists.items():
+        if var_list is not None and fnmatch.fnmatchcase(name_root, pattern):
+            return var_list
+    return None
+
+
+def _extract_vars(src_path, dest_path, var_selection):
+    """Use :program:`ncks` to extract the selected variables from a netCDF file.
+
+    Coordinate variables are included as well.
+
+    :returns: :program:`ncks` return code.
+    :rtype: int
+    """
+    include, exclude = var_selection
+    if include is not None:
+        var_opts = f"-v {','.join(sorted(set(include) - set(exclude)))}"
+    else:
+        var_opts = f"-x -v {','.join(sorted(exclude))}"
+    cmd = f"ncks -O {var_opts} {src_path} {dest_path}"
+    logger.info(cmd)
+    result = subprocess.run(
+        shlex.split(cmd),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+    if result.returncode != 0:
+        logger.error(result.stdout)
+    return result.returncode
+
+
+def _get_file_set_sizes(name_roots, work_dir=None):
+    file_sets = {}
     for fn in name_roots:
-        files = Path.cwd().glob(f"{fn}_[0-9][0-9][0-9][0-9].nc")
-        # Count the number of items yielded by the glob generator
-        nfiles = sum(1 for _ in files)
+        filepaths = list(_work_dir(work_dir).glob(f"{fn}_[0-9][0-9][0-9][0-9].nc"))
+        file_sets[fn] = (len(filepaths), sum(fp.stat().st_size for fp in filepaths))
+    return file_sets
+
+
+def _calc_layout(file_sets, max_concurrent_jobs, n_threads, n_cores):
+    """Calculate the number of concurrent :program:`rebuild_nemo` processes,
+    and the number of OpenMP threads for each to use.
+
+    When the number of processes is not given it is chosen so that the
+    largest file set can be combined in about the same time as all of the
+    others,
+    but never more than the number of file sets or cores.
+    Cores that are not used for concurrent processes are used for threads.
+    """
+    n_sets = len(file_sets)
+    if max_concurrent_jobs is None:
+        if n_threads is None:
+            total_bytes = sum(nbytes for _, nbytes in file_sets.values())
+            largest_bytes = max(nbytes for _, nbytes in file_sets.values())
+            jobs_for_sizes = (
+                math.ceil(total_bytes / largest_bytes) if largest_bytes else n_sets
+            )
+            max_concurrent_jobs = min(n_sets, n_cores, jobs_for_sizes)
+        else:
+            max_concurrent_jobs = min(n_sets, n_cores // n_threads)
+    max_concurrent_jobs = max(1, max_concurrent_jobs)
+    if n_threads is None:
+        n_threads = n_cores // min(max_concurrent_jobs, n_sets)
+    n_threads = max(1, n_threads)
+    return max_concurrent_jobs, n_threads
+
+
+def _combine_results_files(
+    rebuild_nemo_script,
+    name_roots,
+    max_concurrent_jobs=None,
+    n_threads=None,
+    output_dir=None,
+    var_selections=None,
+    work_dir=None,
+):
+    var_selections = var_selections or {}
+    combined = []
+    file_sets = _get_file_set_sizes(name_roots, work_dir)
+    rebuild_sets = {}
+    for fn, (nfiles, nbytes) in file_sets.items():
         if nfiles == 1:
-            # Results from a single processor are simply renamed
-            shutil.move(f"{fn}_0000.nc", f"{fn}.nc")
-            logger.info(f"{fn}_0000.nc renamed to {fn}.nc")
+            if _move_single_file(fn, output_dir, var_selections.get(fn), work_dir):
+                combined.append(fn)
         else:
-            cmd = f"{rebuild_nemo_script} {fn} {nfiles}"
-            logger.info(cmd)
-            result = subprocess.check_output(
-                shlex.split(cmd), stderr=subprocess.STDOUT, universal_newlines=True
+            rebuild_sets[fn] = (nfiles, nbytes)
+    if not rebuild_sets:
+        return combined
+    classic_sets = [fn for fn in rebuild_sets if _is_classic_file_set(fn, work_dir)]
+    max_concurrent_jobs, n_threads = _calc_layout(
+        {fn: v for fn, v in rebuild_sets.items() if fn not in classic_sets}
+        or rebuild_sets,
+        max_concurrent_jobs,
+        n_threads,
+        multiprocessing.cpu_count(),
+    )
+    logger.info(
+        f"Combining {len(rebuild_sets) - len(classic_sets)} file sets in up to "
+        f"{max_concurrent_jobs} concurrent rebuild_nemo processes with {n_threads} "
+        f"OpenMP threads each, and {len(classic_sets)} classic format file sets "
+        f"via memory maps"
+    )
+    # Start the largest file sets first so that they don't finish last
+    jobs = [
+        RebuildJob(
+            fn,
+            nfiles,
+            rebuild_nemo_script,
+            n_threads,
+            output_dir,
+            var_selections.get(fn),
+            work_dir=work_dir,
+        )
+        for fn, (nfiles, nbytes) in sorted(
+            rebuild_sets.items(), key=lambda item: item[1][1], reverse=True
+        )
+        if fn not in classic_sets
+    ]
+    rebuild_jobs = list(jobs)
+    throughputs = {"mmap": [], "rebuild_nemo": []}
+    t_start = time.time()
+    jobs_in_progress = _launch_initial_jobs(jobs, max_concurrent_jobs)
+    # Classic format file sets are combined in this process while the
+    # rebuild_nemo processes run
+    for fn in classic_sets:
+        try:
+            t_mmap_start = time.time()
+            _mmap_combine(fn, output_dir, var_selections.get(fn), work_dir)
+            combined.append(fn)
+            throughputs["mmap"].append(
+                rebuild_sets[fn][1] / max(time.time() - t_mmap_start, 1e-6)
+            )
+        except (ValueError, OSError) as e:
+            logger.warning(
+                f"unable to combine {fn} via memory maps ({e}); "
+                f"falling back to rebuild_nemo"
+            )
+            job = RebuildJob(
+                fn,
+                rebuild_sets[fn][0],
+                rebuild_nemo_script,
+                n_threads,
+                output_dir,
+                var_selections.get(fn),
+                work_dir=work_dir,
             )
-            logger.info(result)
-            os.unlink("nam_rebuild")
+            jobs.append(job)
+            rebuild_jobs.append(job)
+    jobs_in_progress.update(
+        _launch_initial_jobs(jobs, max_concurrent_jobs - len(jobs_in_progress))
+    )
+    while jobs or jobs_in_progress:
+        time.sleep(1)
+        combined.extend(_poll_and_launch(jobs, jobs_in_progress))
+    elapsed = max(time.time() - t_start, 1e-6)
+    combined_bytes = sum(rebuild_sets[fn][1] for fn in combined if fn in rebuild_sets)
+    logger.info(
+        f"Combined {combined_bytes / 2**20:.1f} MiB of per-processor files "
+        f"in {elapsed:.1f} s ({combined_bytes / 2**20 / elapsed:.1f} MiB/s)"
+    )
+    for job in rebuild_jobs:
+        if job.name_root in combined and job.elapsed:
+            throughputs["rebuild_nemo"].append(
+                rebuild_sets[job.name_root][1] / (job.elapsed * job.n_threads)
+            )
+    _update_throughput_history(throughputs)
+    return combined
+
+
+def _move_single_file(name_root, output_dir=None, var_selection=None, work_dir=None):
+    """Rename the results file from a single processor to its combined name,
+    or extract the selected variables from it.
+
+    :returns: Boolean indicating whether the combined file was created.
+    """
+    fn = name_root
+    work_dir = _work_dir(work_dir)
+    if var_selection is not None:
+        dest_dir = work_dir if output_dir is None else output_dir
+        tmp_path = dest_dir / f".{fn}.nc.tmp"
+        if _extract_vars(work_dir / f"{fn}_0000.nc", tmp_path, var_selection):
+            return False
+        tmp_path.rename(dest_dir / f"{fn}.nc")
+    elif output_dir is None:
+        shutil.move(fspath(work_dir / f"{fn}_0000.nc"), fspath(work_dir / f"{fn}.nc"))
+        logger.info(f"{fn}_0000.nc renamed to {fn}.nc")
+    else:
+        tmp_path = output_dir / f".{fn}.nc.tmp"
+        shutil.move(fspath(work_dir / f"{fn}_0000.nc"), fspath(tmp_path))
+        tmp_path.rename(output_dir / f"{fn}.nc")
+        logger.info(f"{fn}_0000.nc moved to {output_dir / f'{fn}.nc'}")
+    return True
+
+
+def _is_classic_file_set(name_root, work_dir=None):
+    filepaths = list(_work_dir(work_dir).glob(f"{name_root}_[0-9][0-9][0-9][0-9].nc"))
+    return bool(filepaths) and all(
+        classic_netcdf.is_classic_format(fp) for fp in filepaths
+    )
+
+
+def _mmap_combine(name_root, output_dir=None, var_selection=None, work_dir=None):
+    work_dir = _work_dir(work_dir)
+    output_dir = work_dir if output_dir is None else output_dir
+    include, exclude = (None, []) if var_selection is None else var_selection
+    tile_paths = sorted(work_dir.glob(f"{name_root}_[0-9][0-9][0-9][0-9].nc"))
+    classic_netcdf.combine_tiles(
+        tile_paths, output_dir / f"{name_root}.nc", include, exclude
+    )
+    logger.info(
+        f"{name_root}: combined {len(tile_paths)} classic format files via memory maps"
+    )
+
+
+def _launch_initial_jobs(jobs, max_concurrent_jobs):
+    jobs_in_progress = {}
+    for process in range(int(max_concurrent_jobs)):
+        try:
+            job = jobs.pop(0)
+        except IndexError:
+            break
+        else:
+            job.start()
+            jobs_in_progress[job.pid] = job
+    return jobs_in_progress
+
+
+def _poll_and_launch(jobs, jobs_in_progress):
+    combined = []
+    for running_job in jobs_in_progress.copy().values():
+        if running_job.done:
+            result = running_job.output
+            if running_job.returncode == 0:
+                logger.info(result)
+                combined.append(running_job.name_root)
+            else:
+                logger.error(result)
+            shutil.rmtree(fspath(running_job.job_dir), ignore_errors=True)
+            jobs_in_progress.pop(running_job.pid)
+            try:
+                job = jobs.pop(0)
+            except IndexError:
+                continue
+            else:
+                job.start()
+                jobs_in_progress[job.pid] = job
+    return combined
 
 
-def _delete_results_files(name_roots):
+def _delete_results_files(name_roots, work_dir=None):
     logger.info("Deleting per-processor files...")
     for name_root in name_roots:
-        filepaths = Path.cwd().glob(f"{name_root}_[0-9][0-9][0-9][0-9].nc")
+        filepaths = _work_dir(work_dir).glob(f"{name_root}_[0-9][0-9][0-9][0-9].nc")
         for fp in filepaths:
             fp.unlink()
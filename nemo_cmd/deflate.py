@@ -65,6 +65,18 @@ class Deflate(cliff.command.Command):
                 "Defaults to 1/2 the number of cores detected."
             ),
         )
+        parser.add_argument(
+            "--output-dir",
+            dest="output_dir",
+            type=Path,
+            default=None,
+            metavar="OUTPUT_DIR",
+            help=(
+                "Directory in which to write the deflated files. "
+                "The original files are deleted. "
+                "Defaults to replacing the original files."
+            ),
+        )
         return parser
 
     def take_action(self, parsed_args):
@@ -76,7 +88,7 @@ class Deflate(cliff.command.Command):
         This command is effectively the same as
         :command:`ncks -4 -L -O filename filename`.
         """
-        deflate(parsed_args.filepaths, parsed_args.jobs)
+        deflate(parsed_args.filepaths, parsed_args.jobs, parsed_args.output_dir)
 
 
 @attr.s
@@ -87,6 +99,9 @@ class DeflateJob(object):
     filepath = attr.ib()
     #: Lempel-Ziv compression level to use.
     dfl_lvl = attr.ib(default=4)
+    #: Directory in which to write the deflated file;
+    #: :py:obj:`None` means replace the original file.
+    output_dir = attr.ib(default=None)
     #: Deflation job subprocess object.
     process = attr.ib(default=None)
     #: Deflation job process PID.
@@ -99,9 +114,7 @@ class DeflateJob(object):
 
         Cache the subprocess object and its process id as job attributes.
         """
-        cmd = (
-            f"nccopy -s -4 -d{self.dfl_lvl} {self.filepath} {self.filepath}.nccopy.tmp"
-        )
+        cmd = f"nccopy -s -4 -d{self.dfl_lvl} {self.filepath} {self.tmp_path}"
         self.process = subprocess.Popen(
             shlex.split(cmd),
             stdout=subprocess.PIPE,
@@ -111,6 +124,18 @@ class DeflateJob(object):
         self.pid = self.process.pid
         logger.debug(f"deflating {self.filepath} in process {self.pid}")
 
+    @property
+    def dest_path(self):
+        """Path of the deflated file."""
+        if self.output_dir is None:
+            return Path(self.filepath)
+        return self.output_dir / Path(self.filepath).name
+
+    @property
+    def tmp_path(self):
+        """Path of the temporary file that the deflated file is written to."""
+        return self.dest_path.with_name(f"{self.dest_path.name}.nccopy.tmp")
+
     @property
     def done(self):
         """Return a boolean indicating whether the job has finished.
@@ -121,7 +146,9 @@ class DeflateJob(object):
         self.returncode = self.process.poll()
         if self.returncode is not None:
             if self.returncode == 0:
-                Path(f"{self.filepath}.nccopy.tmp").rename(self.filepath)
+                self.tmp_path.rename(self.dest_path)
+                if self.output_dir is not None:
+                    Path(self.filepath).unlink()
             finished = True
             logger.debug(
                 f"deflating {self.filepath} finished with return code {self.returncode}"
@@ -129,22 +156,39 @@ class DeflateJob(object):
         return finished
 
 
-def deflate(filepaths, max_concurrent_jobs):
+def deflate(filepaths, max_concurrent_jobs, output_dir=None, work_dir=None):
     """Deflate variables in each of the netCDF files in filepaths using
     Lempel-Ziv compression.
 
     Converts file to netCDF-4 format.
-    The deflated file replaces the original file.
+    The deflated file replaces the original file,
+    or is written directly into output_dir,
+    in which case the original file is deleted.
 
     :param sequence filepaths: Paths/names of files to be deflated.
 
     :param int max_concurrent_jobs: Maximum number of concurrent deflation
     processes allowed.
+
+    :param output_dir: Directory in which to write the deflated files;
+                       it will be created if it does not exist.
+    :type output_dir: :py:class:`pathlib.Path`
+
+    :param work_dir: Directory that relative filepaths and output_dir are
+                     relative to;
+                     defaults to the present working directory.
+    :type work_dir: :py:class:`pathlib.Path`
     """
+    if work_dir is not None:
+        filepaths = [Path(work_dir, fp) for fp in filepaths]
+        if output_dir is not None:
+            output_dir = Path(work_dir, output_dir)
     logger.info(
         f"Deflating in up to {int(max_concurrent_jobs)} concurrent sub-processes"
     )
-    jobs = [DeflateJob(fp) for fp in filepaths if fp.exists()]
+    if output_dir is not None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = [DeflateJob(fp, output_dir=output_dir) for fp in filepaths if fp.exists()]
     jobs_in_progress = _launch_initial_jobs(jobs, max_concurrent_jobs)
     while jobs or jobs_in_progress:
         time.sleep(1)
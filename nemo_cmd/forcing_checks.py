@@ -0,0 +1,401 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""Calculation of the forcing files that a NEMO run needs from its namelist,
+and checking of their availability.
+
+Each checker parses the namelist sections for one type of forcing to
+determine the files,
+and the dates of the files,
+that NEMO will read during the run.
+The file names are calculated the same way that NEMO's :file:`fldread.F90`
+module calculates them.
+
+Checking the availability of the files lists each directory that contains
+them once,
+concurrently,
+instead of checking the existence of each file,
+because directory listings are much faster than per-file metadata lookups
+on parallel file systems.
+"""
+
+import concurrent.futures
+import os
+from pathlib import Path
+
+import arrow
+
+from nemo_cmd.fspath import fspath
+
+#: Maximum number of threads to use to list forcing directories.
+MAX_WORKERS = 8
+
+_WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def run_date_range(namelist):
+    """Return the range of dates for which the run needs forcing files.
+
+    The range starts the day before the run start date so that the files
+    needed for time interpolation at the start of the run are included.
+
+    :param namelist: Namelist containing the :kbd:`namrun` and :kbd:`namdom`
+                     sections.
+    :type namelist: :py:class:`f90nml.namelist.Namelist`
+
+    :returns: First and last dates.
+    :rtype: 2-tuple of :py:class:`arrow.Arrow`
+    """
+    start_date = arrow.get(str(namelist["namrun"]["nn_date0"]), "YYYYMMDD")
+    it000 = namelist["namrun"]["nn_it000"]
+    itend = namelist["namrun"]["nn_itend"]
+    dt = namelist["namdom"]["rn_rdt"]
+    end_date = start_date.shift(seconds=(itend - it000) * dt - 1)
+    return start_date.shift(days=-1), end_date
+
+
+def fld_file_names(flread_params, dates):
+    """Return the names of the files that NEMO reads a field from for a
+    sequence of dates.
+
+    :param list flread_params: Field read parameters from a namelist
+                               :kbd:`sn_*` or :kbd:`bn_*` variable;
+                               file name root, frequency, variable name,
+                               time interpolation flag, climatology flag,
+                               and file period
+                               (:kbd:`daily`, :kbd:`weekLLL`,
+                               :kbd:`monthly`, or :kbd:`yearly`).
+
+    :param dates: Dates for which the field is needed.
+    :type dates: sequence of :py:class:`arrow.Arrow`
+
+    :returns: File names, in date order, without duplicates.
+    :rtype: list
+    """
+    root, clim, period = flread_params[0], flread_params[4], flread_params[5]
+    file_names = {}
+    for date in dates:
+        if period.startswith("week"):
+            # Weekly files are named for the first day of their week
+            week_start = _WEEKDAYS.index(period[4:7])
+            date = date.shift(days=-((date.weekday() - week_start) % 7))
+        if not clim:
+            name = f"{root}_y{date.year:04d}"
+            if period != "yearly":
+                name = f"{name}m{date.month:02d}"
+        elif period == "monthly":
+            name = f"{root}_m{date.month:02d}"
+        else:
+            name = root
+        if period == "daily" or period.startswith("week"):
+            name = f"{name}d{date.day:02d}"
+        file_names[f"{name}.nc"] = None
+    return list(file_names)
+
+
+def atmospheric_files(namelist):
+    """Return the atmospheric forcing files that a run needs.
+
+    The files are those of the CORE bulk formulation quantities in the
+    :kbd:`namsbc_core` section,
+    and the atmospheric pressure in the :kbd:`namsbc_apr` section if
+    :kbd:`ln_apr_dyn` is set.
+
+    :param namelist: Run namelist.
+    :type namelist: :py:class:`f90nml.namelist.Namelist`
+
+    :returns: File paths relative to the run directory.
+    :rtype: list
+    """
+    if not namelist["namsbc"]["ln_blk_core"]:
+        return []
+    days = _days(*run_date_range(namelist))
+    qtys = "sn_wndi sn_wndj sn_qsr sn_qlw sn_tair sn_humi sn_prec sn_snow".split()
+    namsbc_core = namelist["namsbc_core"]
+    file_paths = _fld_file_paths(namsbc_core["cn_dir"], namsbc_core, qtys, days)
+    if namelist["namsbc"].get("ln_apr_dyn"):
+        namsbc_apr = namelist["namsbc_apr"]
+        file_paths.extend(
+            _fld_file_paths(namsbc_apr["cn_dir"], namsbc_apr, ["sn_apr"], days)
+        )
+    return file_paths
+
+
+def rivers_files(namelist):
+    """Return the river runoff forcing files that a run needs.
+
+    The files are the runoff,
+    and the runoff temperature and salinity if :kbd:`ln_rnf_tem` and
+    :kbd:`ln_rnf_sal` are set,
+    in the :kbd:`namsbc_rnf` section,
+    and the river mouth and runoff depth files if :kbd:`ln_rnf_mouth` and
+    :kbd:`ln_rnf_depth` are set.
+
+    :param namelist: Run namelist.
+    :type namelist: :py:class:`f90nml.namelist.Namelist`
+
+    :returns: File paths relative to the run directory.
+    :rtype: list
+    """
+    if not namelist["namsbc"].get("ln_rnf"):
+        return []
+    namsbc_rnf = namelist["namsbc_rnf"]
+    if namsbc_rnf.get("ln_rnf_emp"):
+        # Runoff is included in the precipitation
+        return []
+    cn_dir = namsbc_rnf["cn_dir"]
+    qtys = ["sn_rnf"]
+    if namsbc_rnf.get("ln_rnf_tem"):
+        qtys.append("sn_t_rnf")
+    if namsbc_rnf.get("ln_rnf_sal"):
+        qtys.append("sn_s_rnf")
+    file_paths = _fld_file_paths(
+        cn_dir, namsbc_rnf, qtys, _days(*run_date_range(namelist))
+    )
+    # Time-invariant fields that are read directly from their files
+    if namsbc_rnf.get("ln_rnf_mouth"):
+        file_paths.append(os.path.join(cn_dir, f"{namsbc_rnf['sn_cnf'][0]}.nc"))
+    if namsbc_rnf.get("ln_rnf_depth") and not namsbc_rnf.get("ln_rnf_depth_ini"):
+        file_paths.append(os.path.join(cn_dir, f"{namsbc_rnf['sn_dep_rnf'][0]}.nc"))
+    return file_paths
+
+
+def boundary_files(namelist):
+    """Return the lateral open boundary condition forcing files that a run
+    needs.
+
+    The files are those in the :kbd:`nambdy_dta` sections of the
+    boundaries that read barotropic,
+    baroclinic,
+    or tracer fields from files according to the :kbd:`nn_dyn2d_dta`,
+    :kbd:`nn_dyn3d_dta`,
+    and :kbd:`nn_tra_dta` values in the :kbd:`nambdy` section,
+    and the boundary coordinates file if :kbd:`ln_coords_file` is set for a
+    boundary.
+
+    :param namelist: Run namelist.
+    :type namelist: :py:class:`f90nml.namelist.Namelist`
+
+    :returns: File paths relative to the run directory.
+    :rtype: list
+    """
+    nambdy = namelist.get("nambdy")
+    if nambdy is None:
+        return []
+    days = _days(*run_date_range(namelist))
+    nambdy_dtas = iter(_groups(namelist, "nambdy_dta"))
+    file_paths = []
+    for bdy in range(nambdy.get("nb_bdy", 1)):
+        if _bdy_value(nambdy, "ln_coords_file", bdy):
+            file_paths.append(_bdy_value(nambdy, "cn_coords_file", bdy))
+        dyn2d_from_file = _bdy_value(nambdy, "nn_dyn2d_dta", bdy) in (1, 3)
+        dyn3d_from_file = _bdy_value(nambdy, "nn_dyn3d_dta", bdy) == 1
+        tra_from_file = _bdy_value(nambdy, "nn_tra_dta", bdy) == 1
+        if not any((dyn2d_from_file, dyn3d_from_file, tra_from_file)):
+            # NEMO only reads a nambdy_dta section for boundaries that
+            # read fields from files
+            continue
+        nambdy_dta = next(nambdy_dtas)
+        qtys = []
+        if dyn2d_from_file:
+            qtys.append("bn_ssh")
+            if not nambdy_dta.get("ln_full_vel"):
+                qtys.extend(("bn_u2d", "bn_v2d"))
+        if dyn3d_from_file:
+            qtys.extend(("bn_u3d", "bn_v3d"))
+        if tra_from_file:
+            qtys.extend(("bn_tem", "bn_sal"))
+        file_paths.extend(_fld_file_paths(nambdy_dta["cn_dir"], nambdy_dta, qtys, days))
+    return file_paths
+
+
+def tidal_files(namelist):
+    """Return the tidal harmonics forcing files that a run needs at its
+    lateral open boundaries.
+
+    The files are those for each of the tidal constituents in the
+    :kbd:`nam_tide` section,
+    with the file name roots in the :kbd:`nambdy_tide` sections of the
+    boundaries that have tidal forcing according to the
+    :kbd:`nn_dyn2d_dta` values in the :kbd:`nambdy` section.
+
+    :param namelist: Run namelist.
+    :type namelist: :py:class:`f90nml.namelist.Namelist`
+
+    :returns: File paths relative to the run directory.
+    :rtype: list
+    """
+    nambdy = namelist.get("nambdy")
+    if nambdy is None:
+        return []
+    constituents = [name for name in _as_list(namelist["nam_tide"]["clname"]) if name]
+    nambdy_tides = iter(_groups(namelist, "nambdy_tide"))
+    file_paths = []
+    for bdy in range(nambdy.get("nb_bdy", 1)):
+        if _bdy_value(nambdy, "nn_dyn2d_dta", bdy) not in (2, 3):
+            continue
+        filtide = next(nambdy_tides)["filtide"]
+        file_paths.extend(
+            f"{filtide}{constituent}_grid_{grid}.nc"
+            for constituent in constituents
+            for grid in "TUV"
+        )
+    return file_paths
+
+
+def climatology_files(namelist):
+    """Return the temperature and salinity climatology files that a run
+    needs.
+
+    The files are those in the :kbd:`namtsd` section if the climatology is
+    used for initial conditions or tracer damping,
+    and those in the :kbd:`namsbc_ssr` section if sea surface restoring is
+    used.
+    Only the files for the run start date are needed for initial conditions.
+
+    :param namelist: Run namelist.
+    :type namelist: :py:class:`f90nml.namelist.Namelist`
+
+    :returns: File paths relative to the run directory.
+    :rtype: list
+    """
+    startm1, end_date = run_date_range(namelist)
+    file_paths = []
+    namtsd = namelist.get("namtsd", {})
+    if namtsd.get("ln_tsd_init") or namtsd.get("ln_tsd_tradmp"):
+        days = (
+            _days(startm1, end_date)
+            if namtsd.get("ln_tsd_tradmp")
+            else [startm1.shift(days=1)]
+        )
+        file_paths.extend(
+            _fld_file_paths(namtsd["cn_dir"], namtsd, ["sn_tem", "sn_sal"], days)
+        )
+    if namelist["namsbc"].get("ln_ssr"):
+        namsbc_ssr = namelist["namsbc_ssr"]
+        qtys = []
+        if namsbc_ssr.get("nn_sstr"):
+            qtys.append("sn_sst")
+        if namsbc_ssr.get("nn_sssr"):
+            qtys.append("sn_sss")
+        file_paths.extend(
+            _fld_file_paths(
+                namsbc_ssr["cn_dir"], namsbc_ssr, qtys, _days(startm1, end_date)
+            )
+        )
+    return file_paths
+
+
+#: Functions that calculate the forcing files that a run needs from its
+#: namelist,
+#: keyed by the :kbd:`type` values of :kbd:`check link` sections in run
+#: description files.
+CHECKERS = {
+    "atmospheric": atmospheric_files,
+    "rivers": rivers_files,
+    "boundary": boundary_files,
+    "tides": tidal_files,
+    "climatology": climatology_files,
+}
+
+
+def find_missing_files(base_dir, file_paths, max_workers=MAX_WORKERS):
+    """Return the files that do not exist.
+
+    Each directory that contains the files is listed once,
+    and the directories are listed concurrently.
+
+    :param base_dir: Directory that relative file paths start from.
+    :type base_dir: :py:class:`pathlib.Path`
+
+    :param file_paths: File paths to check.
+    :type file_paths: sequence of str or :py:class:`pathlib.Path`
+
+    :param int max_workers: Maximum number of threads to use to list
+                            directories.
+
+    :returns: Paths from file_paths of files that do not exist,
+              in file_paths order,
+              without duplicates.
+    :rtype: list
+    """
+    file_paths = list(dict.fromkeys(file_paths))
+    full_paths = [Path(base_dir) / file_path for file_path in file_paths]
+    dir_paths = list(dict.fromkeys(full_path.parent for full_path in full_paths))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        dir_listings = dict(zip(dir_paths, executor.map(list_dir_names, dir_paths)))
+    return [
+        file_path
+        for file_path, full_path in zip(file_paths, full_paths)
+        if full_path.name not in dir_listings[full_path.parent]
+    ]
+
+
+def list_dir_names(dir_path):
+    """Return the names of the entries in a directory with a single
+    directory listing.
+
+    :param dir_path: Path of directory to list.
+    :type dir_path: :py:class:`pathlib.Path`
+
+    :returns: Entry names,
+              which is empty if the directory does not exist.
+    :rtype: :py:class:`frozenset`
+    """
+    try:
+        with os.scandir(fspath(dir_path)) as entries:
+            return frozenset(entry.name for entry in entries)
+    except (FileNotFoundError, NotADirectoryError):
+        return frozenset()
+
+
+def _days(start_date, end_date):
+    return list(arrow.Arrow.range("day", start_date, end_date))
+
+
+def _fld_file_paths(cn_dir, section, qtys, days):
+    # Quantities can share files
+    file_paths = (
+        os.path.join(cn_dir, file_name)
+        for qty in qtys
+        for file_name in fld_file_names(section[qty], days)
+    )
+    return list(dict.fromkeys(file_paths))
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _groups(namelist, name):
+    """Return the sections with a name as a list,
+    because namelists can contain several sections with the same name,
+    e.g. one :kbd:`nambdy_dta` section per open boundary.
+    """
+    groups = namelist.get(name)
+    if groups is None:
+        return []
+    return _as_list(groups)
+
+
+def _bdy_value(nambdy, name, bdy):
+    """Return the value of a :kbd:`nambdy` variable for an open boundary,
+    because they are arrays with one element per boundary.
+    """
+    values = _as_list(nambdy.get(name, 0))
+    return values[bdy] if bdy < len(values) else values[-1]
@@ -26,10 +26,17 @@ PEP 519 file system protocol appeared.
 
 The :func:`resolved_path` function returns an absolute :class:`pathlib.Path`
 object with shell and user variables expanded and symlinks resolved.
+
+The :class:`PathCache` class memoizes path resolution and existence checks
+for paths that are looked up many times in a session,
+like the paths in a run description during :command:`nemo prepare`.
 """
 
 import os
 from pathlib import Path
+import threading
+
+import attr
 
 
 def fspath(path):
@@ -73,3 +80,77 @@ def resolved_path(path):
     :rtype: :class:`pathlib.Path`
     """
     return expanded_path(path).resolve()
+
+
+@attr.s
+class PathCache(object):
+    """Memoized path resolution and :py:func:`os.stat` results.
+
+    Paths are resolved and stat-ed once,
+    and the results are reused for the rest of the cache's life,
+    so a cache should only be used for a session in which the file system
+    paths it holds are not expected to change.
+    Lookups are thread-safe.
+    """
+
+    #: Number of lookups answered from the cache.
+    hits = attr.ib(default=0, init=False)
+    #: Number of lookups that required file system access.
+    misses = attr.ib(default=0, init=False)
+    _resolved_paths = attr.ib(factory=dict, init=False, repr=False)
+    _stats = attr.ib(factory=dict, init=False, repr=False)
+    _lock = attr.ib(factory=threading.Lock, init=False, repr=False)
+
+    def resolved_path(self, path):
+        """Return the memoized result of :func:`nemo_cmd.resolved_path`
+        for path.
+
+        :param path: Path to expand variables in and resolve.
+        :type path: :class:`pathlib.Path` or str
+
+        :return: Absolute path with shell and user variables expanded and
+                 symlinks resolved.
+        :rtype: :class:`pathlib.Path`
+        """
+        return self._lookup(self._resolved_paths, path, resolved_path)
+
+    def stat(self, path):
+        """Return the memoized :py:func:`os.stat` result for path.
+
+        :param path: Path to stat.
+        :type path: :class:`pathlib.Path` or str
+
+        :return: Stat result,
+                 or :py:obj:`None` if path does not exist.
+        :rtype: :py:class:`os.stat_result`
+        """
+        return self._lookup(self._stats, path, _stat)
+
+    def exists(self, path):
+        """Return :py:obj:`True` if path exists,
+        using the memoized :py:func:`os.stat` result for it.
+
+        :param path: Path to check.
+        :type path: :class:`pathlib.Path` or str
+
+        :rtype: boolean
+        """
+        return self.stat(path) is not None
+
+    def _lookup(self, results, path, func):
+        key = fspath(path)
+        with self._lock:
+            if key in results:
+                self.hits += 1
+                return results[key]
+        result = func(path)
+        with self._lock:
+            self.misses += 1
+            return results.setdefault(key, result)
+
+
+def _stat(path):
+    try:
+        return os.stat(fspath(path))
+    except (FileNotFoundError, NotADirectoryError):
+        return None
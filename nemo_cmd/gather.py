@@ -21,16 +21,38 @@
 Gather results files from a NEMO run into a specified directory.
 """
 
+import concurrent.futures
+import datetime
+import grp
 import logging
-import shutil
+import os
+import re
+import string
+import time
 from pathlib import Path
 
+import attr
 import cliff.command
 
+from nemo_cmd import bundle, transfer
 from nemo_cmd.fspath import fspath
 
 logger = logging.getLogger(__name__)
 
+#: Name of the checksum manifest file that is written in the results directory.
+MANIFEST = "MANIFEST"
+#: Name of the archive that small files are bundled into in the results directory.
+BUNDLE = "small_files.tar"
+#: Default size in bytes below which files are bundled.
+BUNDLE_THRESHOLD = 2**20
+#: Fields that can be used in results directory layout templates.
+LAYOUT_FIELDS = {"run_id", "yyyy", "mm", "dd"}
+#: Pattern of the output frequency and start and end dates in NEMO results
+#: file names (e.g. SalishSea_1d_20150101_20150101_grid_T.nc)
+DATED_FILE_NAME = re.compile(
+    r"_\d+(?:ts|[hdmy])_(?P<yyyy>\d{4})(?P<mm>\d{2})(?P<dd>\d{2})_\d{8}_"
+)
+
 
 class Gather(cliff.command.Command):
     """Gather results from a NEMO run."""
@@ -53,6 +75,92 @@ class Gather(cliff.command.Command):
             metavar="RESULTS_DIR",
             help="directory to store results into",
         )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            default=transfer.DEFAULT_MAX_WORKERS,
+            help=(
+                "Maximum number of concurrent file copies when RESULTS_DIR is "
+                "on a different file system than the run directory. "
+                "Defaults to %(default)s."
+            ),
+        )
+        parser.add_argument(
+            "--manifest",
+            action="store_true",
+            help=(
+                f"Write a {MANIFEST} file containing the size, modification time, "
+                f"and hash of each file in RESULTS_DIR. "
+                f"Files are hashed while they are copied."
+            ),
+        )
+        parser.add_argument(
+            "--hash",
+            dest="hash_name",
+            choices=("blake2b", "sha256"),
+            default="blake2b",
+            help=f"Hash algorithm to use in the {MANIFEST} file. Defaults to %(default)s.",
+        )
+        parser.add_argument(
+            "--bundle",
+            action="store_true",
+            help=(
+                f"Bundle the files in the run directory that are smaller than the "
+                f"bundle threshold, other than netCDF files, into an indexed "
+                f"{BUNDLE} archive in RESULTS_DIR instead of gathering them as "
+                f"separate files."
+            ),
+        )
+        parser.add_argument(
+            "--bundle-threshold",
+            type=int,
+            default=BUNDLE_THRESHOLD,
+            metavar="BYTES",
+            help="Size below which files are bundled. Defaults to %(default)s.",
+        )
+        parser.add_argument(
+            "--keep-source",
+            action="store_true",
+            help=(
+                "Leave the files in the run directory in place. "
+                "Files are cloned or hard-linked into RESULTS_DIR where the file "
+                "system supports it, and copied otherwise."
+            ),
+        )
+        parser.add_argument(
+            "--add-mode",
+            type=lambda mode: int(mode, 8),
+            metavar="MODE",
+            help=(
+                "Octal permission bits to add to RESULTS_DIR and to the files and "
+                "directories gathered into it (e.g. 064 for g+rw,o+r). "
+                "Directories also get the search bit for each class of users "
+                "that get the read bit."
+            ),
+        )
+        parser.add_argument(
+            "--layout",
+            metavar="TEMPLATE",
+            help=(
+                "Template of the RESULTS_DIR sub-directory to put each results "
+                "file whose name contains NEMO output dates "
+                "(e.g. *_1d_YYYYMMDD_YYYYMMDD_*) into; "
+                "e.g. '{run_id}/{yyyy}/{mm}/' or '{yyyy}{mm}{dd}/'. "
+                "The date fields are filled in from the start date in the file name."
+            ),
+        )
+        parser.add_argument(
+            "--run-id",
+            help="Run id to use for {run_id} in the --layout template.",
+        )
+        parser.add_argument(
+            "--group",
+            help=(
+                "Name or id of the group to change the group ownership of "
+                "RESULTS_DIR, and the files and directories gathered into it, to."
+            ),
+        )
         return parser
 
     def take_action(self, parsed_args):
@@ -65,48 +173,453 @@ class Gather(cliff.command.Command):
         and other files that define the run are also gathered into the
         directory given by `parsed_args.results_dir`.
         """
-        gather(parsed_args.results_dir)
+        gather(
+            parsed_args.results_dir,
+            parsed_args.jobs,
+            manifest=parsed_args.manifest,
+            hash_name=parsed_args.hash_name,
+            bundle_threshold=(
+                parsed_args.bundle_threshold if parsed_args.bundle else None
+            ),
+            keep_source=parsed_args.keep_source,
+            add_mode=parsed_args.add_mode,
+            group=parsed_args.group,
+            layout=parsed_args.layout,
+            run_id=parsed_args.run_id,
+        )
 
 
-def gather(results_dir):
-    """Move all of the files and directories from the present working directory
+def gather(
+    results_dir,
+    max_concurrent_jobs=None,
+    manifest=False,
+    hash_name="blake2b",
+    bundle_threshold=None,
+    keep_source=False,
+    add_mode=None,
+    group=None,
+    layout=None,
+    run_id=None,
+    work_dir=None,
+):
+    """Move all of the files and directories from the run directory
     into results_dir.
 
     If results_dir doesn't exist, create it.
 
-    Delete any symbolic links so that the present working directory is empty.
+    Delete any symbolic links so that the run directory is empty.
+
+    Files and directories on the same file system as results_dir are
+    renamed.
+    Otherwise,
+    their files are copied concurrently,
+    and deleted when their copies are complete.
 
     :param results_dir: Path of the directory into which to store the run
                         results.
     :type results_dir: :py:class:`pathlib.Path`
+
+    :param int max_concurrent_jobs: Maximum number of concurrent file copies
+                                    when results_dir is on a different file
+                                    system;
+                                    defaults to
+                                    :py:data:`nemo_cmd.transfer.DEFAULT_MAX_WORKERS`.
+
+    :param boolean manifest: Write a :file:`MANIFEST` file containing the size,
+                             modification time, and hash of each file in
+                             results_dir.
+
+    :param str hash_name: Name of the :py:mod:`hashlib` algorithm to use for
+                          the :file:`MANIFEST` file.
+
+    :param int bundle_threshold: Size in bytes below which files in the
+                                 present working directory,
+                                 other than netCDF files,
+                                 are bundled into an indexed
+                                 :file:`small_files.tar` archive in
+                                 results_dir;
+                                 :py:obj:`None` means don't bundle files.
+
+    :param boolean keep_source: Leave the files and symbolic links in the
+                                present working directory in place.
+                                Files are cloned with the :kbd:`FICLONE`
+                                ioctl,
+                                or hard-linked,
+                                into results_dir where the file system
+                                supports it,
+                                and copied otherwise.
+
+    :param int add_mode: Permission bits to add to results_dir,
+                         its existing top level contents,
+                         and the files and directories gathered into it
+                         as they are placed there;
+                         :py:obj:`None` means leave their modes unchanged.
+
+    :param str group: Name or id of the group to change the group ownership
+                      of results_dir,
+                      its existing top level contents,
+                      and the files and directories gathered into it to;
+                      :py:obj:`None` means leave their groups unchanged.
+
+    :param str layout: Template of the sub-directory of results_dir to put
+                       each results file whose name contains NEMO output
+                       dates into,
+                       using the fields in
+                       :py:data:`nemo_cmd.gather.LAYOUT_FIELDS`
+                       (e.g. :kbd:`{run_id}/{yyyy}/{mm}/`);
+                       files that are already in results_dir
+                       (e.g. written there by :command:`nemo combine`)
+                       are also moved into their sub-directories.
+                       :py:obj:`None` means put all files in results_dir.
+
+    :param str run_id: Run id to use for the :kbd:`{run_id}` field of the
+                       layout template.
+
+    :param work_dir: Run directory to gather the results from;
+                     a relative results_dir is relative to it.
+                     Defaults to the present working directory.
+    :type work_dir: :py:class:`pathlib.Path`
     """
+    work_dir = Path.cwd() if work_dir is None else Path(work_dir).resolve()
+    results_dir = work_dir / results_dir
+    if max_concurrent_jobs is None:
+        max_concurrent_jobs = transfer.DEFAULT_MAX_WORKERS
+    if layout is not None:
+        _check_layout(layout, run_id)
+    permissions = _permissions(add_mode, group)
     results_dir.mkdir(parents=True, exist_ok=True)
-    symlinks = {p for p in Path.cwd().glob("*") if p.is_symlink()}
+    if permissions is not None:
+        # Files like the job's stdout and stderr are already in results_dir
+        permissions.apply(results_dir)
+        for p in results_dir.iterdir():
+            permissions.apply(p)
+    if layout is not None:
+        _shard_results_dir(results_dir, layout, run_id, permissions)
+    entries = _scan_run_dir(work_dir)
+    _log_entries(entries)
+    # Symbolic links are deleted while the files and directories are moved
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as cleanup:
+        deleted = None
+        if not keep_source:
+            deleted = cleanup.submit(
+                _delete_symlinks, entries.symlinks, max_concurrent_jobs
+            )
+        digests = _move_results(
+            results_dir,
+            entries,
+            max_concurrent_jobs,
+            hash_name if manifest else None,
+            bundle_threshold,
+            keep_source,
+            permissions,
+            layout,
+            run_id,
+            work_dir,
+        )
+    if deleted is not None:
+        deleted.result()
+    if manifest:
+        _write_manifest(
+            results_dir.resolve(),
+            digests,
+            hash_name,
+            max_concurrent_jobs,
+            permissions,
+        )
+
+
+@attr.s
+class RunDirEntries(object):
+    """Entries in a run directory,
+    grouped by type,
+    from a single scan of the directory.
+    """
+
+    #: Sizes in bytes of the regular files keyed by their paths.
+    files = attr.ib(factory=dict)
+    #: Total sizes in bytes of the files in the directory trees keyed by their
+    #: paths.
+    dirs = attr.ib(factory=dict)
+    #: Paths of the symbolic links.
+    symlinks = attr.ib(factory=list)
+
+
+def _scan_run_dir(run_dir=None):
+    """Scan a run directory once to group its entries by type and find their
+    sizes,
+    using the file type information that the operating system returns with
+    the directory listing so that symbolic links are not stat-ed.
+
+    :param run_dir: Run directory to scan;
+                    defaults to the present working directory.
+    :type run_dir: :py:class:`pathlib.Path`
+
+    :returns: Run directory entries with absolute paths.
+    :rtype: :py:class:`nemo_cmd.gather.RunDirEntries`
+    """
+    run_dir = Path.cwd() if run_dir is None else Path(run_dir).resolve()
+    entries = RunDirEntries()
+    with os.scandir(fspath(run_dir)) as it:
+        for entry in it:
+            if entry.is_symlink():
+                entries.symlinks.append(run_dir / entry.name)
+            elif entry.is_dir(follow_symlinks=False):
+                entries.dirs[run_dir / entry.name] = _tree_size(entry.path)
+            else:
+                entries.files[run_dir / entry.name] = entry.stat(
+                    follow_symlinks=False
+                ).st_size
+    return entries
+
+
+def _tree_size(path):
+    size = 0
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                size += _tree_size(entry.path)
+            elif not entry.is_symlink():
+                size += entry.stat(follow_symlinks=False).st_size
+    return size
+
+
+def _log_entries(entries):
+    files_size = sum(entries.files.values()) / 2**20
+    dirs_size = sum(entries.dirs.values()) / 2**20
+    logger.info(
+        f"Run directory contains {len(entries.files)} files ({files_size:.1f} MiB), "
+        f"{len(entries.dirs)} directories ({dirs_size:.1f} MiB), "
+        f"and {len(entries.symlinks)} symbolic links"
+    )
+
+
+def _check_layout(layout, run_id):
+    """Check that a results directory layout template only uses known fields,
+    and that the sub-directories it renders are inside the results directory.
+
+    :raises: :py:exc:`SystemExit` if the template uses an unknown field,
+             uses the :kbd:`{run_id}` field without a run id,
+             or renders an absolute path or one that contains :file:`..`.
+    """
+    try:
+        fields = {field for _, field, _, _ in string.Formatter().parse(layout)}
+    except ValueError as e:
+        logger.error(f"invalid layout template: {layout}: {e}")
+        raise SystemExit(2)
+    fields.discard(None)
+    unknown = fields - LAYOUT_FIELDS
+    if unknown:
+        logger.error(
+            f"unknown field(s) in layout template {layout}: "
+            f"{', '.join(sorted(unknown))}; "
+            f"use {', '.join(sorted(LAYOUT_FIELDS))}"
+        )
+        raise SystemExit(2)
+    if "run_id" in fields and run_id is None:
+        logger.error(f"layout template {layout} uses {{run_id}} but no run id given")
+        raise SystemExit(2)
+    # Date fields are always digits, so the literal text of the template and
+    # the run id are all that can take a sub-directory out of results_dir
     try:
-        _move_results(results_dir, symlinks)
-    except Exception:
-        raise
-    _delete_symlinks(symlinks)
+        subdir = Path(layout.format(run_id=run_id, yyyy="2015", mm="01", dd="01"))
+    except ValueError as e:
+        logger.error(f"invalid layout template: {layout}: {e}")
+        raise SystemExit(2)
+    if subdir.is_absolute() or ".." in subdir.parts:
+        logger.error(
+            f"layout template {layout} renders {subdir}; "
+            f"sub-directories must be relative paths inside the results directory "
+            f"without .. components"
+        )
+        raise SystemExit(2)
+
+
+def _layout_subdir(name, layout, run_id):
+    """Return the sub-directory that the layout template puts the file
+    called name into,
+    or :py:obj:`None` if its name doesn't contain NEMO output dates.
+
+    :rtype: :py:class:`pathlib.Path`
+    """
+    match = DATED_FILE_NAME.search(name)
+    if match is None:
+        return None
+    return Path(layout.format(run_id=run_id, **match.groupdict()))
 
 
-def _move_results(results_dir, symlinks):
-    cwd = Path.cwd()
+def _shard_results_dir(results_dir, layout, run_id, permissions=None):
+    """Move the dated results files that are already in results_dir into the
+    sub-directories that the layout template puts them in.
+
+    The files stay on the same file system,
+    so they are renamed directly rather than by
+    :py:func:`nemo_cmd.transfer.move_entries`,
+    which would resume,
+    and then remove,
+    the journal of an interrupted gather into results_dir before the
+    main transfer could.
+    Hidden files,
+    like the journal and the partial copies of that transfer,
+    are left in place.
+    """
+    files = {}
+    with os.scandir(fspath(results_dir)) as it:
+        for entry in it:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_file(follow_symlinks=False):
+                subdir = _layout_subdir(entry.name, layout, run_id)
+                if subdir is not None:
+                    files[Path(entry.path)] = subdir
+    for src, subdir in files.items():
+        transfer.make_subdirs(results_dir, subdir, permissions)
+        os.replace(fspath(src), fspath(results_dir / subdir / src.name))
+    if files:
+        logger.info(f"Moved {len(files)} files in {results_dir} into {layout}")
+
+
+def _permissions(add_mode, group):
+    """Return the permissions to apply to the gathered files,
+    or :py:obj:`None` if there are none.
+
+    :raises: :py:exc:`SystemExit` if group is not a known group name or id.
+    """
+    if add_mode is None and group is None:
+        return None
+    gid = -1
+    if group is not None:
+        try:
+            gid = int(group) if group.isdigit() else grp.getgrnam(group).gr_gid
+        except KeyError:
+            logger.error(f"unknown group: {group}")
+            raise SystemExit(2)
+    return transfer.Permissions(add_mode or 0, gid)
+
+
+def _move_results(
+    results_dir,
+    entries,
+    max_concurrent_jobs=transfer.DEFAULT_MAX_WORKERS,
+    hash_name=None,
+    bundle_threshold=None,
+    keep_source=False,
+    permissions=None,
+    layout=None,
+    run_id=None,
+    work_dir=None,
+):
+    work_dir = Path.cwd() if work_dir is None else work_dir
     abs_results_dir = results_dir.resolve()
-    if cwd.samefile(abs_results_dir):
-        return
+    if work_dir.samefile(abs_results_dir):
+        return {}
+    bundled = set()
+    if bundle_threshold is not None:
+        bundled = _bundle_small_files(
+            abs_results_dir, entries.files, bundle_threshold, keep_source, permissions
+        )
     logger.info("Moving run definition and results files...")
-    for p in cwd.glob("*"):
-        if p not in symlinks:
-            src = p.relative_to(cwd)
-            suffix = "/" if src.is_dir() else ""
-            logger.info(f"Moving {src}{suffix} to {abs_results_dir}/")
-            if src.is_dir():
-                shutil.move(fspath(src), fspath(abs_results_dir))
-            else:
-                shutil.move(fspath(src), fspath(abs_results_dir / src))
+    action = "Copying" if keep_source else "Moving"
+    srcs = [src for src in entries.files if src not in bundled]
+    subdirs = {}
+    if layout is not None:
+        for src in srcs:
+            subdir = _layout_subdir(src.name, layout, run_id)
+            if subdir is not None:
+                subdirs[src] = subdir
+    for src in srcs:
+        dest_dir = abs_results_dir / subdirs.get(src, "")
+        logger.info(f"{action} {src.name} to {dest_dir}/")
+    for src in entries.dirs:
+        logger.info(f"{action} {src.name}/ to {abs_results_dir}/")
+    srcs.extend(entries.dirs)
+    t_start = time.time()
+    copied_bytes, digests = transfer.move_entries(
+        srcs,
+        abs_results_dir,
+        max_concurrent_jobs,
+        hash_name=hash_name,
+        keep_source=keep_source,
+        permissions=permissions,
+        subdirs=subdirs,
+    )
+    if copied_bytes:
+        elapsed = max(time.time() - t_start, 1e-6)
+        logger.info(
+            f"Copied {copied_bytes / 2**20:.1f} MiB to {abs_results_dir}/ "
+            f"in {elapsed:.1f} s ({copied_bytes / 2**20 / elapsed:.1f} MiB/s)"
+        )
+    return digests
+
+
+def _bundle_small_files(
+    results_dir, files, bundle_threshold, keep_source=False, permissions=None
+):
+    """Bundle the files that are smaller than bundle_threshold,
+    other than netCDF files,
+    into an indexed archive in results_dir,
+    and delete them unless they are to be kept.
+
+    :param dict files: Sizes of the regular files in the run directory
+                       keyed by their paths.
+
+    :returns: Paths of the files that were bundled.
+    :rtype: set
+    """
+    small_files = sorted(
+        p for p, size in files.items() if p.suffix != ".nc" and size < bundle_threshold
+    )
+    if not small_files:
+        return set()
+    bundle_path = results_dir / BUNDLE
+    bundle.write_bundle(small_files, bundle_path)
+    if permissions is not None:
+        permissions.apply(bundle_path)
+        permissions.apply(bundle.index_path(bundle_path))
+    if not keep_source:
+        for p in small_files:
+            p.unlink()
+    logger.info(f"Bundled {len(small_files)} small files into {bundle_path}")
+    return set(small_files)
+
+
+def _write_manifest(
+    results_dir, digests, hash_name, max_concurrent_jobs, permissions=None
+):
+    """Write a tab-separated manifest of the path, size, modification time,
+    and hash of each file in results_dir.
+
+    Files that were not hashed while they were gathered
+    (e.g. files that were written directly into results_dir by
+    :command:`nemo combine` or :command:`nemo deflate`)
+    are hashed by reading them concurrently.
+    """
+    manifest_path = results_dir / MANIFEST
+    paths = sorted(fp for fp in transfer.walk_files(results_dir) if fp != manifest_path)
+    unhashed = [fp for fp in paths if fp not in digests]
+    digests = {
+        **digests,
+        **transfer.hash_files(unhashed, hash_name, max_concurrent_jobs),
+    }
+    tmp_path = manifest_path.with_name(f".{MANIFEST}.tmp")
+    with tmp_path.open("wt") as f:
+        f.write(f"path\tsize\tmtime\t{hash_name}\n")
+        for fp in paths:
+            stat = fp.stat()
+            mtime = datetime.datetime.fromtimestamp(
+                stat.st_mtime, tz=datetime.timezone.utc
+            )
+            f.write(
+                f"{fp.relative_to(results_dir)}\t{stat.st_size}\t"
+                f"{mtime.isoformat()}\t{digests[fp]}\n"
+            )
+    if permissions is not None:
+        permissions.apply(tmp_path)
+    os.replace(tmp_path, manifest_path)
+    logger.info(f"Wrote {hash_name} manifest of {len(paths)} files to {manifest_path}")
 
 
-def _delete_symlinks(symlinks):
+def _delete_symlinks(symlinks, max_workers=transfer.DEFAULT_MAX_WORKERS):
     logger.info("Deleting symbolic links...")
-    for ln in symlinks:
-        ln.unlink()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Consume the results to raise the first exception, if any
+        list(executor.map(os.unlink, map(fspath, symlinks)))
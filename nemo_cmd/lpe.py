@@ -0,0 +1,129 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""Land processor elimination tables.
+
+A land processor elimination (LPE) table is a CSV file with a
+:kbd:`jpni,jpnj,jpnij` line for each MPI decomposition of a NEMO domain,
+where :kbd:`jpnij` is the number of processors that have ocean points
+in them and are therefore used for the run.
+
+Tables are loaded once per process,
+and reloaded only if the file changes.
+"""
+
+import bisect
+import threading
+
+import attr
+
+from nemo_cmd.fspath import fspath
+
+_tables = {}
+_tables_lock = threading.Lock()
+# Upper bound for decomposition dimensions in range query keys
+_MAX = float("inf")
+
+
+@attr.s
+class LPETable(object):
+    """Numbers of processors used for the MPI decompositions of a NEMO
+    domain with land processor elimination.
+    """
+
+    #: Number of processors used keyed by (jpni, jpnj) MPI decomposition.
+    n_processors = attr.ib()
+    #: (jpnij, jpni, jpnj) tuples sorted by number of processors,
+    #: for range queries.
+    _by_n_processors = attr.ib(init=False, repr=False)
+
+    @_by_n_processors.default
+    def _sort_by_n_processors(self):
+        return sorted(
+            (jpnij, jpni, jpnj) for (jpni, jpnj), jpnij in self.n_processors.items()
+        )
+
+    @classmethod
+    def from_csv(cls, path):
+        """Read a land processor elimination table from a CSV file.
+
+        :param path: Path of LPE table CSV file.
+        :type path: :py:class:`pathlib.Path`
+
+        :rtype: :py:class:`nemo_cmd.lpe.LPETable`
+        """
+        n_processors = {}
+        with open(fspath(path), "rt") as f:
+            for line in f:
+                if line.strip():
+                    jpni, jpnj, jpnij = map(int, line.split(","))
+                    n_processors.setdefault((jpni, jpnj), jpnij)
+        return cls(n_processors)
+
+    def lookup(self, jpni, jpnj):
+        """Return the number of processors used for an MPI decomposition.
+
+        :param int jpni: Number of processors in the i (longitude) direction.
+
+        :param int jpnj: Number of processors in the j (latitude) direction.
+
+        :returns: Number of processors,
+                  or :py:obj:`None` if the decomposition is not in the table.
+        :rtype: int
+        """
+        return self.n_processors.get((jpni, jpnj))
+
+    def at_most(self, max_processors):
+        """Return the MPI decompositions that use at most max_processors.
+
+        :param int max_processors: Maximum number of processors.
+
+        :returns: (jpni, jpnj, jpnij) tuples in order of increasing number of
+                  processors used.
+        :rtype: list
+        """
+        end = bisect.bisect_right(self._by_n_processors, (max_processors, _MAX, _MAX))
+        return [
+            (jpni, jpnj, jpnij) for jpnij, jpni, jpnj in self._by_n_processors[:end]
+        ]
+
+
+def load_lpe_table(path):
+    """Return the land processor elimination table in a CSV file.
+
+    Tables are cached in memory keyed by file path,
+    modification time,
+    and size,
+    so the file is only read again if it has changed.
+
+    :param path: Path of LPE table CSV file.
+    :type path: :py:class:`pathlib.Path`
+
+    :rtype: :py:class:`nemo_cmd.lpe.LPETable`
+    """
+    stat = path.stat()
+    key = fspath(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _tables_lock:
+        cached = _tables.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    table = LPETable.from_csv(path)
+    with _tables_lock:
+        _tables[key] = (version, table)
+    return table
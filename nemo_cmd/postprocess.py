@@ -0,0 +1,529 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""NEMO-Cmd command plug-in for postprocess sub-command.
+
+Combine, deflate, and gather the results of a NEMO run in a single pipeline
+in which each file moves on to its next stage as soon as it is ready.
+"""
+
+import concurrent.futures
+import fnmatch
+import logging
+import multiprocessing
+import re
+import shutil
+import time
+from pathlib import Path
+
+import attr
+import cliff.command
+
+from nemo_cmd import combine, gather, transfer
+from nemo_cmd.deflate import DeflateJob
+from nemo_cmd.fspath import fspath
+from nemo_cmd.run_description import RunDescription
+
+logger = logging.getLogger(__name__)
+
+#: File name patterns of the combined results files that are deflated.
+DEFLATE_PATTERNS = ("*_grid_[TUVW]*.nc", "*_ptrc_T*.nc")
+#: Pattern of per-processor results file names.
+PER_PROCESSOR_FILE = re.compile(r"_\d{4}\.nc$")
+
+
+class Postprocess(cliff.command.Command):
+    """Combine, deflate, and gather the results from a NEMO run."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Combine the per-processor results and restart files from the NEMO
+            run described in RUN_DESC_FILE in the present working directory,
+            deflate the combined results files,
+            and gather all of the files into RESULTS_DIR,
+            in a single pipeline.
+            Each file set is deflated as soon as it has been combined,
+            and the deflated files are written directly into RESULTS_DIR.
+            Re-running the command after an interruption resumes the
+            post-processing.
+        """
+        parser.add_argument(
+            "run_desc_file",
+            type=Path,
+            metavar="RUN_DESC_FILE",
+            help="file path/name of run description YAML file",
+        )
+        parser.add_argument(
+            "results_dir",
+            type=Path,
+            metavar="RESULTS_DIR",
+            help="directory to store results into",
+        )
+        parser.add_argument(
+            "--combine-jobs",
+            type=combine.positive_int,
+            default=None,
+            help=(
+                "Maximum number of concurrent rebuild_nemo processes allowed. "
+                "Defaults to a value calculated from the number of cores detected "
+                "and the number and sizes of the per-processor file sets."
+            ),
+        )
+        parser.add_argument(
+            "-t",
+            "--threads",
+            type=combine.positive_int,
+            default=None,
+            help=(
+                "Number of OpenMP threads to use in each rebuild_nemo process. "
+                "Defaults to the number of cores detected divided by the number "
+                "of concurrent rebuild_nemo processes."
+            ),
+        )
+        parser.add_argument(
+            "--deflate-jobs",
+            type=combine.positive_int,
+            default=None,
+            help=(
+                "Maximum number of concurrent deflation processes allowed. "
+                "Defaults to 1/2 the number of cores detected."
+            ),
+        )
+        parser.add_argument(
+            "--transfer-jobs",
+            type=combine.positive_int,
+            default=transfer.DEFAULT_MAX_WORKERS,
+            help=(
+                "Maximum number of concurrent file copies when RESULTS_DIR is "
+                "on a different file system than the run directory. "
+                "Defaults to %(default)s."
+            ),
+        )
+        parser.add_argument(
+            "--no-deflate",
+            action="store_true",
+            help=(
+                "Don't deflate the combined results files; "
+                "they are written directly into RESULTS_DIR."
+            ),
+        )
+        parser.add_argument(
+            "--add-mode",
+            type=lambda mode: int(mode, 8),
+            metavar="MODE",
+            help=(
+                "Octal permission bits to add to RESULTS_DIR and to the files and "
+                "directories gathered into it (e.g. 064 for g+rw,o+r)."
+            ),
+        )
+        parser.add_argument(
+            "--group",
+            help=(
+                "Name or id of the group to change the group ownership of "
+                "RESULTS_DIR, and the files and directories gathered into it, to."
+            ),
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the :command:`nemo postprocess` sub-command.
+
+        Combine, deflate, and gather the results of a NEMO run into the
+        directory given by `parsed_args.results_dir`.
+        """
+        postprocess(
+            parsed_args.run_desc_file,
+            parsed_args.results_dir,
+            max_combine_jobs=parsed_args.combine_jobs,
+            n_threads=parsed_args.threads,
+            max_deflate_jobs=parsed_args.deflate_jobs,
+            max_transfer_jobs=parsed_args.transfer_jobs,
+            no_deflate=parsed_args.no_deflate,
+            add_mode=parsed_args.add_mode,
+            group=parsed_args.group,
+        )
+
+
+@attr.s
+class Pipeline(object):
+    """Combine and deflate stages of the post-processing pipeline.
+
+    Each stage has its own process budget.
+    When a file set has been combined its per-processor files are deleted,
+    and its combined file is queued for deflation,
+    or,
+    if it is not to be deflated,
+    it is written directly into the results directory.
+    Deflated files are written directly into the results directory.
+    """
+
+    #: Directory to store the results in.
+    results_dir = attr.ib()
+    #: Run description dictionary.
+    run_desc = attr.ib(factory=dict)
+    #: File name patterns of the combined files to deflate.
+    deflate_patterns = attr.ib(default=DEFLATE_PATTERNS)
+    #: Maximum number of concurrent :program:`rebuild_nemo` processes;
+    #: :py:obj:`None` means calculate it from the number of cores and the
+    #: sizes of the file sets.
+    max_combine_jobs = attr.ib(default=None)
+    #: Number of OpenMP threads for each :program:`rebuild_nemo` process to use.
+    n_threads = attr.ib(default=None)
+    #: Maximum number of concurrent deflation processes.
+    max_deflate_jobs = attr.ib(default=1)
+    #: Numbers and total sizes of the per-processor files keyed by name-root.
+    file_sets = attr.ib(factory=dict)
+    #: Variable selections keyed by name-root.
+    var_selections = attr.ib(factory=dict)
+    #: Name-roots of the file sets that are combined in this process,
+    #: by renaming single files or via memory maps.
+    in_process_sets = attr.ib(factory=list)
+    #: :program:`rebuild_nemo` jobs waiting to run.
+    combine_jobs = attr.ib(factory=list)
+    #: Deflation jobs waiting to run.
+    deflate_jobs = attr.ib(factory=list)
+    #: Names of the file sets and files that could not be processed.
+    failed = attr.ib(factory=list)
+    #: Run directory that contains the results files;
+    #: :py:obj:`None` means the present working directory.
+    work_dir = attr.ib(default=None)
+
+    def add_file_sets(self, name_roots):
+        """Queue sets of per-processor files to be combined.
+
+        :param list name_roots: Name-roots of the per-processor file sets.
+        """
+        self.file_sets = combine._get_file_set_sizes(name_roots, self.work_dir)
+        self.var_selections = combine._get_var_selections(
+            self.run_desc, name_roots, {}, {}
+        )
+        rebuild_sets = {
+            fn: file_set
+            for fn, file_set in self.file_sets.items()
+            if file_set[0] > 1 and not combine._is_classic_file_set(fn, self.work_dir)
+        }
+        self.in_process_sets = [fn for fn in self.file_sets if fn not in rebuild_sets]
+        if self.file_sets:
+            # The layout is needed for file sets that fall back to rebuild_nemo
+            # even if none of them start there
+            self.max_combine_jobs, self.n_threads = combine._calc_layout(
+                rebuild_sets or self.file_sets,
+                self.max_combine_jobs,
+                self.n_threads,
+                multiprocessing.cpu_count(),
+            )
+        # Start the largest file sets first so that they don't finish last
+        for fn in sorted(
+            rebuild_sets, key=lambda fn: rebuild_sets[fn][1], reverse=True
+        ):
+            self.combine_jobs.append(self._rebuild_job(fn))
+
+    def add_combined_files(self, paths):
+        """Queue combined files to be deflated.
+
+        :param paths: Paths of combined files to deflate.
+        :type paths: sequence of :py:class:`pathlib.Path`
+        """
+        for path in paths:
+            self.deflate_jobs.append(DeflateJob(path, output_dir=self.results_dir))
+
+    def is_deflated(self, name):
+        """Return a boolean indicating whether the file called name is to be
+        deflated.
+        """
+        return any(fnmatch.fnmatchcase(name, p) for p in self.deflate_patterns)
+
+    def run(self):
+        """Run the combine and deflate stages until all of the queued files
+        have been processed.
+
+        :program:`rebuild_nemo` and deflation jobs run in sub-processes,
+        and file sets that are combined in this process run in a thread,
+        so all of them run concurrently.
+        """
+        combines_in_progress = {}
+        deflates_in_progress = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            futures = {
+                executor.submit(self._combine_in_process, fn): fn
+                for fn in self.in_process_sets
+            }
+            _launch_jobs(self.combine_jobs, combines_in_progress, self.max_combine_jobs)
+            while (
+                futures
+                or self.combine_jobs
+                or combines_in_progress
+                or self.deflate_jobs
+                or deflates_in_progress
+            ):
+                for future in [future for future in futures if future.done()]:
+                    fn = futures.pop(future)
+                    combined = future.result()
+                    if combined is None:
+                        # Fall back to rebuild_nemo
+                        self.combine_jobs.append(self._rebuild_job(fn))
+                    elif combined:
+                        self._combined(fn)
+                    else:
+                        self.failed.append(fn)
+                self._poll_combines(combines_in_progress)
+                _launch_jobs(
+                    self.combine_jobs, combines_in_progress, self.max_combine_jobs
+                )
+                self._poll_deflates(deflates_in_progress)
+                _launch_jobs(
+                    self.deflate_jobs, deflates_in_progress, self.max_deflate_jobs
+                )
+                if futures or combines_in_progress or deflates_in_progress:
+                    time.sleep(1)
+
+    def _output_dir(self, name_root):
+        """Combined files that are deflated are written in the run directory,
+        and the others directly in the results directory.
+        """
+        return None if self.is_deflated(f"{name_root}.nc") else self.results_dir
+
+    def _rebuild_job(self, name_root):
+        return combine.RebuildJob(
+            name_root,
+            self.file_sets[name_root][0],
+            combine.find_rebuild_nemo_script(self.run_desc),
+            self.n_threads,
+            self._output_dir(name_root),
+            self.var_selections.get(name_root),
+            work_dir=self.work_dir,
+        )
+
+    def _combine_in_process(self, name_root):
+        """Combine a file set in this process.
+
+        :returns: Boolean indicating whether the file set was combined,
+                  or :py:obj:`None` if it has to be combined by
+                  :program:`rebuild_nemo`.
+        """
+        output_dir = self._output_dir(name_root)
+        var_selection = self.var_selections.get(name_root)
+        if self.file_sets[name_root][0] == 1:
+            return combine._move_single_file(
+                name_root, output_dir, var_selection, self.work_dir
+            )
+        try:
+            combine._mmap_combine(name_root, output_dir, var_selection, self.work_dir)
+        except (ValueError, OSError) as e:
+            logger.warning(
+                f"unable to combine {name_root} via memory maps ({e}); "
+                f"falling back to rebuild_nemo"
+            )
+            return None
+        return True
+
+    def _combined(self, name_root):
+        """Delete the per-processor files of a combined file set,
+        and queue its combined file for deflation if it is to be deflated.
+        """
+        combine._delete_results_files([name_root], self.work_dir)
+        if self.is_deflated(f"{name_root}.nc"):
+            work_dir = Path.cwd() if self.work_dir is None else self.work_dir
+            self.add_combined_files([work_dir / f"{name_root}.nc"])
+
+    def _poll_combines(self, jobs_in_progress):
+        for job in list(jobs_in_progress.values()):
+            if job.done:
+                result = job.output
+                shutil.rmtree(fspath(job.job_dir), ignore_errors=True)
+                jobs_in_progress.pop(job.pid)
+                if job.returncode == 0:
+                    logger.info(result)
+                    self._combined(job.name_root)
+                else:
+                    logger.error(result)
+                    self.failed.append(job.name_root)
+
+    def _poll_deflates(self, jobs_in_progress):
+        for job in list(jobs_in_progress.values()):
+            if job.done:
+                result, _ = job.process.communicate()
+                jobs_in_progress.pop(job.pid)
+                if job.returncode == 0:
+                    logger.info(f"netCDF4 deflated {job.filepath}")
+                else:
+                    logger.error(result)
+                    self.failed.append(fspath(job.filepath))
+
+
+def _launch_jobs(jobs, jobs_in_progress, max_concurrent_jobs):
+    while jobs and len(jobs_in_progress) < max_concurrent_jobs:
+        job = jobs.pop(0)
+        job.start()
+        jobs_in_progress[job.pid] = job
+
+
+def postprocess(
+    run_desc_file,
+    results_dir,
+    max_combine_jobs=None,
+    n_threads=None,
+    max_deflate_jobs=None,
+    max_transfer_jobs=None,
+    no_deflate=False,
+    add_mode=None,
+    group=None,
+    work_dir=None,
+):
+    """Combine, deflate, and gather the results of the NEMO run in work_dir
+    into results_dir in a single pipeline.
+
+    Each set of per-processor files is deflated as soon as it has been
+    combined,
+    and the final version of each combined file is written directly into
+    results_dir.
+    The files that don't need to be combined or deflated are moved into
+    results_dir while the others are being processed.
+    Finally,
+    the remaining files are gathered into results_dir as
+    :py:func:`nemo_cmd.gather.gather` does.
+
+    Each stage deletes its input files only when its output files are
+    complete,
+    and the transfers into results_dir are journaled,
+    so if post-processing is interrupted it can be resumed by running it
+    again.
+
+    :param run_desc_file: File path/name of the run description YAML file.
+    :type run_desc_file: :py:class:`pathlib.Path`
+
+    :param results_dir: Path of the directory into which to store the run
+                        results;
+                        it will be created if it does not exist.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :param int max_combine_jobs: Maximum number of concurrent
+                                 :program:`rebuild_nemo` processes allowed.
+
+    :param int n_threads: Number of OpenMP threads to use in each
+                          :program:`rebuild_nemo` process.
+
+    :param int max_deflate_jobs: Maximum number of concurrent deflation
+                                 processes allowed;
+                                 defaults to 1/2 the number of cores.
+
+    :param int max_transfer_jobs: Maximum number of concurrent file copies
+                                  when results_dir is on a different file
+                                  system;
+                                  defaults to
+                                  :py:data:`nemo_cmd.transfer.DEFAULT_MAX_WORKERS`.
+
+    :param boolean no_deflate: Don't deflate the combined results files.
+
+    :param int add_mode: Permission bits to add to results_dir and the files
+                         and directories placed in it.
+
+    :param str group: Name or id of the group to change the group ownership
+                      of results_dir and the files and directories placed in
+                      it to.
+
+    :param work_dir: Run directory that contains the results files;
+                     relative run_desc_file and results_dir paths are
+                     relative to it.
+                     Defaults to the present working directory.
+    :type work_dir: :py:class:`pathlib.Path`
+
+    :raises: :py:exc:`SystemExit` if any of the file sets could not be
+             combined,
+             or any of the combined files could not be deflated.
+    """
+    work_dir = Path.cwd() if work_dir is None else Path(work_dir).resolve()
+    if max_deflate_jobs is None:
+        max_deflate_jobs = max(1, multiprocessing.cpu_count() // 2)
+    if max_transfer_jobs is None:
+        max_transfer_jobs = transfer.DEFAULT_MAX_WORKERS
+    permissions = gather._permissions(add_mode, group)
+    run_desc = RunDescription.load(work_dir / run_desc_file)
+    results_dir = (work_dir / results_dir).resolve()
+    results_dir.mkdir(parents=True, exist_ok=True)
+    pipeline = Pipeline(
+        results_dir,
+        run_desc,
+        () if no_deflate else DEFLATE_PATTERNS,
+        max_combine_jobs,
+        n_threads,
+        max_deflate_jobs,
+        work_dir=work_dir,
+    )
+    name_roots = combine._get_results_files(work_dir)
+    pipeline.add_file_sets(name_roots)
+    # Combined files left by an interrupted post-processing,
+    # and files that XIOS wrote as single files
+    combined_files = [
+        p
+        for p in sorted(work_dir.glob("*.nc"))
+        if not p.is_symlink()
+        and not PER_PROCESSOR_FILE.search(p.name)
+        and p.stem not in name_roots
+        and pipeline.is_deflated(p.name)
+    ]
+    pipeline.add_combined_files(combined_files)
+    ready = _ready_entries(name_roots, combined_files, work_dir)
+    logger.info(
+        f"Post-processing {len(name_roots)} per-processor file sets and "
+        f"{len(combined_files)} combined files, "
+        f"and moving {len(ready)} other files and directories to {results_dir}/"
+    )
+    t_start = time.time()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as transfers:
+        transferred = transfers.submit(
+            transfer.move_entries,
+            ready,
+            results_dir,
+            max_transfer_jobs,
+            permissions=permissions,
+        )
+        pipeline.run()
+    transferred.result()
+    gather.gather(
+        results_dir,
+        max_transfer_jobs,
+        add_mode=add_mode,
+        group=group,
+        work_dir=work_dir,
+    )
+    logger.info(f"Post-processing finished in {time.time() - t_start:.1f} s")
+    if pipeline.failed:
+        logger.error(f"unable to post-process: {', '.join(pipeline.failed)}")
+        raise SystemExit(2)
+
+
+def _ready_entries(name_roots, combined_files, work_dir):
+    """Return the paths of the entries in work_dir that are ready to be moved
+    to the results directory because they don't need to be combined or
+    deflated.
+
+    Symbolic links,
+    which are deleted by gathering,
+    and hidden work in progress files and directories are excluded too.
+    """
+    busy = {work_dir / f"{fn}.nc" for fn in name_roots} | set(combined_files)
+    return [
+        p
+        for p in sorted(work_dir.iterdir())
+        if not p.is_symlink()
+        and not p.name.startswith(".")
+        and not PER_PROCESSOR_FILE.search(p.name)
+        and p not in busy
+    ]
@@ -22,13 +22,16 @@ Sets up the necessary symbolic links for a NEMO run
 in a specified directory and changes the pwd to that directory.
 """
 
+import concurrent.futures
 from copy import copy, deepcopy
 import functools
+import io
 import logging
 import os
 from pathlib import Path
 import shutil
-import tempfile
+import subprocess
+import threading
 import time
 import xml.etree.ElementTree
 
@@ -40,12 +43,34 @@ import git
 import hglib
 import yaml
 
-from nemo_cmd import fspath, resolved_path, expanded_path
+from nemo_cmd import (
+    cache,
+    forcing_checks,
+    fspath,
+    lpe,
+    resolved_path,
+    expanded_path,
+    PathCache,
+)
 from nemo_cmd.combine import find_rebuild_nemo_script
+from nemo_cmd.run_description import RunDescription, YAML_LOADER
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
+#: Maximum number of threads to use for each group of independent
+#: preparation stages or file system operations.
+MAX_WORKERS = 8
+#: Name of the cache file in which the revision and status records of
+#: version control repositories are stored,
+#: keyed by repository path.
+VCS_REVISIONS_CACHE = "vcs_revisions.yaml"
+#: Files whose changes are ignored in revision and status records because
+#: they change frequently but the changes are generally of no consequence.
+VCS_IGNORED_FILES = ("CONFIG/cfg.txt", "TOOLS/COMPILE/full_key_list.txt")
+
+_vcs_revisions_cache_lock = threading.Lock()
+
 
 class Prepare(cliff.command.Command):
     """Prepare a NEMO run"""
@@ -94,7 +119,7 @@ class Prepare(cliff.command.Command):
         return run_dir
 
 
-def prepare(desc_file, nocheck_init):
+def prepare(desc_file, nocheck_init, run_desc=None):
     """Create and prepare the temporary run directory.
 
     The name of the temporary run directory is created is composed of the run id from the run
@@ -109,29 +134,85 @@ def prepare(desc_file, nocheck_init):
     :param boolean nocheck_init: Suppress the initial condition link check;
                                  the default is to check
 
+    :param run_desc: Run description that has already been loaded from
+                     desc_file;
+                     desc_file is loaded if it is :py:obj:`None`.
+    :type run_desc: dict or :py:class:`nemo_cmd.run_description.RunDescription`
+
     :returns: Path of the temporary run directory
     :rtype: :py:class:`pathlib.Path`
     """
-    run_desc = load_run_desc(desc_file)
-    nemo_bin_dir = check_nemo_exec(run_desc)
-    xios_bin_dir = check_xios_exec(run_desc)
-    find_rebuild_nemo_script(run_desc)
+    if run_desc is None:
+        run_desc = load_run_desc(desc_file)
+    run_desc = RunDescription.from_dict(run_desc)
+    # The run description paths are resolved and checked once for all of the
+    # preparation stages
+    path_cache = PathCache()
+    run_desc.validate(path_cache)
+    nemo_bin_dir = check_nemo_exec(run_desc, path_cache=path_cache)
+    xios_bin_dir = check_xios_exec(run_desc, path_cache=path_cache)
+    find_rebuild_nemo_script(run_desc, path_cache=path_cache)
     run_set_dir = resolved_path(desc_file).parent
-    run_dir = make_run_dir(run_desc)
-    make_namelists(run_set_dir, run_desc, run_dir)
-    copy_run_set_files(run_desc, desc_file, run_set_dir, run_dir)
-    make_executable_links(nemo_bin_dir, run_dir, xios_bin_dir)
-    make_grid_links(run_desc, run_dir)
-    make_forcing_links(run_desc, run_dir)
-    make_restart_links(run_desc, run_dir, nocheck_init)
-    record_vcs_revisions(run_desc, run_dir)
-    add_agrif_files(run_desc, desc_file, run_set_dir, run_dir, nocheck_init)
+    run_dir = make_run_dir(run_desc, path_cache=path_cache)
+
+    def make_namelists_and_forcing_links():
+        namelists = make_namelists(
+            run_set_dir, run_desc, run_dir, path_cache=path_cache
+        )
+        # Forcing link checkers use the namelists
+        make_forcing_links(
+            run_desc, run_dir, namelists=namelists, path_cache=path_cache
+        )
+
+    try:
+        _run_concurrently(
+            [
+                make_namelists_and_forcing_links,
+                functools.partial(
+                    copy_run_set_files,
+                    run_desc,
+                    desc_file,
+                    run_set_dir,
+                    run_dir,
+                    path_cache=path_cache,
+                ),
+                functools.partial(
+                    make_executable_links, nemo_bin_dir, run_dir, xios_bin_dir
+                ),
+                functools.partial(
+                    make_grid_links, run_desc, run_dir, path_cache=path_cache
+                ),
+                functools.partial(make_restart_links, run_desc, run_dir, nocheck_init),
+                functools.partial(record_vcs_revisions, run_desc, run_dir),
+            ]
+        )
+    except SystemExit:
+        # Stages that were running when another stage failed may have added
+        # files to the run directory after the failed stage removed it
+        remove_run_dir(run_dir)
+        raise
+    add_agrif_files(
+        run_desc,
+        desc_file,
+        run_set_dir,
+        run_dir,
+        nocheck_init,
+        path_cache=path_cache,
+    )
+    logger.debug(
+        f"run description path cache: {path_cache.hits} hits, "
+        f"{path_cache.misses} misses"
+    )
     return run_dir
 
 
 def load_run_desc(desc_file):
     """Load the run description file contents into a data structure.
 
+    The YAML is parsed with the LibYAML based :py:class:`yaml.CSafeLoader`
+    when PyYAML was built with LibYAML,
+    otherwise with the pure-Python :py:class:`yaml.SafeLoader`.
+
     :param desc_file: File path/name of the YAML run description file.
     :type desc_file: :py:class:`pathlib.Path`
 
@@ -139,12 +220,18 @@ def load_run_desc(desc_file):
     :rtype: dict
     """
     with open(fspath(desc_file), "rt") as f:
-        run_desc = yaml.safe_load(f)
+        run_desc = yaml.load(f, Loader=YAML_LOADER)
     return run_desc
 
 
 def get_run_desc_value(
-    run_desc, keys, expand_path=False, resolve_path=False, run_dir=None, fatal=True
+    run_desc,
+    keys,
+    expand_path=False,
+    resolve_path=False,
+    run_dir=None,
+    fatal=True,
+    path_cache=None,
 ):
     """Get the run description value defined by the sequence of keys.
 
@@ -174,6 +261,10 @@ def get_run_desc_value(
                           :py:exc:`SystemExit` exception.
                           Otherwise, raise a :py:exc:`KeyError` exception.
 
+    :param path_cache: Cache to resolve the path and confirm that it exists
+                       with when resolve_path is :py:obj:`True`.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
     :raises: :py:exc:`SystemExit` or :py:exc:`KeyError`
 
     :returns: Run description value defined by the sequence of keys.
@@ -194,8 +285,13 @@ def get_run_desc_value(
     if expand_path:
         value = expanded_path(value)
     if resolve_path:
-        value = resolved_path(value)
-        if not value.exists():
+        if path_cache is None:
+            value = resolved_path(value)
+            value_exists = value.exists()
+        else:
+            value = path_cache.resolved_path(value)
+            value_exists = path_cache.exists(value)
+        if not value_exists:
             logger.error(
                 f'{value} path from "{": ".join(keys)}" key not found - please check your '
                 f"run description YAML file"
@@ -206,7 +302,7 @@ def get_run_desc_value(
     return value
 
 
-def check_nemo_exec(run_desc):
+def check_nemo_exec(run_desc, path_cache=None):
     """Calculate absolute path of the NEMO executable's directory.
 
     Confirm that the NEMO executable exists, raising a SystemExit
@@ -214,25 +310,22 @@ def check_nemo_exec(run_desc):
 
     :param dict run_desc: Run description dictionary.
 
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
     :returns: Absolute path of NEMO executable's directory.
     :rtype: :py:class:`pathlib.Path`
 
     :raises: :py:exc:`SystemExit` with exit code 2
     """
-    try:
-        nemo_config_dir = get_run_desc_value(
-            run_desc, ("paths", "NEMO code config"), resolve_path=True, fatal=False
-        )
-    except KeyError:
-        # Alternate key spelling for backward compatibility
-        nemo_config_dir = get_run_desc_value(
-            run_desc, ("paths", "NEMO-code-config"), resolve_path=True
-        )
-    try:
-        config_name = get_run_desc_value(run_desc, ("config name",), fatal=False)
-    except KeyError:
-        # Alternate key spelling for backward compatibility
-        config_name = get_run_desc_value(run_desc, ("config_name",))
+    run_desc = RunDescription.from_dict(run_desc)
+    nemo_config_dir = get_run_desc_value(
+        run_desc,
+        ("paths", "NEMO code config"),
+        resolve_path=True,
+        path_cache=path_cache,
+    )
+    config_name = get_run_desc_value(run_desc, ("config name",))
     nemo_bin_dir = nemo_config_dir / config_name / "BLD" / "bin"
     nemo_exec = nemo_bin_dir / "nemo.exe"
     if not nemo_exec.exists():
@@ -241,7 +334,7 @@ def check_nemo_exec(run_desc):
     return nemo_bin_dir
 
 
-def check_xios_exec(run_desc):
+def check_xios_exec(run_desc, path_cache=None):
     """Calculate absolute path of the XIOS executable's directory.
 
     Confirm that the XIOS executable exists, raising a SystemExit
@@ -249,12 +342,17 @@ def check_xios_exec(run_desc):
 
     :param dict run_desc: Run description dictionary.
 
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
     :returns: Absolute path of XIOS executable's directory.
     :rtype: :py:class:`pathlib.Path`
 
     :raises: :py:exc:`SystemExit` with exit code 2
     """
-    xios_code_path = get_run_desc_value(run_desc, ("paths", "XIOS"), resolve_path=True)
+    xios_code_path = get_run_desc_value(
+        run_desc, ("paths", "XIOS"), resolve_path=True, path_cache=path_cache
+    )
     xios_bin_dir = xios_code_path / "bin"
     xios_exec = xios_bin_dir / "xios_server.exe"
     if not xios_exec.exists():
@@ -263,7 +361,7 @@ def check_xios_exec(run_desc):
     return xios_bin_dir
 
 
-def make_run_dir(run_desc):
+def make_run_dir(run_desc, path_cache=None):
     """Create the temporary directory from which NEMO will be run.
 
     The location is in the runs directory from the run description,
@@ -271,12 +369,15 @@ def make_run_dir(run_desc):
 
     :param dict run_desc: Run description dictionary.
 
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
     :returns: Path of the temporary run directory
     :rtype: :py:class:`pathlib.Path`
     """
     run_id = get_run_desc_value(run_desc, ("run_id",))
     runs_dir = get_run_desc_value(
-        run_desc, ("paths", "runs directory"), resolve_path=True
+        run_desc, ("paths", "runs directory"), resolve_path=True, path_cache=path_cache
     )
     run_dir = runs_dir / f"{run_id}_{arrow.now().format('YYYY-MM-DDTHHmmss.SSSSSSZ')}"
     run_dir.mkdir()
@@ -302,10 +403,93 @@ def remove_run_dir(run_dir):
         pass
 
 
-def make_namelists(run_set_dir, run_desc, run_dir, agrif_n=None):
+def _run_concurrently(funcs, max_workers=MAX_WORKERS):
+    """Call each of the functions in funcs in a thread pool.
+
+    Preparation is dominated by file system latency,
+    so independent stages,
+    and the file operations within them,
+    are overlapped.
+    When a call fails the calls that have not started are cancelled,
+    or skipped if a worker picks them up before they are cancelled,
+    and the exception is re-raised once the running calls have finished.
+    :py:exc:`SystemExit` exceptions,
+    which the stages raise after reporting an error and removing the run
+    directory,
+    take precedence over other exceptions,
+    which may be caused by the run directory having been removed.
+
+    :param sequence funcs: Functions to call without arguments.
+
+    :param int max_workers: Maximum number of concurrent calls.
+
+    :returns: Return values of the calls in the order of funcs.
+    :rtype: list
+    """
+    failed = threading.Event()
+
+    def call_unless_failed(func):
+        if failed.is_set():
+            return None
+        try:
+            return func()
+        except BaseException:
+            failed.set()
+            raise
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(call_unless_failed, func) for func in funcs]
+        concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+        for future in futures:
+            future.cancel()
+    exceptions = [
+        future.exception()
+        for future in futures
+        if not future.cancelled() and future.exception() is not None
+    ]
+    if exceptions:
+        raise next((e for e in exceptions if isinstance(e, SystemExit)), exceptions[0])
+    return [future.result() for future in futures]
+
+
+def _map_concurrently(func, items, max_workers=MAX_WORKERS):
+    """Call func for each item in items in a thread pool.
+
+    :returns: Return values of the calls in the order of items.
+    :rtype: list
+    """
+    return _run_concurrently(
+        [functools.partial(func, item) for item in items], max_workers
+    )
+
+
+def _make_links(run_dir, links, resolve=False):
+    """Create symlinks in run_dir concurrently.
+
+    :param run_dir: Path of the temporary run directory.
+    :type run_dir: :py:class:`pathlib.Path`
+
+    :param sequence links: (target path, link name) pairs.
+
+    :param boolean resolve: Resolve symbolic links in the target paths.
+    """
+
+    def make_link(link):
+        target, link_name = link
+        (run_dir / link_name).symlink_to(target.resolve() if resolve else target)
+
+    _map_concurrently(make_link, links)
+
+
+def make_namelists(run_set_dir, run_desc, run_dir, agrif_n=None, path_cache=None):
     """Build the namelist files for the NEMO run in run_dir by
     concatenating the lists of namelist section files provided in run_desc.
 
+    The namelists are assembled,
+    and :file:`namelist_cfg` is patched with the MPI decomposition,
+    in memory,
+    and each namelist file is written once.
+
     If any of the required namelist section files are missing,
     delete the run directory and raise a :py:exc:`SystemExit` exception.
 
@@ -321,32 +505,32 @@ def make_namelists(run_set_dir, run_desc, run_dir, agrif_n=None):
 
     :param int agrif_n: AGRIF sub-grid number.
 
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
+    :returns: Parsed namelists keyed by file name,
+              for use by later preparation stages instead of re-reading the
+              namelist files.
+              Only the patched :file:`namelist_cfg` of the parent grid is
+              parsed.
+    :rtype: dict
+
     :raises: :py:exc:`SystemExit` with exit code 2
     """
-    try:
-        nemo_config_dir = get_run_desc_value(
-            run_desc,
-            ("paths", "NEMO code config"),
-            resolve_path=True,
-            run_dir=run_dir,
-            fatal=False,
-        )
-    except KeyError:
-        # Alternate key spelling for backward compatibility
-        nemo_config_dir = get_run_desc_value(
-            run_desc, ("paths", "NEMO-code-config"), resolve_path=True, run_dir=run_dir
-        )
-    try:
-        config_name = get_run_desc_value(
-            run_desc, ("config name",), run_dir=run_dir, fatal=False
-        )
-    except KeyError:
-        # Alternate key spelling for backward compatibility
-        config_name = get_run_desc_value(run_desc, ("config_name",), run_dir=run_dir)
+    run_desc = RunDescription.from_dict(run_desc)
+    nemo_config_dir = get_run_desc_value(
+        run_desc,
+        ("paths", "NEMO code config"),
+        resolve_path=True,
+        path_cache=path_cache,
+        run_dir=run_dir,
+    )
+    config_name = get_run_desc_value(run_desc, ("config name",), run_dir=run_dir)
     keys = ("namelists",)
     if agrif_n is not None:
         keys = ("namelists", f"AGRIF_{agrif_n}")
     namelists = get_run_desc_value(run_desc, keys, run_dir=run_dir)
+    namelist_texts = {}
     for namelist_filename in namelists:
         if namelist_filename.startswith("AGRIF"):
             continue
@@ -359,21 +543,19 @@ def make_namelists(run_set_dir, run_desc, run_dir, agrif_n=None):
                 f"AGRIF_{agrif_n}",
                 namelist_filename,
             )
-        with (run_dir / namelist_dest).open("wt") as namelist:
-            namelist_files = get_run_desc_value(run_desc, keys, run_dir=run_dir)
-            for nl in namelist_files:
-                nl_path = expanded_path(nl)
-                if not nl_path.is_absolute():
-                    nl_path = run_set_dir / nl_path
-                try:
-                    with nl_path.open("rt") as f:
-                        namelist.writelines(f.readlines())
-                        namelist.write("\n\n")
-                except IOError as e:
-                    logger.error(e)
-                    namelist.close()
-                    remove_run_dir(run_dir)
-                    raise SystemExit(2)
+        namelist_sections = []
+        namelist_files = get_run_desc_value(run_desc, keys, run_dir=run_dir)
+        for nl in namelist_files:
+            nl_path = expanded_path(nl)
+            if not nl_path.is_absolute():
+                nl_path = run_set_dir / nl_path
+            try:
+                namelist_sections.extend((nl_path.read_text(), "\n\n"))
+            except IOError as e:
+                logger.error(e)
+                remove_run_dir(run_dir)
+                raise SystemExit(2)
+        namelist_texts[namelist_dest] = "".join(namelist_sections)
         ref_namelist = namelist_filename.replace("_cfg", "_ref")
         if ref_namelist not in namelists:
             ref_namelist_source = nemo_config_dir / config_name / "EXP00" / ref_namelist
@@ -381,17 +563,31 @@ def make_namelists(run_set_dir, run_desc, run_dir, agrif_n=None):
                 fspath(ref_namelist_source),
                 fspath(run_dir / namelist_dest.replace("_cfg", "_ref")),
             )
-    if "namelist_cfg" in namelists:
-        set_mpi_decomposition("namelist_cfg", run_desc, run_dir)
-    else:
+    if "namelist_cfg" not in namelists:
         logger.error(
             "No namelist_cfg key found in namelists section of run description"
         )
         remove_run_dir(run_dir)
         raise SystemExit(2)
+    parsed_namelists = {}
+    if agrif_n is None:
+        # Sub-grids share the MPI decomposition that is set in the parent
+        # grid's namelist_cfg
+        parsed_namelists["namelist_cfg"] = set_mpi_decomposition(
+            "namelist_cfg",
+            run_desc,
+            run_dir,
+            namelist_texts=namelist_texts,
+            path_cache=path_cache,
+        )
+    for namelist_dest, namelist_text in namelist_texts.items():
+        (run_dir / namelist_dest).write_text(namelist_text)
+    return parsed_namelists
 
 
-def set_mpi_decomposition(namelist_filename, run_desc, run_dir):
+def set_mpi_decomposition(
+    namelist_filename, run_desc, run_dir, namelist_texts=None, path_cache=None
+):
     """Update the &nammpp namelist jpni & jpnj values with the MPI
     decomposition values from the run description.
 
@@ -405,6 +601,19 @@ def set_mpi_decomposition(namelist_filename, run_desc, run_dir):
     :param run_dir: Path of the temporary run directory.
     :type run_dir: :py:class:`pathlib.Path`
 
+    :param dict namelist_texts: Contents of namelists that have not been
+                                written to run_dir yet,
+                                keyed by file name.
+                                If namelist_filename is in it,
+                                its contents are patched in place instead of
+                                the namelist file.
+
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
+    :returns: Patched namelist.
+    :rtype: :py:class:`f90nml.namelist.Namelist`
+
     :raises: :py:exc:`SystemExit` with exit code 2
     """
     try:
@@ -428,28 +637,42 @@ def set_mpi_decomposition(namelist_filename, run_desc, run_dir):
         "nammpp": {
             "jpni": jpni,
             "jpnj": jpnj,
-            "jpnij": get_n_processors(run_desc, run_dir),
+            "jpnij": get_n_processors(run_desc, run_dir, path_cache=path_cache),
         }
     }
-    _patch_namelist(run_dir / namelist_filename, patch)
+    if namelist_texts is not None and namelist_filename in namelist_texts:
+        namelist_texts[namelist_filename], namelist = _patch_namelist_text(
+            namelist_texts[namelist_filename], patch
+        )
+        return namelist
+    return _patch_namelist(run_dir / namelist_filename, patch)
 
 
 def _patch_namelist(namelist_path, patch):
     """
     :param :py:class:`pathlib.Path` namelist_path:
     :param dict patch:
+    :rtype: :py:class:`f90nml.namelist.Namelist`
     """
-    # f90nml insists on writing the patched namelist to a file,
-    # so we use a temporary file and copy it on to the original namelist file
-    with tempfile.NamedTemporaryFile("wt", delete=False) as tmp_patched_namelist:
-        f90nml.patch(fspath(namelist_path), patch, tmp_patched_namelist)
-    mode_b4_copy = namelist_path.stat().st_mode
-    shutil.copy2(tmp_patched_namelist.name, fspath(namelist_path))
-    namelist_path.chmod(mode_b4_copy)
-    Path(tmp_patched_namelist.name).unlink()
+    patched_text, namelist = _patch_namelist_text(namelist_path.read_text(), patch)
+    # Rewriting the file in place preserves its permissions
+    namelist_path.write_text(patched_text)
+    return namelist
 
 
-def get_n_processors(run_desc, run_dir):
+def _patch_namelist_text(namelist_text, patch):
+    """
+    :param str namelist_text:
+    :param dict patch:
+    :returns: Patched namelist text, and parsed patched namelist.
+    :rtype: 2-tuple
+    """
+    patched_namelist = io.StringIO()
+    namelist = f90nml.patch(io.StringIO(namelist_text), patch, patched_namelist)
+    return patched_namelist.getvalue(), namelist
+
+
+def get_n_processors(run_desc, run_dir, path_cache=None):
     """Return the total number of processors required for the run as
     specified by the MPI decomposition key in the run description.
 
@@ -458,9 +681,13 @@ def get_n_processors(run_desc, run_dir):
     :param run_dir: Path of the temporary run directory.
     :type run_dir: :py:class:`pathlib.Path`
 
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
     :returns: Number of processors required for the run.
     :rtype: int
     """
+    run_desc = RunDescription.from_dict(run_desc)
     jpni, jpnj = map(
         int, get_run_desc_value(run_desc, ("MPI decomposition",)).split("x")
     )
@@ -469,40 +696,28 @@ def get_n_processors(run_desc, run_dir):
             run_desc, ("grid", "land processor elimination"), fatal=False
         )
     except KeyError:
-        # Alternate key spelling for backward compatibility
-        try:
-            mpi_lpe_mapping = get_run_desc_value(
-                run_desc, ("grid", "Land processor elimination"), fatal=False
-            )
-        except KeyError:
-            logger.warning(
-                "No grid: land processor elimination: key found in run "
-                "description YAML file, so proceeding on the assumption that "
-                "you want to run without land processor elimination"
-            )
-            mpi_lpe_mapping = False
+        logger.warning(
+            "No grid: land processor elimination: key found in run "
+            "description YAML file, so proceeding on the assumption that "
+            "you want to run without land processor elimination"
+        )
+        mpi_lpe_mapping = False
     if not mpi_lpe_mapping:
         return jpni * jpnj
 
-    try:
-        mpi_lpe_mapping = get_run_desc_value(
-            run_desc,
-            ("grid", "land processor elimination"),
-            expand_path=True,
-            fatal=False,
-            run_dir=run_dir,
-        )
-    except KeyError:
-        # Alternate key spelling for backward compatibility
-        mpi_lpe_mapping = get_run_desc_value(
-            run_desc,
-            ("grid", "Land processor elimination"),
-            expand_path=True,
-            run_dir=run_dir,
-        )
+    mpi_lpe_mapping = get_run_desc_value(
+        run_desc,
+        ("grid", "land processor elimination"),
+        expand_path=True,
+        run_dir=run_dir,
+    )
     if not mpi_lpe_mapping.is_absolute():
         nemo_forcing_dir = get_run_desc_value(
-            run_desc, ("paths", "forcing"), resolve_path=True, run_dir=run_dir
+            run_desc,
+            ("paths", "forcing"),
+            resolve_path=True,
+            path_cache=path_cache,
+            run_dir=run_dir,
         )
         mpi_lpe_mapping = nemo_forcing_dir / "grid" / mpi_lpe_mapping
     n_processors = _lookup_lpe_n_processors(mpi_lpe_mapping, jpni, jpnj)
@@ -515,14 +730,12 @@ def get_n_processors(run_desc, run_dir):
 
 def _lookup_lpe_n_processors(mpi_lpe_mapping, jpni, jpnj):
     """Encapsulate file access to facilitate testability of get_n_processors()."""
-    with mpi_lpe_mapping.open("rt") as f:
-        for line in f:
-            cjpni, cjpnj, cnw = map(int, line.split(","))
-            if jpni == cjpni and jpnj == cjpnj:
-                return cnw
+    return lpe.load_lpe_table(mpi_lpe_mapping).lookup(jpni, jpnj)
 
 
-def copy_run_set_files(run_desc, desc_file, run_set_dir, run_dir, agrif_n=None):
+def copy_run_set_files(
+    run_desc, desc_file, run_set_dir, run_dir, agrif_n=None, path_cache=None
+):
     """Copy the run-set files given into run_dir.
 
     The YAML run description file (from the command-line) is copied.
@@ -556,54 +769,37 @@ def copy_run_set_files(run_desc, desc_file, run_set_dir, run_dir, agrif_n=None):
     :type run_dir: :py:class:`pathlib.Path`
 
     :param int agrif_n: AGRIF sub-grid number.
+
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
     """
-    try:
-        iodefs = get_run_desc_value(
-            run_desc,
-            ("output", "iodefs"),
-            resolve_path=True,
-            run_dir=run_dir,
-            fatal=False,
-        )
-    except KeyError:
-        # Alternate key spelling for backward compatibility
-        iodefs = get_run_desc_value(
-            run_desc, ("output", "files"), resolve_path=True, run_dir=run_dir
-        )
+    run_desc = RunDescription.from_dict(run_desc)
+    iodefs = get_run_desc_value(
+        run_desc,
+        ("output", "iodefs"),
+        resolve_path=True,
+        path_cache=path_cache,
+        run_dir=run_dir,
+    )
     run_set_files = [
         (iodefs, "iodef.xml"),
         (run_set_dir / desc_file.name, desc_file.name),
     ]
-    try:
-        keys = ("output", "domaindefs")
-        domain_def_filename = "domain_def.xml"
-        if agrif_n is not None:
-            keys = ("output", f"AGRIF_{agrif_n}", "domaindefs")
-            domain_def_filename = f"{agrif_n}_domain_def.xml"
-        domains_def = get_run_desc_value(
-            run_desc, keys, resolve_path=True, run_dir=run_dir, fatal=False
-        )
-    except KeyError:
-        # Alternate key spelling for backward compatibility
-        keys = ("output", "domain")
-        if agrif_n is not None:
-            keys = ("output", f"AGRIF_{agrif_n}", "domain")
-        domains_def = get_run_desc_value(
-            run_desc, keys, resolve_path=True, run_dir=run_dir
-        )
-    try:
-        fields_def = get_run_desc_value(
-            run_desc,
-            ("output", "fielddefs"),
-            resolve_path=True,
-            run_dir=run_dir,
-            fatal=False,
-        )
-    except KeyError:
-        # Alternate key spelling for backward compatibility
-        fields_def = get_run_desc_value(
-            run_desc, ("output", "fields"), resolve_path=True, run_dir=run_dir
-        )
+    keys = ("output", "domaindefs")
+    domain_def_filename = "domain_def.xml"
+    if agrif_n is not None:
+        keys = ("output", f"AGRIF_{agrif_n}", "domaindefs")
+        domain_def_filename = f"{agrif_n}_domain_def.xml"
+    domains_def = get_run_desc_value(
+        run_desc, keys, resolve_path=True, path_cache=path_cache, run_dir=run_dir
+    )
+    fields_def = get_run_desc_value(
+        run_desc,
+        ("output", "fielddefs"),
+        resolve_path=True,
+        path_cache=path_cache,
+        run_dir=run_dir,
+    )
     run_set_files.extend(
         [(domains_def, domain_def_filename), (fields_def, "field_def.xml")]
     )
@@ -614,14 +810,23 @@ def copy_run_set_files(run_desc, desc_file, run_set_dir, run_dir, agrif_n=None):
             keys = ("output", f"AGRIF_{agrif_n}", "filedefs")
             file_def_filename = f"{agrif_n}_file_def.xml"
         files_def = get_run_desc_value(
-            run_desc, keys, resolve_path=True, run_dir=run_dir, fatal=False
+            run_desc,
+            keys,
+            resolve_path=True,
+            path_cache=path_cache,
+            run_dir=run_dir,
+            fatal=False,
         )
         run_set_files.append((files_def, file_def_filename))
     except KeyError:
         # `files` key is optional and only used with XIOS-2
         pass
-    for source, dest_name in run_set_files:
-        shutil.copy2(fspath(source), fspath(run_dir / dest_name))
+    _map_concurrently(
+        lambda run_set_file: shutil.copy2(
+            fspath(run_set_file[0]), fspath(run_dir / run_set_file[1])
+        ),
+        run_set_files,
+    )
     _set_xios_server_mode(run_desc, run_dir)
 
 
@@ -686,7 +891,7 @@ def make_executable_links(nemo_bin_dir, run_dir, xios_bin_dir):
     (run_dir / "xios_server.exe").symlink_to(xios_server_exec)
 
 
-def make_grid_links(run_desc, run_dir, agrif_n=None):
+def make_grid_links(run_desc, run_dir, agrif_n=None, path_cache=None):
     """Create symlinks in run_dir to the file names that NEMO expects
     to the bathymetry and coordinates files given in the run_desc dict.
 
@@ -700,6 +905,9 @@ def make_grid_links(run_desc, run_dir, agrif_n=None):
 
     :param int agrif_n: AGRIF sub-grid number.
 
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
     :raises: :py:exc:`SystemExit` with exit code 2
     """
     coords_keys = ("grid", "coordinates")
@@ -721,25 +929,30 @@ def make_grid_links(run_desc, run_dir, agrif_n=None):
         grid_paths = ((coords_path, coords_filename), (bathy_path, bathy_filename))
     else:
         nemo_forcing_dir = get_run_desc_value(
-            run_desc, ("paths", "forcing"), resolve_path=True, run_dir=run_dir
+            run_desc,
+            ("paths", "forcing"),
+            resolve_path=True,
+            path_cache=path_cache,
+            run_dir=run_dir,
         )
         grid_dir = nemo_forcing_dir / "grid"
         grid_paths = (
             (grid_dir / coords_path, coords_filename),
             (grid_dir / bathy_path, bathy_filename),
         )
-    for source, link_name in grid_paths:
-        if not source.exists():
+    sources_exist = _map_concurrently(Path.exists, [p for p, _ in grid_paths])
+    for (source, link_name), source_exists in zip(grid_paths, sources_exist):
+        if not source_exists:
             logger.error(
                 f"{source} not found; cannot create symlink - "
                 f"please check the forcing path and grid file names in your run description file"
             )
             remove_run_dir(run_dir)
             raise SystemExit(2)
-        (run_dir / link_name).symlink_to(source)
+    _make_links(run_dir, grid_paths)
 
 
-def make_forcing_links(run_desc, run_dir):
+def make_forcing_links(run_desc, run_dir, namelists=None, path_cache=None):
     """Create symlinks in run_dir to the forcing directory/file names given
     in the run description forcing section.
 
@@ -748,21 +961,40 @@ def make_forcing_links(run_desc, run_dir):
     :param run_dir: Path of the temporary run directory.
     :type run_dir: :py:class:`pathlib.Path`
 
+    :param dict namelists: Parsed namelists keyed by file name,
+                           as returned by
+                           :py:func:`~nemo_cmd.prepare.make_namelists`,
+                           for the forcing link checks to use instead of
+                           parsing the namelist files.
+
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
     :raises: :py:exc:`SystemExit` with exit code 2 if a symlink target
              does not exist
     """
-    link_checkers = {"atmospheric": _check_atmospheric_forcing_link}
     link_names = get_run_desc_value(run_desc, ("forcing",), run_dir=run_dir)
-    for link_name in link_names:
-        source = _resolve_forcing_path(run_desc, (link_name, "link to"), run_dir)
-        if not source.exists():
+    forcing_links = [
+        (
+            _resolve_forcing_path(
+                run_desc, (link_name, "link to"), run_dir, path_cache=path_cache
+            ),
+            link_name,
+        )
+        for link_name in link_names
+    ]
+    sources_exist = _map_concurrently(Path.exists, [p for p, _ in forcing_links])
+    for (source, link_name), source_exists in zip(forcing_links, sources_exist):
+        if not source_exists:
             logger.error(
                 f"{source} not found; cannot create symlink - "
                 f"please check the forcing paths and file names in your run description file"
             )
             remove_run_dir(run_dir)
             raise SystemExit(2)
-        (run_dir / link_name).symlink_to(source)
+    _make_links(run_dir, forcing_links)
+    link_checks = []
+    for source, link_name in forcing_links:
         try:
             link_checker = get_run_desc_value(
                 run_desc,
@@ -770,8 +1002,10 @@ def make_forcing_links(run_desc, run_dir):
                 run_dir=run_dir,
                 fatal=False,
             )
-            link_checkers[link_checker["type"]](
-                run_dir, source, link_checker["namelist filename"]
+            if link_checker["type"] not in forcing_checks.CHECKERS:
+                raise KeyError(link_checker["type"])
+            link_checks.append(
+                (source, link_checker["type"], link_checker["namelist filename"])
             )
         except KeyError:
             if "check link" not in link_names[link_name]:
@@ -782,9 +1016,11 @@ def make_forcing_links(run_desc, run_dir):
                     logger.error(f"unknown forcing link checker: {link_checker}")
                     remove_run_dir(run_dir)
                     raise SystemExit(2)
+    if link_checks:
+        _check_forcing_links(run_dir, link_checks, namelists)
 
 
-def _resolve_forcing_path(run_desc, keys, run_dir):
+def _resolve_forcing_path(run_desc, keys, run_dir, path_cache=None):
     """Calculate a resolved path for a forcing path.
 
     If the path in the run description is absolute, resolve any symbolic links,
@@ -801,6 +1037,9 @@ def _resolve_forcing_path(run_desc, keys, run_dir):
     :param run_dir: Path of the temporary run directory.
     :type run_dir: :py:class:`pathlib.Path`
 
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
     :return: Resolved path
     :rtype: :py:class:`pathlib.Path`
 
@@ -813,70 +1052,85 @@ def _resolve_forcing_path(run_desc, keys, run_dir):
     if path.is_absolute():
         return path.resolve()
     nemo_forcing_dir = get_run_desc_value(
-        run_desc, ("paths", "forcing"), resolve_path=True, run_dir=run_dir
+        run_desc,
+        ("paths", "forcing"),
+        resolve_path=True,
+        path_cache=path_cache,
+        run_dir=run_dir,
     )
     return nemo_forcing_dir / path
 
 
-def _check_atmospheric_forcing_link(run_dir, link_path, namelist_filename):
-    """Confirm that the atmospheric forcing files necessary for the NEMO
-    run are present.
+def _check_forcing_links(run_dir, link_checks, namelists=None):
+    """Confirm that the forcing files necessary for the NEMO run are present.
 
-    Sections of the namelist file are parsed to determine
-    the necessary files, and the date ranges required for the run.
+    Sections of the namelist files are parsed to determine
+    the necessary files, and the date ranges required for the run,
+    for each type of link check.
+    The files for all of the link checks are checked together,
+    by listing each directory that contains them once,
+    and all of the missing files are reported.
 
     :param run_dir: Path of the temporary run directory.
     :type run_dir: :py:class:`pathlib.Path`
 
-    :param link_path: Path of the atmospheric forcing files collection.
-    :type :py:class:`pathlib.Path`:
+    :param link_checks: Forcing files collection path,
+                        link check type,
+                        and file name of the namelist to parse for file names
+                        and date ranges,
+                        for each link check.
+    :type link_checks: list of 3-tuples
 
-    :param str namelist_filename: File name of the namelist to parse for
-                                  atmospheric file names and date ranges.
+    :param dict namelists: Parsed namelists keyed by file name.
+                           Namelists that are not in it are read from
+                           run_dir.
 
-    :raises: :py:exc:`SystemExit` with exit code 2 if an atmospheric forcing
-             file does not exist
+    :raises: :py:exc:`SystemExit` with exit code 2 if any forcing files do
+             not exist
     """
-    namelist = f90nml.read(fspath(run_dir / namelist_filename))
-    if not namelist["namsbc"]["ln_blk_core"]:
-        return
-    start_date = arrow.get(str(namelist["namrun"]["nn_date0"]), "YYYYMMDD")
-    it000 = namelist["namrun"]["nn_it000"]
-    itend = namelist["namrun"]["nn_itend"]
-    dt = namelist["namdom"]["rn_rdt"]
-    end_date = start_date.replace(seconds=(itend - it000) * dt - 1)
-    qtys = "sn_wndi sn_wndj sn_qsr sn_qlw sn_tair sn_humi sn_prec sn_snow".split()
-    core_dir = namelist["namsbc_core"]["cn_dir"]
-    file_info = {"core": {"dir": core_dir, "params": []}}
-    for qty in qtys:
-        flread_params = namelist["namsbc_core"][qty]
-        file_info["core"]["params"].append((flread_params[0], flread_params[5]))
-    if namelist["namsbc"]["ln_apr_dyn"]:
-        apr_dir = namelist["namsbc_apr"]["cn_dir"]
-        file_info["apr"] = {"dir": apr_dir, "params": []}
-        flread_params = namelist["namsbc_apr"]["sn_apr"]
-        file_info["apr"]["params"].append((flread_params[0], flread_params[5]))
-    startm1 = start_date.replace(days=-1)
-    for r in arrow.Arrow.range("day", startm1, end_date):
-        for v in file_info.values():
-            for basename, period in v["params"]:
-                if period == "daily":
-                    file_path = os.path.join(
-                        v["dir"],
-                        f"{basename}_y{r.year}m{r.month:02d}d{r.day:02d}.nc",
-                    )
-                elif period == "yearly":
-                    file_path = os.path.join(v["dir"], f"{basename}.nc")
-                if not (run_dir / file_path).exists():
-                    logger.error(
-                        f"{file_path} not found; please confirm that atmospheric forcing "
-                        f"files for {startm1.format('YYYY-MM-DD')} through "
-                        f"{end_date.format('YYYY-MM-DD')} are in the {link_path} collection, "
-                        f"and that atmospheric forcing paths in your run description and "
-                        f"surface boundary conditions namelist are in agreement."
-                    )
-                    remove_run_dir(run_dir)
-                    raise SystemExit(2)
+    namelists = dict(namelists or {})
+    link_check_files = []
+    for link_path, check_type, namelist_filename in link_checks:
+        if namelist_filename not in namelists:
+            namelists[namelist_filename] = f90nml.read(
+                fspath(run_dir / namelist_filename)
+            )
+        namelist = namelists[namelist_filename]
+        file_paths = forcing_checks.CHECKERS[check_type](namelist)
+        link_check_files.append(file_paths)
+    missing_files = set(
+        forcing_checks.find_missing_files(
+            run_dir,
+            [file_path for file_paths in link_check_files for file_path in file_paths],
+            max_workers=MAX_WORKERS,
+        )
+    )
+    link_check_failed = False
+    for (link_path, check_type, namelist_filename), file_paths in zip(
+        link_checks, link_check_files
+    ):
+        link_missing_files = [
+            file_path
+            for file_path in dict.fromkeys(file_paths)
+            if file_path in missing_files
+        ]
+        if not link_missing_files:
+            continue
+        link_check_failed = True
+        for file_path in link_missing_files:
+            logger.error(f"{file_path} not found")
+        startm1, end_date = forcing_checks.run_date_range(namelists[namelist_filename])
+        logger.error(
+            f"{len(link_missing_files)} {check_type} forcing files not found; "
+            f"please confirm that {check_type} forcing "
+            f"files for {startm1.format('YYYY-MM-DD')} through "
+            f"{end_date.format('YYYY-MM-DD')} are in the {link_path} collection, "
+            f"and that {check_type} forcing paths in your run description and "
+            f"{namelist_filename} namelist are in agreement."
+        )
+    if link_check_failed:
+        remove_run_dir(run_dir)
+        raise SystemExit(2)
 
 
 def make_restart_links(run_desc, run_dir, nocheck_init, agrif_n=None):
@@ -908,6 +1162,7 @@ def make_restart_links(run_desc, run_dir, nocheck_init, agrif_n=None):
             "have been provided"
         )
         return
+    restart_links = []
     for link_name in link_names:
         if link_name.startswith("AGRIF"):
             continue
@@ -916,17 +1171,20 @@ def make_restart_links(run_desc, run_dir, nocheck_init, agrif_n=None):
             keys = ("restart", f"AGRIF_{agrif_n}", link_name)
             link_name = f"{agrif_n}_{link_name}"
         source = get_run_desc_value(run_desc, keys, expand_path=True)
-        if not source.exists() and not nocheck_init:
+        restart_links.append((source, link_name))
+    if nocheck_init:
+        _make_links(run_dir, restart_links)
+        return
+    sources_exist = _map_concurrently(Path.exists, [p for p, _ in restart_links])
+    for (source, link_name), source_exists in zip(restart_links, sources_exist):
+        if not source_exists:
             logger.error(
                 f"{source} not found; cannot create symlink - "
                 f"please check the restart file paths and file names in your run description file"
             )
             remove_run_dir(run_dir)
             raise SystemExit(2)
-        if nocheck_init:
-            (run_dir / link_name).symlink_to(source)
-        else:
-            (run_dir / link_name).symlink_to(source.resolve())
+    _make_links(run_dir, restart_links, resolve=True)
 
 
 def record_vcs_revisions(run_desc, run_dir):
@@ -940,14 +1198,19 @@ def record_vcs_revisions(run_desc, run_dir):
     """
     if "vcs revisions" not in run_desc:
         return
-    vcs_funcs = {"git": get_git_revision, "hg": get_hg_revision}
+    vcs_funcs = {"git": get_git_plumbing_revision, "hg": get_hg_plumbing_revision}
     vcs_tools = get_run_desc_value(run_desc, ("vcs revisions",), run_dir=run_dir)
+    repos = []
     for vcs_tool in vcs_tools:
-        repos = get_run_desc_value(
-            run_desc, ("vcs revisions", vcs_tool), run_dir=run_dir
+        repos.extend(
+            (Path(repo), vcs_funcs[vcs_tool])
+            for repo in get_run_desc_value(
+                run_desc, ("vcs revisions", vcs_tool), run_dir=run_dir
+            )
         )
-        for repo in repos:
-            write_repo_rev_file(Path(repo), run_dir, vcs_funcs[vcs_tool])
+    _map_concurrently(
+        lambda repo: write_repo_rev_file(repo[0], run_dir, repo[1]), repos
+    )
 
 
 def write_repo_rev_file(repo, run_dir, vcs_func):
@@ -957,6 +1220,12 @@ def write_repo_rev_file(repo, run_dir, vcs_func):
     The file name is the repository directory name with :kbd:`_rev.txt`
     appended.
 
+    The information is cached,
+    keyed by the state of the repository,
+    so that runs prepared from a repository that has not changed since an
+    earlier run was prepared from it reuse that run's information instead of
+    walking the repository again.
+
     :param repo: Path of Mercurial repository to get revision and status
                  information from.
     :type repo: :py:class:`pathlib.Path`
@@ -968,13 +1237,182 @@ def write_repo_rev_file(repo, run_dir, vcs_func):
                      information from repo.
     """
     repo_path = resolved_path(repo)
-    repo_rev_file_lines = vcs_func(repo_path, run_dir)
+    state = _repo_state(repo_path, vcs_func)
+    cached = None
+    if state is not None:
+        with _vcs_revisions_cache_lock:
+            cached = cache.read_yaml(VCS_REVISIONS_CACHE, default={}).get(
+                fspath(repo_path)
+            )
+    if cached is not None and cached.get("state") == state:
+        logger.debug(f"using cached revision and status information for {repo}")
+        repo_rev_file_lines = cached["lines"]
+    else:
+        repo_rev_file_lines = vcs_func(repo_path, run_dir)
+        if state is not None and repo_rev_file_lines:
+            with _vcs_revisions_cache_lock:
+                revisions = cache.read_yaml(VCS_REVISIONS_CACHE, default={})
+                revisions[fspath(repo_path)] = {
+                    "state": state,
+                    "lines": repo_rev_file_lines,
+                }
+                cache.write_yaml(VCS_REVISIONS_CACHE, revisions)
     if repo_rev_file_lines:
         rev_file = run_dir / f"{repo_path.name}_rev.txt"
         with rev_file.open("wt") as f:
             f.writelines(f"{line}\n" for line in repo_rev_file_lines)
 
 
+def _repo_state(repo_path, vcs_func):
+    """Return a key that identifies the state of a repository cheaply:
+    the checked out revision,
+    the modification times of the files that record the state of the
+    working copy and the tags,
+    and whether there are uncommitted changes.
+
+    :returns: Repository state,
+              or :py:obj:`None` if the state can't be determined,
+              or there are uncommitted changes,
+              so the revision and status information must not be cached.
+    :rtype: dict
+    """
+    state_funcs = {
+        get_git_revision: _git_repo_state,
+        get_git_plumbing_revision: _git_repo_state,
+        get_hg_revision: _hg_repo_state,
+        get_hg_plumbing_revision: _hg_repo_state,
+    }
+    try:
+        state_func = state_funcs[vcs_func]
+    except (KeyError, TypeError):
+        return None
+    try:
+        return state_func(repo_path)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug(f"unable to determine state of {repo_path}: {e}")
+        return None
+
+
+def _find_repo_root(path, marker):
+    """Return the repository root in or above path by looking for the
+    marker (e.g. :file:`.git`) in each directory.
+
+    A Git worktree or submodule marker is a file rather than a directory.
+
+    :returns: Repository root path, or :py:obj:`None` if it isn't found.
+    :rtype: :py:class:`pathlib.Path`
+    """
+    for dir_path in (path, *path.parents):
+        if (dir_path / marker).exists():
+            return dir_path
+    return None
+
+
+def _vcs_output(args, env=None):
+    """Run a version control system command and return its output.
+
+    :raises: :py:exc:`subprocess.CalledProcessError` if the command fails.
+    :rtype: str
+    """
+    return subprocess.run(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=env,
+        check=True,
+    ).stdout.decode("utf-8", "replace")
+
+
+def _hg_env():
+    """Return the environment for :command:`hg` commands,
+    with user configuration that changes their output disabled.
+    """
+    return {**os.environ, "HGPLAIN": "1"}
+
+
+def _mtime_ns(path):
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _has_uncommitted_changes(changed_files):
+    return any(not name.endswith(VCS_IGNORED_FILES) for name in changed_files)
+
+
+def _git_repo_state(repo_path):
+    repo_root = _find_repo_root(repo_path, ".git")
+    if repo_root is None:
+        return None
+    git_dir = repo_root / ".git"
+    head = (git_dir / "HEAD").read_text().strip()
+    commit = head
+    if head.startswith("ref: "):
+        ref = head[len("ref: ") :]
+        try:
+            commit = (git_dir / ref).read_text().strip()
+        except FileNotFoundError:
+            try:
+                packed_refs = (git_dir / "packed-refs").read_text().splitlines()
+            except FileNotFoundError:
+                packed_refs = []
+            commit = next(
+                (line.split()[0] for line in packed_refs if line.endswith(f" {ref}")),
+                None,
+            )
+            if commit is None:
+                # Unborn branch that has no commits yet
+                return None
+    # Compares the stat information in the index with the working tree,
+    # without reading file contents
+    changed_files = _vcs_output(
+        ["git", "-C", fspath(repo_root), "diff-files", "--name-only"]
+    ).splitlines()
+    if _has_uncommitted_changes(changed_files):
+        return None
+    return {
+        "head": head,
+        "commit": commit,
+        "index": _mtime_ns(git_dir / "index"),
+        "tags": [
+            _mtime_ns(git_dir / "packed-refs"),
+            _mtime_ns(git_dir / "refs" / "tags"),
+        ],
+    }
+
+
+def _hg_repo_state(repo_path):
+    repo_root = _find_repo_root(repo_path, ".hg")
+    if repo_root is None:
+        return None
+    hg_dir = repo_root / ".hg"
+    # The dirstate starts with the node ids of the working copy's parents
+    with (hg_dir / "dirstate").open("rb") as f:
+        parents = f.read(40).hex()
+    changed_files = _vcs_output(
+        [
+            "hg",
+            "--cwd",
+            fspath(repo_root),
+            "status",
+            "--modified",
+            "--added",
+            "--removed",
+            "--deleted",
+            "--no-status",
+        ],
+        env=_hg_env(),
+    ).splitlines()
+    if _has_uncommitted_changes(changed_files):
+        return None
+    return {
+        "parents": parents,
+        "dirstate": _mtime_ns(hg_dir / "dirstate"),
+        "tags": [_mtime_ns(hg_dir / "localtags"), _mtime_ns(repo_root / ".hgtags")],
+    }
+
+
 def get_git_revision(git_repo, run_dir):
     """Gather revision and status information from a Git repo.
 
@@ -1033,7 +1471,7 @@ def get_git_revision(git_repo, run_dir):
         ]
     )
     if commit.diff(None):
-        ignore = ("CONFIG/cfg.txt", "TOOLS/COMPILE/full_key_list.txt")
+        ignore = VCS_IGNORED_FILES
         diffs = deepcopy(commit.diff(None))
         for d in deepcopy(diffs):
             if d.a_path.endswith(ignore):
@@ -1108,7 +1546,7 @@ def get_hg_revision(hg_repo, run_dir):
         ]
     )
     repo_rev_file_lines.extend(line.decode() for line in revision.desc.splitlines())
-    ignore = ("CONFIG/cfg.txt", "TOOLS/COMPILE/full_key_list.txt")
+    ignore = VCS_IGNORED_FILES
     for s in copy(status):
         if s[1].decode().endswith(ignore):
             status.remove(s)
@@ -1119,7 +1557,193 @@ def get_hg_revision(hg_repo, run_dir):
     return repo_rev_file_lines
 
 
-def add_agrif_files(run_desc, desc_file, run_set_dir, run_dir, nocheck_init):
+def get_git_plumbing_revision(git_repo, run_dir):
+    """Gather revision and status information from a Git repo with
+    :command:`git` plumbing commands.
+
+    The information is the same as that gathered by
+    :py:func:`~nemo_cmd.prepare.get_git_revision`,
+    but the repo root is found by looking for :file:`.git` in each directory,
+    instead of trying to open a repo at each level,
+    and the information is gathered by 5 short-lived :command:`git`
+    processes.
+
+    :param git_repo: Path of Git repository to get revision and status information from.
+    :type git_repo: :py:class:`pathlib.Path`
+
+    :param run_dir: Path of the temporary run directory.
+    :type run_dir: :py:class:`pathlib.Path`
+
+    :returns: Git repository revision and status information strings.
+    :rtype: list
+    """
+    if not git_repo.exists():
+        logger.warning(
+            f"revision and status requested for non-existent repo: {git_repo}"
+        )
+        return []
+    repo_root = _find_repo_root(git_repo, ".git")
+    if repo_root is None:
+        logger.error(f"unable to find Git repo root in or above {git_repo}")
+        remove_run_dir(run_dir)
+        raise SystemExit(2)
+    git_cmd = ["git", "-C", fspath(repo_root)]
+    hexsha, ref = _vcs_output(
+        [*git_cmd, "rev-parse", "HEAD", "--symbolic-full-name", "HEAD"]
+    ).split()
+    branch = ref[len("refs/heads/") :] if ref.startswith("refs/heads/") else ref
+    tags = _vcs_output([*git_cmd, "tag", "--points-at", hexsha]).splitlines()
+    # Commit object headers are followed by a blank line and the message
+    headers, message = _vcs_output([*git_cmd, "cat-file", "commit", hexsha]).split(
+        "\n\n", 1
+    )
+    author = next(
+        line[len("author ") :]
+        for line in headers.splitlines()
+        if line.startswith("author ")
+    )
+    author_name, author_time = author.rsplit(" <", 1)
+    timestamp, utc_offset = author_time.rsplit(" ", 2)[1:]
+    offset_secs = (int(utc_offset[1:3]) * 3600 + int(utc_offset[3:5]) * 60) * (
+        -1 if utc_offset.startswith("-") else 1
+    )
+    author_datetime = arrow.get(int(timestamp)).to(tz.tzoffset(None, offset_secs))
+    # The commit's diff against its parent, in the same direction as
+    # GitPython's commit.diff("HEAD~1")
+    files = _parse_git_raw_diff(
+        _vcs_output(
+            [*git_cmd, "diff-tree", "-r", "-M", "--raw", "-z", "--no-color"]
+            + [hexsha, "HEAD~1"]
+        )
+    )
+    repo_rev_file_lines = [
+        f"branch: {branch}",
+        f"commit: {hexsha}",
+    ]
+    repo_rev_file_lines.extend(f"tag:    {tag}" for tag in tags)
+    repo_rev_file_lines.extend(
+        [
+            f"author: {author_name}",
+            f"date:   {author_datetime.format('ddd MMM DD HH:mm:ss YYYY ZZ')}",
+            f"files:  {' '.join(path for _, path in files)}",
+            f"message:",
+            f"{message}",
+        ]
+    )
+    diffs = [
+        (change_type, path)
+        for change_type, path in _parse_git_raw_diff(
+            _vcs_output([*git_cmd, "diff", "-M", "--raw", "-z", "--no-color", hexsha])
+        )
+        if not path.endswith(VCS_IGNORED_FILES)
+    ]
+    if diffs:
+        logger.warning(f"There are uncommitted changes in {git_repo}")
+        repo_rev_file_lines.append("uncommitted changes:")
+        repo_rev_file_lines.extend(
+            f"{change_type} {path}" for change_type, path in diffs
+        )
+    return repo_rev_file_lines
+
+
+def _parse_git_raw_diff(output):
+    """Parse :command:`git diff --raw -z` output into a list of
+    (change type, path) 2-tuples.
+
+    Renamed and copied files are reported by their source paths.
+    """
+    fields = iter(output.split("\0"))
+    diffs = []
+    for field in fields:
+        if not field.startswith(":"):
+            continue
+        change_type = field.split()[-1][0]
+        diffs.append((change_type, next(fields)))
+        if change_type in "RC":
+            # Destination path
+            next(fields)
+    return diffs
+
+
+def get_hg_plumbing_revision(hg_repo, run_dir):
+    """Gather revision and status information from a Mercurial repo with
+    a :command:`hg log` command and a :command:`hg status` command.
+
+    The information is the same as that gathered by
+    :py:func:`~nemo_cmd.prepare.get_hg_revision`,
+    but the repo root is found by looking for :file:`.hg` in each directory,
+    instead of starting a Mercurial command server at each level.
+
+    :param hg_repo: Path of Mercurial repository to get revision and status
+                    information from.
+    :type hg_repo: :py:class:`pathlib.Path`
+
+    :param run_dir: Path of the temporary run directory.
+    :type run_dir: :py:class:`pathlib.Path`
+
+    :returns: Mercurial repository revision and status information strings.
+    :rtype: list
+    """
+    if not hg_repo.exists():
+        logger.warning(
+            f"revision and status requested for non-existent repo: {hg_repo}"
+        )
+        return []
+    repo_root = _find_repo_root(hg_repo, ".hg")
+    if repo_root is None:
+        logger.error(f"unable to find Mercurial repo root in or above {hg_repo}")
+        remove_run_dir(run_dir)
+        raise SystemExit(2)
+    hg_cmd = ["hg", "--cwd", fspath(repo_root)]
+    # The files are in hg status --change order: modified, added, removed
+    template = (
+        r"{rev}\0{node}\0{tags}\0{author}\0{date|hgdate}\0"
+        r"{join(file_mods, ' ')}\0{join(file_adds, ' ')}\0{join(file_dels, ' ')}\0"
+        r"{desc}\0"
+    )
+    fields = _vcs_output(
+        [*hg_cmd, "log", "--rev", "parents()", "--template", template], env=_hg_env()
+    ).split("\0")[:-1]
+    n_fields = 9
+    parents = [fields[i : i + n_fields] for i in range(0, len(fields), n_fields)]
+    rev, node, tags, author, date, *files, desc = parents[0]
+    repo_rev_file_lines = [f"changset:   {rev}:{node}"]
+    if tags:
+        repo_rev_file_lines.append(f"tag:        {tags}")
+    if len(parents) > 1:
+        repo_rev_file_lines.extend(
+            f"parent:     {parent[0]}:{parent[1]}" for parent in parents
+        )
+    date = arrow.get(int(date.split()[0])).to(tz.tzlocal())
+    repo_rev_file_lines.extend(
+        [
+            f"user:       {author}",
+            f"date:       {date.format('ddd MMM DD HH:mm:ss YYYY ZZ')}",
+            f"files:      {' '.join(f for f in files if f)}",
+            f"description:",
+        ]
+    )
+    repo_rev_file_lines.extend(desc.splitlines())
+    status = []
+    for entry in _vcs_output(
+        [*hg_cmd, "status", "-mardC", "--print0"], env=_hg_env()
+    ).split("\0"):
+        if not entry:
+            continue
+        # Copy sources are indented under their destinations
+        code, path = (" ", entry[2:]) if entry.startswith(" ") else entry.split(" ", 1)
+        if not path.endswith(VCS_IGNORED_FILES):
+            status.append(f"{code} {path}")
+    if status:
+        logger.warning(f"There are uncommitted changes in {hg_repo}")
+        repo_rev_file_lines.append("uncommitted changes:")
+        repo_rev_file_lines.extend(status)
+    return repo_rev_file_lines
+
+
+def add_agrif_files(
+    run_desc, desc_file, run_set_dir, run_dir, nocheck_init, path_cache=None
+):
     """Add file copies and symlinks to temporary run directory for
     AGRIF runs.
 
@@ -1139,6 +1763,9 @@ def add_agrif_files(run_desc, desc_file, run_set_dir, run_dir, nocheck_init):
     :param boolean nocheck_init: Suppress restart file existence check;
                                  the default is to check
 
+    :param path_cache: Cache of resolved run description paths.
+    :type path_cache: :py:class:`nemo_cmd.PathCache`
+
     :raises: :py:exc:`SystemExit` with exit code 2 if mismatching number of
              sub-grids is detected
     """
@@ -1148,7 +1775,11 @@ def add_agrif_files(run_desc, desc_file, run_set_dir, run_dir, nocheck_init):
         # Not an AGRIF run
         return
     fixed_grids = get_run_desc_value(
-        run_desc, ("AGRIF", "fixed grids"), run_dir, resolve_path=True
+        run_desc,
+        ("AGRIF", "fixed grids"),
+        run_dir,
+        resolve_path=True,
+        path_cache=path_cache,
     )
     shutil.copy2(fspath(fixed_grids), fspath(run_dir / "AGRIF_FixedGrids.in"))
     # Get number of sub-grids
@@ -1159,12 +1790,21 @@ def add_agrif_files(run_desc, desc_file, run_set_dir, run_dir, nocheck_init):
         )
     run_desc_sections = {
         # sub-grid coordinates and bathymetry files
-        "grid": functools.partial(make_grid_links, run_desc, run_dir),
+        "grid": functools.partial(
+            make_grid_links, run_desc, run_dir, path_cache=path_cache
+        ),
         # sub-grid namelist files
-        "namelists": functools.partial(make_namelists, run_set_dir, run_desc, run_dir),
+        "namelists": functools.partial(
+            make_namelists, run_set_dir, run_desc, run_dir, path_cache=path_cache
+        ),
         # sub-grid output files
         "output": functools.partial(
-            copy_run_set_files, run_desc, desc_file, run_set_dir, run_dir
+            copy_run_set_files,
+            run_desc,
+            desc_file,
+            run_set_dir,
+            run_dir,
+            path_cache=path_cache,
         ),
     }
     try:
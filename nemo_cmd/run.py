@@ -35,6 +35,7 @@ import cliff.command
 from nemo_cmd import api
 from nemo_cmd.fspath import fspath
 from nemo_cmd.prepare import get_n_processors, get_run_desc_value, load_run_desc
+from nemo_cmd.run_description import RunDescription
 
 logger = logging.getLogger(__name__)
 
@@ -90,6 +91,15 @@ class Run(cliff.command.Command):
             definitions in your file_def.xml file.
             """,
         )
+        parser.add_argument(
+            "--postprocess",
+            action="store_true",
+            help="""
+            Use "nemo postprocess" in the bash script to combine, deflate, and
+            gather the results in a single pipeline instead of separate
+            "nemo combine", "nemo deflate", and "nemo gather" commands.
+            """,
+        )
         parser.add_argument(
             "--no-submit",
             dest="no_submit",
@@ -149,6 +159,7 @@ class Run(cliff.command.Command):
             parsed_args.waitjob,
             parsed_args.queue_job_cmd,
             quiet=parsed_args.quiet,
+            postprocess=parsed_args.postprocess,
         )
         if qsub_msg and not parsed_args.quiet:
             logger.info(qsub_msg)
@@ -164,11 +175,13 @@ def run(
     waitjob=0,
     queue_job_cmd="qsub",
     quiet=False,
+    postprocess=False,
 ):
     """Create and populate a temporary run directory, and a run script,
     and submit the run to the queue manager.
 
-    The temporary run directory is created and populated via the
+    The run description file is loaded once,
+    and the temporary run directory is created and populated from it via the
     :func:`nemo_cmd.api.prepare` API function.
     The system-specific run script is stored in :file:`NEMO.sh`
     in the run directory.
@@ -204,23 +217,24 @@ def run(
                           the default is to show the temporary run directory
                           path.
 
+    :param boolean postprocess: Use :command:`nemo postprocess` in the bash
+                                script instead of separate
+                                :command:`nemo combine`,
+                                :command:`nemo deflate`,
+                                and :command:`nemo gather` commands.
+
     :returns: Message generated by queue manager upon submission of the
               run script.
     :rtype: str
     """
-    run_dir = api.prepare(desc_file, nocheck_init)
+    # The run description is parsed once for preparation and the batch script
+    run_desc = RunDescription.from_dict(load_run_desc(desc_file))
+    run_dir = api.prepare(desc_file, nocheck_init, run_desc=run_desc)
     if not quiet:
         logger.info(f"Created run directory {run_dir}")
-    run_desc = load_run_desc(desc_file)
     nemo_processors = get_n_processors(run_desc, run_dir)
-    separate_xios_server = get_run_desc_value(
-        run_desc, ("output", "separate XIOS server")
-    )
-    xios_processors = (
-        get_run_desc_value(run_desc, ("output", "XIOS servers"))
-        if separate_xios_server
-        else 0
-    )
+    # The run description was validated by prepare
+    xios_processors = run_desc.xios_servers if run_desc.separate_xios_server else 0
     results_dir = Path(results_dir)
     batch_script = _build_batch_script(
         run_desc,
@@ -232,23 +246,24 @@ def run(
         results_dir,
         run_dir,
         queue_job_cmd,
+        postprocess,
     )
     batch_file = run_dir / "NEMO.sh"
     with batch_file.open("wt") as f:
         f.write(batch_script)
     if no_submit:
         return
-    starting_dir = Path.cwd()
-    os.chdir(fspath(run_dir))
     if waitjob:
         depend_opt = "-W depend=afterok" if queue_job_cmd == "qsub" else "-d afterok"
         cmd = f"{queue_job_cmd} {depend_opt}:{waitjob} NEMO.sh"
     else:
         cmd = f"{queue_job_cmd} NEMO.sh"
-    results_dir.mkdir(parents=True, exist_ok=True)
+    # The batch script runs in run_dir, so a relative results_dir is relative
+    # to it
+    (run_dir / results_dir).mkdir(parents=True, exist_ok=True)
     try:
         submit_job_msg = subprocess.check_output(
-            shlex.split(cmd), universal_newlines=True
+            shlex.split(cmd), cwd=fspath(run_dir), universal_newlines=True
         )
     except OSError:
         logger.error(
@@ -264,7 +279,6 @@ def run(
         except OSError:
             pass
         submit_job_msg = None
-    os.chdir(fspath(starting_dir))
     return submit_job_msg
 
 
@@ -278,6 +292,7 @@ def _build_batch_script(
     results_dir,
     run_dir,
     queue_job_cmd,
+    postprocess=False,
 ):
     """Build the Bash script that will execute the run.
 
@@ -309,6 +324,11 @@ def _build_batch_script(
     :param str queue_job_cmd: Command to use to submit the bash script to
                               execute the NEMO run.
 
+    :param boolean postprocess: Use :command:`nemo postprocess` instead of
+                                separate :command:`nemo combine`,
+                                :command:`nemo deflate`,
+                                and :command:`nemo gather` commands.
+
     :returns: Bash script to execute the run.
     :rtype: str
     """
@@ -324,14 +344,13 @@ def _build_batch_script(
     )
     script = (
         f"{script}\n"
-        f"{_definitions(run_desc, desc_file, run_dir, results_dir, no_deflate)}\n"
+        f"{_definitions(run_desc, desc_file, run_dir, results_dir, no_deflate, postprocess)}\n"
     )
     if "modules to load" in run_desc:
         script = f"{script}\n" f"{_modules(run_desc['modules to load'])}\n"
     script = (
         f"{script}\n"
-        f"{_execute(nemo_processors, xios_processors, no_deflate, max_deflate_jobs)}\n"
-        f"{_fix_permissions()}\n"
+        f"{_execute(nemo_processors, xios_processors, no_deflate, max_deflate_jobs, postprocess)}\n"
         f"{_cleanup()}"
     )
     return script
@@ -463,7 +482,9 @@ def _td2hms(timedelta):
     return f"{hms[0]}:{hms[1]:02d}:{hms[2]:02d}"
 
 
-def _definitions(run_desc, run_desc_file, run_dir, results_dir, no_deflate):
+def _definitions(
+    run_desc, run_desc_file, run_dir, results_dir, no_deflate, postprocess=False
+):
     nemo_cmd_dir = Path(__file__).parent.parent
     nemo_cmd = f"pixi run -m {os.fspath(nemo_cmd_dir)} nemo"
     defns = (
@@ -471,8 +492,11 @@ def _definitions(run_desc, run_desc_file, run_dir, results_dir, no_deflate):
         f'RUN_DESC="{run_desc_file}"\n'
         f'WORK_DIR="{run_dir}"\n'
         f'RESULTS_DIR="{results_dir}"\n'
-        f'COMBINE="{nemo_cmd} combine"\n'
     )
+    if postprocess:
+        defns += f'POSTPROCESS="{nemo_cmd} postprocess"\n'
+        return defns
+    defns += f'COMBINE="{nemo_cmd} combine"\n'
     if not no_deflate:
         defns += f'DEFLATE="{nemo_cmd} deflate"\n'
     defns += f'GATHER="{nemo_cmd} gather"\n'
@@ -486,7 +510,9 @@ def _modules(modules_to_load):
     return modules
 
 
-def _execute(nemo_processors, xios_processors, no_deflate, max_deflate_jobs):
+def _execute(
+    nemo_processors, xios_processors, no_deflate, max_deflate_jobs, postprocess=False
+):
     mpirun = f"mpirun -np {nemo_processors} ./nemo.exe"
     if xios_processors:
         mpirun = " ".join(
@@ -501,12 +527,34 @@ def _execute(nemo_processors, xios_processors, no_deflate, max_deflate_jobs):
         'echo "Starting run at $(date)"\n'
     )
     script += f"{mpirun}\n"
+    if postprocess:
+        script += (
+            "MPIRUN_EXIT_CODE=$?\n"
+            'echo "Ended run at $(date)"\n'
+            "\n"
+            'echo "Results post-processing started at $(date)"\n'
+        )
+        if no_deflate:
+            postprocess_opts = "--no-deflate"
+        else:
+            script += "module load nco/4.6.6\n"
+            postprocess_opts = f"--deflate-jobs {max_deflate_jobs}"
+        script += (
+            f"${{POSTPROCESS}} ${{RUN_DESC}} ${{RESULTS_DIR}} {postprocess_opts} "
+            f"--add-mode 064 --debug\n"
+            'echo "Results post-processing ended at $(date)"\n'
+        )
+        return script
+    # The final versions of the combined and deflated files are written directly
+    # into the results directory so that gather only has to move the remaining files;
+    # when there is no deflation that means combining into the results directory
+    combine_opts = "--output-dir ${RESULTS_DIR} --debug" if no_deflate else "--debug"
     script += (
         "MPIRUN_EXIT_CODE=$?\n"
         'echo "Ended run at $(date)"\n'
         "\n"
         'echo "Results combining started at $(date)"\n'
-        "${COMBINE} ${RUN_DESC} --debug\n"
+        f"${{COMBINE}} ${{RUN_DESC}} {combine_opts}\n"
         'echo "Results combining ended at $(date)"\n'
     )
     if not no_deflate:
@@ -515,27 +563,18 @@ def _execute(nemo_processors, xios_processors, no_deflate, max_deflate_jobs):
             f'echo "Results deflation started at $(date)"\n'
             f"module load nco/4.6.6\n"
             f"${{DEFLATE}} *_grid_[TUVW]*.nc *_ptrc_T*.nc "
-            f"--jobs {max_deflate_jobs} --debug\n"
+            f"--jobs {max_deflate_jobs} --output-dir ${{RESULTS_DIR}} --debug\n"
             f'echo "Results deflation ended at $(date)"\n'
         )
     script += (
         "\n"
         'echo "Results gathering started at $(date)"\n'
-        "${GATHER} ${RESULTS_DIR} --debug\n"
+        "${GATHER} ${RESULTS_DIR} --add-mode 064 --debug\n"
         'echo "Results gathering ended at $(date)"\n'
     )
     return script
 
 
-def _fix_permissions():
-    script = (
-        "chmod go+rx ${RESULTS_DIR}\n"
-        "chmod g+rw ${RESULTS_DIR}/*\n"
-        "chmod o+r ${RESULTS_DIR}/*\n"
-    )
-    return script
-
-
 def _cleanup():
     script = (
         'echo "Deleting run directory" >>${RESULTS_DIR}/stdout\n'
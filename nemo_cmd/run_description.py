@@ -0,0 +1,281 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""Run description model.
+
+A :py:class:`RunDescription` is a read-only mapping of the contents of a
+run description YAML file in which alternate key spellings that are
+accepted for backward compatibility have been replaced by their canonical
+spellings,
+so that lookups don't have to try each spelling.
+It also holds the commonly used values with types,
+and, once it has been validated,
+the resolved paths of the directories and files that the run uses.
+"""
+
+import collections.abc
+import fnmatch
+import logging
+
+import attr
+import yaml
+
+from nemo_cmd.fspath import fspath, PathCache
+
+logger = logging.getLogger(__name__)
+
+#: LibYAML based loader is much faster for large run description files,
+#: so it is used if PyYAML was built with LibYAML.
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+#: Alternate key spellings that are accepted for backward compatibility,
+#: mapped to their canonical spellings,
+#: and keyed by the sequence of key patterns of the section they are in.
+ALTERNATE_KEYS = {
+    (): {"config_name": "config name"},
+    ("paths",): {"NEMO-code-config": "NEMO code config"},
+    ("grid",): {"Land processor elimination": "land processor elimination"},
+    ("output",): {"files": "iodefs", "domain": "domaindefs", "fields": "fielddefs"},
+    ("output", "AGRIF_*"): {"domain": "domaindefs"},
+}
+
+#: Attribute names,
+#: run description key sequences,
+#: and whether the key is required,
+#: for the paths that are resolved and checked by
+#: :py:meth:`RunDescription.validate`.
+PATHS = (
+    ("nemo_code_config", ("paths", "NEMO code config"), True),
+    ("xios_code", ("paths", "XIOS"), True),
+    ("forcing", ("paths", "forcing"), False),
+    ("runs_dir", ("paths", "runs directory"), True),
+    ("iodefs", ("output", "iodefs"), True),
+    ("domaindefs", ("output", "domaindefs"), True),
+    ("fielddefs", ("output", "fielddefs"), True),
+    ("filedefs", ("output", "filedefs"), False),
+)
+
+
+@attr.s(slots=True, eq=False)
+class RunDescription(collections.abc.Mapping):
+    """Run description with normalized keys, typed values,
+    and resolved paths.
+
+    Instances are mappings,
+    so they can be used wherever a run description dictionary is expected.
+    """
+
+    #: Run description dictionary with canonical key spellings.
+    _run_desc = attr.ib(repr=False)
+    #: Run id.
+    run_id = attr.ib(init=False, default=None)
+    #: NEMO configuration name.
+    config_name = attr.ib(init=False, default=None)
+    #: (jpni, jpnj) MPI decomposition.
+    mpi_decomposition = attr.ib(init=False, default=None)
+    #: Whether to run the XIOS servers detached from NEMO.
+    separate_xios_server = attr.ib(init=False, default=None)
+    #: Number of XIOS servers.
+    xios_servers = attr.ib(init=False, default=None)
+    #: Resolved :kbd:`paths: NEMO code config` path.
+    nemo_code_config = attr.ib(init=False, default=None)
+    #: Resolved :kbd:`paths: XIOS` path.
+    xios_code = attr.ib(init=False, default=None)
+    #: Resolved :kbd:`paths: forcing` path.
+    forcing = attr.ib(init=False, default=None)
+    #: Resolved :kbd:`paths: runs directory` path.
+    runs_dir = attr.ib(init=False, default=None)
+    #: Resolved :kbd:`output: iodefs` path.
+    iodefs = attr.ib(init=False, default=None)
+    #: Resolved :kbd:`output: domaindefs` path.
+    domaindefs = attr.ib(init=False, default=None)
+    #: Resolved :kbd:`output: fielddefs` path.
+    fielddefs = attr.ib(init=False, default=None)
+    #: Resolved :kbd:`output: filedefs` path.
+    filedefs = attr.ib(init=False, default=None)
+
+    def __attrs_post_init__(self):
+        self.run_id = self._run_desc.get("run_id")
+        self.config_name = self._run_desc.get("config name")
+        self.mpi_decomposition = _mpi_decomposition(
+            self._run_desc.get("MPI decomposition")
+        )
+        output = self._run_desc.get("output") or {}
+        self.separate_xios_server = output.get("separate XIOS server")
+        self.xios_servers = output.get("XIOS servers")
+
+    @classmethod
+    def from_dict(cls, run_desc):
+        """Create a run description from a run description dictionary.
+
+        :param dict run_desc: Run description dictionary;
+                              it is returned unchanged if it is already a
+                              :py:class:`RunDescription`.
+
+        :rtype: :py:class:`nemo_cmd.run_description.RunDescription`
+        """
+        if isinstance(run_desc, cls):
+            return run_desc
+        return cls(normalized_keys(run_desc or {}))
+
+    @classmethod
+    def load(cls, desc_file):
+        """Load a run description from a YAML file.
+
+        :param desc_file: File path/name of the YAML run description file.
+        :type desc_file: :py:class:`pathlib.Path`
+
+        :rtype: :py:class:`nemo_cmd.run_description.RunDescription`
+        """
+        with open(fspath(desc_file), "rt") as f:
+            return cls.from_dict(yaml.load(f, Loader=YAML_LOADER))
+
+    def __getitem__(self, key):
+        return self._run_desc[key]
+
+    def __iter__(self):
+        return iter(self._run_desc)
+
+    def __len__(self):
+        return len(self._run_desc)
+
+    def validate(self, path_cache=None):
+        """Confirm that the keys that are required to prepare a run are
+        present,
+        and resolve the paths in :py:data:`PATHS` and confirm that they exist.
+
+        All of the problems that are found are logged before a
+        :py:exc:`SystemExit` exception is raised,
+        so that they can be fixed together.
+
+        :param path_cache: Cache to resolve the paths and confirm that they
+                           exist with;
+                           the resolved paths are reused from it by later
+                           lookups.
+        :type path_cache: :py:class:`nemo_cmd.PathCache`
+
+        :raises: :py:exc:`SystemExit` with exit code 2
+        """
+        if path_cache is None:
+            path_cache = PathCache()
+        errors = []
+        for keys in (
+            ("run_id",),
+            ("config name",),
+            ("MPI decomposition",),
+            ("namelists", "namelist_cfg"),
+            ("output", "separate XIOS server"),
+        ):
+            try:
+                self.value(keys)
+            except KeyError:
+                errors.append(f'"{": ".join(keys)}" key not found')
+        if "MPI decomposition" in self and self.mpi_decomposition is None:
+            errors.append(
+                f'"MPI decomposition: {self["MPI decomposition"]}" value is not '
+                f"like 8x18"
+            )
+        if self.separate_xios_server and self.xios_servers is None:
+            errors.append('"output: XIOS servers" key not found')
+        for attr_name, keys, required in PATHS:
+            try:
+                path = path_cache.resolved_path(self.value(keys))
+            except KeyError:
+                if required:
+                    errors.append(f'"{": ".join(keys)}" key not found')
+                continue
+            if not path_cache.exists(path):
+                errors.append(f'{path} path from "{": ".join(keys)}" key not found')
+                continue
+            setattr(self, attr_name, path)
+        if errors:
+            for error in errors:
+                logger.error(f"{error} - please check your run description YAML file")
+            raise SystemExit(2)
+
+    def value(self, keys):
+        """Return the value defined by a sequence of keys.
+
+        :param sequence keys: Keys that lead to the value to be returned.
+
+        :raises: :py:exc:`KeyError`
+
+        :returns: Run description value defined by the sequence of keys.
+        """
+        value = self._run_desc
+        for key in keys:
+            try:
+                value = value[key]
+            except TypeError:
+                raise KeyError(key)
+        return value
+
+
+def normalized_keys(run_desc):
+    """Return a copy of a run description dictionary in which the
+    alternate key spellings in :py:data:`ALTERNATE_KEYS` have been replaced
+    by their canonical spellings.
+
+    When both spellings of a key are present,
+    the value of the canonical spelling is used.
+    Only the sections that can contain alternate key spellings are copied.
+
+    :param dict run_desc: Run description dictionary.
+
+    :rtype: dict
+    """
+    return _normalized_section(run_desc, ())
+
+
+def _normalized_section(section, section_keys):
+    alternates = {}
+    for pattern_keys, pattern_alternates in ALTERNATE_KEYS.items():
+        if _keys_match(section_keys, pattern_keys):
+            alternates.update(pattern_alternates)
+    normalized = {}
+    for key, value in section.items():
+        canonical_key = alternates.get(key, key)
+        if canonical_key != key and canonical_key in section:
+            continue
+        if isinstance(value, dict) and _is_parent_section(section_keys + (key,)):
+            value = _normalized_section(value, section_keys + (key,))
+        normalized[canonical_key] = value
+    return normalized
+
+
+def _keys_match(section_keys, pattern_keys):
+    return len(section_keys) == len(pattern_keys) and all(
+        fnmatch.fnmatchcase(str(key), pattern)
+        for key, pattern in zip(section_keys, pattern_keys)
+    )
+
+
+def _is_parent_section(section_keys):
+    return any(
+        _keys_match(section_keys, pattern_keys[: len(section_keys)])
+        for pattern_keys in ALTERNATE_KEYS
+        if len(pattern_keys) >= len(section_keys)
+    )
+
+
+def _mpi_decomposition(value):
+    try:
+        jpni, jpnj = map(int, value.split("x"))
+    except (AttributeError, ValueError):
+        return None
+    return jpni, jpnj
@@ -0,0 +1,801 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""Parallel transfer engine for moving files and directory trees.
+
+Entries that are on the same file system as their destination are moved
+with :py:func:`os.rename`.
+Files that have to be copied to another file system
+(typically from a scratch run directory to a project results directory)
+are copied concurrently in a pool of threads,
+and files that are larger than the range size are split into byte ranges
+that are copied concurrently too.
+The copies use :py:func:`os.copy_file_range` or :py:func:`os.sendfile`
+so that the data does not pass through Python,
+with a :py:func:`os.pread`/:py:func:`os.pwrite` fallback.
+
+Each copied file is written under a temporary name,
+flushed to disk with :py:func:`os.fsync`,
+renamed into place,
+and only then is its source file deleted.
+
+Sources can optionally be kept,
+in which case files are cloned with the :kbd:`FICLONE` copy-on-write
+:py:func:`fcntl.ioctl` or hard-linked where the file system supports it,
+and copied otherwise.
+
+Copies to another file system are recorded in a journal in the destination
+directory as they progress:
+started,
+each byte range copied,
+copied (renamed into place),
+verified,
+and source removed.
+If a transfer is interrupted,
+the journal is used by the next transfer into the same directory to finish
+removing the sources of files that were completely copied,
+to resume copying partially copied files from their remaining byte ranges,
+or to roll back partial files that can't be resumed.
+
+Files can optionally be hashed while they are moved.
+Files that are copied are hashed as their data is streamed,
+and files that are renamed are hashed by reading them concurrently,
+so that a checksum manifest does not require a second read of the copied
+data.
+"""
+
+import concurrent.futures
+import errno
+import fcntl
+import functools
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import threading
+from pathlib import Path
+
+import attr
+
+from nemo_cmd.fspath import fspath
+
+logger = logging.getLogger(__name__)
+
+#: Default number of threads to copy files with.
+DEFAULT_MAX_WORKERS = 8
+#: Size in bytes of the byte ranges that large files are split into.
+RANGE_SIZE = 256 * 2**20
+#: Maximum number of bytes to copy in each system call.
+CHUNK_SIZE = 64 * 2**20
+#: Size in bytes of the buffer used when the data has to be copied through
+#: user space.
+BUFFER_SIZE = 8 * 2**20
+#: :py:data:`errno` codes for which an in-kernel copy method is abandoned
+#: in favour of the next method.
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP}
+#: Linux :kbd:`FICLONE` ioctl request code to clone a file by sharing its
+#: extents copy-on-write;
+#: supported by XFS, btrfs, and other file systems.
+FICLONE = 0x40049409
+#: Name of the transfer journal file in the destination directory.
+JOURNAL = ".nemo_transfer_journal"
+
+
+@attr.s
+class Journal(object):
+    """Append-only journal of the progress of file copies.
+
+    Each record is a tab-separated line of the state,
+    the destination path,
+    the source path,
+    the source size and modification time in nanoseconds,
+    and,
+    for :kbd:`started` records,
+    the size of the byte ranges that the file is copied in,
+    or,
+    for :kbd:`range` records,
+    the offset of the byte range that was copied.
+    Records are flushed to disk as they are written.
+    """
+
+    #: Path of the journal file.
+    path = attr.ib()
+    #: Lock to serialize writing records from several threads.
+    lock = attr.ib(factory=threading.Lock, repr=False, eq=False)
+
+    def record(self, state, copy, offset=""):
+        """Append a record of the state of a file copy to the journal.
+
+        :param str state: :kbd:`started`, :kbd:`range`, :kbd:`copied`,
+                          :kbd:`verified`, or :kbd:`source-removed`.
+
+        :param copy: File copy.
+        :type copy: :py:class:`nemo_cmd.transfer.FileCopy`
+
+        :param int offset: Offset of byte range that was copied,
+                           or byte range size of a started copy.
+        """
+        line = (
+            f"{state}\t{copy.dest}\t{copy.src}\t{copy.size}\t"
+            f"{copy.src_mtime_ns}\t{offset}\n"
+        )
+        with self.lock:
+            with self.path.open("at") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def read(self):
+        """Read the latest state of each file copy in the journal.
+
+        :returns: Dicts of state,
+                  source path,
+                  source size,
+                  source modification time in nanoseconds,
+                  byte range size,
+                  and set of byte range offsets copied,
+                  keyed by destination path.
+        :rtype: dict
+        """
+        copies = {}
+        try:
+            with self.path.open("rt") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return copies
+        for line in lines:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) != 6:
+                # Incomplete last line of an interrupted write
+                continue
+            state, dest, src, size, mtime_ns, offset = fields
+            source = (Path(src), int(size), int(mtime_ns))
+            dest = Path(dest)
+            if state == "started":
+                # A copy is started from scratch,
+                # so the ranges copied by earlier attempts are discarded
+                copies[dest] = {
+                    "source": source,
+                    "range_size": int(offset) if offset else None,
+                    "offsets": set(),
+                }
+            if dest not in copies:
+                continue
+            copies[dest]["state"] = state
+            if state == "range":
+                copies[dest]["offsets"].add(int(offset))
+        return copies
+
+    def recover(self, keep_source=False, resume=True):
+        """Finish or roll back the file copies in the journal of an
+        interrupted transfer.
+
+        The sources of files that were completely copied are deleted,
+        unless they are to be kept.
+        Partial copies are kept so that they can be resumed if resume is
+        true and their source files have not changed since they were
+        started;
+        otherwise they are deleted.
+
+        :param boolean keep_source: Keep the source files of completed
+                                    copies.
+
+        :param boolean resume: Allow partial copies to be resumed.
+
+        :returns: Byte range sizes and sets of offsets of the byte ranges
+                  that have already been copied,
+                  keyed by the destination paths of the copies that can be
+                  resumed.
+        :rtype: dict of 2-tuples
+        """
+        resumable = {}
+        for dest, journaled in self.read().items():
+            src, size, mtime_ns = journaled["source"]
+            copy = FileCopy(src, dest, size, src_mtime_ns=mtime_ns)
+            if journaled["state"] in {"copied", "verified"}:
+                if not keep_source and src.exists() and _same_size(src, dest):
+                    os.unlink(fspath(src))
+                    logger.info(f"finished interrupted transfer of {src} to {dest}")
+            elif journaled["state"] != "source-removed" and copy.tmp_path.exists():
+                if resume and _unchanged(copy):
+                    resumable[dest] = (journaled["range_size"], journaled["offsets"])
+                    logger.info(f"resuming interrupted transfer of {src} to {dest}")
+                else:
+                    copy.tmp_path.unlink()
+                    logger.info(f"rolled back interrupted transfer of {src} to {dest}")
+        return resumable
+
+    def remove(self):
+        """Delete the journal file."""
+        self.path.unlink(missing_ok=True)
+
+
+def _same_size(src, dest):
+    try:
+        return dest.stat().st_size == src.stat().st_size
+    except FileNotFoundError:
+        return False
+
+
+def _unchanged(copy):
+    try:
+        stat = copy.src.stat()
+    except FileNotFoundError:
+        return False
+    return (stat.st_size, stat.st_mtime_ns) == (copy.size, copy.src_mtime_ns)
+
+
+@attr.s
+class Permissions(object):
+    """Permission bits and group ownership to apply to moved files and
+    directories.
+    """
+
+    #: Permission bits to add to the mode of each file and directory.
+    #: Directories also get the search (execute) bit for each class of users
+    #: that get the read bit.
+    mode_bits = attr.ib(default=0)
+    #: Id of the group to change the ownership of each file and directory to;
+    #: -1 means leave the group unchanged.
+    gid = attr.ib(default=-1)
+
+    def apply(self, path):
+        """Add the permission bits to the mode of path and change its group,
+        skipping changes that are not required.
+
+        Symbolic links are left unchanged.
+
+        :param path: Path of file or directory.
+        :type path: :py:class:`pathlib.Path`
+        """
+        st = os.lstat(fspath(path))
+        if stat.S_ISLNK(st.st_mode):
+            return
+        # Changing the group first because chown() may clear the set-group-id bit
+        if self.gid != -1 and st.st_gid != self.gid:
+            os.chown(fspath(path), -1, self.gid)
+        mode_bits = self.mode_bits
+        if stat.S_ISDIR(st.st_mode):
+            mode_bits |= (mode_bits & 0o444) >> 2
+        mode = stat.S_IMODE(st.st_mode)
+        if mode | mode_bits != mode:
+            os.chmod(fspath(path), mode | mode_bits)
+
+    def apply_tree(self, path):
+        """Apply the permissions to path and,
+        if it is a directory,
+        to everything in it.
+
+        :param path: Path of file or directory.
+        :type path: :py:class:`pathlib.Path`
+        """
+        self.apply(path)
+        if path.is_dir() and not path.is_symlink():
+            for dirpath, dirnames, filenames in os.walk(fspath(path)):
+                for name in dirnames + filenames:
+                    self.apply(Path(dirpath, name))
+
+
+@attr.s
+class FileCopy(object):
+    """Copy of a file to another file system."""
+
+    #: Path of the file to copy.
+    src = attr.ib()
+    #: Path to copy the file to.
+    dest = attr.ib()
+    #: Size of the file in bytes.
+    size = attr.ib()
+    #: :py:mod:`hashlib` object to update with the file's data as it is
+    #: copied;
+    #: files that are hashed are copied in a single byte range.
+    hasher = attr.ib(default=None, repr=False, eq=False)
+    #: Keep the source file after it has been copied.
+    keep_source = attr.ib(default=False)
+    #: Modification time of the source file in nanoseconds.
+    src_mtime_ns = attr.ib(default=0)
+    #: Journal to record the progress of the copy in.
+    journal = attr.ib(default=None, repr=False, eq=False)
+    #: Permissions to apply to the copy before it is renamed into place.
+    permissions = attr.ib(default=None, repr=False, eq=False)
+    #: Offsets of the byte ranges that were copied by an interrupted
+    #: transfer.
+    done_offsets = attr.ib(factory=set, repr=False, eq=False)
+    #: Size of the byte ranges that were copied by an interrupted transfer;
+    #: the copy is restarted if it is copied in ranges of another size.
+    done_range_size = attr.ib(default=None, repr=False, eq=False)
+    #: Number of byte ranges that have not been copied yet.
+    ranges_left = attr.ib(default=0)
+    #: Lock to serialize updates of :py:attr:`ranges_left`.
+    lock = attr.ib(factory=threading.Lock, repr=False, eq=False)
+
+    @property
+    def tmp_path(self):
+        """Path that the file is copied to before it is renamed into place."""
+        return self.dest.with_name(f".{self.dest.name}.part")
+
+    def finish(self):
+        """Flush the copy to disk,
+        copy the permission bits and times of the source file to it,
+        apply the copy's permissions to it,
+        rename it into place,
+        and delete the source file unless it is to be kept.
+        """
+        fd = os.open(fspath(self.tmp_path), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        shutil.copystat(fspath(self.src), fspath(self.tmp_path))
+        self._apply_permissions()
+        os.rename(fspath(self.tmp_path), fspath(self.dest))
+        self._record("copied")
+        if not _same_size(self.src, self.dest):
+            raise OSError(
+                errno.EIO, f"size of {self.dest} does not match size of {self.src}"
+            )
+        self._record("verified")
+        if not self.keep_source:
+            os.unlink(fspath(self.src))
+            self._record("source-removed")
+
+    def _apply_permissions(self):
+        if self.permissions is not None:
+            self.permissions.apply(self.tmp_path)
+
+    def _record(self, state, offset=""):
+        if self.journal is not None:
+            self.journal.record(state, self, offset)
+
+    def clone_or_link(self):
+        """Clone the source file with the :kbd:`FICLONE` ioctl,
+        or hard-link it if it can't be cloned.
+
+        The copy's permissions are applied to the clone or link;
+        a hard link shares its mode and group with the source file.
+
+        :returns: :kbd:`clone` or :kbd:`link` to indicate how the file was
+                  placed,
+                  or :py:obj:`None` if it has to be copied.
+        :rtype: str
+        """
+        method = "clone"
+        try:
+            _clone(self.src, self.tmp_path)
+            shutil.copystat(fspath(self.src), fspath(self.tmp_path))
+        except OSError:
+            self.tmp_path.unlink(missing_ok=True)
+            method = "link"
+            try:
+                os.link(fspath(self.src), fspath(self.tmp_path))
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS | {errno.EPERM, errno.EMLINK}:
+                    raise
+                return None
+        self._apply_permissions()
+        os.rename(fspath(self.tmp_path), fspath(self.dest))
+        return method
+
+
+def move_entries(
+    src_paths,
+    dest_dir,
+    max_workers=DEFAULT_MAX_WORKERS,
+    range_size=RANGE_SIZE,
+    hash_name=None,
+    keep_source=False,
+    permissions=None,
+    subdirs=None,
+):
+    """Move files and directory trees into dest_dir,
+    resuming any interrupted transfer into dest_dir first.
+
+    Entries that are on the same file system as dest_dir are renamed.
+    The files in the other entries are copied concurrently,
+    and their sources are deleted when they have been copied.
+
+    When keep_source is true the entries are left in place,
+    and their files are cloned,
+    hard-linked,
+    or copied into dest_dir,
+    in that order of preference.
+
+    If any copy fails the first exception is re-raised after all of the
+    other copies have finished;
+    the sources of the files that were not copied are left in place,
+    and their partial copies are kept so that the transfer can be resumed.
+
+    :param src_paths: Paths of files and directories to move.
+    :type src_paths: sequence of :py:class:`pathlib.Path`
+
+    :param dest_dir: Directory to move the entries into.
+    :type dest_dir: :py:class:`pathlib.Path`
+
+    :param int max_workers: Maximum number of threads to copy files with.
+
+    :param int range_size: Size in bytes of the byte ranges that large files
+                           are split into so that they can be copied
+                           concurrently.
+
+    :param str hash_name: Name of the :py:mod:`hashlib` algorithm to hash the
+                          moved files with;
+                          :py:obj:`None` means don't hash them.
+
+    :param boolean keep_source: Keep the source entries.
+
+    :param permissions: Permission bits and group to apply to the moved
+                        files and directories as they are placed in
+                        dest_dir;
+                        :py:obj:`None` means leave them unchanged.
+    :type permissions: :py:class:`nemo_cmd.transfer.Permissions`
+
+    :param dict subdirs: Relative paths of the sub-directories of dest_dir
+                         to move entries into,
+                         keyed by their source paths;
+                         the sub-directories are created if they don't
+                         exist.
+                         Entries that are not in subdirs are moved into
+                         dest_dir.
+
+    :returns: Number of bytes copied between file systems,
+              and hexadecimal digests of the moved files keyed by their
+              destination paths.
+    :rtype: 2-tuple of (int, dict)
+    """
+    journal = Journal(Path(dest_dir) / JOURNAL)
+    # Partial copies can't be resumed when they are hashed because the
+    # hash of the data that was already copied has been lost
+    resumable = journal.recover(keep_source, resume=hash_name is None)
+    copies = []
+    src_dirs = []
+    # Files that were placed in dest_dir without their data being read
+    placed = []
+    subdirs = subdirs or {}
+    for src in src_paths:
+        dest = Path(dest_dir) / src.name
+        if src in subdirs:
+            make_subdirs(Path(dest_dir), subdirs[src], permissions)
+            dest = Path(dest_dir) / subdirs[src] / src.name
+        if not os.path.lexists(fspath(src)) and os.path.lexists(fspath(dest)):
+            # Transfer was finished by the journal recovery
+            placed.append(dest)
+            continue
+        if not keep_source:
+            try:
+                os.rename(fspath(src), fspath(dest))
+                if permissions is not None:
+                    permissions.apply_tree(dest)
+                placed.append(dest)
+                continue
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        if src.is_dir() and not src.is_symlink():
+            _plan_tree_copy(src, dest, copies, src_dirs, keep_source)
+        else:
+            copies.append(FileCopy(src, dest, src.lstat().st_size))
+    if keep_source:
+        methods = {"clone": 0, "link": 0}
+        uncloned = []
+        for copy in copies:
+            copy.keep_source = True
+            copy.permissions = permissions
+            method = copy.clone_or_link()
+            if method is None:
+                uncloned.append(copy)
+            else:
+                methods[method] += 1
+                placed.append(copy.dest)
+        logger.info(
+            f"Kept sources: {methods['clone']} files cloned, "
+            f"{methods['link']} hard-linked, {len(uncloned)} copied"
+        )
+        copies = uncloned
+    for copy in copies:
+        copy.src_mtime_ns = copy.src.stat().st_mtime_ns
+        copy.journal = journal
+        copy.permissions = permissions
+        copy.done_range_size, copy.done_offsets = resumable.get(
+            copy.dest, (None, set())
+        )
+        if hash_name is not None:
+            copy.hasher = hashlib.new(hash_name)
+    copy_files(copies, max_workers, range_size)
+    # Directory permissions and times are copied after their contents
+    # so that the times are not changed by the copies
+    for src_dir, dest_subdir in reversed(src_dirs):
+        shutil.copystat(fspath(src_dir), fspath(dest_subdir))
+        if permissions is not None:
+            permissions.apply(dest_subdir)
+        if not keep_source:
+            os.rmdir(fspath(src_dir))
+    digests = {}
+    if hash_name is not None:
+        digests = {copy.dest: copy.hasher.hexdigest() for copy in copies}
+        placed_files = [fp for path in placed for fp in walk_files(path)]
+        digests.update(hash_files(placed_files, hash_name, max_workers))
+    journal.remove()
+    return sum(copy.size for copy in copies), digests
+
+
+def make_subdirs(dest_dir, subdir, permissions=None):
+    """Create subdir in dest_dir,
+    applying permissions to the directories that are created.
+
+    :param dest_dir: Directory to create subdir in.
+    :type dest_dir: :py:class:`pathlib.Path`
+
+    :param subdir: Relative path of the sub-directory to create.
+    :type subdir: :py:class:`pathlib.Path`
+
+    :param permissions: Permission bits and group to apply to the created
+                        directories;
+                        :py:obj:`None` means leave them unchanged.
+    :type permissions: :py:class:`nemo_cmd.transfer.Permissions`
+    """
+    path = dest_dir
+    for part in Path(subdir).parts:
+        path = path / part
+        try:
+            path.mkdir()
+        except FileExistsError:
+            continue
+        if permissions is not None:
+            permissions.apply(path)
+
+
+def _plan_tree_copy(src, dest, copies, src_dirs, keep_source=False):
+    """Create the directories of the tree at src under dest,
+    re-create its symbolic links,
+    and append its files to the copies list.
+    """
+    for dirpath, dirnames, filenames in os.walk(fspath(src)):
+        src_dir = Path(dirpath)
+        dest_subdir = dest / src_dir.relative_to(src)
+        dest_subdir.mkdir(exist_ok=True)
+        src_dirs.append((src_dir, dest_subdir))
+        for name in dirnames + filenames:
+            src_path = src_dir / name
+            if src_path.is_symlink():
+                _make_symlink(dest_subdir / name, os.readlink(fspath(src_path)))
+                if not keep_source:
+                    src_path.unlink()
+            elif name in filenames:
+                copies.append(
+                    FileCopy(src_path, dest_subdir / name, src_path.stat().st_size)
+                )
+        # Symbolic links to directories have been re-created, not walked into
+        dirnames[:] = [
+            name for name in dirnames if not (dest_subdir / name).is_symlink()
+        ]
+
+
+def _make_symlink(link, target):
+    """Create a symbolic link to target,
+    replacing a link to another target that a resumed transfer finds.
+    """
+    if link.is_symlink():
+        if os.readlink(fspath(link)) == target:
+            return
+        link.unlink()
+    link.symlink_to(target)
+
+
+def copy_files(copies, max_workers=DEFAULT_MAX_WORKERS, range_size=RANGE_SIZE):
+    """Copy files concurrently in a pool of threads,
+    splitting files that are larger than range_size into byte ranges that
+    are copied concurrently.
+
+    The largest files are started first so that they don't finish last.
+    Each file's source is deleted when all of its byte ranges have been
+    copied.
+
+    Copies that have a journal record their progress in it,
+    and skip the byte ranges in their :py:attr:`done_offsets` if they are
+    copied in ranges of their :py:attr:`done_range_size`;
+    otherwise they are restarted.
+    Their partial copies are kept if the copy fails,
+    so that it can be resumed;
+    the partial copies of other files are deleted.
+
+    :param copies: Files to copy.
+    :type copies: sequence of :py:class:`nemo_cmd.transfer.FileCopy`
+
+    :param int max_workers: Maximum number of threads to copy files with.
+
+    :param int range_size: Size in bytes of the byte ranges that large files
+                           are split into.
+
+    :raises: The first exception raised by any of the copies.
+    """
+    if not copies:
+        return
+    copies = sorted(copies, key=lambda copy: copy.size, reverse=True)
+    ranges = []
+    finished = []
+    for copy in copies:
+        # Hashes have to be calculated in order,
+        # so files that are hashed are copied in a single range
+        file_range_size = max(copy.size, 1) if copy.hasher else range_size
+        if (
+            copy.done_offsets
+            and copy.done_range_size == file_range_size
+            and copy.tmp_path.exists()
+        ):
+            offsets = [
+                offset
+                for offset in range(0, max(copy.size, 1), file_range_size)
+                if offset not in copy.done_offsets
+            ]
+        else:
+            with open(fspath(copy.tmp_path), "wb") as f:
+                f.truncate(copy.size)
+            copy._record("started", file_range_size)
+            offsets = range(0, max(copy.size, 1), file_range_size)
+        copy.ranges_left = len(offsets)
+        if not offsets:
+            finished.append(copy)
+        ranges.extend(
+            (copy, offset, min(file_range_size, copy.size - offset))
+            for offset in offsets
+        )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(copy.finish) for copy in finished]
+        futures.extend(executor.submit(_copy_range, *args) for args in ranges)
+    errors = [future.exception() for future in futures if future.exception()]
+    if errors:
+        for copy in copies:
+            if copy.journal is None and copy.tmp_path.exists():
+                copy.tmp_path.unlink()
+        raise errors[0]
+
+
+def _clone(src, dest):
+    with open(fspath(src), "rb") as src_file:
+        with open(fspath(dest), "wb") as dest_file:
+            fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+
+
+def _copy_range(copy, offset, count):
+    src_fd = os.open(fspath(copy.src), os.O_RDONLY)
+    try:
+        dest_fd = os.open(fspath(copy.tmp_path), os.O_WRONLY)
+        try:
+            _copy_bytes(src_fd, dest_fd, offset, count, copy.hasher)
+            if copy.journal is not None:
+                # The range must be on disk before it is journaled as copied
+                os.fdatasync(dest_fd)
+                copy._record("range", offset)
+        finally:
+            os.close(dest_fd)
+    finally:
+        os.close(src_fd)
+    with copy.lock:
+        copy.ranges_left -= 1
+        finished = copy.ranges_left == 0
+    if finished:
+        copy.finish()
+
+
+def _copy_bytes(src_fd, dest_fd, offset, count, hasher=None):
+    """Copy count bytes at offset from src_fd to the same offset in dest_fd,
+    using the first copy method that works.
+
+    The data has to pass through user space to be hashed,
+    so only :py:func:`os.pread`/:py:func:`os.pwrite` are used when hasher
+    is given.
+    """
+    methods = []
+    if hasher is None:
+        methods = [
+            method
+            for name, method in (
+                ("copy_file_range", _copy_file_range),
+                ("sendfile", _sendfile),
+            )
+            if hasattr(os, name)
+        ]
+    methods.append(functools.partial(_pread_pwrite, hasher=hasher))
+    end = offset + count
+    while offset < end:
+        try:
+            copied = methods[0](src_fd, dest_fd, offset, min(CHUNK_SIZE, end - offset))
+        except OSError as e:
+            if len(methods) == 1 or e.errno not in _FALLBACK_ERRNOS:
+                raise
+            methods.pop(0)
+            continue
+        if copied == 0:
+            raise OSError(errno.EIO, f"unexpected end of file at byte {offset}")
+        offset += copied
+
+
+def _copy_file_range(src_fd, dest_fd, offset, count):
+    return os.copy_file_range(src_fd, dest_fd, count, offset, offset)
+
+
+def _sendfile(src_fd, dest_fd, offset, count):
+    os.lseek(dest_fd, offset, os.SEEK_SET)
+    return os.sendfile(dest_fd, src_fd, offset, count)
+
+
+def _pread_pwrite(src_fd, dest_fd, offset, count, hasher=None):
+    data = os.pread(src_fd, min(count, BUFFER_SIZE), offset)
+    if hasher is not None:
+        hasher.update(data)
+    written = 0
+    while written < len(data):
+        written += os.pwrite(dest_fd, data[written:], offset + written)
+    return written
+
+
+def walk_files(path):
+    """Return the paths of the files in the tree at path,
+    or path itself if it is a file.
+
+    Symbolic links are not included.
+
+    :param path: File or directory path.
+    :type path: :py:class:`pathlib.Path`
+
+    :rtype: list of :py:class:`pathlib.Path`
+    """
+    if path.is_symlink():
+        return []
+    if not path.is_dir():
+        return [path]
+    return [
+        Path(dirpath, name)
+        for dirpath, _, filenames in os.walk(fspath(path))
+        for name in filenames
+        if not os.path.islink(os.path.join(dirpath, name))
+    ]
+
+
+def hash_files(paths, hash_name, max_workers=DEFAULT_MAX_WORKERS):
+    """Hash files by reading them concurrently in a pool of threads.
+
+    :param paths: Paths of files to hash.
+    :type paths: sequence of :py:class:`pathlib.Path`
+
+    :param str hash_name: Name of the :py:mod:`hashlib` algorithm to use.
+
+    :param int max_workers: Maximum number of threads to read files with.
+
+    :returns: Hexadecimal digests keyed by path.
+    :rtype: dict
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        digests = executor.map(
+            functools.partial(_hash_file, hash_name=hash_name), paths
+        )
+        return dict(zip(paths, digests))
+
+
+def _hash_file(path, hash_name):
+    hasher = hashlib.new(hash_name)
+    buf = bytearray(BUFFER_SIZE)
+    view = memoryview(buf)
+    with open(fspath(path), "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
@@ -152,6 +152,24 @@ class TestRunSubcommand(object):
         assert m_log.called
 
 
+class TestRunInSubprocess:
+    """Unit test for run_in_subprocess() function."""
+
+    @patch("nemo_cmd.api.subprocess.check_output", return_value="", autospec=True)
+    def test_work_dir(self, m_sco, tmp_path):
+        nemo_cmd.api.run_in_subprocess(
+            "foo", {"run_id": "foo"}, "results/", work_dir=tmp_path
+        )
+        assert m_sco.call_args.kwargs["cwd"] == str(tmp_path)
+        assert m_sco.call_args.args[0] == [
+            "salishsea",
+            "run",
+            "foo_subprocess_run.yaml",
+            "results/",
+        ]
+        assert list(tmp_path.iterdir()) == []
+
+
 class TestPbsCommon:
     """Unit tests for `salishsea run` pbs_common() function."""
 
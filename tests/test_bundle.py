@@ -0,0 +1,123 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""NEMO-Cmd small file bundle unit tests"""
+
+import tarfile
+
+import pytest
+
+from nemo_cmd import bundle
+
+
+@pytest.fixture
+def small_files(tmp_path):
+    src = tmp_path / "run_dir"
+    src.mkdir()
+    (src / "namelist_cfg").write_text("&namrun\n/\n")
+    (src / "layout.dat").write_bytes(b"")
+    (src / "NEMO-code_rev.txt").write_text("changeset: 1234\n")
+    return sorted(src.iterdir())
+
+
+class TestWriteBundle:
+    """Unit tests for write_bundle function."""
+
+    def test_write_bundle(self, small_files, tmp_path):
+        bundle_path = tmp_path / "small_files.tar"
+        index = bundle.write_bundle(small_files, bundle_path)
+        assert sorted(index) == ["NEMO-code_rev.txt", "layout.dat", "namelist_cfg"]
+        assert index["namelist_cfg"]["size"] == 10
+        assert bundle.index_path(bundle_path).exists()
+        with tarfile.open(bundle_path) as tar:
+            assert tar.extractfile("namelist_cfg").read() == b"&namrun\n/\n"
+
+    def test_append_to_bundle(self, small_files, tmp_path):
+        bundle_path = tmp_path / "small_files.tar"
+        bundle.write_bundle(small_files[:1], bundle_path)
+        small_files[-1].write_text("&namrun\nnn_it000 = 1\n/\n")
+        bundle.write_bundle(small_files[1:], bundle_path)
+        assert bundle.list_members(bundle_path) == [
+            "NEMO-code_rev.txt",
+            "layout.dat",
+            "namelist_cfg",
+        ]
+        assert bundle.read_member(bundle_path, "NEMO-code_rev.txt") == (
+            b"changeset: 1234\n"
+        )
+        assert bundle.read_member(bundle_path, "namelist_cfg") == (
+            b"&namrun\nnn_it000 = 1\n/\n"
+        )
+
+    def test_interrupted_before_index_written(self, small_files, tmp_path):
+        bundle_path = tmp_path / "small_files.tar"
+        bundle.write_bundle(small_files[:1], bundle_path)
+        bundle.index_path(bundle_path).unlink()
+        index = bundle.write_bundle(small_files[1:], bundle_path)
+        assert sorted(index) == ["NEMO-code_rev.txt", "layout.dat", "namelist_cfg"]
+        assert bundle.read_member(bundle_path, "NEMO-code_rev.txt") == (
+            b"changeset: 1234\n"
+        )
+        assert bundle.read_member(bundle_path, "namelist_cfg") == b"&namrun\n/\n"
+
+    def test_interrupted_while_writing_member(self, small_files, tmp_path):
+        bundle_path = tmp_path / "small_files.tar"
+        bundle.write_bundle(small_files[:1], bundle_path)
+        # Truncated archive copy of an interrupted write
+        tmp_path_ = tmp_path / ".small_files.tar.tmp"
+        tmp_path_.write_bytes(bundle_path.read_bytes()[:-1500])
+        bundle.write_bundle(small_files[1:], bundle_path)
+        assert bundle.list_members(bundle_path) == [
+            "NEMO-code_rev.txt",
+            "layout.dat",
+            "namelist_cfg",
+        ]
+        assert bundle.read_member(bundle_path, "namelist_cfg") == b"&namrun\n/\n"
+        assert not tmp_path_.exists()
+        with tarfile.open(bundle_path) as tar:
+            assert sorted(tar.getnames()) == [
+                "NEMO-code_rev.txt",
+                "layout.dat",
+                "namelist_cfg",
+            ]
+
+
+class TestReadIndex:
+    """Unit tests for read_index function."""
+
+    def test_missing_index_rebuilt(self, small_files, tmp_path):
+        bundle_path = tmp_path / "small_files.tar"
+        index = bundle.write_bundle(small_files, bundle_path)
+        bundle.index_path(bundle_path).unlink()
+        assert bundle.read_index(bundle_path) == index
+
+
+class TestReadMember:
+    """Unit tests for read_member function."""
+
+    def test_read_member(self, small_files, tmp_path):
+        bundle_path = tmp_path / "small_files.tar"
+        bundle.write_bundle(small_files, bundle_path)
+        assert bundle.read_member(bundle_path, "layout.dat") == b""
+        assert bundle.read_member(bundle_path, "namelist_cfg") == b"&namrun\n/\n"
+
+    def test_missing_member(self, small_files, tmp_path):
+        bundle_path = tmp_path / "small_files.tar"
+        bundle.write_bundle(small_files, bundle_path)
+        with pytest.raises(KeyError):
+            bundle.read_member(bundle_path, "ocean.output")
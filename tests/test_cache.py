@@ -0,0 +1,61 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""NEMO-Cmd per-user cache unit tests"""
+
+from pathlib import Path
+
+from nemo_cmd import cache
+
+
+class TestCacheDir:
+    """Unit tests for cache_dir function."""
+
+    def test_xdg_cache_home(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        assert cache.cache_dir() == tmp_path / "nemo_cmd"
+
+    def test_default(self, monkeypatch):
+        monkeypatch.delenv("XDG_CACHE_HOME", raising=False)
+        assert cache.cache_dir() == Path.home() / ".cache" / "nemo_cmd"
+
+
+class TestReadWriteYAML:
+    """Unit tests for read_yaml and write_yaml functions."""
+
+    def test_missing_file(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        assert cache.read_yaml("foo.yaml", default={}) == {}
+
+    def test_round_trip(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        cache.write_yaml("foo.yaml", {"bar": [1.5, 2.5]})
+        assert cache.read_yaml("foo.yaml") == {"bar": [1.5, 2.5]}
+        assert [p.name for p in (tmp_path / "nemo_cmd").iterdir()] == ["foo.yaml"]
+
+    def test_unreadable_file(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        (tmp_path / "nemo_cmd").mkdir()
+        (tmp_path / "nemo_cmd" / "foo.yaml").write_text("{bar: [")
+        assert cache.read_yaml("foo.yaml", default={}) == {}
+
+    def test_unwritable_cache_dir(self, tmp_path, monkeypatch):
+        (tmp_path / "cache").write_text("not a directory")
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        cache.write_yaml("foo.yaml", {"bar": 1})
+        assert cache.read_yaml("foo.yaml") is None
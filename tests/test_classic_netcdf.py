@@ -0,0 +1,257 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""NEMO-Cmd memory-mapped classic netCDF combining unit tests"""
+
+import struct
+
+import pytest
+
+from nemo_cmd import classic_netcdf
+from nemo_cmd.classic_netcdf import Header, Variable
+
+
+def _int_attr(name, values):
+    return name, 4, len(values), struct.pack(f">{len(values)}i", *values)
+
+
+def _make_tile(
+    path,
+    first,
+    nx,
+    ny,
+    sn_values,
+    halo_start=(0, 0),
+    halo_end=(0, 0),
+    n_domains=2,
+    global_size=(4, 2),
+    omit_attrs=(),
+):
+    """Write a per-processor file with a decomposed record variable (sn),
+    a non-decomposed variable (nav_lev),
+    and a decomposed variable with a _FillValue (mask).
+    """
+    gatts = [
+        ("file_name", 2, 3, b"foo"),
+        _int_attr("DOMAIN_number_total", [n_domains]),
+        _int_attr("DOMAIN_dimensions_ids", [1, 2]),
+        _int_attr("DOMAIN_size_global", global_size),
+        _int_attr("DOMAIN_position_first", first),
+        _int_attr("DOMAIN_halo_size_start", halo_start),
+        _int_attr("DOMAIN_halo_size_end", halo_end),
+    ]
+    gatts = [att for att in gatts if att[0] not in omit_attrs]
+    dims = [("x", nx), ("y", ny), ("z", 2), ("time_counter", 0)]
+    variables = [
+        Variable("nav_lev", [2], [], 6),
+        Variable("mask", [1, 0], [("_FillValue", 3, 1, struct.pack(">h", -1))], 3),
+        Variable("sn", [3, 1, 0], [("units", 2, 4, b"g/kg")], 5),
+    ]
+    header = Header(2, 1, dims, gatts, variables)
+    header_bytes, file_size = classic_netcdf.write_header(header)
+    buf = bytearray(file_size)
+    buf[: len(header_bytes)] = header_bytes
+    nav_lev, mask, sn = header.variables
+    struct.pack_into(">2d", buf, nav_lev.begin, 0.5, 1.5)
+    struct.pack_into(f">{nx * ny}h", buf, mask.begin, *([1] * nx * ny))
+    struct.pack_into(f">{nx * ny}f", buf, sn.begin, *sn_values)
+    path.write_bytes(bytes(buf))
+    return path
+
+
+def _read_var(path, name):
+    buf = path.read_bytes()
+    header = classic_netcdf.read_header(buf)
+    var = next(var for var in header.variables if var.name == name)
+    fmt = classic_netcdf.TYPE_FORMATS[var.nc_type]
+    count = header.slab_size(var) // classic_netcdf.TYPE_SIZES[var.nc_type]
+    return header, list(struct.unpack_from(f">{count}{fmt}", buf, var.begin))
+
+
+class TestIsClassicFormat:
+    """Unit tests for is_classic_format function."""
+
+    @pytest.mark.parametrize("magic", [b"CDF\x01", b"CDF\x02"])
+    def test_classic_format(self, magic, tmp_path):
+        path = tmp_path / "foo_0000.nc"
+        path.write_bytes(magic + b"\x00" * 4)
+        assert classic_netcdf.is_classic_format(path)
+
+    def test_netcdf4_format(self, tmp_path):
+        path = tmp_path / "foo_0000.nc"
+        path.write_bytes(b"\x89HDF\r\n\x1a\n")
+        assert not classic_netcdf.is_classic_format(path)
+
+    def test_missing_file(self, tmp_path):
+        assert not classic_netcdf.is_classic_format(tmp_path / "foo_0000.nc")
+
+
+class TestReadHeader:
+    """Unit tests for read_header function."""
+
+    def test_not_classic_format(self):
+        with pytest.raises(ValueError):
+            classic_netcdf.read_header(b"\x89HDF\r\n\x1a\n")
+
+    def test_classic_format_header(self):
+        buf = (
+            b"CDF\x01"
+            + struct.pack(">I", 0)
+            + struct.pack(">II", 0x0A, 1)
+            + struct.pack(">I", 1)
+            + b"x\x00\x00\x00"
+            + struct.pack(">I", 3)
+            + struct.pack(">II", 0, 0)
+            + struct.pack(">II", 0x0B, 1)
+            + struct.pack(">I", 3)
+            + b"lon\x00"
+            + struct.pack(">II", 1, 0)
+            + struct.pack(">II", 0, 0)
+            + struct.pack(">III", 5, 12, 80)
+        )
+        header = classic_netcdf.read_header(buf)
+        assert header.version == 1
+        assert header.dims == [("x", 3)]
+        assert header.variables == [Variable("lon", [0], [], 5, 80)]
+
+    def test_round_trip(self, tmp_path):
+        tile = _make_tile(tmp_path / "foo_0000.nc", (1, 1), 2, 2, [1, 2, 3, 4])
+        header = classic_netcdf.read_header(tile.read_bytes())
+        assert header.numrecs == 1
+        assert header.dims == [("x", 2), ("y", 2), ("z", 2), ("time_counter", 0)]
+        assert header.global_attr("DOMAIN_size_global") == [4, 2]
+        assert header.global_attr("file_name") == "foo"
+        assert header.global_attr("missing") is None
+        assert [var.name for var in header.variables] == ["nav_lev", "mask", "sn"]
+
+
+class TestCombineTiles:
+    """Unit tests for combine_tiles function."""
+
+    def test_combine_tiles(self, tmp_path):
+        tiles = [
+            _make_tile(tmp_path / "foo_0000.nc", (1, 1), 2, 2, [1, 2, 5, 6]),
+            _make_tile(tmp_path / "foo_0001.nc", (3, 1), 2, 2, [3, 4, 7, 8]),
+        ]
+        classic_netcdf.combine_tiles(tiles, tmp_path / "foo.nc")
+        header, sn = _read_var(tmp_path / "foo.nc", "sn")
+        assert sn == [1, 2, 3, 4, 5, 6, 7, 8]
+        assert header.dims == [("x", 4), ("y", 2), ("z", 2), ("time_counter", 0)]
+        assert header.global_attr("file_name") == "foo"
+        assert header.global_attr("DOMAIN_size_global") is None
+        _, nav_lev = _read_var(tmp_path / "foo.nc", "nav_lev")
+        assert nav_lev == [0.5, 1.5]
+        assert not (tmp_path / ".foo.nc.tmp").exists()
+
+    def test_halos_excluded(self, tmp_path):
+        tiles = [
+            _make_tile(
+                tmp_path / "foo_0000.nc",
+                (1, 1),
+                3,
+                2,
+                [1, 2, -9, 5, 6, -9],
+                halo_end=(1, 0),
+            ),
+            _make_tile(
+                tmp_path / "foo_0001.nc",
+                (2, 1),
+                3,
+                2,
+                [-9, 3, 4, -9, 7, 8],
+                halo_start=(1, 0),
+            ),
+        ]
+        classic_netcdf.combine_tiles(tiles, tmp_path / "foo.nc")
+        _, sn = _read_var(tmp_path / "foo.nc", "sn")
+        assert sn == [1, 2, 3, 4, 5, 6, 7, 8]
+
+    def test_eliminated_land_processor_filled(self, tmp_path):
+        tiles = [
+            _make_tile(
+                tmp_path / "foo_0000.nc", (1, 1), 2, 2, [1, 2, 5, 6], n_domains=1
+            ),
+        ]
+        classic_netcdf.combine_tiles(tiles, tmp_path / "foo.nc")
+        _, mask = _read_var(tmp_path / "foo.nc", "mask")
+        assert mask == [1, 1, -1, -1, 1, 1, -1, -1]
+        _, sn = _read_var(tmp_path / "foo.nc", "sn")
+        assert sn == [1, 2, 0, 0, 5, 6, 0, 0]
+
+    def test_include_vars(self, tmp_path):
+        tiles = [
+            _make_tile(tmp_path / "foo_0000.nc", (1, 1), 2, 2, [1, 2, 5, 6]),
+            _make_tile(tmp_path / "foo_0001.nc", (3, 1), 2, 2, [3, 4, 7, 8]),
+        ]
+        classic_netcdf.combine_tiles(tiles, tmp_path / "foo.nc", include=["sn"])
+        header, sn = _read_var(tmp_path / "foo.nc", "sn")
+        assert [var.name for var in header.variables] == ["sn"]
+        assert sn == [1, 2, 3, 4, 5, 6, 7, 8]
+
+    def test_exclude_vars(self, tmp_path):
+        tiles = [
+            _make_tile(tmp_path / "foo_0000.nc", (1, 1), 2, 2, [1, 2, 5, 6]),
+            _make_tile(tmp_path / "foo_0001.nc", (3, 1), 2, 2, [3, 4, 7, 8]),
+        ]
+        classic_netcdf.combine_tiles(tiles, tmp_path / "foo.nc", exclude=["mask"])
+        header = classic_netcdf.read_header((tmp_path / "foo.nc").read_bytes())
+        assert [var.name for var in header.variables] == ["nav_lev", "sn"]
+
+    @pytest.mark.parametrize("include, exclude", [(None, ()), (["sn"], ())])
+    def test_combined_file_size(self, include, exclude, tmp_path):
+        tiles = [
+            _make_tile(tmp_path / "foo_0000.nc", (1, 1), 2, 2, [1, 2, 5, 6]),
+            _make_tile(tmp_path / "foo_0001.nc", (3, 1), 2, 2, [3, 4, 7, 8]),
+        ]
+        file_size = classic_netcdf.combined_file_size(tiles, include, exclude)
+        classic_netcdf.combine_tiles(tiles, tmp_path / "foo.nc", include, exclude)
+        assert file_size == (tmp_path / "foo.nc").stat().st_size
+
+    @pytest.mark.parametrize(
+        "attr_name",
+        ["DOMAIN_dimensions_ids", "DOMAIN_size_global", "DOMAIN_position_first"],
+    )
+    def test_missing_domain_attr(self, attr_name, tmp_path):
+        tiles = [
+            _make_tile(
+                tmp_path / "foo_0000.nc",
+                (1, 1),
+                2,
+                2,
+                [1, 2, 5, 6],
+                omit_attrs=(attr_name,),
+            ),
+            _make_tile(
+                tmp_path / "foo_0001.nc",
+                (3, 1),
+                2,
+                2,
+                [3, 4, 7, 8],
+                omit_attrs=(attr_name,),
+            ),
+        ]
+        with pytest.raises(ValueError, match=attr_name):
+            classic_netcdf.combine_tiles(tiles, tmp_path / "foo.nc")
+        assert not (tmp_path / "foo.nc").exists()
+        assert not (tmp_path / ".foo.nc.tmp").exists()
+
+    def test_missing_tile(self, tmp_path):
+        tiles = [_make_tile(tmp_path / "foo_0000.nc", (1, 1), 2, 2, [1, 2, 5, 6])]
+        with pytest.raises(ValueError):
+            classic_netcdf.combine_tiles(tiles, tmp_path / "foo.nc")
+        assert not (tmp_path / "foo.nc").exists()
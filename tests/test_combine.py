@@ -18,15 +18,17 @@
 
 """NEMO-Cmd combine sub-command plug-in unit tests"""
 
+import os
 from pathlib import Path
 import shlex
 import subprocess
 from types import SimpleNamespace
-from unittest.mock import call, Mock, patch
+from unittest.mock import ANY, call, Mock, patch
 
 import cliff.app
 import pytest
 
+import nemo_cmd.cache
 import nemo_cmd.combine
 
 
@@ -37,6 +39,16 @@ def combine_cmd():
     return nemo_cmd.combine.Combine(Mock(spec=cliff.app.App), [])
 
 
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    """Keep the throughput history that combine records out of the user's
+    cache directory.
+    """
+    cache_home = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    return cache_home
+
+
 class TestParser:
     """Unit tests for `nemo combine` sub-command command-line parser."""
 
@@ -48,6 +60,59 @@ class TestParser:
         parser = combine_cmd.get_parser("nemo combine")
         parsed_args = parser.parse_args(["nemo.yaml"])
         assert parsed_args.run_desc_file == Path("nemo.yaml")
+        assert parsed_args.jobs is None
+        assert parsed_args.threads is None
+        assert parsed_args.output_dir is None
+        assert parsed_args.include_vars == []
+        assert parsed_args.exclude_vars == []
+        assert not parsed_args.plan
+
+    def test_parsed_args_plan(self, combine_cmd):
+        parser = combine_cmd.get_parser("nemo combine")
+        parsed_args = parser.parse_args(["nemo.yaml", "--plan", "-j", "2"])
+        assert parsed_args.plan
+        assert parsed_args.jobs == 2
+
+    def test_parsed_args_var_selections(self, combine_cmd):
+        parser = combine_cmd.get_parser("nemo combine")
+        parsed_args = parser.parse_args(
+            [
+                "nemo.yaml",
+                "--include-vars",
+                "*_grid_T=votemper,vosaline",
+                "--include-vars",
+                "*_grid_U=vozocrtx",
+                "--exclude-vars",
+                "*_restart=e3t_b",
+            ]
+        )
+        assert parsed_args.include_vars == [
+            ("*_grid_T", ["votemper", "vosaline"]),
+            ("*_grid_U", ["vozocrtx"]),
+        ]
+        assert parsed_args.exclude_vars == [("*_restart", ["e3t_b"])]
+
+    @pytest.mark.parametrize("value", ["*_grid_T", "=votemper", "*_grid_T="])
+    def test_bad_var_selection(self, value, combine_cmd):
+        parser = combine_cmd.get_parser("nemo combine")
+        with pytest.raises(SystemExit):
+            parser.parse_args(["nemo.yaml", "--include-vars", value])
+
+    @pytest.mark.parametrize("option", ["--jobs", "--threads"])
+    @pytest.mark.parametrize("value", ["0", "-1", "two"])
+    def test_non_positive_int(self, option, value, combine_cmd):
+        parser = combine_cmd.get_parser("nemo combine")
+        with pytest.raises(SystemExit):
+            parser.parse_args(["nemo.yaml", option, value])
+
+    def test_parsed_args_options(self, combine_cmd):
+        parser = combine_cmd.get_parser("nemo combine")
+        parsed_args = parser.parse_args(
+            ["nemo.yaml", "-j4", "--threads", "8", "--output-dir", "results/"]
+        )
+        assert parsed_args.jobs == 4
+        assert parsed_args.threads == 8
+        assert parsed_args.output_dir == Path("results/")
 
 
 class TestTakeAction:
@@ -55,9 +120,160 @@ class TestTakeAction:
 
     @patch("nemo_cmd.combine.combine", autospec=True)
     def test_take_action(self, m_combine, combine_cmd):
-        parsed_args = SimpleNamespace(run_desc_file=Path("nemo.yaml"))
+        parsed_args = SimpleNamespace(
+            run_desc_file=Path("nemo.yaml"),
+            jobs=None,
+            threads=None,
+            output_dir=None,
+            include_vars=[("*_grid_T", ["votemper"])],
+            exclude_vars=[],
+            plan=False,
+        )
+        combine_cmd.take_action(parsed_args)
+        m_combine.assert_called_once_with(
+            Path("nemo.yaml"),
+            max_concurrent_jobs=None,
+            n_threads=None,
+            output_dir=None,
+            include_vars={"*_grid_T": ["votemper"]},
+            exclude_vars={},
+        )
+
+    @patch("nemo_cmd.combine.combine", autospec=True)
+    @patch("nemo_cmd.combine.plan", autospec=True)
+    def test_take_action_plan(self, m_plan, m_combine, combine_cmd):
+        parsed_args = SimpleNamespace(
+            run_desc_file=Path("nemo.yaml"),
+            jobs=2,
+            threads=None,
+            output_dir=None,
+            include_vars=[],
+            exclude_vars=[],
+            plan=True,
+        )
         combine_cmd.take_action(parsed_args)
-        m_combine.assert_called_once_with(Path("nemo.yaml"))
+        m_plan.assert_called_once_with(
+            Path("nemo.yaml"),
+            max_concurrent_jobs=2,
+            n_threads=None,
+            include_vars={},
+            exclude_vars={},
+        )
+        assert not m_combine.called
+
+
+@patch("nemo_cmd.combine.logger", autospec=True)
+class TestPlan:
+    """Unit tests for plan function."""
+
+    @patch("nemo_cmd.combine.multiprocessing.cpu_count", return_value=8)
+    @patch("nemo_cmd.combine.classic_netcdf.combined_file_size", autospec=True)
+    @patch("nemo_cmd.combine._is_classic_file_set", autospec=True)
+    @patch("nemo_cmd.combine._get_file_set_sizes", autospec=True)
+    @patch("nemo_cmd.combine._get_results_files", autospec=True)
+    def test_plan(
+        self,
+        m_get_results_files,
+        m_sizes,
+        m_is_classic,
+        m_combined_file_size,
+        m_cpu_count,
+        m_logger,
+        tmp_path,
+    ):
+        run_desc_file = tmp_path / "nemo.yaml"
+        run_desc_file.write_text("paths: {}\n")
+        m_get_results_files.return_value = ["grid_T", "restart", "grid_U", "mesh"]
+        m_sizes.return_value = {
+            "grid_T": (4, 400),
+            "restart": (4, 800),
+            "grid_U": (4, 200),
+            "mesh": (1, 50),
+        }
+        m_is_classic.side_effect = lambda fn, work_dir: fn == "restart"
+        m_combined_file_size.return_value = 700
+        nemo_cmd.cache.write_yaml(
+            nemo_cmd.combine.THROUGHPUT_HISTORY,
+            {"rebuild_nemo": [10.0, 25.0, 30.0], "mmap": [100.0]},
+        )
+        plans, wall_time = nemo_cmd.combine.plan(run_desc_file, n_threads=2)
+        assert plans == [
+            nemo_cmd.combine.FileSetPlan("grid_T", 4, 400, "rebuild_nemo", 400, 8),
+            nemo_cmd.combine.FileSetPlan("grid_U", 4, 200, "rebuild_nemo", 200, 4),
+            nemo_cmd.combine.FileSetPlan("mesh", 1, 50, "rename", 50, 0),
+            nemo_cmd.combine.FileSetPlan("restart", 4, 800, "mmap", 700, 8),
+        ]
+        assert wall_time == 8
+
+    @patch("nemo_cmd.combine.multiprocessing.cpu_count", return_value=8)
+    @patch("nemo_cmd.combine._is_classic_file_set", return_value=False)
+    @patch("nemo_cmd.combine._get_file_set_sizes", autospec=True)
+    @patch("nemo_cmd.combine._get_results_files", autospec=True)
+    def test_plan_no_history(
+        self,
+        m_get_results_files,
+        m_sizes,
+        m_is_classic,
+        m_cpu_count,
+        m_logger,
+        tmp_path,
+    ):
+        run_desc_file = tmp_path / "nemo.yaml"
+        run_desc_file.write_text("paths: {}\n")
+        m_get_results_files.return_value = ["grid_T"]
+        m_sizes.return_value = {"grid_T": (4, 400)}
+        plans, wall_time = nemo_cmd.combine.plan(run_desc_file)
+        assert plans[0].seconds is None
+        assert wall_time is None
+
+    @patch("nemo_cmd.combine._get_results_files", return_value=[])
+    def test_plan_no_files(self, m_get_results_files, m_logger, tmp_path):
+        run_desc_file = tmp_path / "nemo.yaml"
+        run_desc_file.write_text("paths: {}\n")
+        assert nemo_cmd.combine.plan(run_desc_file) == ([], None)
+
+
+class TestEstimateWallTime:
+    """Unit tests for _estimate_wall_time function."""
+
+    def test_largest_first_on_slots(self):
+        plans = [
+            nemo_cmd.combine.FileSetPlan(fn, 2, nbytes, "rebuild_nemo", nbytes, sec)
+            for fn, nbytes, sec in (("a", 600, 6), ("b", 300, 3), ("c", 200, 2))
+        ]
+        assert nemo_cmd.combine._estimate_wall_time(plans, 2) == 6
+
+    def test_mmap_file_sets_serial(self):
+        plans = [
+            nemo_cmd.combine.FileSetPlan("a", 2, 100, "rebuild_nemo", 100, 1),
+            nemo_cmd.combine.FileSetPlan("r1", 2, 100, "mmap", 100, 2),
+            nemo_cmd.combine.FileSetPlan("r2", 2, 100, "mmap", 100, 2),
+        ]
+        assert nemo_cmd.combine._estimate_wall_time(plans, 2) == 4
+
+
+class TestThroughputHistory:
+    """Unit tests for _update_throughput_history and _median_throughputs
+    functions.
+    """
+
+    def test_no_history(self):
+        assert nemo_cmd.combine._median_throughputs() == {}
+
+    def test_update_history(self):
+        nemo_cmd.combine._update_throughput_history(
+            {"mmap": [100, 300], "rebuild_nemo": []}
+        )
+        nemo_cmd.combine._update_throughput_history({"mmap": [200]})
+        assert nemo_cmd.combine._median_throughputs() == {"mmap": 200}
+
+    def test_history_length_limited(self):
+        nemo_cmd.combine._update_throughput_history(
+            {"mmap": list(range(nemo_cmd.combine.THROUGHPUT_HISTORY_LENGTH + 10))}
+        )
+        history = nemo_cmd.cache.read_yaml(nemo_cmd.combine.THROUGHPUT_HISTORY)
+        assert len(history["mmap"]) == nemo_cmd.combine.THROUGHPUT_HISTORY_LENGTH
+        assert history["mmap"][0] == 10
 
 
 @patch("nemo_cmd.combine.Path", autospec=True)
@@ -102,27 +318,397 @@ class TestFindRebuildNemoScript:
         assert m_logger.error.called
 
 
+class TestGetVarSelections:
+    """Unit tests for _get_var_selections function."""
+
+    def test_no_selections(self):
+        var_selections = nemo_cmd.combine._get_var_selections(
+            {}, ["SalishSea_1h_grid_T"], {}, {}
+        )
+        assert var_selections == {}
+
+    def test_run_desc_selections(self):
+        run_desc = {
+            "combine": {
+                "variables": {
+                    "*_grid_T": {"include": ["votemper", "vosaline"]},
+                    "*_restart": {"exclude": ["e3t_b"]},
+                }
+            }
+        }
+        var_selections = nemo_cmd.combine._get_var_selections(
+            run_desc, ["SalishSea_1h_grid_T", "SalishSea_restart", "foo"], {}, {}
+        )
+        assert var_selections == {
+            "SalishSea_1h_grid_T": (["votemper", "vosaline"], []),
+            "SalishSea_restart": (None, ["e3t_b"]),
+        }
+
+    def test_cli_overrides_run_desc(self):
+        run_desc = {"combine": {"variables": {"*_grid_T": {"include": ["votemper"]}}}}
+        var_selections = nemo_cmd.combine._get_var_selections(
+            run_desc,
+            ["SalishSea_1h_grid_T"],
+            {"*_grid_T": ["sossheig"]},
+            {"*_grid_T": ["nav_lat"]},
+        )
+        assert var_selections == {"SalishSea_1h_grid_T": (["sossheig"], ["nav_lat"])}
+
+    def test_cli_pattern_takes_precedence(self):
+        run_desc = {"combine": {"variables": {"*": {"exclude": ["e3t"]}}}}
+        var_selections = nemo_cmd.combine._get_var_selections(
+            run_desc,
+            ["SalishSea_1h_grid_T", "SalishSea_restart"],
+            {"*_grid_T": ["votemper", "e3t"]},
+            {},
+        )
+        assert var_selections == {
+            "SalishSea_1h_grid_T": (["votemper", "e3t"], ["e3t"]),
+            "SalishSea_restart": (None, ["e3t"]),
+        }
+
+    def test_cli_and_run_desc_lists_merged(self):
+        run_desc = {
+            "combine": {
+                "variables": {
+                    "*_grid_T": {"include": ["votemper", "vosaline"], "exclude": []}
+                }
+            }
+        }
+        var_selections = nemo_cmd.combine._get_var_selections(
+            run_desc, ["SalishSea_1h_grid_T"], {}, {"*_grid_T": ["vosaline"]}
+        )
+        assert var_selections == {
+            "SalishSea_1h_grid_T": (["votemper", "vosaline"], ["vosaline"])
+        }
+
+    @pytest.mark.parametrize(
+        "include_vars, exclude_vars",
+        [
+            ({"*_grid_T": ["votemper"]}, {"*_grid_T": ["votemper"]}),
+            ({"*_grid_T": []}, {}),
+        ],
+    )
+    def test_empty_selection(self, include_vars, exclude_vars, caplog):
+        with pytest.raises(SystemExit) as exc_info:
+            nemo_cmd.combine._get_var_selections(
+                {}, ["SalishSea_1h_grid_T"], include_vars, exclude_vars
+            )
+        assert exc_info.value.code == 2
+        assert "no variables selected for SalishSea_1h_grid_T" in caplog.text
+        for var in include_vars["*_grid_T"]:
+            assert var in caplog.text
+
+    @patch("nemo_cmd.combine._combine_results_files", autospec=True)
+    @patch("nemo_cmd.combine.find_rebuild_nemo_script", autospec=True)
+    @patch("nemo_cmd.combine._get_results_files", autospec=True)
+    @patch("nemo_cmd.combine.RunDescription.load", autospec=True)
+    def test_empty_selection_before_jobs(self, m_load, m_grf, m_frns, m_crf, tmp_path):
+        m_load.return_value = {}
+        m_grf.return_value = ["SalishSea_1h_grid_T"]
+        with pytest.raises(SystemExit):
+            nemo_cmd.combine.combine(
+                "SalishSea.yaml",
+                include_vars={"*_grid_T": ["votemper"]},
+                exclude_vars={"*_grid_T": ["votemper"]},
+                work_dir=tmp_path,
+            )
+        assert not m_crf.called
+
+
+@patch("nemo_cmd.combine.logger", autospec=True)
+@patch("nemo_cmd.combine.subprocess.run", autospec=True)
+class TestExtractVars:
+    """Unit tests for _extract_vars function."""
+
+    def test_include(self, m_run, m_logger):
+        m_run.return_value = SimpleNamespace(returncode=0, stdout="")
+        returncode = nemo_cmd.combine._extract_vars(
+            Path("foo.nc"), Path("foo.vars.nc"), (["vosaline", "votemper"], [])
+        )
+        assert returncode == 0
+        assert m_run.call_args.args[0] == shlex.split(
+            "ncks -O -v vosaline,votemper foo.nc foo.vars.nc"
+        )
+
+    def test_exclude(self, m_run, m_logger):
+        m_run.return_value = SimpleNamespace(returncode=0, stdout="")
+        nemo_cmd.combine._extract_vars(
+            Path("foo.nc"), Path("foo.vars.nc"), (None, ["e3t_b"])
+        )
+        assert m_run.call_args.args[0] == shlex.split(
+            "ncks -O -x -v e3t_b foo.nc foo.vars.nc"
+        )
+
+    def test_failure(self, m_run, m_logger):
+        m_run.return_value = SimpleNamespace(returncode=1, stdout="ncks error")
+        returncode = nemo_cmd.combine._extract_vars(
+            Path("foo.nc"), Path("foo.vars.nc"), (None, ["e3t_b"])
+        )
+        assert returncode == 1
+        m_logger.error.assert_called_once_with("ncks error")
+
+
+class TestCalcLayout:
+    """Unit tests for _calc_layout function."""
+
+    def test_equal_size_file_sets(self):
+        file_sets = {"foo": (4, 100), "bar": (4, 100), "baz": (4, 100)}
+        layout = nemo_cmd.combine._calc_layout(file_sets, None, None, 12)
+        assert layout == (3, 4)
+
+    def test_one_dominant_file_set(self):
+        file_sets = {"restart": (4, 1000), "foo": (4, 10), "bar": (4, 10)}
+        layout = nemo_cmd.combine._calc_layout(file_sets, None, None, 12)
+        assert layout == (2, 6)
+
+    def test_more_file_sets_than_cores(self):
+        file_sets = {f"foo{i}": (4, 100) for i in range(8)}
+        layout = nemo_cmd.combine._calc_layout(file_sets, None, None, 4)
+        assert layout == (4, 1)
+
+    def test_jobs_given(self):
+        file_sets = {"foo": (4, 100), "bar": (4, 100)}
+        layout = nemo_cmd.combine._calc_layout(file_sets, 1, None, 8)
+        assert layout == (1, 8)
+
+    def test_threads_given(self):
+        file_sets = {f"foo{i}": (4, 100) for i in range(8)}
+        layout = nemo_cmd.combine._calc_layout(file_sets, None, 4, 8)
+        assert layout == (2, 4)
+
+    def test_jobs_and_threads_given(self):
+        file_sets = {"foo": (4, 100), "bar": (4, 100)}
+        layout = nemo_cmd.combine._calc_layout(file_sets, 2, 16, 8)
+        assert layout == (2, 16)
+
+
+class TestRebuildJob:
+    """Unit tests for RebuildJob class."""
+
+    @patch("nemo_cmd.combine.subprocess.Popen")
+    def test_start(self, m_popen, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for i in range(2):
+            (tmp_path / f"foo_000{i}.nc").write_bytes(b"")
+        job = nemo_cmd.combine.RebuildJob("foo", 2, "rebuild_nemo", n_threads=4)
+        job.start()
+        assert job.job_dir == tmp_path / ".foo.rebuild"
+        assert (job.job_dir / "foo_0000.nc").resolve() == tmp_path / "foo_0000.nc"
+        assert (job.job_dir / "foo_0001.nc").is_symlink()
+        m_popen.assert_called_once_with(
+            shlex.split("rebuild_nemo -t 4 foo 2"),
+            cwd=str(tmp_path / ".foo.rebuild"),
+            stdout=ANY,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        )
+        # Output goes to a log file, not a pipe that could fill up
+        stdout = m_popen.call_args.kwargs["stdout"]
+        assert stdout.name == str(job.job_dir / nemo_cmd.combine.REBUILD_LOG)
+
+    @patch("nemo_cmd.combine.subprocess.Popen")
+    def test_start_output_dir(self, m_popen, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "foo_0000.nc").write_bytes(b"")
+        output_dir = tmp_path / "results"
+        output_dir.mkdir()
+        job = nemo_cmd.combine.RebuildJob(
+            "foo", 2, "rebuild_nemo", output_dir=output_dir
+        )
+        job.start()
+        assert job.job_dir == output_dir / ".foo.rebuild"
+        assert (job.job_dir / "foo_0000.nc").resolve() == tmp_path / "foo_0000.nc"
+        assert m_popen.call_args.kwargs["cwd"] == str(output_dir / ".foo.rebuild")
+
+    @patch("nemo_cmd.combine.subprocess.Popen")
+    def test_start_work_dir(self, m_popen, tmp_path):
+        (tmp_path / "foo_0000.nc").write_bytes(b"")
+        job = nemo_cmd.combine.RebuildJob("foo", 2, "rebuild_nemo", work_dir=tmp_path)
+        job.start()
+        assert job.job_dir == tmp_path / ".foo.rebuild"
+        assert (job.job_dir / "foo_0000.nc").resolve() == tmp_path / "foo_0000.nc"
+
+    def test_done_moves_combined_file(self, tmp_path):
+        job_dir = tmp_path / ".foo.rebuild"
+        job_dir.mkdir()
+        (job_dir / "foo.nc").write_bytes(b"")
+        (job_dir / nemo_cmd.combine.REBUILD_LOG).write_text("rebuild_nemo output")
+        job = nemo_cmd.combine.RebuildJob("foo", 2, "rebuild_nemo", job_dir=job_dir)
+        job.process = Mock(name="process", poll=Mock(return_value=0))
+        assert job.done
+        assert job.returncode == 0
+        assert job.output == "rebuild_nemo output"
+        assert (tmp_path / "foo.nc").exists()
+
+    def test_done_without_combined_file(self, tmp_path):
+        job_dir = tmp_path / ".foo.rebuild"
+        job_dir.mkdir()
+        job = nemo_cmd.combine.RebuildJob("foo", 2, "rebuild_nemo", job_dir=job_dir)
+        job.process = Mock(name="process", poll=Mock(return_value=0))
+        assert job.done
+        assert job.returncode == 1
+        assert job.output == (
+            "foo: rebuild_nemo did not produce foo.nc; per-processor files kept"
+        )
+        assert not (tmp_path / "foo.nc").exists()
+
+    @patch("nemo_cmd.combine._extract_vars", autospec=True)
+    def test_done_extracts_selected_vars(self, m_extract_vars, tmp_path):
+        job_dir = tmp_path / ".foo.rebuild"
+        job_dir.mkdir()
+        (job_dir / "foo.nc").write_text("all vars")
+
+        def mock_extract_vars(src_path, dest_path, var_selection):
+            dest_path.write_text("selected vars")
+            return 0
+
+        m_extract_vars.side_effect = mock_extract_vars
+        job = nemo_cmd.combine.RebuildJob(
+            "foo",
+            2,
+            "rebuild_nemo",
+            job_dir=job_dir,
+            var_selection=(["votemper"], []),
+        )
+        job.process = Mock(name="process", poll=Mock(return_value=0))
+        assert job.done
+        assert (tmp_path / "foo.nc").read_text() == "selected vars"
+
+    def test_not_done(self, tmp_path):
+        job = nemo_cmd.combine.RebuildJob("foo", 2, "rebuild_nemo", job_dir=tmp_path)
+        job.process = Mock(name="process", poll=Mock(return_value=None))
+        assert not job.done
+
+    def test_failed(self, tmp_path):
+        job = nemo_cmd.combine.RebuildJob("foo", 2, "rebuild_nemo", job_dir=tmp_path)
+        job.process = Mock(name="process", poll=Mock(return_value=1))
+        assert job.done
+        assert job.returncode == 1
+        assert not (tmp_path.parent / "foo.nc").exists()
+
+
 @patch("nemo_cmd.combine.logger", autospec=True)
-@patch("nemo_cmd.combine.Path", autospec=True)
 class TestCombineResultsFiles:
     """Unit tests for _combine_results_files function."""
 
     @patch("nemo_cmd.combine.shutil.move", autospec=True)
-    def test_single_processor_result(self, m_move, m_path, m_logger):
-        m_path.cwd().glob.return_value = ["foo_0000.nc"]
-        nemo_cmd.combine._combine_results_files("rebuild_nemo", ["foo"])
-        assert m_move.call_args == call("foo_0000.nc", "foo.nc")
-
-    @patch("nemo_cmd.combine.subprocess.check_output", autospec=True)
-    @patch("nemo_cmd.combine.os.unlink", autospec=True)
-    def test_rebuild_nemo_subprocess(self, m_unlink, m_check_output, m_path, m_logger):
-        m_path.cwd().glob.return_value = ["foo_0000.nc", "foo_0001.nc"]
-        nemo_cmd.combine._combine_results_files("rebuild_nemo", ["foo"])
-        assert m_check_output.call_args == call(
-            shlex.split("rebuild_nemo foo 2"),
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
+    @patch("nemo_cmd.combine._get_file_set_sizes", autospec=True)
+    def test_single_processor_result(self, m_sizes, m_move, m_logger):
+        m_sizes.return_value = {"foo": (1, 100)}
+        combined = nemo_cmd.combine._combine_results_files("rebuild_nemo", ["foo"])
+        assert m_move.call_args == call(
+            os.fspath(Path.cwd() / "foo_0000.nc"), os.fspath(Path.cwd() / "foo.nc")
         )
+        assert combined == ["foo"]
+
+    @patch("nemo_cmd.combine._get_file_set_sizes", autospec=True)
+    def test_single_processor_result_output_dir(
+        self, m_sizes, m_logger, tmp_path, monkeypatch
+    ):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "foo_0000.nc").write_bytes(b"")
+        output_dir = tmp_path / "results"
+        output_dir.mkdir()
+        m_sizes.return_value = {"foo": (1, 0)}
+        combined = nemo_cmd.combine._combine_results_files(
+            "rebuild_nemo", ["foo"], output_dir=output_dir
+        )
+        assert combined == ["foo"]
+        assert (output_dir / "foo.nc").exists()
+        assert not (output_dir / ".foo.nc.tmp").exists()
+        assert not (tmp_path / "foo_0000.nc").exists()
+
+    def test_single_processor_result_work_dir(self, m_logger, tmp_path):
+        (tmp_path / "foo_0000.nc").write_bytes(b"")
+        combined = nemo_cmd.combine._combine_results_files(
+            "rebuild_nemo", ["foo"], work_dir=tmp_path
+        )
+        assert combined == ["foo"]
+        assert (tmp_path / "foo.nc").exists()
+        assert not (tmp_path / "foo_0000.nc").exists()
+
+    @patch("nemo_cmd.combine.shutil.rmtree", autospec=True)
+    @patch("nemo_cmd.combine.time.sleep", autospec=True)
+    @patch("nemo_cmd.combine.multiprocessing.cpu_count", return_value=8)
+    @patch("nemo_cmd.combine._get_file_set_sizes", autospec=True)
+    @patch("nemo_cmd.combine.RebuildJob", autospec=True)
+    def test_rebuild_nemo_jobs(
+        self, m_job, m_sizes, m_cpu_count, m_sleep, m_rmtree, m_logger
+    ):
+        m_sizes.return_value = {"foo": (2, 100), "bar": (2, 300)}
+        jobs = [
+            Mock(name="bar_job", pid=1, name_root="bar", returncode=0, done=True),
+            Mock(name="foo_job", pid=2, name_root="foo", returncode=0, done=True),
+        ]
+        for job in jobs:
+            job.job_dir = Path(f".{job.name_root}.rebuild")
+            job.output = ""
+            job.elapsed, job.n_threads = 2.0, 4
+        m_job.side_effect = jobs
+        combined = nemo_cmd.combine._combine_results_files("rebuild_nemo", ["foo"])
+        assert m_job.call_args_list == [
+            call("bar", 2, "rebuild_nemo", 4, None, None, work_dir=None),
+            call("foo", 2, "rebuild_nemo", 4, None, None, work_dir=None),
+        ]
+        assert sorted(combined) == ["bar", "foo"]
+        assert nemo_cmd.combine._median_throughputs() == {"rebuild_nemo": 25}
+
+    @patch("nemo_cmd.combine.shutil.rmtree", autospec=True)
+    @patch("nemo_cmd.combine.time.sleep", autospec=True)
+    @patch("nemo_cmd.combine.multiprocessing.cpu_count", return_value=8)
+    @patch("nemo_cmd.combine._get_file_set_sizes", autospec=True)
+    @patch("nemo_cmd.combine.RebuildJob", autospec=True)
+    def test_rebuild_nemo_failure(
+        self, m_job, m_sizes, m_cpu_count, m_sleep, m_rmtree, m_logger
+    ):
+        m_sizes.return_value = {"foo": (2, 100)}
+        job = Mock(name="foo_job", pid=1, name_root="foo", returncode=1, done=True)
+        job.job_dir = Path(".foo.rebuild")
+        job.output = "rebuild failed"
+        m_job.return_value = job
+        combined = nemo_cmd.combine._combine_results_files("rebuild_nemo", ["foo"])
+        assert combined == []
+        m_logger.error.assert_called_once_with("rebuild failed")
+
+    @patch("nemo_cmd.combine.shutil.rmtree", autospec=True)
+    @patch("nemo_cmd.combine.time.sleep", autospec=True)
+    @patch("nemo_cmd.combine.multiprocessing.cpu_count", return_value=8)
+    @patch("nemo_cmd.combine._get_file_set_sizes", autospec=True)
+    @patch("nemo_cmd.combine._is_classic_file_set", autospec=True)
+    @patch("nemo_cmd.combine._mmap_combine", autospec=True)
+    @patch("nemo_cmd.combine.RebuildJob", autospec=True)
+    def test_classic_file_sets(
+        self,
+        m_job,
+        m_mmap_combine,
+        m_is_classic,
+        m_sizes,
+        m_cpu_count,
+        m_sleep,
+        m_rmtree,
+        m_logger,
+    ):
+        m_sizes.return_value = {"restart": (2, 300), "bad_restart": (2, 300)}
+        m_is_classic.return_value = True
+        m_mmap_combine.side_effect = [None, ValueError("different variables")]
+        job = Mock(name="job", pid=1, name_root="bad_restart", returncode=0, done=True)
+        job.job_dir = Path(".bad_restart.rebuild")
+        job.elapsed = None
+        job.output = ""
+        m_job.return_value = job
+        combined = nemo_cmd.combine._combine_results_files(
+            "rebuild_nemo", ["restart", "bad_restart"]
+        )
+        assert m_mmap_combine.call_args_list == [
+            call("restart", None, None, None),
+            call("bad_restart", None, None, None),
+        ]
+        m_job.assert_called_once_with(
+            "bad_restart", 2, "rebuild_nemo", 4, None, None, work_dir=None
+        )
+        assert combined == ["restart", "bad_restart"]
+        assert m_logger.warning.called
 
 
 @patch("nemo_cmd.combine.Path", autospec=True)
@@ -133,3 +719,20 @@ class TestDeleteResultsFiles:
         m_path.cwd().glob.return_value = [Mock(spec=Path)]
         nemo_cmd.combine._delete_results_files(["foo"])
         assert m_path.cwd().glob()[0].unlink.called
+
+
+class TestMmapCombine:
+    """Unit test for _mmap_combine function."""
+
+    @patch("nemo_cmd.combine.classic_netcdf.combine_tiles", autospec=True)
+    def test_mmap_combine(self, m_combine_tiles, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for i in (1, 0):
+            (tmp_path / f"restart_000{i}.nc").write_bytes(b"CDF\x01")
+        nemo_cmd.combine._mmap_combine("restart")
+        m_combine_tiles.assert_called_once_with(
+            [tmp_path / "restart_0000.nc", tmp_path / "restart_0001.nc"],
+            tmp_path / "restart.nc",
+            None,
+            [],
+        )
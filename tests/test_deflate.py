@@ -77,16 +77,76 @@ class TestParser:
         parsed_args = parser.parse_args(["foo.nc", "-j6"])
         assert parsed_args.jobs == 6
 
+    def test_output_dir_option(self, deflate_cmd):
+        parser = deflate_cmd.get_parser("nemo deflate")
+        assert parser.parse_args(["foo.nc"]).output_dir is None
+        parsed_args = parser.parse_args(["foo.nc", "--output-dir", "results/"])
+        assert parsed_args.output_dir == Path("results/")
+
 
 class TestTakeAction:
     """Unit test for `nemo deflate` sub-command take_action() method."""
 
     def test_take_action(self, deflate_cmd, caplog, monkeypatch):
         parsed_args = SimpleNamespace(
-            filepaths=[Path("foo.nc"), Path("bar.nc")], jobs=6
+            filepaths=[Path("foo.nc"), Path("bar.nc")], jobs=6, output_dir=None
         )
         caplog.set_level(logging.INFO)
         deflate_cmd.take_action(parsed_args)
         assert caplog.records[0].levelname == "INFO"
         expected = "Deflating in up to 6 concurrent sub-processes"
         assert caplog.messages[0] == expected
+
+
+class TestDeflateJob:
+    """Unit tests for DeflateJob class."""
+
+    def test_done_replaces_file(self, tmp_path):
+        filepath = tmp_path / "foo.nc"
+        filepath.write_text("original")
+        (tmp_path / "foo.nc.nccopy.tmp").write_text("deflated")
+        job = nemo_cmd.deflate.DeflateJob(filepath)
+        job.process = SimpleNamespace(poll=lambda: 0)
+        assert job.done
+        assert filepath.read_text() == "deflated"
+
+    def test_done_output_dir(self, tmp_path):
+        filepath = tmp_path / "foo.nc"
+        filepath.write_text("original")
+        output_dir = tmp_path / "results"
+        output_dir.mkdir()
+        (output_dir / "foo.nc.nccopy.tmp").write_text("deflated")
+        job = nemo_cmd.deflate.DeflateJob(filepath, output_dir=output_dir)
+        job.process = SimpleNamespace(poll=lambda: 0)
+        assert job.done
+        assert (output_dir / "foo.nc").read_text() == "deflated"
+        assert not filepath.exists()
+
+    def test_failed_leaves_original(self, tmp_path):
+        filepath = tmp_path / "foo.nc"
+        filepath.write_text("original")
+        job = nemo_cmd.deflate.DeflateJob(filepath, output_dir=tmp_path / "results")
+        job.process = SimpleNamespace(poll=lambda: 1)
+        assert job.done
+        assert filepath.read_text() == "original"
+
+
+class TestDeflate:
+    """Unit test for deflate function."""
+
+    def test_work_dir(self, tmp_path, monkeypatch):
+        (tmp_path / "foo.nc").write_text("original")
+        launched = []
+
+        def launch(jobs, max_concurrent_jobs):
+            launched.extend(jobs)
+            jobs.clear()
+            return {}
+
+        monkeypatch.setattr(nemo_cmd.deflate, "_launch_initial_jobs", launch)
+        nemo_cmd.deflate.deflate(
+            [Path("foo.nc"), Path("bar.nc")], 1, Path("results"), work_dir=tmp_path
+        )
+        assert [job.filepath for job in launched] == [tmp_path / "foo.nc"]
+        assert launched[0].output_dir == tmp_path / "results"
+        assert (tmp_path / "results").is_dir()
@@ -0,0 +1,278 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""NEMO-Cmd forcing file checks unit tests"""
+
+import arrow
+import f90nml
+import pytest
+
+from nemo_cmd import forcing_checks
+
+RUN_SECTIONS = """
+&namrun
+    nn_date0 = 20150101
+    nn_it000 = 1
+    nn_itend = 2160
+/
+&namdom
+    rn_rdt = 40.0
+/
+"""
+
+
+def _namelist(sections):
+    return f90nml.reads(RUN_SECTIONS + sections)
+
+
+class TestRunDateRange:
+    """Unit test for run_date_range function."""
+
+    def test_run_date_range(self):
+        startm1, end_date = forcing_checks.run_date_range(_namelist(""))
+        assert startm1 == arrow.get("2014-12-31")
+        assert end_date == arrow.get("2015-01-01T23:59:19")
+
+
+class TestFldFileNames:
+    """Unit tests for fld_file_names function."""
+
+    DATES = list(
+        arrow.Arrow.range("day", arrow.get("2015-01-30"), arrow.get("2015-02-02"))
+    )
+
+    @pytest.mark.parametrize(
+        "clim, period, expected",
+        [
+            (
+                False,
+                "daily",
+                [
+                    "ops_y2015m01d30.nc",
+                    "ops_y2015m01d31.nc",
+                    "ops_y2015m02d01.nc",
+                    "ops_y2015m02d02.nc",
+                ],
+            ),
+            (False, "monthly", ["ops_y2015m01.nc", "ops_y2015m02.nc"]),
+            (False, "yearly", ["ops_y2015.nc"]),
+            (True, "monthly", ["ops_m01.nc", "ops_m02.nc"]),
+            (True, "yearly", ["ops.nc"]),
+            # 2015-01-30 is a Friday
+            (False, "weekmon", ["ops_y2015m01d26.nc", "ops_y2015m02d02.nc"]),
+            (False, "weekfri", ["ops_y2015m01d30.nc"]),
+        ],
+    )
+    def test_file_names(self, clim, period, expected):
+        flread_params = ["ops", 1, "u_wind", True, clim, period, "", "", ""]
+        assert forcing_checks.fld_file_names(flread_params, self.DATES) == expected
+
+
+class TestAtmosphericFiles:
+    """Unit tests for atmospheric_files function."""
+
+    def test_apr_files(self):
+        sn_params = "\n".join(
+            f"    {qty} = 'ops', 1, 'x', .true., .false., 'daily', '', '', ''"
+            for qty in "wndi wndj qsr qlw tair humi prec snow".split()
+        )
+        namelist = _namelist(f"""
+            &namsbc
+                ln_blk_core = .true.
+                ln_apr_dyn = .true.
+            /
+            &namsbc_core
+                cn_dir = 'NEMO-atmos/'
+            {sn_params.replace("    ", "    sn_")}
+            /
+            &namsbc_apr
+                cn_dir = 'NEMO-atmos/'
+                sn_apr = 'slp', 1, 'atmpres', .true., .false., 'daily', '', '', ''
+            /
+            """)
+        file_paths = forcing_checks.atmospheric_files(namelist)
+        # The CORE quantities share a file name root
+        assert file_paths == [
+            "NEMO-atmos/ops_y2014m12d31.nc",
+            "NEMO-atmos/ops_y2015m01d01.nc",
+            "NEMO-atmos/slp_y2014m12d31.nc",
+            "NEMO-atmos/slp_y2015m01d01.nc",
+        ]
+
+    def test_no_blk_core(self):
+        namelist = _namelist("&namsbc\n ln_blk_core = .false.\n/\n")
+        assert forcing_checks.atmospheric_files(namelist) == []
+
+
+class TestRiversFiles:
+    """Unit tests for rivers_files function."""
+
+    def test_rivers_files(self):
+        namelist = _namelist("""
+            &namsbc
+                ln_rnf = .true.
+            /
+            &namsbc_rnf
+                cn_dir = 'rivers/'
+                ln_rnf_mouth = .true.
+                ln_rnf_depth = .true.
+                ln_rnf_tem = .true.
+                sn_rnf = 'R201702', 24, 'rorunoff', .true., .false., 'daily', '', '', ''
+                sn_cnf = 'bathy_meter', 0, 'socoefr', .false., .true., 'yearly', '', '', ''
+                sn_t_rnf = 'rivers_temp', 24, 'rotemper', .true., .true., 'yearly', '', '', ''
+                sn_dep_rnf = 'rivers_depth', 0, 'rodepth', .false., .true., 'yearly', '', '', ''
+            /
+            """)
+        assert forcing_checks.rivers_files(namelist) == [
+            "rivers/R201702_y2014m12d31.nc",
+            "rivers/R201702_y2015m01d01.nc",
+            "rivers/rivers_temp.nc",
+            "rivers/bathy_meter.nc",
+            "rivers/rivers_depth.nc",
+        ]
+
+    def test_no_rivers(self):
+        namelist = _namelist("&namsbc\n ln_rnf = .false.\n/\n")
+        assert forcing_checks.rivers_files(namelist) == []
+
+
+BOUNDARY_SECTIONS = """
+&nambdy
+    nb_bdy = 2
+    ln_coords_file = .true., .false.
+    cn_coords_file = 'open_boundaries/west/coords.nc', ''
+    nn_dyn2d_dta = 2, 3
+    nn_dyn3d_dta = 1, 0
+    nn_tra_dta = 1, 0
+/
+&nambdy_dta
+    cn_dir = 'open_boundaries/west/'
+    bn_u3d = 'U', 168, 'vozocrtx', .true., .true., 'yearly', '', '', ''
+    bn_v3d = 'V', 168, 'vomecrty', .true., .true., 'yearly', '', '', ''
+    bn_tem = 'TS', 168, 'votemper', .true., .true., 'yearly', '', '', ''
+    bn_sal = 'TS', 168, 'vosaline', .true., .true., 'yearly', '', '', ''
+/
+&nambdy_dta
+    cn_dir = 'open_boundaries/north/'
+    bn_ssh = 'ssh', 1, 'sossheig', .true., .false., 'daily', '', '', ''
+    bn_u2d = 'ssh', 1, 'vobtcrtx', .true., .false., 'daily', '', '', ''
+    bn_v2d = 'ssh', 1, 'vobtcrty', .true., .false., 'daily', '', '', ''
+/
+&nam_tide
+    clname(1) = 'M2'
+    clname(2) = 'K1'
+/
+&nambdy_tide
+    filtide = 'open_boundaries/west/tides/west_tide_'
+/
+&nambdy_tide
+    filtide = 'open_boundaries/north/tides/north_tide_'
+/
+"""
+
+
+class TestBoundaryFiles:
+    """Unit tests for boundary_files function."""
+
+    def test_boundary_files(self):
+        namelist = _namelist(BOUNDARY_SECTIONS)
+        assert forcing_checks.boundary_files(namelist) == [
+            "open_boundaries/west/coords.nc",
+            "open_boundaries/west/U.nc",
+            "open_boundaries/west/V.nc",
+            "open_boundaries/west/TS.nc",
+            "open_boundaries/north/ssh_y2014m12d31.nc",
+            "open_boundaries/north/ssh_y2015m01d01.nc",
+        ]
+
+    def test_no_boundaries(self):
+        assert forcing_checks.boundary_files(_namelist("")) == []
+
+
+class TestTidalFiles:
+    """Unit tests for tidal_files function."""
+
+    def test_tidal_files(self):
+        namelist = _namelist(BOUNDARY_SECTIONS)
+        file_paths = forcing_checks.tidal_files(namelist)
+        assert file_paths[:4] == [
+            "open_boundaries/west/tides/west_tide_M2_grid_T.nc",
+            "open_boundaries/west/tides/west_tide_M2_grid_U.nc",
+            "open_boundaries/west/tides/west_tide_M2_grid_V.nc",
+            "open_boundaries/west/tides/west_tide_K1_grid_T.nc",
+        ]
+        assert file_paths[-1] == "open_boundaries/north/tides/north_tide_K1_grid_V.nc"
+        assert len(file_paths) == 2 * 2 * 3
+
+
+class TestClimatologyFiles:
+    """Unit tests for climatology_files function."""
+
+    NAMTSD = """
+    &namsbc
+        ln_ssr = .false.
+    /
+    &namtsd
+        ln_tsd_init = .true.
+        ln_tsd_tradmp = {tradmp}
+        cn_dir = 'initial_strat/'
+        sn_tem = 'TS', -1, 'votemper', .true., .true., 'monthly', '', '', ''
+        sn_sal = 'TS', -1, 'vosaline', .true., .true., 'monthly', '', '', ''
+    /
+    """
+
+    def test_initial_conditions(self):
+        namelist = _namelist(self.NAMTSD.format(tradmp=".false."))
+        assert forcing_checks.climatology_files(namelist) == ["initial_strat/TS_m01.nc"]
+
+    def test_tracer_damping(self):
+        namelist = _namelist(self.NAMTSD.format(tradmp=".true."))
+        assert forcing_checks.climatology_files(namelist) == [
+            "initial_strat/TS_m12.nc",
+            "initial_strat/TS_m01.nc",
+        ]
+
+
+class TestFindMissingFiles:
+    """Unit tests for find_missing_files function."""
+
+    def test_find_missing_files(self, tmp_path):
+        (tmp_path / "atmos").mkdir()
+        (tmp_path / "atmos" / "ops_y2015m01d01.nc").write_bytes(b"")
+        file_paths = [
+            "atmos/ops_y2014m12d31.nc",
+            "atmos/ops_y2015m01d01.nc",
+            "rivers/R201702_y2015m01d01.nc",
+            "atmos/ops_y2014m12d31.nc",
+        ]
+        assert forcing_checks.find_missing_files(tmp_path, file_paths) == [
+            "atmos/ops_y2014m12d31.nc",
+            "rivers/R201702_y2015m01d01.nc",
+        ]
+
+
+class TestListDirNames:
+    """Unit tests for list_dir_names function."""
+
+    def test_dir_names(self, tmp_path):
+        (tmp_path / "foo.nc").write_bytes(b"")
+        (tmp_path / "bar").mkdir()
+        assert forcing_checks.list_dir_names(tmp_path) == {"foo.nc", "bar"}
+
+    def test_missing_dir(self, tmp_path):
+        assert forcing_checks.list_dir_names(tmp_path / "foo") == frozenset()
@@ -0,0 +1,49 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""NEMO-Cmd file system path functions unit tests"""
+
+import nemo_cmd
+
+
+class TestPathCache:
+    """Unit tests for PathCache class."""
+
+    def test_resolved_path(self, tmp_path, monkeypatch):
+        (tmp_path / "target").mkdir()
+        (tmp_path / "link").symlink_to(tmp_path / "target")
+        monkeypatch.setenv("RUNS_DIR", str(tmp_path))
+        path_cache = nemo_cmd.PathCache()
+        assert path_cache.resolved_path("$RUNS_DIR/link") == (tmp_path / "target")
+        assert path_cache.resolved_path("$RUNS_DIR/link") == (tmp_path / "target")
+        assert (path_cache.hits, path_cache.misses) == (1, 1)
+
+    def test_stat(self, tmp_path):
+        (tmp_path / "foo").write_bytes(b"bar")
+        path_cache = nemo_cmd.PathCache()
+        assert path_cache.stat(tmp_path / "foo").st_size == 3
+        (tmp_path / "foo").unlink()
+        # Cached result is reused for the life of the cache
+        assert path_cache.exists(tmp_path / "foo")
+        assert (path_cache.hits, path_cache.misses) == (1, 1)
+
+    def test_does_not_exist(self, tmp_path):
+        path_cache = nemo_cmd.PathCache()
+        assert path_cache.stat(tmp_path / "foo") is None
+        assert not path_cache.exists(tmp_path / "foo")
+        assert not path_cache.exists(tmp_path / "foo" / "bar")
@@ -18,13 +18,19 @@
 
 """NEMO-Cmd gather sub-command plug-in unit tests"""
 
+import datetime
+import errno
+import hashlib
+import os
 from pathlib import Path
 from types import SimpleNamespace
 
 import pytest
 
+import nemo_cmd.bundle
 import nemo_cmd.main
 import nemo_cmd.gather
+import nemo_cmd.transfer
 
 
 @pytest.fixture
@@ -56,6 +62,51 @@ class TestGetParser:
         parser = gather_cmd.get_parser("nemo gather")
         parsed_args = parser.parse_args(["/results/"])
         assert parsed_args.results_dir == Path("/results/")
+        assert parsed_args.jobs == nemo_cmd.transfer.DEFAULT_MAX_WORKERS
+        assert not parsed_args.manifest
+        assert parsed_args.hash_name == "blake2b"
+        assert not parsed_args.bundle
+        assert not parsed_args.keep_source
+        assert parsed_args.bundle_threshold == nemo_cmd.gather.BUNDLE_THRESHOLD
+        assert parsed_args.add_mode is None
+        assert parsed_args.group is None
+        assert parsed_args.layout is None
+        assert parsed_args.run_id is None
+
+    def test_parsed_args_layout(self, gather_cmd):
+        parser = gather_cmd.get_parser("nemo gather")
+        parsed_args = parser.parse_args(
+            ["/results/", "--layout", "{run_id}/{yyyy}/{mm}/", "--run-id", "foo"]
+        )
+        assert parsed_args.layout == "{run_id}/{yyyy}/{mm}/"
+        assert parsed_args.run_id == "foo"
+
+    def test_parsed_args_permissions(self, gather_cmd):
+        parser = gather_cmd.get_parser("nemo gather")
+        parsed_args = parser.parse_args(
+            ["/results/", "--add-mode", "064", "--group", "allen"]
+        )
+        assert parsed_args.add_mode == 0o064
+        assert parsed_args.group == "allen"
+
+    def test_parsed_args_bundle(self, gather_cmd):
+        parser = gather_cmd.get_parser("nemo gather")
+        parsed_args = parser.parse_args(
+            ["/results/", "--bundle", "--bundle-threshold", "4096"]
+        )
+        assert parsed_args.bundle
+        assert parsed_args.bundle_threshold == 4096
+
+    def test_parsed_args_manifest(self, gather_cmd):
+        parser = gather_cmd.get_parser("nemo gather")
+        parsed_args = parser.parse_args(["/results/", "--manifest", "--hash", "sha256"])
+        assert parsed_args.manifest
+        assert parsed_args.hash_name == "sha256"
+
+    def test_parsed_args_jobs(self, gather_cmd):
+        parser = gather_cmd.get_parser("nemo gather")
+        parsed_args = parser.parse_args(["/results/", "-j", "16"])
+        assert parsed_args.jobs == 16
 
 
 class TestTakeAction:
@@ -71,6 +122,358 @@ class TestTakeAction:
         monkeypatch.setattr(nemo_cmd.gather, "_move_results", mock_move_results)
         monkeypatch.setattr(nemo_cmd.gather, "_delete_symlinks", mock_delete_symlinks)
         results_dir = tmp_path / "results_dir"
-        parsed_args = SimpleNamespace(results_dir=results_dir)
+        parsed_args = SimpleNamespace(
+            results_dir=results_dir,
+            jobs=8,
+            manifest=False,
+            hash_name="blake2b",
+            bundle=False,
+            bundle_threshold=nemo_cmd.gather.BUNDLE_THRESHOLD,
+            keep_source=False,
+            add_mode=None,
+            group=None,
+            layout=None,
+            run_id=None,
+        )
         gather_cmd.take_action(parsed_args)
         assert results_dir.exists()
+
+
+class TestScanRunDir:
+    """Unit tests for _scan_run_dir function."""
+
+    def test_scan_run_dir(self, tmp_path):
+        (tmp_path / "restart" / "sub").mkdir(parents=True)
+        (tmp_path / "restart" / "foo_restart.nc").write_bytes(b"restart")
+        (tmp_path / "restart" / "sub" / "bar.nc").write_bytes(b"bar")
+        (tmp_path / "restart" / "link").symlink_to("foo_restart.nc")
+        (tmp_path / "namelist_cfg").write_text("&namrun\n/\n")
+        (tmp_path / "nemo.exe").symlink_to(tmp_path / "missing" / "nemo.exe")
+        (tmp_path / "bathy").symlink_to(tmp_path / "restart")
+        entries = nemo_cmd.gather._scan_run_dir(tmp_path)
+        assert entries.files == {tmp_path / "namelist_cfg": 10}
+        assert entries.dirs == {tmp_path / "restart": 10}
+        assert sorted(entries.symlinks) == [tmp_path / "bathy", tmp_path / "nemo.exe"]
+
+    def test_present_working_directory(self, tmp_path, monkeypatch):
+        (tmp_path / "namelist_cfg").write_text("")
+        monkeypatch.chdir(tmp_path)
+        entries = nemo_cmd.gather._scan_run_dir()
+        assert entries.files == {tmp_path / "namelist_cfg": 0}
+
+
+class TestLayout:
+    """Unit tests for results directory layout functions."""
+
+    @pytest.mark.parametrize(
+        "name, layout, expected",
+        [
+            ("SalishSea_1d_20150102_20150102_grid_T.nc", "{yyyy}{mm}{dd}/", "20150102"),
+            (
+                "SalishSea_1h_20150102_20150111_ptrc_T.nc",
+                "{run_id}/{yyyy}/{mm}/",
+                "foo/2015/01",
+            ),
+            ("SalishSea_00002160_restart.nc", "{yyyy}/", None),
+            ("namelist_cfg", "{yyyy}/", None),
+        ],
+    )
+    def test_layout_subdir(self, name, layout, expected):
+        subdir = nemo_cmd.gather._layout_subdir(name, layout, "foo")
+        assert subdir == (None if expected is None else Path(expected))
+
+    @pytest.mark.parametrize(
+        "layout, run_id", [("{yyyy}/{hh}/", None), ("{run_id}/", None), ("{yyyy", None)]
+    )
+    def test_check_layout_error(self, layout, run_id):
+        with pytest.raises(SystemExit):
+            nemo_cmd.gather._check_layout(layout, run_id)
+
+    @pytest.mark.parametrize(
+        "layout, run_id",
+        [
+            ("/tmp/{yyyy}/", None),
+            ("../{yyyy}/", None),
+            ("{yyyy}/../../{mm}/", None),
+            ("{run_id}/{yyyy}/", "../foo"),
+            ("{run_id}/{yyyy}/", "/foo"),
+        ],
+    )
+    def test_check_layout_outside_results_dir(self, layout, run_id, caplog):
+        with pytest.raises(SystemExit):
+            nemo_cmd.gather._check_layout(layout, run_id)
+        assert "must be relative paths inside the results directory" in caplog.text
+
+    def test_check_layout(self):
+        nemo_cmd.gather._check_layout("{run_id}/{yyyy}/{mm}/{dd}/", "foo")
+
+
+class TestDeleteSymlinks:
+    """Unit test for _delete_symlinks function."""
+
+    def test_delete_symlinks(self, tmp_path):
+        symlinks = [tmp_path / f"link_{i}" for i in range(20)]
+        for link in symlinks:
+            link.symlink_to(tmp_path / "missing")
+        nemo_cmd.gather._delete_symlinks(symlinks, max_workers=4)
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestGather:
+    """Unit tests for gather function."""
+
+    def test_gather(self, tmp_path, monkeypatch):
+        run_dir = tmp_path / "run_dir"
+        run_dir.mkdir()
+        (run_dir / "nemo.yaml").write_text("run_id: foo\n")
+        (run_dir / "restart").mkdir()
+        (run_dir / "restart" / "foo_restart.nc").write_bytes(b"restart")
+        (run_dir / "nemo.exe").symlink_to(tmp_path / "nemo.exe")
+        monkeypatch.chdir(run_dir)
+        results_dir = tmp_path / "results_dir"
+        nemo_cmd.gather.gather(results_dir)
+        assert list(run_dir.iterdir()) == []
+        assert (results_dir / "nemo.yaml").read_text() == "run_id: foo\n"
+        assert (results_dir / "restart" / "foo_restart.nc").read_bytes() == b"restart"
+        assert not (results_dir / "nemo.exe").exists()
+
+    def test_work_dir(self, tmp_path, monkeypatch):
+        run_dir = tmp_path / "run_dir"
+        run_dir.mkdir()
+        (run_dir / "nemo.yaml").write_text("run_id: foo\n")
+        (run_dir / "nemo.exe").symlink_to(tmp_path / "nemo.exe")
+        (tmp_path / "elsewhere").mkdir()
+        monkeypatch.chdir(tmp_path / "elsewhere")
+        nemo_cmd.gather.gather(Path("../results_dir"), work_dir=run_dir)
+        assert list(run_dir.iterdir()) == []
+        assert (tmp_path / "results_dir" / "nemo.yaml").exists()
+        assert list((tmp_path / "elsewhere").iterdir()) == []
+
+    def test_gather_cross_file_system(self, tmp_path, monkeypatch):
+        run_dir = tmp_path / "run_dir"
+        run_dir.mkdir()
+        (run_dir / "foo_grid_T.nc").write_bytes(b"grid_T" * 1000)
+        monkeypatch.chdir(run_dir)
+
+        def mock_rename(src, dest):
+            if dest.endswith("foo_grid_T.nc") and not src.endswith(".part"):
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+            os_rename(src, dest)
+
+        os_rename = os.rename
+        monkeypatch.setattr(nemo_cmd.transfer.os, "rename", mock_rename)
+        results_dir = tmp_path / "results_dir"
+        nemo_cmd.gather.gather(results_dir, max_concurrent_jobs=2)
+        assert list(run_dir.iterdir()) == []
+        assert (results_dir / "foo_grid_T.nc").read_bytes() == b"grid_T" * 1000
+
+    def test_resume_interrupted_cross_file_system(self, tmp_path, monkeypatch):
+        run_dir = tmp_path / "run_dir"
+        run_dir.mkdir()
+        (run_dir / "foo_grid_T.nc").write_bytes(b"grid_T")
+        (run_dir / "foo_grid_U.nc").write_bytes(b"grid_U")
+        monkeypatch.chdir(run_dir)
+        results_dir = tmp_path / "results_dir"
+        results_dir.mkdir()
+        # foo_grid_T.nc was copied but its source was not removed
+        (results_dir / "foo_grid_T.nc").write_bytes(b"grid_T")
+        copy = nemo_cmd.transfer.FileCopy(
+            run_dir / "foo_grid_T.nc", results_dir / "foo_grid_T.nc", 6
+        )
+        journal = nemo_cmd.transfer.Journal(results_dir / nemo_cmd.transfer.JOURNAL)
+        journal.record("started", copy, 6)
+        journal.record("verified", copy)
+
+        def mock_rename(src, dest):
+            if not src.endswith(".part"):
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+            os_rename(src, dest)
+
+        os_rename = os.rename
+        monkeypatch.setattr(nemo_cmd.transfer.os, "rename", mock_rename)
+        nemo_cmd.gather.gather(results_dir)
+        assert list(run_dir.iterdir()) == []
+        assert (results_dir / "foo_grid_T.nc").read_bytes() == b"grid_T"
+        assert (results_dir / "foo_grid_U.nc").read_bytes() == b"grid_U"
+        assert not (results_dir / nemo_cmd.transfer.JOURNAL).exists()
+
+    def test_gather_manifest(self, tmp_path, monkeypatch):
+        run_dir = tmp_path / "run_dir"
+        (run_dir / "restart").mkdir(parents=True)
+        (run_dir / "foo_grid_T.nc").write_bytes(b"grid_T")
+        (run_dir / "restart" / "foo_restart.nc").write_bytes(b"restart")
+        monkeypatch.chdir(run_dir)
+        results_dir = tmp_path / "results_dir"
+        results_dir.mkdir()
+        # e.g. written by nemo combine --output-dir
+        (results_dir / "foo_grid_U.nc").write_bytes(b"grid_U")
+        nemo_cmd.gather.gather(results_dir, manifest=True, hash_name="sha256")
+        lines = (results_dir / "MANIFEST").read_text().splitlines()
+        assert lines[0] == "path\tsize\tmtime\tsha256"
+        records = [line.split("\t") for line in lines[1:]]
+        assert [(path, size, digest) for path, size, _, digest in records] == [
+            ("foo_grid_T.nc", "6", hashlib.sha256(b"grid_T").hexdigest()),
+            ("foo_grid_U.nc", "6", hashlib.sha256(b"grid_U").hexdigest()),
+            ("restart/foo_restart.nc", "7", hashlib.sha256(b"restart").hexdigest()),
+        ]
+        mtime = (results_dir / "foo_grid_T.nc").stat().st_mtime
+        assert datetime.datetime.fromisoformat(records[0][2]).timestamp() == (
+            pytest.approx(mtime, abs=1e-6)
+        )
+
+    def test_gather_bundle(self, tmp_path, monkeypatch):
+        run_dir = tmp_path / "run_dir"
+        run_dir.mkdir()
+        (run_dir / "namelist_cfg").write_text("&namrun\n/\n")
+        (run_dir / "time.step").write_text("42\n")
+        (run_dir / "ocean.output").write_bytes(b"x" * 100)
+        (run_dir / "foo_restart.nc").write_bytes(b"restart")
+        monkeypatch.chdir(run_dir)
+        results_dir = tmp_path / "results_dir"
+        nemo_cmd.gather.gather(results_dir, bundle_threshold=100)
+        assert list(run_dir.iterdir()) == []
+        assert sorted(p.name for p in results_dir.iterdir()) == [
+            "foo_restart.nc",
+            "ocean.output",
+            "small_files.tar",
+            "small_files.tar.index.yaml",
+        ]
+        bundle_path = results_dir / "small_files.tar"
+        assert nemo_cmd.bundle.list_members(bundle_path) == [
+            "namelist_cfg",
+            "time.step",
+        ]
+        assert nemo_cmd.bundle.read_member(bundle_path, "time.step") == b"42\n"
+
+    def test_gather_keep_source(self, tmp_path, monkeypatch):
+        run_dir = tmp_path / "run_dir"
+        run_dir.mkdir()
+        (run_dir / "namelist_cfg").write_text("&namrun\n/\n")
+        (run_dir / "foo_restart.nc").write_bytes(b"restart")
+        (run_dir / "nemo.exe").symlink_to(tmp_path / "nemo.exe")
+        monkeypatch.chdir(run_dir)
+        results_dir = tmp_path / "results_dir"
+        nemo_cmd.gather.gather(results_dir, bundle_threshold=100, keep_source=True)
+        assert sorted(p.name for p in run_dir.iterdir()) == [
+            "foo_restart.nc",
+            "namelist_cfg",
+            "nemo.exe",
+        ]
+        assert (results_dir / "foo_restart.nc").read_bytes() == b"restart"
+        assert nemo_cmd.bundle.list_members(results_dir / "small_files.tar") == [
+            "namelist_cfg"
+        ]
+
+    def test_gather_add_mode(self, tmp_path, monkeypatch):
+        run_dir = tmp_path / "run_dir"
+        (run_dir / "restart").mkdir(parents=True)
+        (run_dir / "restart").chmod(0o700)
+        (run_dir / "restart" / "foo_restart.nc").write_bytes(b"restart")
+        (run_dir / "restart" / "foo_restart.nc").chmod(0o600)
+        (run_dir / "namelist_cfg").write_text("&namrun\n/\n")
+        (run_dir / "namelist_cfg").chmod(0o600)
+        monkeypatch.chdir(run_dir)
+        results_dir = tmp_path / "results_dir"
+        results_dir.mkdir(mode=0o700)
+        (results_dir / "stdout").write_text("")
+        (results_dir / "stdout").chmod(0o600)
+        nemo_cmd.gather.gather(results_dir, add_mode=0o064, bundle_threshold=2**20)
+
+        def mode(path):
+            return path.stat().st_mode & 0o777
+
+        assert mode(results_dir) == 0o775
+        assert mode(results_dir / "stdout") == 0o664
+        assert mode(results_dir / "restart") == 0o775
+        assert mode(results_dir / "restart" / "foo_restart.nc") == 0o664
+        assert mode(results_dir / nemo_cmd.gather.BUNDLE) == 0o664
+
+    def test_gather_group(self, tmp_path, monkeypatch):
+        run_dir = tmp_path / "run_dir"
+        run_dir.mkdir()
+        (run_dir / "foo_grid_T.nc").write_bytes(b"grid_T")
+        monkeypatch.chdir(run_dir)
+        results_dir = tmp_path / "results_dir"
+        gid = os.getegid()
+        nemo_cmd.gather.gather(results_dir, group=str(gid))
+        assert (results_dir / "foo_grid_T.nc").stat().st_gid == gid
+
+    def test_gather_unknown_group(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        with pytest.raises(SystemExit):
+            nemo_cmd.gather.gather(tmp_path / "results_dir", group="no-such-group")
+
+    def test_gather_layout(self, tmp_path, monkeypatch):
+        run_dir = tmp_path / "run_dir"
+        run_dir.mkdir()
+        (run_dir / "SalishSea_1h_20150102_20150102_grid_W.nc").write_bytes(b"grid_W")
+        (run_dir / "namelist_cfg").write_text("&namrun\n/\n")
+        monkeypatch.chdir(run_dir)
+        results_dir = tmp_path / "results_dir"
+        results_dir.mkdir()
+        (results_dir / "SalishSea_1d_20150201_20150201_grid_T.nc").write_bytes(b"T")
+        nemo_cmd.gather.gather(
+            results_dir, layout="{run_id}/{yyyy}/{mm}/", run_id="foo"
+        )
+        assert (results_dir / "namelist_cfg").exists()
+        assert (
+            results_dir / "foo/2015/01/SalishSea_1h_20150102_20150102_grid_W.nc"
+        ).read_bytes() == b"grid_W"
+        assert (
+            results_dir / "foo/2015/02/SalishSea_1d_20150201_20150201_grid_T.nc"
+        ).read_bytes() == b"T"
+        assert sorted(p.name for p in results_dir.iterdir()) == ["foo", "namelist_cfg"]
+
+    def test_resume_interrupted_layout_keep_source(self, tmp_path, monkeypatch):
+        run_dir = tmp_path / "run_dir"
+        run_dir.mkdir()
+        grid_T = "SalishSea_1h_20150102_20150102_grid_T.nc"
+        grid_U = "SalishSea_1h_20150102_20150102_grid_U.nc"
+        (run_dir / grid_T).write_bytes(b"grid_T")
+        (run_dir / grid_U).write_bytes(b"grid_U" * 10)
+        monkeypatch.chdir(run_dir)
+        results_dir = tmp_path / "results_dir"
+        subdir = results_dir / "foo/2015/01"
+        subdir.mkdir(parents=True)
+        # An earlier --keep-source gather was interrupted after grid_T was
+        # copied and while grid_U was being copied
+        (subdir / grid_T).write_bytes(b"grid_T")
+        journal = nemo_cmd.transfer.Journal(results_dir / nemo_cmd.transfer.JOURNAL)
+        copy = nemo_cmd.transfer.FileCopy(run_dir / grid_T, subdir / grid_T, 6)
+        journal.record("started", copy, 6)
+        journal.record("verified", copy)
+        copy = nemo_cmd.transfer.FileCopy(
+            run_dir / grid_U,
+            subdir / grid_U,
+            60,
+            src_mtime_ns=(run_dir / grid_U).stat().st_mtime_ns,
+        )
+        journal.record("started", copy, 30)
+        journal.record("range", copy, 0)
+        copy.tmp_path.write_bytes(b"grid_U" * 5)
+        # Combined by nemo combine after the interruption
+        (results_dir / "SalishSea_1d_20150101_20150101_grid_V.nc").write_bytes(b"V")
+
+        def mock_rename(src, dest):
+            if not src.endswith(".part"):
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+            os_rename(src, dest)
+
+        os_rename = os.rename
+        monkeypatch.setattr(nemo_cmd.transfer.os, "rename", mock_rename)
+        nemo_cmd.gather.gather(
+            results_dir,
+            keep_source=True,
+            layout="{run_id}/{yyyy}/{mm}/",
+            run_id="foo",
+        )
+        assert sorted(p.name for p in run_dir.iterdir()) == [grid_T, grid_U]
+        assert (subdir / grid_T).read_bytes() == b"grid_T"
+        assert (subdir / grid_U).read_bytes() == b"grid_U" * 10
+        assert (
+            results_dir / "foo/2015/01/SalishSea_1d_20150101_20150101_grid_V.nc"
+        ).read_bytes() == b"V"
+        assert sorted(p.name for p in results_dir.iterdir()) == ["foo"]
+        assert sorted(p.name for p in subdir.iterdir()) == sorted(
+            [grid_T, grid_U, "SalishSea_1d_20150101_20150101_grid_V.nc"]
+        )
@@ -0,0 +1,78 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""NEMO-Cmd land processor elimination tables unit tests"""
+
+import os
+
+import pytest
+
+from nemo_cmd import lpe
+
+
+@pytest.fixture
+def lpe_csv(tmp_path):
+    lpe_csv = tmp_path / "bathymetry.csv"
+    lpe_csv.write_text("1,1,1\n8,18,88\n4,4,16\n2,8,14\n4,4,99\n\n")
+    return lpe_csv
+
+
+class TestLPETable:
+    """Unit tests for LPETable class."""
+
+    def test_from_csv(self, lpe_csv):
+        table = lpe.LPETable.from_csv(lpe_csv)
+        # First line for a decomposition wins
+        assert table.n_processors == {(1, 1): 1, (8, 18): 88, (4, 4): 16, (2, 8): 14}
+
+    @pytest.mark.parametrize(
+        "jpni, jpnj, expected", [(8, 18, 88), (4, 4, 16), (3, 3, None)]
+    )
+    def test_lookup(self, jpni, jpnj, expected, lpe_csv):
+        table = lpe.LPETable.from_csv(lpe_csv)
+        assert table.lookup(jpni, jpnj) == expected
+
+    @pytest.mark.parametrize(
+        "max_processors, expected",
+        [
+            (0, []),
+            (14, [(1, 1, 1), (2, 8, 14)]),
+            (16, [(1, 1, 1), (2, 8, 14), (4, 4, 16)]),
+            (100, [(1, 1, 1), (2, 8, 14), (4, 4, 16), (8, 18, 88)]),
+        ],
+    )
+    def test_at_most(self, max_processors, expected, lpe_csv):
+        table = lpe.LPETable.from_csv(lpe_csv)
+        assert table.at_most(max_processors) == expected
+
+
+class TestLoadLPETable:
+    """Unit tests for load_lpe_table function."""
+
+    def test_cached(self, lpe_csv):
+        table = lpe.load_lpe_table(lpe_csv)
+        assert lpe.load_lpe_table(lpe_csv) is table
+
+    def test_reload_changed_file(self, lpe_csv):
+        table = lpe.load_lpe_table(lpe_csv)
+        lpe_csv.write_text("8,18,80\n")
+        stat = lpe_csv.stat()
+        os.utime(lpe_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        reloaded = lpe.load_lpe_table(lpe_csv)
+        assert reloaded is not table
+        assert reloaded.lookup(8, 18) == 80
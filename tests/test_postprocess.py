@@ -0,0 +1,250 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""NEMO-Cmd postprocess sub-command plug-in unit tests"""
+
+import itertools
+from pathlib import Path
+from types import SimpleNamespace
+
+import attr
+import pytest
+
+import nemo_cmd.main
+import nemo_cmd.postprocess
+import nemo_cmd.transfer
+
+
+@pytest.fixture
+def postprocess_cmd():
+    return nemo_cmd.postprocess.Postprocess(nemo_cmd.main.NEMO_App, [])
+
+
+@attr.s
+class MockDeflateJob(object):
+    """Deflation job that copies the file instead of running nccopy."""
+
+    pids = itertools.count(1)
+
+    filepath = attr.ib()
+    output_dir = attr.ib(default=None)
+    returncode = attr.ib(default=None)
+    pid = attr.ib(default=None)
+    process = attr.ib(default=None)
+
+    def start(self):
+        self.pid = next(self.pids)
+        self.process = SimpleNamespace(communicate=lambda: ("nccopy error", None))
+
+    @property
+    def done(self):
+        if b"bad" in Path(self.filepath).read_bytes():
+            self.returncode = 1
+            return True
+        self.returncode = 0
+        dest = self.output_dir / Path(self.filepath).name
+        dest.write_bytes(b"deflated " + Path(self.filepath).read_bytes())
+        Path(self.filepath).unlink()
+        return True
+
+
+@pytest.fixture
+def run_dir(tmp_path, monkeypatch):
+    run_dir = tmp_path / "run_dir"
+    run_dir.mkdir()
+    (run_dir / "nemo.yaml").write_text("run_id: foo\n")
+    monkeypatch.chdir(run_dir)
+    monkeypatch.setattr(nemo_cmd.postprocess, "DeflateJob", MockDeflateJob)
+    monkeypatch.setattr(nemo_cmd.postprocess.time, "sleep", lambda seconds: None)
+    return run_dir
+
+
+class TestParser:
+    """Unit tests for `nemo postprocess` sub-command command-line parser."""
+
+    def test_get_parser(self, postprocess_cmd):
+        parser = postprocess_cmd.get_parser("nemo postprocess")
+        assert parser.prog == "nemo postprocess"
+
+    def test_parsed_args_defaults(self, postprocess_cmd):
+        parser = postprocess_cmd.get_parser("nemo postprocess")
+        parsed_args = parser.parse_args(["nemo.yaml", "/results/"])
+        assert parsed_args.run_desc_file == Path("nemo.yaml")
+        assert parsed_args.results_dir == Path("/results/")
+        assert parsed_args.combine_jobs is None
+        assert parsed_args.threads is None
+        assert parsed_args.deflate_jobs is None
+        assert parsed_args.transfer_jobs == nemo_cmd.transfer.DEFAULT_MAX_WORKERS
+        assert not parsed_args.no_deflate
+        assert parsed_args.add_mode is None
+        assert parsed_args.group is None
+
+    @pytest.mark.parametrize(
+        "option", ["--combine-jobs", "--threads", "--deflate-jobs", "--transfer-jobs"]
+    )
+    @pytest.mark.parametrize("value", ["0", "-1"])
+    def test_non_positive_int(self, option, value, postprocess_cmd):
+        parser = postprocess_cmd.get_parser("nemo postprocess")
+        with pytest.raises(SystemExit):
+            parser.parse_args(["nemo.yaml", "/results/", option, value])
+
+    def test_parsed_args_budgets(self, postprocess_cmd):
+        parser = postprocess_cmd.get_parser("nemo postprocess")
+        parsed_args = parser.parse_args(
+            [
+                "nemo.yaml",
+                "/results/",
+                "--combine-jobs",
+                "2",
+                "--deflate-jobs",
+                "6",
+                "--transfer-jobs",
+                "4",
+                "--add-mode",
+                "064",
+            ]
+        )
+        assert parsed_args.combine_jobs == 2
+        assert parsed_args.deflate_jobs == 6
+        assert parsed_args.transfer_jobs == 4
+        assert parsed_args.add_mode == 0o064
+
+
+class TestTakeAction:
+    """Unit test for `nemo postprocess` sub-command take_action() method."""
+
+    def test_take_action(self, postprocess_cmd, monkeypatch):
+        calls = []
+        monkeypatch.setattr(
+            nemo_cmd.postprocess,
+            "postprocess",
+            lambda *args, **kwargs: calls.append((args, kwargs)),
+        )
+        parsed_args = SimpleNamespace(
+            run_desc_file=Path("nemo.yaml"),
+            results_dir=Path("results"),
+            combine_jobs=None,
+            threads=None,
+            deflate_jobs=2,
+            transfer_jobs=8,
+            no_deflate=False,
+            add_mode=None,
+            group=None,
+        )
+        postprocess_cmd.take_action(parsed_args)
+        assert calls == [
+            (
+                (Path("nemo.yaml"), Path("results")),
+                {
+                    "max_combine_jobs": None,
+                    "n_threads": None,
+                    "max_deflate_jobs": 2,
+                    "max_transfer_jobs": 8,
+                    "no_deflate": False,
+                    "add_mode": None,
+                    "group": None,
+                },
+            )
+        ]
+
+
+class TestPipeline:
+    """Unit tests for Pipeline class."""
+
+    @pytest.mark.parametrize(
+        "name, expected",
+        [
+            ("SalishSea_1h_20150101_20150101_grid_T.nc", True),
+            ("SalishSea_1d_20150101_20150101_ptrc_T.nc", True),
+            ("SalishSea_00002160_restart.nc", False),
+        ],
+    )
+    def test_is_deflated(self, name, expected):
+        pipeline = nemo_cmd.postprocess.Pipeline(Path("results"))
+        assert pipeline.is_deflated(name) == expected
+
+    def test_no_deflate(self):
+        pipeline = nemo_cmd.postprocess.Pipeline(Path("results"), deflate_patterns=())
+        assert not pipeline.is_deflated("SalishSea_1h_20150101_20150101_grid_T.nc")
+
+
+class TestPostprocess:
+    """Unit tests for postprocess function."""
+
+    def test_postprocess(self, run_dir, tmp_path):
+        (run_dir / "SalishSea_1h_20150101_20150101_grid_T_0000.nc").write_bytes(b"T")
+        (run_dir / "SalishSea_00002160_restart_0000.nc").write_bytes(b"restart")
+        (run_dir / "namelist_cfg").write_text("&namrun\n/\n")
+        (run_dir / "nemo.exe").symlink_to(tmp_path / "nemo.exe")
+        results_dir = tmp_path / "results_dir"
+        nemo_cmd.postprocess.postprocess(
+            Path("nemo.yaml"), results_dir, max_deflate_jobs=2
+        )
+        assert list(run_dir.iterdir()) == []
+        assert (
+            results_dir / "SalishSea_1h_20150101_20150101_grid_T.nc"
+        ).read_bytes() == b"deflated T"
+        assert (
+            results_dir / "SalishSea_00002160_restart.nc"
+        ).read_bytes() == b"restart"
+        assert (results_dir / "namelist_cfg").exists()
+        assert (results_dir / "nemo.yaml").exists()
+
+    def test_no_deflate(self, run_dir, tmp_path):
+        (run_dir / "SalishSea_1h_20150101_20150101_grid_T_0000.nc").write_bytes(b"T")
+        results_dir = tmp_path / "results_dir"
+        nemo_cmd.postprocess.postprocess(
+            Path("nemo.yaml"), results_dir, no_deflate=True
+        )
+        assert (
+            results_dir / "SalishSea_1h_20150101_20150101_grid_T.nc"
+        ).read_bytes() == b"T"
+
+    def test_resume_deflates_combined_files(self, run_dir, tmp_path):
+        # Left by an interrupted postprocess
+        (run_dir / "SalishSea_1h_20150101_20150101_grid_U.nc").write_bytes(b"U")
+        results_dir = tmp_path / "results_dir"
+        nemo_cmd.postprocess.postprocess(Path("nemo.yaml"), results_dir)
+        assert list(run_dir.iterdir()) == []
+        assert (
+            results_dir / "SalishSea_1h_20150101_20150101_grid_U.nc"
+        ).read_bytes() == b"deflated U"
+
+    def test_failed_deflation(self, run_dir, tmp_path):
+        (run_dir / "SalishSea_1h_20150101_20150101_grid_T_0000.nc").write_bytes(b"bad")
+        results_dir = tmp_path / "results_dir"
+        with pytest.raises(SystemExit):
+            nemo_cmd.postprocess.postprocess(Path("nemo.yaml"), results_dir)
+        # The undeflated file is gathered
+        assert (
+            results_dir / "SalishSea_1h_20150101_20150101_grid_T.nc"
+        ).read_bytes() == b"bad"
+
+    def test_work_dir(self, run_dir, tmp_path, monkeypatch):
+        (run_dir / "SalishSea_1h_20150101_20150101_grid_T_0000.nc").write_bytes(b"T")
+        (run_dir / "namelist_cfg").write_text("&namrun\n/\n")
+        monkeypatch.chdir(tmp_path)
+        nemo_cmd.postprocess.postprocess(
+            Path("nemo.yaml"), Path("../results_dir"), work_dir=run_dir
+        )
+        assert list(run_dir.iterdir()) == []
+        results_dir = tmp_path / "results_dir"
+        assert (
+            results_dir / "SalishSea_1h_20150101_20150101_grid_T.nc"
+        ).read_bytes() == b"deflated T"
+        assert (results_dir / "namelist_cfg").exists()
@@ -18,17 +18,23 @@
 
 """NEMO-Cmd prepare sub-command plug-in unit tests"""
 
+import concurrent.futures
 from datetime import datetime
+import functools
 from pathlib import Path
+import subprocess
+import threading
 from unittest.mock import call, Mock, patch
 
 import arrow
 import attr
 import cliff.app
 from dateutil import tz
+import f90nml
 import git
 import pytest
 
+import nemo_cmd.forcing_checks
 import nemo_cmd.prepare
 
 
@@ -57,6 +63,7 @@ class TestParser:
         assert getattr(parsed_args, attr)
 
 
+@patch("nemo_cmd.prepare.RunDescription", spec=True)
 @patch("nemo_cmd.prepare.load_run_desc", spec=True)
 @patch("nemo_cmd.prepare.check_nemo_exec", autospec=True)
 @patch("nemo_cmd.prepare.check_xios_exec", autospec=True)
@@ -90,30 +97,168 @@ class TestPrepare:
         m_cxe,
         m_cne,
         m_lrd,
+        m_run_desc,
     ):
         m_cne.return_value = "nemo_bin_dir"
         m_cxe.return_value = "xios_bin_dir"
         run_dir = nemo_cmd.prepare.prepare(Path("run_desc.yaml"), nocheck_init=False)
+        # All stages share a path cache
+        path_cache = m_cne.call_args.kwargs["path_cache"]
+        assert isinstance(path_cache, nemo_cmd.PathCache)
         m_lrd.assert_called_once_with(Path("run_desc.yaml"))
-        m_cne.assert_called_once_with(m_lrd())
-        m_cne.assert_called_once_with(m_lrd())
+        m_run_desc.from_dict.assert_called_once_with(m_lrd.return_value)
+        run_desc = m_run_desc.from_dict.return_value
+        run_desc.validate.assert_called_once_with(path_cache)
+        m_cne.assert_called_once_with(run_desc, path_cache=path_cache)
+        m_cxe.assert_called_once_with(run_desc, path_cache=path_cache)
         m_resolved_path.assert_called_once_with(Path("run_desc.yaml"))
-        m_frns.assert_called_once_with(m_lrd())
-        m_mrd.assert_called_once_with(m_lrd())
-        m_mnl.assert_called_once_with(m_resolved_path().parent, m_lrd(), m_mrd())
+        m_frns.assert_called_once_with(run_desc, path_cache=path_cache)
+        m_mrd.assert_called_once_with(run_desc, path_cache=path_cache)
+        m_mnl.assert_called_once_with(
+            m_resolved_path().parent, run_desc, m_mrd(), path_cache=path_cache
+        )
         m_crsf.assert_called_once_with(
-            m_lrd(), Path("run_desc.yaml"), m_resolved_path().parent, m_mrd()
+            run_desc,
+            Path("run_desc.yaml"),
+            m_resolved_path().parent,
+            m_mrd(),
+            path_cache=path_cache,
         )
         m_mel.assert_called_once_with("nemo_bin_dir", m_mrd(), "xios_bin_dir")
-        m_mgl.assert_called_once_with(m_lrd(), m_mrd())
-        m_mfl.assert_called_once_with(m_lrd(), m_mrd())
-        m_mrl.assert_called_once_with(m_lrd(), m_mrd(), False)
+        m_mgl.assert_called_once_with(run_desc, m_mrd(), path_cache=path_cache)
+        m_mfl.assert_called_once_with(
+            run_desc, m_mrd(), namelists=m_mnl.return_value, path_cache=path_cache
+        )
+        m_mrl.assert_called_once_with(run_desc, m_mrd(), False)
         m_aaf.assert_called_once_with(
-            m_lrd(), Path("run_desc.yaml"), m_resolved_path().parent, m_mrd(), False
+            run_desc,
+            Path("run_desc.yaml"),
+            m_resolved_path().parent,
+            m_mrd(),
+            False,
+            path_cache=path_cache,
         )
-        m_rvr.assert_called_once_with(m_lrd(), m_mrd())
+        m_rvr.assert_called_once_with(run_desc, m_mrd())
         assert run_dir == m_mrd()
 
+    @patch("nemo_cmd.prepare.remove_run_dir", autospec=True)
+    def test_stage_failure(
+        self,
+        m_rm_run_dir,
+        m_aaf,
+        m_rvr,
+        m_mrl,
+        m_mfl,
+        m_mgl,
+        m_mel,
+        m_crsf,
+        m_mnl,
+        m_mrd,
+        m_resolved_path,
+        m_frns,
+        m_cxe,
+        m_cne,
+        m_lrd,
+        m_run_desc,
+    ):
+        m_mgl.side_effect = SystemExit(2)
+        with pytest.raises(SystemExit):
+            nemo_cmd.prepare.prepare(Path("run_desc.yaml"), nocheck_init=False)
+        m_rm_run_dir.assert_called_once_with(m_mrd())
+        assert not m_aaf.called
+
+    def test_forcing_links_after_namelists(
+        self,
+        m_aaf,
+        m_rvr,
+        m_mrl,
+        m_mfl,
+        m_mgl,
+        m_mel,
+        m_crsf,
+        m_mnl,
+        m_mrd,
+        m_resolved_path,
+        m_frns,
+        m_cxe,
+        m_cne,
+        m_lrd,
+        m_run_desc,
+    ):
+        m_mnl.side_effect = SystemExit(2)
+        with pytest.raises(SystemExit):
+            nemo_cmd.prepare.prepare(Path("run_desc.yaml"), nocheck_init=False)
+        assert not m_mfl.called
+
+    def test_loaded_run_desc(
+        self,
+        m_aaf,
+        m_rvr,
+        m_mrl,
+        m_mfl,
+        m_mgl,
+        m_mel,
+        m_crsf,
+        m_mnl,
+        m_mrd,
+        m_resolved_path,
+        m_frns,
+        m_cxe,
+        m_cne,
+        m_lrd,
+        m_run_desc,
+    ):
+        run_desc = {"run_id": "foo"}
+        nemo_cmd.prepare.prepare(
+            Path("run_desc.yaml"), nocheck_init=False, run_desc=run_desc
+        )
+        assert not m_lrd.called
+        m_run_desc.from_dict.assert_called_once_with(run_desc)
+        assert m_cne.call_args.args == (m_run_desc.from_dict.return_value,)
+
+    def test_invalid_run_desc(
+        self,
+        m_aaf,
+        m_rvr,
+        m_mrl,
+        m_mfl,
+        m_mgl,
+        m_mel,
+        m_crsf,
+        m_mnl,
+        m_mrd,
+        m_resolved_path,
+        m_frns,
+        m_cxe,
+        m_cne,
+        m_lrd,
+        m_run_desc,
+    ):
+        m_run_desc.from_dict.return_value.validate.side_effect = SystemExit(2)
+        with pytest.raises(SystemExit):
+            nemo_cmd.prepare.prepare(Path("run_desc.yaml"), nocheck_init=False)
+        assert not m_mrd.called
+
+
+class TestLoadRunDesc:
+    """Unit test for `nemo prepare` load_run_desc() function."""
+
+    def test_load_run_desc(self, tmp_path):
+        desc_file = tmp_path / "run_desc.yaml"
+        desc_file.write_text(
+            "run_id: foo\n"
+            "walltime: 1:02:03\n"
+            "paths:\n"
+            "  forcing: $HOME/NEMO-forcing/\n"
+        )
+        run_desc = nemo_cmd.prepare.load_run_desc(desc_file)
+        assert run_desc == {
+            "run_id": "foo",
+            # YAML 1.1 sexagesimal integer
+            "walltime": 3723,
+            "paths": {"forcing": "$HOME/NEMO-forcing/"},
+        }
+
 
 @patch("nemo_cmd.prepare.logger", autospec=True)
 @patch("nemo_cmd.prepare.remove_run_dir", autospec=True)
@@ -166,6 +311,18 @@ class TestGetRunDescValue:
         )
         assert value == m_resolved_path("bar")
 
+    def test_resolve_path_with_path_cache(self, m_rm_run_dir, m_logger, tmp_path):
+        run_desc = {"foo": {"bar": str(tmp_path)}, "baz": str(tmp_path)}
+        path_cache = nemo_cmd.PathCache()
+        for keys in (("foo", "bar"), ("baz",)):
+            value = nemo_cmd.prepare.get_run_desc_value(
+                run_desc, keys, resolve_path=True, path_cache=path_cache
+            )
+            assert value == tmp_path.resolve()
+        # Resolution and existence check of 1st lookup; same for 2nd
+        assert path_cache.misses == 2
+        assert path_cache.hits == 2
+
     @patch("nemo_cmd.prepare.resolved_path", spec=True)
     def test_resolved_path_does_not_exist(
         self, m_resolved_path, m_rm_run_dir, m_logger
@@ -282,6 +439,59 @@ class TestRemoveRunDir:
         assert not m_rmdir.called
 
 
+class TestRunConcurrently:
+    """Unit tests for `nemo prepare` _run_concurrently() function."""
+
+    def test_results_in_order(self):
+        results = nemo_cmd.prepare._run_concurrently([lambda: 1, lambda: 2, lambda: 3])
+        assert results == [1, 2, 3]
+
+    def test_system_exit_takes_precedence(self):
+        both_running = threading.Barrier(2)
+
+        def fail():
+            both_running.wait()
+            raise FileNotFoundError("run_dir")
+
+        def exit():
+            both_running.wait()
+            raise SystemExit(2)
+
+        with pytest.raises(SystemExit):
+            nemo_cmd.prepare._run_concurrently([fail, exit])
+
+    def test_pending_calls_cancelled(self):
+        calls = []
+        released = threading.Event()
+        shutdown = concurrent.futures.ThreadPoolExecutor.shutdown
+
+        def release_and_shutdown(executor, *args, **kwargs):
+            # The pending calls have been cancelled by the time the executor
+            # is shut down
+            released.set()
+            shutdown(executor, *args, **kwargs)
+
+        def running():
+            assert released.wait(timeout=10)
+            calls.append("running")
+
+        def exit():
+            raise SystemExit(2)
+
+        funcs = [running, exit] + [
+            functools.partial(calls.append, i) for i in range(100)
+        ]
+        with patch.object(
+            concurrent.futures.ThreadPoolExecutor,
+            "shutdown",
+            autospec=True,
+            side_effect=release_and_shutdown,
+        ):
+            with pytest.raises(SystemExit):
+                nemo_cmd.prepare._run_concurrently(funcs, max_workers=2)
+        assert calls == ["running"]
+
+
 class TestMakeNamelist:
     """Unit tests for `nemo prepare` _make_namelist() function."""
 
@@ -498,8 +708,16 @@ class TestMakeNamelist:
             nemo_cmd.prepare.make_namelists(
                 Path(p_run_set_dir), run_desc, Path(str(p_run_dir))
             )
+        # Alternate key spellings are normalized
         m_set_mpi_decomp.assert_called_once_with(
-            "namelist_cfg", run_desc, Path(str(p_run_dir))
+            "namelist_cfg",
+            nemo_cmd.prepare.RunDescription.from_dict(run_desc),
+            Path(str(p_run_dir)),
+            namelist_texts={
+                "namelist_cfg": "&namrun\n&end\n\n\n",
+                "namelist_top_cfg": "&namtrc\n&end\n\n\n",
+            },
+            path_cache=None,
         )
 
     @pytest.mark.parametrize(
@@ -570,6 +788,30 @@ class TestSetMpiDesomposition:
         assert m_logger.error.called
         m_rm_run_dir.assert_called_once_with(Path("run_dir"))
 
+    @patch("nemo_cmd.prepare.get_n_processors", return_value=144, spec=True)
+    def test_namelist_text(self, m_get_n_procs, m_logger):
+        run_desc = {"MPI decomposition": "8x18"}
+        namelist_texts = {"namelist_cfg": "&nammpp\n    jpni = 1 ! i\n/\n"}
+        namelist = nemo_cmd.prepare.set_mpi_decomposition(
+            "namelist_cfg", run_desc, Path("run_dir"), namelist_texts=namelist_texts
+        )
+        assert namelist_texts["namelist_cfg"] == (
+            "&nammpp\n    jpni = 8 ! i\n    jpnij = 144\n    jpnj = 18\n/\n"
+        )
+        assert namelist["nammpp"] == {"jpni": 8, "jpnj": 18, "jpnij": 144}
+
+    @patch("nemo_cmd.prepare.get_n_processors", return_value=144, spec=True)
+    def test_namelist_file(self, m_get_n_procs, m_logger, tmp_path):
+        run_desc = {"MPI decomposition": "8x18"}
+        (tmp_path / "namelist_cfg").write_text("&nammpp\n    jpni = 1\n/\n")
+        (tmp_path / "namelist_cfg").chmod(0o640)
+        namelist = nemo_cmd.prepare.set_mpi_decomposition(
+            "namelist_cfg", run_desc, tmp_path
+        )
+        assert f90nml.read(tmp_path / "namelist_cfg") == namelist
+        assert namelist["nammpp"]["jpnij"] == 144
+        assert (tmp_path / "namelist_cfg").stat().st_mode & 0o777 == 0o640
+
     @patch("nemo_cmd.prepare.get_n_processors", spec=True)
     @patch("nemo_cmd.prepare._patch_namelist", autospec=True)
     def test_set_mpi_decomposition(self, m_patch_nml, m_get_n_procs, m_logger):
@@ -577,7 +819,9 @@ class TestSetMpiDesomposition:
         nemo_cmd.prepare.set_mpi_decomposition(
             "namelist_cfg", run_desc, Path("run_dir")
         )
-        m_get_n_procs.assert_called_once_with(run_desc, Path("run_dir"))
+        m_get_n_procs.assert_called_once_with(
+            run_desc, Path("run_dir"), path_cache=None
+        )
         m_patch_nml.assert_called_once_with(
             Path("run_dir") / "namelist_cfg",
             {"nammpp": {"jpni": 8, "jpnj": 18, "jpnij": m_get_n_procs()}},
@@ -707,7 +951,9 @@ class TestCopyRunSetFiles:
             call(str(pwd / "domain_def.xml"), str(Path("run_dir") / "domain_def.xml")),
             call(str(pwd / "field_def.xml"), str(Path("run_dir") / "field_def.xml")),
         ]
-        assert m_copy.call_args_list == expected
+        # The files are copied concurrently
+        assert m_copy.call_count == len(expected)
+        m_copy.assert_has_calls(expected, any_order=True)
 
     @pytest.mark.parametrize(
         "iodefs_key, domains_key, fields_key",
@@ -749,7 +995,9 @@ class TestCopyRunSetFiles:
             ),
             call(str(pwd / "field_def.xml"), str(Path("run_dir") / "field_def.xml")),
         ]
-        assert m_copy.call_args_list == expected
+        # The files are copied concurrently
+        assert m_copy.call_count == len(expected)
+        m_copy.assert_has_calls(expected, any_order=True)
 
     @pytest.mark.parametrize(
         "iodefs_key, domains_key, fields_key",
@@ -793,7 +1041,9 @@ class TestCopyRunSetFiles:
                 str(Path("run_dir") / "field_def.xml"),
             ),
         ]
-        assert m_copy.call_args_list == expected
+        # The files are copied concurrently
+        assert m_copy.call_count == len(expected)
+        m_copy.assert_has_calls(expected, any_order=True)
 
     @pytest.mark.parametrize(
         "iodefs_key, domains_key, fields_key",
@@ -839,7 +1089,9 @@ class TestCopyRunSetFiles:
                 str(Path("run_dir") / "field_def.xml"),
             ),
         ]
-        assert m_copy.call_args_list == expected
+        # The files are copied concurrently
+        assert m_copy.call_count == len(expected)
+        m_copy.assert_has_calls(expected, any_order=True)
 
     @patch("nemo_cmd.prepare.shutil.copy2", autospec=True)
     @patch("nemo_cmd.prepare._set_xios_server_mode", autospec=True)
@@ -866,8 +1118,11 @@ class TestCopyRunSetFiles:
             (pwd / "../file_def.xml").resolve(),
         )
         nemo_cmd.prepare.copy_run_set_files(run_desc, desc_file, pwd, Path("run_dir"))
-        assert m_copy.call_args_list[-1] == call(
-            str(pwd.parent / "file_def.xml"), str(Path("run_dir") / "file_def.xml")
+        assert (
+            call(
+                str(pwd.parent / "file_def.xml"), str(Path("run_dir") / "file_def.xml")
+            )
+            in m_copy.call_args_list
         )
 
     @patch("nemo_cmd.prepare.shutil.copy2", autospec=True)
@@ -897,8 +1152,12 @@ class TestCopyRunSetFiles:
         nemo_cmd.prepare.copy_run_set_files(
             run_desc, desc_file, pwd, Path("run_dir"), agrif_n=1
         )
-        assert m_copy.call_args_list[-1] == call(
-            str(pwd.parent / "1_file_def.xml"), str(Path("run_dir") / "1_file_def.xml")
+        assert (
+            call(
+                str(pwd.parent / "1_file_def.xml"),
+                str(Path("run_dir") / "1_file_def.xml"),
+            )
+            in m_copy.call_args_list
         )
 
 
@@ -1080,8 +1339,8 @@ class TestMakeForcingLinks:
         )
         m_rm_run_dir.assert_called_once_with(Path("run_dir"))
 
-    @patch("nemo_cmd.prepare._check_atmospheric_forcing_link", autospec=True)
-    def test_link_checker(self, m_chk_atmos_frc_link, tmpdir):
+    @patch("nemo_cmd.prepare._check_forcing_links", autospec=True)
+    def test_link_checker(self, m_chk_frc_links, tmpdir):
         p_nemo_forcing = tmpdir.ensure_dir("NEMO-forcing")
         p_atmos_ops = tmpdir.ensure_dir(
             "results/forcing/atmospheric/GEM2.5/operational"
@@ -1101,8 +1360,8 @@ class TestMakeForcingLinks:
         patch_symlink_to = patch("nemo_cmd.prepare.Path.symlink_to", autospec=True)
         with patch_symlink_to as m_symlink_to:
             nemo_cmd.prepare.make_forcing_links(run_desc, Path("run_dir"))
-        m_chk_atmos_frc_link.assert_called_once_with(
-            Path("run_dir"), Path(p_atmos_ops), "namelist_cfg"
+        m_chk_frc_links.assert_called_once_with(
+            Path("run_dir"), [(Path(p_atmos_ops), "atmospheric", "namelist_cfg")], None
         )
 
     @patch("nemo_cmd.prepare.remove_run_dir", autospec=True)
@@ -1159,6 +1418,102 @@ class TestResolveForcingPath:
         assert path == Path("/foo/bar")
 
 
+class TestCheckForcingLinks:
+    """Unit tests for `nemo prepare` _check_forcing_links() function."""
+
+    QTYS = "sn_wndi sn_wndj sn_qsr sn_qlw sn_tair sn_humi sn_prec sn_snow".split()
+
+    @pytest.fixture
+    def run_dir(self, tmp_path):
+        atmos_dir = tmp_path / "atmos"
+        atmos_dir.mkdir()
+        (atmos_dir / "no_snow.nc").write_bytes(b"")
+        rivers_dir = tmp_path / "rivers"
+        rivers_dir.mkdir()
+        run_dir = tmp_path / "run_dir"
+        run_dir.mkdir()
+        (run_dir / "NEMO-atmos").symlink_to(atmos_dir)
+        (run_dir / "rivers").symlink_to(rivers_dir)
+        sn_params = {
+            qty: ["ops", 1, "x", True, False, "daily", "", "", ""] for qty in self.QTYS
+        }
+        sn_params["sn_snow"] = ["no_snow", -12, "x", True, True, "yearly", "", "", ""]
+        namelist = {
+            "namrun": {"nn_date0": 20150101, "nn_it000": 1, "nn_itend": 2160},
+            "namdom": {"rn_rdt": 40.0},
+            "namsbc": {"ln_blk_core": True, "ln_apr_dyn": False, "ln_rnf": True},
+            "namsbc_core": {"cn_dir": "NEMO-atmos/", **sn_params},
+            "namsbc_rnf": {
+                "cn_dir": "rivers/",
+                "sn_rnf": ["R201702", 24, "rorunoff", True, False, "daily"],
+            },
+        }
+        f90nml.write(namelist, run_dir / "namelist_cfg")
+        return run_dir
+
+    def test_all_files_present(self, run_dir):
+        for day in ("y2014m12d31", "y2015m01d01"):
+            (run_dir / "NEMO-atmos" / f"ops_{day}.nc").write_bytes(b"")
+        nemo_cmd.prepare._check_forcing_links(
+            run_dir, [(Path("/atmos"), "atmospheric", "namelist_cfg")]
+        )
+        assert run_dir.exists()
+
+    def test_all_missing_files_reported(self, run_dir, caplog):
+        (run_dir / "rivers" / "R201702_y2014m12d31.nc").write_bytes(b"")
+        link_checks = [
+            (Path("/atmos"), "atmospheric", "namelist_cfg"),
+            (Path("/rivers"), "rivers", "namelist_cfg"),
+        ]
+        with pytest.raises(SystemExit):
+            nemo_cmd.prepare._check_forcing_links(run_dir, link_checks)
+        # The 7 daily quantities share a file name root
+        assert caplog.messages[:2] == [
+            "NEMO-atmos/ops_y2014m12d31.nc not found",
+            "NEMO-atmos/ops_y2015m01d01.nc not found",
+        ]
+        assert caplog.messages[2].startswith(
+            "2 atmospheric forcing files not found; "
+            "please confirm that atmospheric forcing files for 2014-12-31 through "
+            "2015-01-01 are in the /atmos collection"
+        )
+        assert caplog.messages[3] == "rivers/R201702_y2015m01d01.nc not found"
+        assert caplog.messages[4].startswith("1 rivers forcing files not found")
+        assert not run_dir.exists()
+
+    def test_directories_listed_once(self, run_dir, monkeypatch):
+        listed = []
+        list_dir_names = nemo_cmd.forcing_checks.list_dir_names
+        monkeypatch.setattr(
+            nemo_cmd.forcing_checks,
+            "list_dir_names",
+            lambda dir_path: listed.append(dir_path) or list_dir_names(dir_path),
+        )
+        link_checks = [
+            (Path("/atmos"), "atmospheric", "namelist_cfg"),
+            (Path("/rivers"), "rivers", "namelist_cfg"),
+        ]
+        with pytest.raises(SystemExit):
+            nemo_cmd.prepare._check_forcing_links(run_dir, link_checks)
+        assert sorted(listed) == [run_dir / "NEMO-atmos", run_dir / "rivers"]
+
+    def test_parsed_namelist_used(self, run_dir):
+        namelists = {"namelist_cfg": f90nml.read(run_dir / "namelist_cfg")}
+        namelists["namelist_cfg"]["namsbc"]["ln_blk_core"] = False
+        (run_dir / "namelist_cfg").unlink()
+        nemo_cmd.prepare._check_forcing_links(
+            run_dir, [(Path("/atmos"), "atmospheric", "namelist_cfg")], namelists
+        )
+
+    def test_blk_core_false(self, run_dir):
+        namelist = f90nml.read(run_dir / "namelist_cfg")
+        namelist["namsbc"]["ln_blk_core"] = False
+        namelist.write(run_dir / "namelist_cfg", force=True)
+        nemo_cmd.prepare._check_forcing_links(
+            run_dir, [(Path("/atmos"), "atmospheric", "namelist_cfg")]
+        )
+
+
 class TestMakeRestartLinks:
     """Unit tests for `salishsea prepare` make_restart_links() function."""
 
@@ -1268,10 +1623,109 @@ class TestRecordVcsRevision:
         assert m_write.call_args_list[-1] == call(
             Path(str(nemo_code_repo)),
             Path("tmp_run_dir"),
-            nemo_cmd.prepare.get_hg_revision,
+            nemo_cmd.prepare.get_hg_plumbing_revision,
         )
 
 
+@pytest.fixture
+def git_repo(tmp_path, monkeypatch):
+    repo = tmp_path / "NEMO-3.6-code"
+    (repo / "CONFIG").mkdir(parents=True)
+    (repo / "CONFIG" / "cfg.txt").write_text("SalishSea\n")
+    (repo / "README").write_text("NEMO\n")
+    for var in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{var}_NAME", "Foo Bar")
+        monkeypatch.setenv(f"GIT_{var}_EMAIL", "foo@example.com")
+
+    _git(repo, "init", "-q")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-q", "-m", "Initial commit")
+    return repo
+
+
+def _git(repo, *args):
+    return subprocess.run(
+        ["git", "-C", str(repo), *args],
+        check=True,
+        capture_output=True,
+        universal_newlines=True,
+    ).stdout
+
+
+class TestWriteRepoRevFile:
+    """Unit tests for `nemo prepare` write_repo_rev_file() function."""
+
+    @pytest.fixture(autouse=True)
+    def cache_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    @patch("nemo_cmd.prepare._repo_state", return_value={"commit": "abc"})
+    def test_cached_lines_reused(self, m_repo_state, tmp_path):
+        vcs_func = Mock(return_value=["commit: abc"])
+        for run_dir in (tmp_path / "run_1", tmp_path / "run_2"):
+            run_dir.mkdir()
+            nemo_cmd.prepare.write_repo_rev_file(tmp_path / "NEMO", run_dir, vcs_func)
+            assert (run_dir / "NEMO_rev.txt").read_text() == "commit: abc\n"
+        assert vcs_func.call_count == 1
+
+    @patch("nemo_cmd.prepare._repo_state")
+    def test_changed_state(self, m_repo_state, tmp_path):
+        vcs_func = Mock(side_effect=[["commit: abc"], ["commit: def"]])
+        m_repo_state.side_effect = [{"commit": "abc"}, {"commit": "def"}]
+        nemo_cmd.prepare.write_repo_rev_file(tmp_path / "NEMO", tmp_path, vcs_func)
+        nemo_cmd.prepare.write_repo_rev_file(tmp_path / "NEMO", tmp_path, vcs_func)
+        assert (tmp_path / "NEMO_rev.txt").read_text() == "commit: def\n"
+
+    @patch("nemo_cmd.prepare._repo_state", return_value=None)
+    def test_unknown_state_not_cached(self, m_repo_state, tmp_path):
+        vcs_func = Mock(return_value=["commit: abc"])
+        nemo_cmd.prepare.write_repo_rev_file(tmp_path / "NEMO", tmp_path, vcs_func)
+        nemo_cmd.prepare.write_repo_rev_file(tmp_path / "NEMO", tmp_path, vcs_func)
+        assert vcs_func.call_count == 2
+        assert not (tmp_path / "cache" / "nemo_cmd").exists()
+
+
+class TestGitRepoState:
+    """Unit tests for `nemo prepare` _git_repo_state() function."""
+
+    def test_clean_repo(self, git_repo):
+        state = nemo_cmd.prepare._git_repo_state(git_repo / "CONFIG")
+        assert state["commit"] == _git(git_repo, "rev-parse", "HEAD").strip()
+
+    def test_uncommitted_changes(self, git_repo):
+        (git_repo / "README").write_text("NEMO-3.6\n")
+        assert nemo_cmd.prepare._git_repo_state(git_repo) is None
+
+    def test_ignored_changes(self, git_repo):
+        (git_repo / "CONFIG" / "cfg.txt").write_text("SalishSea OPA_SRC\n")
+        assert nemo_cmd.prepare._git_repo_state(git_repo) is not None
+
+    def test_new_commit(self, git_repo):
+        state = nemo_cmd.prepare._git_repo_state(git_repo)
+        _git(git_repo, "commit", "-q", "--allow-empty", "-m", "Empty commit")
+        assert nemo_cmd.prepare._git_repo_state(git_repo) != state
+
+    def test_new_tag(self, git_repo):
+        state = nemo_cmd.prepare._git_repo_state(git_repo)
+        _git(git_repo, "tag", "v1")
+        assert nemo_cmd.prepare._git_repo_state(git_repo) != state
+
+    def test_packed_refs(self, git_repo):
+        _git(git_repo, "pack-refs", "--all")
+        state = nemo_cmd.prepare._git_repo_state(git_repo)
+        assert len(state["commit"]) == 40
+
+    @pytest.mark.parametrize("pack_refs", [True, False])
+    def test_unborn_branch(self, pack_refs, git_repo):
+        if pack_refs:
+            _git(git_repo, "pack-refs", "--all")
+        _git(git_repo, "checkout", "-q", "--orphan", "unborn")
+        assert nemo_cmd.prepare._git_repo_state(git_repo) is None
+
+    def test_not_a_repo(self, tmp_path):
+        assert nemo_cmd.prepare._git_repo_state(tmp_path) is None
+
+
 @attr.s
 class MockGitDiff:
     a_path = attr.ib()
@@ -1709,6 +2163,168 @@ class TestGetHgRevision:
         assert repo_rev_file_lines[-2:] == expected
 
 
+class TestGetGitPlumbingRevision:
+    """Unit tests for `nemo prepare` get_git_plumbing_revision() function."""
+
+    @pytest.fixture
+    def two_commit_repo(self, git_repo, monkeypatch):
+        monkeypatch.setenv("GIT_AUTHOR_DATE", "2019-10-23T12:30:43-07:00")
+        (git_repo / "CONFIG" / "cfg.txt").write_text("SalishSea OPA_SRC\n")
+        _git(git_repo, "mv", "README", "README.rst")
+        (git_repo / "LICENSE").write_text("Apache-2.0\n")
+        _git(git_repo, "add", ".")
+        _git(git_repo, "commit", "-q", "-m", "Add license\n\nAnd rename README")
+        return git_repo
+
+    def test_non_existent_repo(self, caplog, tmp_path):
+        git_repo = tmp_path / "git-repo"
+        repo_rev_file_lines = nemo_cmd.prepare.get_git_plumbing_revision(
+            git_repo, tmp_path / "tmp_run_dir"
+        )
+        assert repo_rev_file_lines == []
+        expected = f"revision and status requested for non-existent repo: {git_repo}"
+        assert caplog.messages[0] == expected
+
+    def test_repo_root_not_found(self, caplog, tmp_path):
+        git_repo = tmp_path / "git-repo"
+        git_repo.mkdir()
+        with pytest.raises(SystemExit):
+            nemo_cmd.prepare.get_git_plumbing_revision(
+                git_repo, tmp_path / "tmp_run_dir"
+            )
+        assert caplog.records[0].levelname == "ERROR"
+        expected = f"unable to find Git repo root in or above {git_repo}"
+        assert caplog.messages[0] == expected
+
+    def test_same_as_gitpython(self, two_commit_repo, tmp_path):
+        repo_rev_file_lines = nemo_cmd.prepare.get_git_plumbing_revision(
+            two_commit_repo / "CONFIG", tmp_path / "tmp_run_dir"
+        )
+        expected = nemo_cmd.prepare.get_git_revision(
+            two_commit_repo / "CONFIG", tmp_path / "tmp_run_dir"
+        )
+        assert repo_rev_file_lines == expected
+        assert repo_rev_file_lines[2:5] == [
+            "author: Foo Bar",
+            "date:   Wed Oct 23 12:30:43 2019 -07:00",
+            "files:  CONFIG/cfg.txt LICENSE README.rst",
+        ]
+
+    def test_uncommitted_changes_same_as_gitpython(
+        self, two_commit_repo, tmp_path, caplog
+    ):
+        (two_commit_repo / "CONFIG" / "cfg.txt").write_text("SalishSea\n")
+        (two_commit_repo / "LICENSE").unlink()
+        (two_commit_repo / "README.rst").write_text("NEMO-3.6\n")
+        repo_rev_file_lines = nemo_cmd.prepare.get_git_plumbing_revision(
+            two_commit_repo, tmp_path / "tmp_run_dir"
+        )
+        expected = nemo_cmd.prepare.get_git_revision(
+            two_commit_repo, tmp_path / "tmp_run_dir"
+        )
+        assert repo_rev_file_lines == expected
+        assert repo_rev_file_lines[-3:] == [
+            "uncommitted changes:",
+            "D LICENSE",
+            "M README.rst",
+        ]
+        expected = f"There are uncommitted changes in {two_commit_repo}"
+        assert caplog.messages[0] == expected
+
+    def test_tags(self, two_commit_repo, tmp_path):
+        _git(two_commit_repo, "tag", "v1")
+        _git(two_commit_repo, "tag", "-a", "-m", "Release 2", "v2")
+        repo_rev_file_lines = nemo_cmd.prepare.get_git_plumbing_revision(
+            two_commit_repo, tmp_path / "tmp_run_dir"
+        )
+        assert repo_rev_file_lines[2:4] == ["tag:    v1", "tag:    v2"]
+
+
+class TestGetHgPlumbingRevision:
+    """Unit tests for `nemo prepare` get_hg_plumbing_revision() function."""
+
+    @pytest.fixture
+    def hg_repo(self, tmp_path):
+        hg_repo = tmp_path / "hg-repo"
+        (hg_repo / ".hg").mkdir(parents=True)
+        (hg_repo / "CONFIG").mkdir()
+        return hg_repo
+
+    @staticmethod
+    def mock_vcs_output(log, status=""):
+        def _vcs_output(args, env=None):
+            assert env["HGPLAIN"] == "1"
+            return log if "log" in args else status
+
+        return _vcs_output
+
+    def test_repo_root_not_found(self, caplog, tmp_path):
+        hg_repo = tmp_path / "hg-repo"
+        hg_repo.mkdir()
+        with pytest.raises(SystemExit):
+            nemo_cmd.prepare.get_hg_plumbing_revision(hg_repo, tmp_path / "tmp_run_dir")
+        expected = f"unable to find Mercurial repo root in or above {hg_repo}"
+        assert caplog.messages[0] == expected
+
+    def test_repo_rev_file_lines(self, hg_repo, tmp_path, monkeypatch):
+        timestamp = arrow.get("2019-10-25 19:30:43").int_timestamp
+        log = (
+            f"43\0f7d21a1dfad4\0tip\0Doug Latornell <dlatornell@example.com>\0"
+            f"{timestamp} 25200\0foo/bar.py foo/baz.py\0foo/new.py\0\0"
+            f"Refactor the Frobnitzicator class\n\nImprove disambiguation\0"
+        )
+        monkeypatch.setattr(nemo_cmd.prepare, "_vcs_output", self.mock_vcs_output(log))
+        repo_rev_file_lines = nemo_cmd.prepare.get_hg_plumbing_revision(
+            hg_repo / "CONFIG", tmp_path / "tmp_run_dir"
+        )
+        formatted_datetime = (
+            arrow.get(timestamp).to(tz.tzlocal()).format("ddd MMM DD HH:mm:ss YYYY ZZ")
+        )
+        assert repo_rev_file_lines == [
+            "changset:   43:f7d21a1dfad4",
+            "tag:        tip",
+            "user:       Doug Latornell <dlatornell@example.com>",
+            f"date:       {formatted_datetime}",
+            "files:      foo/bar.py foo/baz.py foo/new.py",
+            "description:",
+            "Refactor the Frobnitzicator class",
+            "",
+            "Improve disambiguation",
+        ]
+
+    def test_merge_parents(self, hg_repo, tmp_path, monkeypatch):
+        log = (
+            "43\0f7d21a1dfad4\0tip\0Foo\00 0\0foo.py\0\0\0Merge\0"
+            "41\0a4f8e9b2e4e2\0\0Bar\00 0\0bar.py\0\0\0Fix\0"
+        )
+        monkeypatch.setattr(nemo_cmd.prepare, "_vcs_output", self.mock_vcs_output(log))
+        repo_rev_file_lines = nemo_cmd.prepare.get_hg_plumbing_revision(
+            hg_repo, tmp_path / "tmp_run_dir"
+        )
+        assert repo_rev_file_lines[2:4] == [
+            "parent:     43:f7d21a1dfad4",
+            "parent:     41:a4f8e9b2e4e2",
+        ]
+        assert repo_rev_file_lines[6] == "files:      foo.py"
+
+    def test_uncommitted_changes(self, hg_repo, tmp_path, monkeypatch, caplog):
+        log = "43\0f7d21a1dfad4\0\0Foo\00 0\0foo.py\0\0\0Fix\0"
+        status = "M CONFIG/cfg.txt\0A foo/qux.py\0  foo/baz.py\0R foo/baz.py\0"
+        monkeypatch.setattr(
+            nemo_cmd.prepare, "_vcs_output", self.mock_vcs_output(log, status)
+        )
+        repo_rev_file_lines = nemo_cmd.prepare.get_hg_plumbing_revision(
+            hg_repo, tmp_path / "tmp_run_dir"
+        )
+        assert caplog.messages[0] == f"There are uncommitted changes in {hg_repo}"
+        assert repo_rev_file_lines[-4:] == [
+            "uncommitted changes:",
+            "A foo/qux.py",
+            "  foo/baz.py",
+            "R foo/baz.py",
+        ]
+
+
 @patch("nemo_cmd.prepare.logger", autospec=True)
 @patch("nemo_cmd.prepare.make_grid_links", autospec=True)
 @patch("nemo_cmd.prepare.make_restart_links", autospec=True)
@@ -1827,8 +2443,8 @@ class TestAddAgrifFiles:
                 nocheck_init=False,
             )
         assert m_mk_grid_links.call_args_list == [
-            call(run_desc, Path("run_dir"), agrif_n=1),
-            call(run_desc, Path("run_dir"), agrif_n=2),
+            call(run_desc, Path("run_dir"), path_cache=None, agrif_n=1),
+            call(run_desc, Path("run_dir"), path_cache=None, agrif_n=2),
         ]
 
     @patch("nemo_cmd.prepare.shutil.copy2", autospec=True)
@@ -2021,8 +2637,20 @@ class TestAddAgrifFiles:
                 nocheck_init=False,
             )
         assert m_mk_nl.call_args_list == [
-            call(Path("run_set_dir"), run_desc, Path("run_dir"), agrif_n=1),
-            call(Path("run_set_dir"), run_desc, Path("run_dir"), agrif_n=2),
+            call(
+                Path("run_set_dir"),
+                run_desc,
+                Path("run_dir"),
+                path_cache=None,
+                agrif_n=1,
+            ),
+            call(
+                Path("run_set_dir"),
+                run_desc,
+                Path("run_dir"),
+                path_cache=None,
+                agrif_n=2,
+            ),
         ]
 
     @patch("nemo_cmd.prepare.shutil.copy2", autospec=True)
@@ -2105,6 +2733,7 @@ class TestAddAgrifFiles:
                 Path("foo.yaml"),
                 Path("run_set_dir"),
                 Path("run_dir"),
+                path_cache=None,
                 agrif_n=1,
             ),
             call(
@@ -2112,6 +2741,7 @@ class TestAddAgrifFiles:
                 Path("foo.yaml"),
                 Path("run_set_dir"),
                 Path("run_dir"),
+                path_cache=None,
                 agrif_n=2,
             ),
         ]
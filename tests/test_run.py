@@ -98,10 +98,20 @@ class TestTakeAction:
             waitjob=0,
             queue_job_cmd="qsub",
             quiet=False,
+            postprocess=False,
         )
         run_cmd.run(parsed_args)
         m_run.assert_called_once_with(
-            "desc file", "results dir", 4, False, False, False, 0, "qsub", quiet=False
+            "desc file",
+            "results dir",
+            4,
+            False,
+            False,
+            False,
+            0,
+            "qsub",
+            quiet=False,
+            postprocess=False,
         )
         m_logger.info.assert_called_once_with("qsub message")
 
@@ -117,6 +127,7 @@ class TestTakeAction:
             waitjob=0,
             queue_job_cmd="qsub",
             quiet=True,
+            postprocess=False,
         )
         run_cmd.run(parsed_args)
         assert not m_logger.info.called
@@ -133,6 +144,7 @@ class TestTakeAction:
             waitjob=0,
             queue_job_cmd="qsub",
             quiet=True,
+            postprocess=False,
         )
         run_cmd.run(parsed_args)
         assert not m_logger.info.called
@@ -174,7 +186,9 @@ class TestRun:
         submit_job_msg = nemo_cmd.run.run(
             Path("nemo.yaml"), str(p_results_dir), queue_job_cmd=queue_job_cmd
         )
-        m_prepare.assert_called_once_with(Path("nemo.yaml"), False)
+        m_prepare.assert_called_once_with(
+            Path("nemo.yaml"), False, run_desc=m_lrd.return_value
+        )
         m_lrd.assert_called_once_with(Path("nemo.yaml"))
         m_gnp.assert_called_once_with(m_lrd(), Path(str(p_run_dir)))
         m_bbs.assert_called_once_with(
@@ -187,9 +201,10 @@ class TestRun:
             Path(str(p_results_dir)),
             Path(str(p_run_dir)),
             queue_job_cmd,
+            False,
         )
         m_sco.assert_called_once_with(
-            [queue_job_cmd, "NEMO.sh"], universal_newlines=True
+            [queue_job_cmd, "NEMO.sh"], cwd=str(p_run_dir), universal_newlines=True
         )
         assert submit_job_msg == "msg"
 
@@ -224,7 +239,9 @@ class TestRun:
             no_submit=True,
             queue_job_cmd=queue_job_cmd,
         )
-        m_prepare.assert_called_once_with(Path("nemo.yaml"), False)
+        m_prepare.assert_called_once_with(
+            Path("nemo.yaml"), False, run_desc=m_lrd.return_value
+        )
         m_lrd.assert_called_once_with(Path("nemo.yaml"))
         m_gnp.assert_called_once_with(m_lrd(), Path(str(p_run_dir)))
         m_bbs.assert_called_once_with(
@@ -237,6 +254,7 @@ class TestRun:
             Path(str(p_results_dir)),
             Path(str(p_run_dir)),
             queue_job_cmd,
+            False,
         )
         assert not m_sco.called
         assert submit_job_msg is None
@@ -260,7 +278,9 @@ class TestRun:
             no_submit=False,
             queue_job_cmd=queue_job_cmd,
         )
-        m_prepare.assert_called_once_with(Path("nemo.yaml"), False)
+        m_prepare.assert_called_once_with(
+            Path("nemo.yaml"), False, run_desc=m_lrd.return_value
+        )
         m_lrd.assert_called_once_with(Path("nemo.yaml"))
         m_gnp.assert_called_once_with(m_lrd(), Path(str(p_run_dir)))
         m_bbs.assert_called_once_with(
@@ -273,9 +293,10 @@ class TestRun:
             Path(str(p_results_dir)),
             Path(str(p_run_dir)),
             queue_job_cmd,
+            False,
         )
         m_sco.assert_called_once_with(
-            [queue_job_cmd, "NEMO.sh"], universal_newlines=True
+            [queue_job_cmd, "NEMO.sh"], cwd=str(p_run_dir), universal_newlines=True
         )
         assert submit_job_msg == "msg"
 
@@ -307,7 +328,9 @@ class TestRun:
         submit_job_msg = nemo_cmd.run.run(
             Path("nemo.yaml"), str(p_results_dir), queue_job_cmd=queue_job_cmd
         )
-        m_prepare.assert_called_once_with(Path("nemo.yaml"), False)
+        m_prepare.assert_called_once_with(
+            Path("nemo.yaml"), False, run_desc=m_lrd.return_value
+        )
         m_lrd.assert_called_once_with(Path("nemo.yaml"))
         m_gnp.assert_called_once_with(m_lrd(), Path(str(p_run_dir)))
         m_bbs.assert_called_once_with(
@@ -320,9 +343,10 @@ class TestRun:
             Path(str(p_results_dir)),
             Path(str(p_run_dir)),
             queue_job_cmd,
+            False,
         )
         m_sco.assert_called_once_with(
-            [queue_job_cmd, "NEMO.sh"], universal_newlines=True
+            [queue_job_cmd, "NEMO.sh"], cwd=str(p_run_dir), universal_newlines=True
         )
         assert submit_job_msg == "msg"
 
@@ -341,7 +365,9 @@ class TestRun:
         submit_job_msg = nemo_cmd.run.run(
             Path("nemo.yaml"), str(p_results_dir), queue_job_cmd=queue_job_cmd
         )
-        m_prepare.assert_called_once_with(Path("nemo.yaml"), False)
+        m_prepare.assert_called_once_with(
+            Path("nemo.yaml"), False, run_desc=m_lrd.return_value
+        )
         m_lrd.assert_called_once_with(Path("nemo.yaml"))
         m_gnp.assert_called_once_with(m_lrd(), Path(str(p_run_dir)))
         m_bbs.assert_called_once_with(
@@ -354,9 +380,10 @@ class TestRun:
             Path(str(p_results_dir)),
             Path(str(p_run_dir)),
             queue_job_cmd,
+            False,
         )
         m_sco.assert_called_once_with(
-            [queue_job_cmd, "NEMO.sh"], universal_newlines=True
+            [queue_job_cmd, "NEMO.sh"], cwd=str(p_run_dir), universal_newlines=True
         )
         assert m_logger.error.called
         assert submit_job_msg is None
@@ -390,7 +417,9 @@ class TestRun:
                 waitjob=42,
                 queue_job_cmd=queue_job_cmd,
             )
-        m_prepare.assert_called_once_with(Path("nemo.yaml"), False)
+        m_prepare.assert_called_once_with(
+            Path("nemo.yaml"), False, run_desc=m_lrd.return_value
+        )
         m_lrd.assert_called_once_with(Path("nemo.yaml"))
         m_gnp.assert_called_once_with(m_lrd(), Path(m_prepare()))
         m_bbs.assert_called_once_with(
@@ -403,9 +432,12 @@ class TestRun:
             Path(str(p_results_dir)),
             Path(str(p_run_dir)),
             queue_job_cmd,
+            False,
         )
         m_sco.assert_called_once_with(
-            ["qsub", "-W", "depend=afterok:42", "NEMO.sh"], universal_newlines=True
+            ["qsub", "-W", "depend=afterok:42", "NEMO.sh"],
+            cwd=str(p_run_dir),
+            universal_newlines=True,
         )
         assert p_run_dir.join("NEMO.sh").check(file=True)
         assert qsb_msg == "msg"
@@ -439,7 +471,9 @@ class TestRun:
                 waitjob=42,
                 queue_job_cmd=queue_job_cmd,
             )
-        m_prepare.assert_called_once_with(Path("nemo.yaml"), False)
+        m_prepare.assert_called_once_with(
+            Path("nemo.yaml"), False, run_desc=m_lrd.return_value
+        )
         m_lrd.assert_called_once_with(Path("nemo.yaml"))
         m_gnp.assert_called_once_with(m_lrd(), Path(m_prepare()))
         m_bbs.assert_called_once_with(
@@ -452,9 +486,12 @@ class TestRun:
             Path(str(p_results_dir)),
             Path(str(p_run_dir)),
             queue_job_cmd,
+            False,
         )
         m_sco.assert_called_once_with(
-            ["sbatch", "-d", "afterok:42", "NEMO.sh"], universal_newlines=True
+            ["sbatch", "-d", "afterok:42", "NEMO.sh"],
+            cwd=str(p_run_dir),
+            universal_newlines=True,
         )
         assert p_run_dir.join("NEMO.sh").check(file=True)
         assert qsb_msg == "msg"
@@ -472,7 +509,6 @@ class TestBuiltBatchScript:
         monkeypatch.setattr(nemo_cmd.run, "Path", _mock_path)
 
     @patch("nemo_cmd.run._cleanup", autospec=True)
-    @patch("nemo_cmd.run._fix_permissions", autospec=True)
     @patch("nemo_cmd.run._execute", autospec=True)
     @patch("nemo_cmd.run._modules", autospec=True)
     @patch("nemo_cmd.run._definitions", autospec=True)
@@ -488,7 +524,6 @@ class TestBuiltBatchScript:
         m_defns,
         m_mods,
         m_exec,
-        m_fixperms,
         m_cleanup,
         mock_path,
         queue_job_cmd,
@@ -523,13 +558,12 @@ class TestBuiltBatchScript:
                 run_desc, nemo_processors + xios_processors, results_dir
             )
         m_defns.assert_called_once_with(
-            run_desc, desc_file, run_dir, results_dir, no_deflate
+            run_desc, desc_file, run_dir, results_dir, no_deflate, False
         )
         m_mods.assert_called_once_with(run_desc["modules to load"])
         m_exec.assert_called_once_with(
-            nemo_processors, xios_processors, no_deflate, max_deflate_jobs
+            nemo_processors, xios_processors, no_deflate, max_deflate_jobs, False
         )
-        m_fixperms.assert_called_once_with()
         m_cleanup.assert_called_once_with()
 
     @pytest.mark.parametrize("no_deflate", [True, False])
@@ -606,28 +640,27 @@ class TestBuiltBatchScript:
             'echo "Ended run at $(date)"\n'
             "\n"
             'echo "Results combining started at $(date)"\n'
-            "${COMBINE} ${RUN_DESC} --debug\n"
-            'echo "Results combining ended at $(date)"\n'
         )
+        if no_deflate:
+            expected += "${COMBINE} ${RUN_DESC} --output-dir ${RESULTS_DIR} --debug\n"
+        else:
+            expected += "${COMBINE} ${RUN_DESC} --debug\n"
+        expected += 'echo "Results combining ended at $(date)"\n'
         if not no_deflate:
             expected += (
                 "\n"
                 'echo "Results deflation started at $(date)"\n'
                 "module load nco/4.6.6\n"
                 "${DEFLATE} *_grid_[TUVW]*.nc *_ptrc_T*.nc "
-                "--jobs 4 --debug\n"
+                "--jobs 4 --output-dir ${RESULTS_DIR} --debug\n"
                 'echo "Results deflation ended at $(date)"\n'
             )
         expected += (
             "\n"
             'echo "Results gathering started at $(date)"\n'
-            "${GATHER} ${RESULTS_DIR} --debug\n"
+            "${GATHER} ${RESULTS_DIR} --add-mode 064 --debug\n"
             'echo "Results gathering ended at $(date)"\n'
             "\n"
-            "chmod go+rx ${RESULTS_DIR}\n"
-            "chmod g+rw ${RESULTS_DIR}/*\n"
-            "chmod o+r ${RESULTS_DIR}/*\n"
-            "\n"
             'echo "Deleting run directory" >>${RESULTS_DIR}/stdout\n'
             "rmdir $(pwd)\n"
             'echo "Finished at $(date)" >>${RESULTS_DIR}/stdout\n'
@@ -702,28 +735,27 @@ class TestBuiltBatchScript:
             'echo "Ended run at $(date)"\n'
             "\n"
             'echo "Results combining started at $(date)"\n'
-            "${COMBINE} ${RUN_DESC} --debug\n"
-            'echo "Results combining ended at $(date)"\n'
         )
+        if no_deflate:
+            expected += "${COMBINE} ${RUN_DESC} --output-dir ${RESULTS_DIR} --debug\n"
+        else:
+            expected += "${COMBINE} ${RUN_DESC} --debug\n"
+        expected += 'echo "Results combining ended at $(date)"\n'
         if not no_deflate:
             expected += (
                 "\n"
                 'echo "Results deflation started at $(date)"\n'
                 "module load nco/4.6.6\n"
                 "${DEFLATE} *_grid_[TUVW]*.nc *_ptrc_T*.nc "
-                "--jobs 4 --debug\n"
+                "--jobs 4 --output-dir ${RESULTS_DIR} --debug\n"
                 'echo "Results deflation ended at $(date)"\n'
             )
         expected += (
             "\n"
             'echo "Results gathering started at $(date)"\n'
-            "${GATHER} ${RESULTS_DIR} --debug\n"
+            "${GATHER} ${RESULTS_DIR} --add-mode 064 --debug\n"
             'echo "Results gathering ended at $(date)"\n'
             "\n"
-            "chmod go+rx ${RESULTS_DIR}\n"
-            "chmod g+rw ${RESULTS_DIR}/*\n"
-            "chmod o+r ${RESULTS_DIR}/*\n"
-            "\n"
             'echo "Deleting run directory" >>${RESULTS_DIR}/stdout\n'
             "rmdir $(pwd)\n"
             'echo "Finished at $(date)" >>${RESULTS_DIR}/stdout\n'
@@ -868,6 +900,53 @@ class TestDefinitions:
         expected += 'GATHER="pixi run -m $HOME/MEOPAR/NEMO-Cmd nemo gather"\n'
         assert defns == expected
 
+    def test_postprocess(self, monkeypatch):
+        def mock_path(p):
+            return Path("$HOME/MEOPAR/NEMO-Cmd/nemo_cmd/run.py")
+
+        monkeypatch.setattr(nemo_cmd.run, "Path", mock_path)
+
+        run_desc = {"run_id": "test"}
+        defns = nemo_cmd.run._definitions(
+            run_desc,
+            "NEMO.yaml",
+            Path("run_dir"),
+            Path("results_dir"),
+            False,
+            postprocess=True,
+        )
+        expected = (
+            'RUN_ID="test"\n'
+            'RUN_DESC="NEMO.yaml"\n'
+            'WORK_DIR="run_dir"\n'
+            'RESULTS_DIR="results_dir"\n'
+            'POSTPROCESS="pixi run -m $HOME/MEOPAR/NEMO-Cmd nemo postprocess"\n'
+        )
+        assert defns == expected
+
+
+class TestExecute:
+    """Unit tests for _execute() function."""
+
+    @pytest.mark.parametrize(
+        "no_deflate, expected_opts, module_load",
+        [
+            (False, "--deflate-jobs 4", "module load nco/4.6.6\n"),
+            (True, "--no-deflate", ""),
+        ],
+    )
+    def test_postprocess(self, no_deflate, expected_opts, module_load):
+        script = nemo_cmd.run._execute(42, 0, no_deflate, 4, postprocess=True)
+        assert script.endswith(
+            'echo "Results post-processing started at $(date)"\n'
+            f"{module_load}"
+            f"${{POSTPROCESS}} ${{RUN_DESC}} ${{RESULTS_DIR}} {expected_opts} "
+            f"--add-mode 064 --debug\n"
+            'echo "Results post-processing ended at $(date)"\n'
+        )
+        assert "${COMBINE}" not in script
+        assert "${GATHER}" not in script
+
 
 class TestModules:
     """Unit tests for _module() function."""
@@ -0,0 +1,166 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""NEMO-Cmd run description model unit tests"""
+
+from unittest.mock import patch
+
+import pytest
+
+import nemo_cmd
+import nemo_cmd.prepare
+from nemo_cmd.run_description import normalized_keys, RunDescription
+
+
+@pytest.fixture
+def run_desc_dict(tmp_path):
+    for dir_name in ("NEMO-3.6-code/NEMOGCM/CONFIG", "XIOS", "NEMO-forcing", "runs"):
+        (tmp_path / dir_name).mkdir(parents=True)
+    for file_name in ("iodef.xml", "domain_def.xml", "field_def.xml"):
+        (tmp_path / file_name).write_text("")
+    return {
+        "config_name": "SalishSea",
+        "run_id": "foo",
+        "MPI decomposition": "8x18",
+        "paths": {
+            "NEMO-code-config": str(tmp_path / "NEMO-3.6-code/NEMOGCM/CONFIG"),
+            "XIOS": str(tmp_path / "XIOS"),
+            "forcing": str(tmp_path / "NEMO-forcing"),
+            "runs directory": str(tmp_path / "runs"),
+        },
+        "namelists": {"namelist_cfg": ["namelist.time"]},
+        "output": {
+            "separate XIOS server": True,
+            "XIOS servers": 1,
+            "files": str(tmp_path / "iodef.xml"),
+            "domain": str(tmp_path / "domain_def.xml"),
+            "fields": str(tmp_path / "field_def.xml"),
+        },
+    }
+
+
+class TestNormalizedKeys:
+    """Unit tests for normalized_keys function."""
+
+    def test_alternate_keys(self, run_desc_dict):
+        run_desc = normalized_keys(run_desc_dict)
+        assert run_desc["config name"] == "SalishSea"
+        assert "NEMO code config" in run_desc["paths"]
+        assert set(run_desc["output"]) == {
+            "separate XIOS server",
+            "XIOS servers",
+            "iodefs",
+            "domaindefs",
+            "fielddefs",
+        }
+        # The original dict is unchanged
+        assert "config_name" in run_desc_dict
+
+    def test_canonical_key_precedence(self):
+        run_desc = normalized_keys(
+            {
+                "grid": {
+                    "land processor elimination": "lpe.csv",
+                    "Land processor elimination": False,
+                }
+            }
+        )
+        assert run_desc == {"grid": {"land processor elimination": "lpe.csv"}}
+
+    def test_agrif_output(self):
+        run_desc = normalized_keys(
+            {"output": {"AGRIF_1": {"domain": "domain_def.xml", "filedefs": "f.xml"}}}
+        )
+        assert run_desc == {
+            "output": {"AGRIF_1": {"domaindefs": "domain_def.xml", "filedefs": "f.xml"}}
+        }
+
+    def test_unrelated_sections_not_copied(self, run_desc_dict):
+        run_desc = normalized_keys(run_desc_dict)
+        assert run_desc["namelists"] is run_desc_dict["namelists"]
+
+
+class TestRunDescription:
+    """Unit tests for RunDescription class."""
+
+    def test_typed_values(self, run_desc_dict):
+        run_desc = RunDescription.from_dict(run_desc_dict)
+        assert run_desc.run_id == "foo"
+        assert run_desc.config_name == "SalishSea"
+        assert run_desc.mpi_decomposition == (8, 18)
+        assert run_desc.separate_xios_server
+        assert run_desc.xios_servers == 1
+
+    def test_mapping(self, run_desc_dict):
+        run_desc = RunDescription.from_dict(run_desc_dict)
+        assert run_desc == normalized_keys(run_desc_dict)
+        assert "vcs revisions" not in run_desc
+        nemo_config_dir = nemo_cmd.prepare.get_run_desc_value(
+            run_desc, ("paths", "NEMO code config"), fatal=False
+        )
+        assert nemo_config_dir == run_desc_dict["paths"]["NEMO-code-config"]
+
+    def test_slots(self, run_desc_dict):
+        run_desc = RunDescription.from_dict(run_desc_dict)
+        with pytest.raises(AttributeError):
+            run_desc.foo = "bar"
+
+    def test_from_run_description(self, run_desc_dict):
+        run_desc = RunDescription.from_dict(run_desc_dict)
+        assert RunDescription.from_dict(run_desc) is run_desc
+
+    def test_load(self, tmp_path):
+        desc_file = tmp_path / "run_desc.yaml"
+        desc_file.write_text("run_id: foo\npaths:\n  NEMO-code-config: CONFIG/\n")
+        run_desc = RunDescription.load(desc_file)
+        assert run_desc == {"run_id": "foo", "paths": {"NEMO code config": "CONFIG/"}}
+
+    def test_validate(self, run_desc_dict, tmp_path):
+        run_desc = RunDescription.from_dict(run_desc_dict)
+        path_cache = nemo_cmd.PathCache()
+        run_desc.validate(path_cache)
+        assert run_desc.nemo_code_config == tmp_path / "NEMO-3.6-code/NEMOGCM/CONFIG"
+        assert run_desc.forcing == tmp_path / "NEMO-forcing"
+        assert run_desc.iodefs == tmp_path / "iodef.xml"
+        assert run_desc.filedefs is None
+        # Later lookups reuse the resolved paths
+        misses = path_cache.misses
+        nemo_cmd.prepare.get_run_desc_value(
+            run_desc, ("paths", "XIOS"), resolve_path=True, path_cache=path_cache
+        )
+        assert path_cache.misses == misses
+
+    @patch("nemo_cmd.run_description.logger", autospec=True)
+    def test_validate_reports_all_errors(self, m_logger, run_desc_dict, tmp_path):
+        del run_desc_dict["run_id"]
+        run_desc_dict["MPI decomposition"] = "8 by 18"
+        run_desc_dict["paths"]["XIOS"] = str(tmp_path / "XIOS-2")
+        del run_desc_dict["output"]["XIOS servers"]
+        run_desc = RunDescription.from_dict(run_desc_dict)
+        with pytest.raises(SystemExit):
+            run_desc.validate()
+        errors = [call.args[0] for call in m_logger.error.call_args_list]
+        assert errors == [
+            '"run_id" key not found - please check your run description YAML file',
+            '"MPI decomposition: 8 by 18" value is not like 8x18 - please check your '
+            "run description YAML file",
+            '"output: XIOS servers" key not found - please check your run '
+            "description YAML file",
+            f'{tmp_path / "XIOS-2"} path from "paths: XIOS" key not found - please '
+            f"check your run description YAML file",
+        ]
@@ -0,0 +1,542 @@
+# Copyright 2013 – present by the SalishSeaCast contributors
+# and The University of British Columbia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""NEMO-Cmd parallel transfer engine unit tests"""
+
+import errno
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+
+from nemo_cmd import transfer
+
+
+@pytest.fixture
+def cross_device(monkeypatch):
+    """Make renames of the entries to be moved fail as if the destination
+    was on another file system.
+    """
+    os_rename = os.rename
+
+    def mock_rename(src, dest):
+        if not src.endswith(".part"):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        os_rename(src, dest)
+
+    monkeypatch.setattr(transfer.os, "rename", mock_rename)
+
+
+class TestMoveEntries:
+    """Unit tests for move_entries function."""
+
+    def test_same_file_system(self, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        (src / "foo.nc").write_bytes(b"foo")
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        copied_bytes, digests = transfer.move_entries([src / "foo.nc"], dest_dir)
+        assert copied_bytes == 0
+        assert digests == {}
+        assert (dest_dir / "foo.nc").read_bytes() == b"foo"
+        assert not (src / "foo.nc").exists()
+
+    def test_cross_file_system_file(self, cross_device, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        (src / "foo.nc").write_bytes(b"foo")
+        (src / "foo.nc").chmod(0o640)
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        copied_bytes, _ = transfer.move_entries([src / "foo.nc"], dest_dir)
+        assert copied_bytes == 3
+        assert (dest_dir / "foo.nc").read_bytes() == b"foo"
+        assert (dest_dir / "foo.nc").stat().st_mode & 0o777 == 0o640
+        assert not (src / "foo.nc").exists()
+        assert not (dest_dir / ".foo.nc.part").exists()
+
+    def test_cross_file_system_tree(self, cross_device, tmp_path):
+        src = tmp_path / "src"
+        (src / "restart" / "sub").mkdir(parents=True)
+        (src / "restart" / "foo.nc").write_bytes(b"foo")
+        (src / "restart" / "sub" / "empty.nc").write_bytes(b"")
+        (src / "restart" / "link").symlink_to("foo.nc")
+        (src / "restart" / "dir_link").symlink_to("sub")
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        transfer.move_entries([src / "restart"], dest_dir)
+        assert not (src / "restart").exists()
+        assert (dest_dir / "restart" / "foo.nc").read_bytes() == b"foo"
+        assert (dest_dir / "restart" / "sub" / "empty.nc").read_bytes() == b""
+        assert os.readlink(dest_dir / "restart" / "link") == "foo.nc"
+        assert os.readlink(dest_dir / "restart" / "dir_link") == "sub"
+
+    def test_resumed_tree_symlinks(self, cross_device, tmp_path):
+        src = tmp_path / "src"
+        (src / "restart").mkdir(parents=True)
+        (src / "restart" / "foo.nc").write_bytes(b"foo")
+        (src / "restart" / "link").symlink_to("foo.nc")
+        (src / "restart" / "other_link").symlink_to("foo.nc")
+        dest_dir = tmp_path / "dest"
+        (dest_dir / "restart").mkdir(parents=True)
+        # Links created by an interrupted transfer
+        (dest_dir / "restart" / "link").symlink_to("foo.nc")
+        (dest_dir / "restart" / "other_link").symlink_to("bar.nc")
+        transfer.move_entries([src / "restart"], dest_dir)
+        assert os.readlink(dest_dir / "restart" / "link") == "foo.nc"
+        assert os.readlink(dest_dir / "restart" / "other_link") == "foo.nc"
+        assert not (src / "restart").exists()
+
+    def test_byte_ranges(self, cross_device, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        data = bytes(range(256)) * 40
+        (src / "foo.nc").write_bytes(data)
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        transfer.move_entries([src / "foo.nc"], dest_dir, range_size=1000)
+        assert (dest_dir / "foo.nc").read_bytes() == data
+
+    @pytest.mark.parametrize("hash_name", ["blake2b", "sha256"])
+    def test_hash_copied_files(self, hash_name, cross_device, tmp_path):
+        src = tmp_path / "src"
+        (src / "restart").mkdir(parents=True)
+        data = bytes(range(256)) * 40
+        (src / "foo.nc").write_bytes(data)
+        (src / "restart" / "bar.nc").write_bytes(b"bar")
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        _, digests = transfer.move_entries(
+            [src / "foo.nc", src / "restart"],
+            dest_dir,
+            range_size=1000,
+            hash_name=hash_name,
+        )
+        assert (dest_dir / "foo.nc").read_bytes() == data
+        assert digests == {
+            dest_dir / "foo.nc": hashlib.new(hash_name, data).hexdigest(),
+            dest_dir / "restart" / "bar.nc": hashlib.new(hash_name, b"bar").hexdigest(),
+        }
+
+    def test_hash_renamed_files(self, tmp_path):
+        src = tmp_path / "src"
+        (src / "restart").mkdir(parents=True)
+        (src / "restart" / "bar.nc").write_bytes(b"bar")
+        (src / "restart" / "link").symlink_to("bar.nc")
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        _, digests = transfer.move_entries(
+            [src / "restart"], dest_dir, hash_name="blake2b"
+        )
+        assert digests == {
+            dest_dir / "restart" / "bar.nc": hashlib.blake2b(b"bar").hexdigest()
+        }
+
+    def test_keep_source(self, tmp_path):
+        src = tmp_path / "src"
+        (src / "restart").mkdir(parents=True)
+        (src / "foo.nc").write_bytes(b"foo")
+        (src / "restart" / "bar.nc").write_bytes(b"bar")
+        (src / "restart" / "link").symlink_to("bar.nc")
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        transfer.move_entries(
+            [src / "foo.nc", src / "restart"], dest_dir, keep_source=True
+        )
+        assert (src / "foo.nc").read_bytes() == b"foo"
+        assert (src / "restart" / "bar.nc").read_bytes() == b"bar"
+        assert (src / "restart" / "link").is_symlink()
+        assert (dest_dir / "foo.nc").read_bytes() == b"foo"
+        assert (dest_dir / "restart" / "bar.nc").read_bytes() == b"bar"
+        assert os.readlink(dest_dir / "restart" / "link") == "bar.nc"
+
+    def test_keep_source_cross_file_system(self, tmp_path, monkeypatch):
+        def cross_device(*args):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+        monkeypatch.setattr(transfer, "_clone", cross_device)
+        monkeypatch.setattr(transfer.os, "link", cross_device)
+        src = tmp_path / "src"
+        src.mkdir()
+        (src / "foo.nc").write_bytes(b"foo")
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        copied_bytes, digests = transfer.move_entries(
+            [src / "foo.nc"], dest_dir, keep_source=True, hash_name="sha256"
+        )
+        assert copied_bytes == 3
+        assert digests == {dest_dir / "foo.nc": hashlib.sha256(b"foo").hexdigest()}
+        assert (src / "foo.nc").read_bytes() == b"foo"
+        assert (dest_dir / "foo.nc").read_bytes() == b"foo"
+
+    def test_subdirs(self, cross_device, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        (src / "foo.nc").write_bytes(b"foo")
+        (src / "bar.nc").write_bytes(b"bar")
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        transfer.move_entries(
+            [src / "foo.nc", src / "bar.nc"],
+            dest_dir,
+            subdirs={src / "foo.nc": Path("2015/01")},
+        )
+        assert (dest_dir / "2015" / "01" / "foo.nc").read_bytes() == b"foo"
+        assert (dest_dir / "bar.nc").read_bytes() == b"bar"
+
+    def test_other_rename_error_raised(self, tmp_path):
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        with pytest.raises(FileNotFoundError):
+            transfer.move_entries([tmp_path / "missing.nc"], dest_dir)
+
+
+class TestCopyFiles:
+    """Unit tests for copy_files function."""
+
+    def test_failed_copy_keeps_source(self, tmp_path, monkeypatch):
+        def mock_copy_bytes(*args):
+            raise OSError(errno.EIO, "I/O error")
+
+        monkeypatch.setattr(transfer, "_copy_bytes", mock_copy_bytes)
+        (tmp_path / "foo.nc").write_bytes(b"foo")
+        copies = [transfer.FileCopy(tmp_path / "foo.nc", tmp_path / "bar.nc", 3)]
+        with pytest.raises(OSError):
+            transfer.copy_files(copies)
+        assert (tmp_path / "foo.nc").exists()
+        assert not (tmp_path / "bar.nc").exists()
+        assert not (tmp_path / ".bar.nc.part").exists()
+
+
+class TestJournal:
+    """Unit tests for resuming interrupted transfers from the journal."""
+
+    def test_interrupted_copy_resumed(self, cross_device, tmp_path, monkeypatch):
+        src = tmp_path / "src"
+        src.mkdir()
+        data = bytes(range(256)) * 40
+        (src / "foo.nc").write_bytes(data)
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        copy_bytes = transfer._copy_bytes
+        failing_offsets = {5000}
+        offsets = []
+
+        def mock_copy_bytes(src_fd, dest_fd, offset, count, hasher=None):
+            if offset in failing_offsets:
+                raise OSError(errno.EIO, "I/O error")
+            offsets.append(offset)
+            copy_bytes(src_fd, dest_fd, offset, count, hasher)
+
+        monkeypatch.setattr(transfer, "_copy_bytes", mock_copy_bytes)
+        with pytest.raises(OSError):
+            transfer.move_entries([src / "foo.nc"], dest_dir, range_size=1000)
+        assert (src / "foo.nc").exists()
+        assert (dest_dir / ".foo.nc.part").exists()
+        assert (dest_dir / transfer.JOURNAL).exists()
+        failing_offsets.clear()
+        offsets.clear()
+        transfer.move_entries([src / "foo.nc"], dest_dir, range_size=1000)
+        assert offsets == [5000]
+        assert (dest_dir / "foo.nc").read_bytes() == data
+        assert not (src / "foo.nc").exists()
+        assert not (dest_dir / transfer.JOURNAL).exists()
+
+    def test_changed_source_rolled_back(self, tmp_path):
+        (tmp_path / "foo.nc").write_bytes(b"foo")
+        copy = transfer.FileCopy(
+            tmp_path / "foo.nc", tmp_path / "dest" / "foo.nc", 3, src_mtime_ns=1
+        )
+        (tmp_path / "dest").mkdir()
+        copy.tmp_path.write_bytes(b"f\x00\x00")
+        journal = transfer.Journal(tmp_path / "dest" / transfer.JOURNAL)
+        journal.record("started", copy)
+        journal.record("range", copy, 0)
+        assert journal.recover() == {}
+        assert not copy.tmp_path.exists()
+
+    def test_unhashed_copy_resumable(self, tmp_path):
+        (tmp_path / "foo.nc").write_bytes(b"foo")
+        mtime_ns = (tmp_path / "foo.nc").stat().st_mtime_ns
+        copy = transfer.FileCopy(
+            tmp_path / "foo.nc", tmp_path / "dest" / "foo.nc", 3, src_mtime_ns=mtime_ns
+        )
+        (tmp_path / "dest").mkdir()
+        copy.tmp_path.write_bytes(b"f\x00\x00")
+        journal = transfer.Journal(tmp_path / "dest" / transfer.JOURNAL)
+        journal.record("started", copy, 1000)
+        journal.record("range", copy, 0)
+        assert journal.recover() == {copy.dest: (1000, {0})}
+        assert journal.recover(resume=False) == {}
+        assert not copy.tmp_path.exists()
+
+    @pytest.mark.parametrize("state", ["copied", "verified"])
+    def test_source_removal_finished(self, state, tmp_path):
+        (tmp_path / "foo.nc").write_bytes(b"foo")
+        (tmp_path / "dest").mkdir()
+        (tmp_path / "dest" / "foo.nc").write_bytes(b"foo")
+        copy = transfer.FileCopy(tmp_path / "foo.nc", tmp_path / "dest" / "foo.nc", 3)
+        journal = transfer.Journal(tmp_path / "dest" / transfer.JOURNAL)
+        journal.record("started", copy)
+        journal.record(state, copy)
+        transfer.move_entries([], tmp_path / "dest")
+        assert not (tmp_path / "foo.nc").exists()
+        assert (tmp_path / "dest" / "foo.nc").read_bytes() == b"foo"
+        assert not (tmp_path / "dest" / transfer.JOURNAL).exists()
+
+    @pytest.mark.parametrize("state", ["copied", "verified"])
+    def test_finished_entry_skipped(self, state, cross_device, tmp_path):
+        # Entries are scanned before the journal is recovered
+        (tmp_path / "foo.nc").write_bytes(b"foo")
+        (tmp_path / "bar.nc").write_bytes(b"bar")
+        (tmp_path / "dest").mkdir()
+        (tmp_path / "dest" / "foo.nc").write_bytes(b"foo")
+        copy = transfer.FileCopy(tmp_path / "foo.nc", tmp_path / "dest" / "foo.nc", 3)
+        journal = transfer.Journal(tmp_path / "dest" / transfer.JOURNAL)
+        journal.record("started", copy, 3)
+        journal.record(state, copy)
+        copied_bytes, digests = transfer.move_entries(
+            [tmp_path / "foo.nc", tmp_path / "bar.nc"],
+            tmp_path / "dest",
+            hash_name="md5",
+        )
+        assert copied_bytes == 3
+        assert not (tmp_path / "foo.nc").exists()
+        assert (tmp_path / "dest" / "bar.nc").read_bytes() == b"bar"
+        assert set(digests) == {
+            tmp_path / "dest" / "foo.nc",
+            tmp_path / "dest" / "bar.nc",
+        }
+
+    def test_changed_range_size_restarted(self, cross_device, tmp_path, monkeypatch):
+        src = tmp_path / "src"
+        src.mkdir()
+        data = bytes(range(256)) * 40
+        (src / "foo.nc").write_bytes(data)
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        copy_bytes = transfer._copy_bytes
+        offsets = []
+
+        def mock_copy_bytes(src_fd, dest_fd, offset, count, hasher=None):
+            if offset == 5000:
+                raise OSError(errno.EIO, "I/O error")
+            offsets.append(offset)
+            copy_bytes(src_fd, dest_fd, offset, count, hasher)
+
+        monkeypatch.setattr(transfer, "_copy_bytes", mock_copy_bytes)
+        with pytest.raises(OSError):
+            transfer.move_entries([src / "foo.nc"], dest_dir, range_size=1000)
+        monkeypatch.setattr(transfer, "_copy_bytes", copy_bytes)
+        # Resuming in 4000 byte ranges would skip the range at 4000 as done
+        # although only its 1st 1000 bytes were copied
+        transfer.move_entries([src / "foo.nc"], dest_dir, range_size=4000)
+        assert (dest_dir / "foo.nc").read_bytes() == data
+
+    def test_restarted_copy_discards_ranges(self, tmp_path):
+        copy = transfer.FileCopy(tmp_path / "foo.nc", tmp_path / "bar.nc", 3)
+        journal = transfer.Journal(tmp_path / transfer.JOURNAL)
+        journal.record("started", copy, 1)
+        journal.record("range", copy, 0)
+        journal.record("started", copy, 3)
+        assert journal.read()[tmp_path / "bar.nc"]["offsets"] == set()
+        assert journal.read()[tmp_path / "bar.nc"]["range_size"] == 3
+
+    def test_incomplete_record_ignored(self, tmp_path):
+        copy = transfer.FileCopy(tmp_path / "foo.nc", tmp_path / "bar.nc", 3)
+        journal = transfer.Journal(tmp_path / transfer.JOURNAL)
+        journal.record("started", copy)
+        with journal.path.open("at") as f:
+            f.write("range\tbar")
+        assert journal.read()[tmp_path / "bar.nc"]["state"] == "started"
+
+
+class TestPermissions:
+    """Unit tests for Permissions class."""
+
+    def test_add_mode_bits(self, tmp_path):
+        (tmp_path / "foo.nc").write_bytes(b"foo")
+        (tmp_path / "foo.nc").chmod(0o600)
+        transfer.Permissions(0o064).apply(tmp_path / "foo.nc")
+        assert (tmp_path / "foo.nc").stat().st_mode & 0o777 == 0o664
+
+    def test_directory_search_bits(self, tmp_path):
+        (tmp_path / "restart").mkdir(mode=0o700)
+        transfer.Permissions(0o044).apply(tmp_path / "restart")
+        assert (tmp_path / "restart").stat().st_mode & 0o777 == 0o755
+
+    def test_unchanged_mode_not_set(self, tmp_path, monkeypatch):
+        (tmp_path / "foo.nc").write_bytes(b"foo")
+        (tmp_path / "foo.nc").chmod(0o664)
+
+        def mock_chmod(*args):
+            raise AssertionError("unexpected chmod")
+
+        monkeypatch.setattr(transfer.os, "chmod", mock_chmod)
+        transfer.Permissions(0o064).apply(tmp_path / "foo.nc")
+
+    def test_symlink_unchanged(self, tmp_path):
+        (tmp_path / "foo.nc").write_bytes(b"foo")
+        (tmp_path / "foo.nc").chmod(0o600)
+        (tmp_path / "link").symlink_to("foo.nc")
+        transfer.Permissions(0o064).apply(tmp_path / "link")
+        assert (tmp_path / "foo.nc").stat().st_mode & 0o777 == 0o600
+
+    def test_copied_files(self, cross_device, tmp_path):
+        src = tmp_path / "src"
+        (src / "restart").mkdir(parents=True)
+        (src / "restart").chmod(0o700)
+        (src / "restart" / "foo.nc").write_bytes(b"foo")
+        (src / "restart" / "foo.nc").chmod(0o600)
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        permissions = transfer.Permissions(0o064, os.getegid())
+        transfer.move_entries([src / "restart"], dest_dir, permissions=permissions)
+        assert (dest_dir / "restart").stat().st_mode & 0o777 == 0o775
+        assert (dest_dir / "restart" / "foo.nc").stat().st_mode & 0o777 == 0o664
+
+    def test_renamed_tree(self, tmp_path):
+        src = tmp_path / "src"
+        (src / "restart").mkdir(parents=True)
+        (src / "restart" / "foo.nc").write_bytes(b"foo")
+        (src / "restart" / "foo.nc").chmod(0o600)
+        dest_dir = tmp_path / "dest"
+        dest_dir.mkdir()
+        transfer.move_entries(
+            [src / "restart"], dest_dir, permissions=transfer.Permissions(0o064)
+        )
+        assert (dest_dir / "restart" / "foo.nc").stat().st_mode & 0o777 == 0o664
+
+
+class TestCloneOrLink:
+    """Unit tests for FileCopy.clone_or_link method."""
+
+    def test_clone(self, tmp_path, monkeypatch):
+        def mock_clone(src, dest):
+            dest.write_bytes(src.read_bytes())
+
+        monkeypatch.setattr(transfer, "_clone", mock_clone)
+        (tmp_path / "foo.nc").write_bytes(b"foo")
+        copy = transfer.FileCopy(tmp_path / "foo.nc", tmp_path / "bar.nc", 3)
+        assert copy.clone_or_link() == "clone"
+        assert (tmp_path / "bar.nc").read_bytes() == b"foo"
+        assert (tmp_path / "foo.nc").stat().st_ino != (
+            tmp_path / "bar.nc"
+        ).stat().st_ino
+
+    def test_link(self, tmp_path, monkeypatch):
+        def unsupported(src, dest):
+            dest.write_bytes(b"")
+            raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+        monkeypatch.setattr(transfer, "_clone", unsupported)
+        (tmp_path / "foo.nc").write_bytes(b"foo")
+        copy = transfer.FileCopy(tmp_path / "foo.nc", tmp_path / "bar.nc", 3)
+        assert copy.clone_or_link() == "link"
+        assert (tmp_path / "foo.nc").stat().st_ino == (
+            tmp_path / "bar.nc"
+        ).stat().st_ino
+        assert not copy.tmp_path.exists()
+
+    def test_copy_required(self, tmp_path, monkeypatch):
+        def cross_device(*args):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+        monkeypatch.setattr(transfer, "_clone", cross_device)
+        monkeypatch.setattr(transfer.os, "link", cross_device)
+        (tmp_path / "foo.nc").write_bytes(b"foo")
+        copy = transfer.FileCopy(tmp_path / "foo.nc", tmp_path / "bar.nc", 3)
+        assert copy.clone_or_link() is None
+        assert not (tmp_path / "bar.nc").exists()
+
+
+class TestCopyBytes:
+    """Unit tests for _copy_bytes function."""
+
+    @pytest.mark.parametrize("unavailable", [(), ("copy_file_range",)])
+    def test_in_kernel_copy(self, unavailable, tmp_path, monkeypatch):
+        for name in unavailable:
+            monkeypatch.delattr(transfer.os, name, raising=False)
+        self._check_copy(tmp_path)
+
+    def test_fallback_to_pread_pwrite(self, tmp_path, monkeypatch):
+        def unsupported(*args):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+        monkeypatch.setattr(transfer, "_copy_file_range", unsupported)
+        monkeypatch.setattr(transfer, "_sendfile", unsupported)
+        monkeypatch.setattr(transfer, "BUFFER_SIZE", 7)
+        self._check_copy(tmp_path)
+
+    def test_hashing_streams_through_user_space(self, tmp_path, monkeypatch):
+        def in_kernel_copy(*args):
+            raise AssertionError("data must be hashed")
+
+        monkeypatch.setattr(transfer, "_copy_file_range", in_kernel_copy)
+        monkeypatch.setattr(transfer, "_sendfile", in_kernel_copy)
+        monkeypatch.setattr(transfer, "BUFFER_SIZE", 3)
+        hasher = hashlib.sha256()
+        self._check_copy(tmp_path, hasher)
+        assert hasher.hexdigest() == hashlib.sha256(b"56789abcde").hexdigest()
+
+    def test_unexpected_end_of_file(self, tmp_path):
+        src, dest = tmp_path / "src", tmp_path / "dest"
+        src.write_bytes(b"abc")
+        dest.write_bytes(b"")
+        src_fd = os.open(src, os.O_RDONLY)
+        dest_fd = os.open(dest, os.O_WRONLY)
+        try:
+            with pytest.raises(OSError):
+                transfer._copy_bytes(src_fd, dest_fd, 0, 10)
+        finally:
+            os.close(src_fd)
+            os.close(dest_fd)
+
+    @staticmethod
+    def _check_copy(tmp_path, hasher=None):
+        src, dest = tmp_path / "src", tmp_path / "dest"
+        src.write_bytes(b"0123456789abcdefghij")
+        dest.write_bytes(b"\x00" * 20)
+        src_fd = os.open(src, os.O_RDONLY)
+        dest_fd = os.open(dest, os.O_WRONLY)
+        try:
+            transfer._copy_bytes(src_fd, dest_fd, 5, 10, hasher)
+        finally:
+            os.close(src_fd)
+            os.close(dest_fd)
+        assert dest.read_bytes() == b"\x00" * 5 + b"56789abcde" + b"\x00" * 5
+
+
+class TestHashFiles:
+    """Unit tests for walk_files and hash_files functions."""
+
+    def test_hash_files(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(transfer, "BUFFER_SIZE", 4)
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "foo.nc").write_bytes(b"0123456789")
+        (tmp_path / "sub" / "bar.nc").write_bytes(b"")
+        (tmp_path / "link").symlink_to("foo.nc")
+        paths = sorted(transfer.walk_files(tmp_path))
+        assert paths == [tmp_path / "foo.nc", tmp_path / "sub" / "bar.nc"]
+        digests = transfer.hash_files(paths, "sha256", max_workers=2)
+        assert digests == {
+            tmp_path / "foo.nc": hashlib.sha256(b"0123456789").hexdigest(),
+            tmp_path / "sub" / "bar.nc": hashlib.sha256(b"").hexdigest(),
+        }